@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+"""
+benchmarks/bench_alias_index.py - Command extraction cost with many registered aliases.
+Registers thousands of synthetic one- to three-word aliases and times finding the longest
+alias at the start of a message, once with the old sort-and-scan approach and once with
+the alias trie.
+
+Usage:
+    python benchmarks/bench_alias_index.py [alias_count] [iterations]
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from plugins.alias_index import AliasMapping
+
+def _scan_match(mapping: dict, text: str):
+    """
+    The previous implementation: sort aliases by length, then test each as a prefix.
+    """
+    for alias in sorted(mapping.keys(), key=lambda x: len(x), reverse=True):
+        if text.startswith(alias) and (len(text) == len(alias) or text[len(alias)] == " "):
+            return mapping[alias], len(alias)
+    return None
+
+def main() -> None:
+    alias_count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    rng = random.Random(42)
+    vocab = [f"w{i}" for i in range(400)]
+    mapping = AliasMapping()
+    while len(mapping) < alias_count:
+        alias = " ".join(rng.choice(vocab) for _ in range(rng.randint(1, 3)))
+        mapping[alias] = alias
+    plain = dict(mapping)
+    aliases = list(plain)
+    messages = [rng.choice(aliases) + " some trailing arguments here" for _ in range(iterations // 2)]
+    messages += ["no alias matches this message at all"] * (iterations - len(messages))
+
+    start = time.perf_counter()
+    for text in messages:
+        expected = _scan_match(plain, text)
+    scan = (time.perf_counter() - start) / len(messages) * 1e6
+
+    start = time.perf_counter()
+    for text in messages:
+        result = mapping.index.longest_match(text)
+    trie = (time.perf_counter() - start) / len(messages) * 1e6
+
+    for text in messages:
+        assert mapping.index.longest_match(text) == _scan_match(plain, text)
+
+    print(f"{alias_count} aliases, {len(messages)} messages")
+    print(f"{'method':<8} {'per message (us)':>18}")
+    print(f"{'scan':<8} {scan:>18.1f}")
+    print(f"{'trie':<8} {trie:>18.2f}")
+    print(f"speedup: {scan / trie:.0f}x")
+
+if __name__ == "__main__":
+    main()
+
+# End of benchmarks/bench_alias_index.py
@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+"""
+benchmarks/bench_db_pool.py - Per-query latency of fresh vs. pooled SQLite connections.
+Runs a primary-key SELECT and a single-row UPDATE against a temporary UserStates table,
+once opening a new connection per query (the old get_connection path) and once through
+the shared connection pool.
+
+Usage:
+    python benchmarks/bench_db_pool.py [iterations]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+_fd, _db_path = tempfile.mkstemp(prefix="bench_pool_", suffix=".db")
+os.close(_fd)
+os.environ["DB_NAME"] = _db_path
+
+from db.connection import get_connection, get_pooled_connection, close_pool
+import db.schema
+
+SELECT_SQL = "SELECT user_id, flow_state FROM UserStates WHERE user_id = ?"
+UPDATE_SQL = "UPDATE UserStates SET flow_state = ? WHERE user_id = ?"
+
+def _run(provider, iterations: int) -> dict:
+    """
+    Time SELECT and UPDATE statements using connections from provider().
+    Returns mean microseconds per query for each statement.
+    """
+    results = {}
+    for label, sql, params, commit in (
+        ("select", SELECT_SQL, ("user-1",), False),
+        ("update", UPDATE_SQL, ('{"flows": {}}', "user-1"), True),
+    ):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            conn = provider()
+            conn.execute(sql, params).fetchall()
+            if commit:
+                conn.commit()
+            conn.close()
+        results[label] = (time.perf_counter() - start) / iterations * 1e6
+    return results
+
+def main() -> None:
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    db.schema.init_db()
+    conn = get_connection()
+    conn.execute("INSERT OR REPLACE INTO UserStates (user_id, flow_state) VALUES ('user-1', '{}')")
+    conn.commit()
+    conn.close()
+    # Open one pooled connection first so both runs see the same (WAL) journal mode.
+    get_pooled_connection().close()
+
+    fresh = _run(get_connection, iterations)
+    pooled = _run(get_pooled_connection, iterations)
+    close_pool()
+
+    print(f"{'query':<8} {'fresh (us)':>12} {'pooled (us)':>12} {'speedup':>8}")
+    for label in ("select", "update"):
+        print(f"{label:<8} {fresh[label]:>12.1f} {pooled[label]:>12.1f} {fresh[label] / pooled[label]:>7.1f}x")
+
+if __name__ == "__main__":
+    try:
+        main()
+    finally:
+        for suffix in ("", "-wal", "-shm"):
+            try:
+                os.remove(_db_path + suffix)
+            except OSError:
+                pass
+
+# End of benchmarks/bench_db_pool.py
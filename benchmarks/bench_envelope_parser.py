@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+"""
+benchmarks/bench_envelope_parser.py - Envelope parsing cost on a signal-cli corpus.
+Times extracting every field with the seven parse_* functions against parse_envelope,
+plus full parse_message / parse_messages, on the corpus from
+tests/parsers/envelope_corpus.py. Reports the best of many short rounds, which keeps
+the figures stable on a busy machine.
+
+Usage:
+    python benchmarks/bench_envelope_parser.py [envelopes] [rounds]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from parsers import envelope_parser as ep
+from parsers.message_parser import parse_message, parse_messages
+from tests.parsers.envelope_corpus import build_corpus
+
+def _per_field(message: str):
+    return (
+        ep.parse_sender(message),
+        ep.parse_body(message),
+        ep.parse_timestamp(message),
+        ep.parse_group_info(message),
+        ep.parse_reply_id(message),
+        ep.parse_message_timestamp(message),
+        ep.parse_message_type(message),
+    )
+
+def _best(func, corpus, rounds: int) -> float:
+    """
+    Return the best mean microseconds per envelope over rounds runs of func(corpus).
+    """
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        func(corpus)
+        best = min(best, (time.perf_counter() - start) / len(corpus) * 1e6)
+    return best
+
+def main() -> None:
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 300
+    corpus = build_corpus(count)
+    cases = [
+        ("seven parse_* calls", lambda c: [_per_field(m) for m in c]),
+        ("parse_envelope", lambda c: [ep.parse_envelope(m) for m in c]),
+        ("parse_message", lambda c: [parse_message(m) for m in c]),
+        ("parse_messages (batch)", parse_messages),
+    ]
+    print(f"{count} envelopes, mean {sum(map(len, corpus)) / count:.0f} chars")
+    print(f"{'method':<24} {'per envelope (us)':>18}")
+    for label, func in cases:
+        print(f"{label:<24} {_best(func, corpus, rounds):>18.2f}")
+
+if __name__ == "__main__":
+    main()
+
+# End of benchmarks/bench_envelope_parser.py
@@ -0,0 +1,127 @@
+"""
+core/api/async_db_api.py
+------------------------
+Awaitable counterpart of core/api/db_api for code running on the event loop.
+Each call runs the matching db_api function in a worker thread: reads on reader
+threads, writes and transactions on a single writer thread that applies them in
+submission order. The event loop is never blocked on SQLite I/O.
+
+Usage Example:
+    from core.api import async_db_api
+
+    row = await async_db_api.fetch_one("SELECT * FROM UserStates WHERE user_id=?", (user_id,))
+    await async_db_api.execute_query("DELETE FROM UserStates WHERE user_id=?", (user_id,), commit=True)
+"""
+
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from core.api import db_api
+from core.transaction import atomic_transaction
+from db.async_db import get_async_db
+
+async def fetch_one(query: str, params: Tuple[Any, ...] = ()) -> Optional[Dict[str, Any]]:
+    """
+    fetch_one(query, params=()) -> dict or None
+    -------------------------------------------
+    Awaitable version of db_api.fetch_one, executed on a reader thread.
+
+    Usage Example:
+        row = await fetch_one("SELECT * FROM UserStates WHERE user_id=?", ("+15551234567",))
+    """
+    return await get_async_db().run_read(db_api.fetch_one, query, params)
+
+async def fetch_all(query: str, params: Tuple[Any, ...] = ()) -> List[Dict[str, Any]]:
+    """
+    fetch_all(query, params=()) -> list of dict
+    -------------------------------------------
+    Awaitable version of db_api.fetch_all, executed on a reader thread.
+
+    Usage Example:
+        rows = await fetch_all("SELECT user_id FROM UserStates")
+    """
+    return await get_async_db().run_read(db_api.fetch_all, query, params)
+
+async def execute_query(query: str, params: Tuple[Any, ...] = (), commit: bool = False) -> None:
+    """
+    execute_query(query, params=(), commit=False) -> None
+    -----------------------------------------------------
+    Awaitable version of db_api.execute_query, executed on the ordered writer thread.
+
+    Usage Example:
+        await execute_query("UPDATE UserStates SET flow_state=? WHERE user_id=?", ("{}", uid), commit=True)
+    """
+    await get_async_db().run_write(db_api.execute_query, query, params, commit)
+
+async def insert_record(table: str, data: Dict[str, Any], replace: bool = False) -> int:
+    """
+    insert_record(table, data, replace=False) -> int
+    ------------------------------------------------
+    Awaitable version of db_api.insert_record, executed on the ordered writer thread.
+
+    Usage Example:
+        new_id = await insert_record("UserStates", {"user_id": uid, "flow_state": "{}"})
+    """
+    return await get_async_db().run_write(db_api.insert_record, table, data, replace)
+
+async def upsert_record(table: str, data: Dict[str, Any], key: str = "id") -> None:
+    """
+    upsert_record(table, data, key="id") -> None
+    --------------------------------------------
+    Awaitable version of db_api.upsert_record, executed on the ordered writer thread.
+
+    Usage Example:
+        await upsert_record("UserStates", {"user_id": uid, "flow_state": "{}"}, key="user_id")
+    """
+    await get_async_db().run_write(db_api.upsert_record, table, data, key)
+
+async def upsert_records(table: str, rows: List[Dict[str, Any]], key: str = "id") -> int:
+    """
+    upsert_records(table, rows, key="id") -> int
+    --------------------------------------------
+    Awaitable version of db_api.upsert_records, executed on the ordered writer thread.
+
+    Usage Example:
+        await upsert_records("UserStates", [{"user_id": u, "flow_state": "{}"} for u in uids], key="user_id")
+    """
+    return await get_async_db().run_write(db_api.upsert_records, table, rows, key)
+
+async def run_transaction(func: Callable[[Any], Any], exclusive: bool = False) -> Any:
+    """
+    run_transaction(func, exclusive=False) -> Any
+    ---------------------------------------------
+    Run func(conn) inside atomic_transaction on the writer thread and return its result.
+    The transaction commits if func returns and rolls back if it raises.
+    func is synchronous: it must not await, so the whole transaction runs without
+    yielding to other writers.
+
+    Usage Example:
+        def move(conn):
+            conn.execute("DELETE FROM UserStates WHERE user_id=?", (old_id,))
+            conn.execute("INSERT INTO UserStates (user_id, flow_state) VALUES (?, ?)", (new_id, "{}"))
+
+        await run_transaction(move)
+    """
+    def _run():
+        with atomic_transaction(exclusive=exclusive) as conn:
+            return func(conn)
+    return await get_async_db().run_write(_run)
+
+async def run_in_writer(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """
+    run_in_writer(func, *args, **kwargs) -> Any
+    -------------------------------------------
+    Run an arbitrary blocking write helper on the ordered writer thread.
+
+    Usage Example:
+        await run_in_writer(flow_state_api.flush_user_states)
+    """
+    return await get_async_db().run_write(func, *args, **kwargs)
+
+async def run_in_reader(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """
+    run_in_reader(func, *args, **kwargs) -> Any
+    -------------------------------------------
+    Run an arbitrary blocking read helper on a reader thread.
+    """
+    return await get_async_db().run_read(func, *args, **kwargs)
+
+# End of core/api/async_db_api.py
@@ -10,6 +10,7 @@ Usage Example:
 
     row = fetch_one("SELECT * FROM Volunteers WHERE phone=?", (phone,))
     insert_record("Volunteers", {"phone": phone, "name": "Alice"})
+    upsert_record("Volunteers", {"phone": phone, "name": "Alice"}, key="phone")
 """
 
 from typing import Any, Dict, Optional, Tuple, List
@@ -78,4 +79,35 @@ def insert_record(table: str, data: Dict[str, Any], replace: bool = False) -> in
     repo = BaseRepository(table_name=table)
     return repo.create(data, replace=replace)
 
+def upsert_record(table: str, data: Dict[str, Any], key: str = "id") -> None:
+    """
+    upsert_record(table, data, key="id") -> None
+    --------------------------------------------
+    Insert the row, or update its other columns if a row with the same key exists,
+    in one INSERT ... ON CONFLICT(key) DO UPDATE statement. key must be the table's
+    primary key or have a UNIQUE constraint.
+
+    Usage Example:
+        from core.api.db_api import upsert_record
+
+        upsert_record("Volunteers", {"phone": "+15551234567", "name": "Alice"}, key="phone")
+    """
+    from db.repository import BaseRepository
+    BaseRepository(table_name=table, primary_key=key).upsert(data)
+
+def upsert_records(table: str, rows: List[Dict[str, Any]], key: str = "id") -> int:
+    """
+    upsert_records(table, rows, key="id") -> int
+    --------------------------------------------
+    Upsert many rows in a single transaction. Every row must have the same columns.
+    Returns the number of rows written.
+
+    Usage Example:
+        from core.api.db_api import upsert_records
+
+        upsert_records("Volunteers", [{"phone": p, "name": n} for p, n in roster], key="phone")
+    """
+    from db.repository import BaseRepository
+    return BaseRepository(table_name=table, primary_key=key).upsert_many(rows)
+
 # End of core/api/db_api.py
\ No newline at end of file
@@ -3,10 +3,12 @@
 core/api/flow_state_api.py
 --------------------------
 Stable façade for multi-step flows. Delegates all flow operations to the centralized FlowManager.
+FlowManager instances share one user-state cache, so changes made here are immediately
+visible to user_state_api and MessageManager.
 """
 
 import logging
-from typing import Optional
+from typing import Dict, List, Optional
 
 from managers.flow_manager import FlowManager
 
@@ -51,4 +53,94 @@ def list_flows(user_id: str) -> dict:
     """
     return _flow_manager.list_flows(user_id)
 
+def users_in_flow(flow_name: str, step: Optional[str] = None) -> List[str]:
+    """
+    Return the IDs of users who have the flow (optionally only those at step),
+    by delegating to FlowManager.
+    """
+    return _flow_manager.users_in_flow(flow_name, step)
+
+def count_users_by_step(flow_name: str) -> Dict[str, int]:
+    """
+    Return how many users are at each step of the flow, by delegating to FlowManager.
+    """
+    return _flow_manager.count_users_by_step(flow_name)
+
+def count_active_flows() -> Dict[str, int]:
+    """
+    Return how many users have each flow active, by delegating to FlowManager.
+    """
+    return _flow_manager.count_active_flows()
+
+def flush_user_states() -> int:
+    """
+    Write all cached flow-state changes to the database now.
+    Returns the number of users written.
+    """
+    return _flow_manager.flush_user_states()
+
+def invalidate_user_state(user_id: Optional[str] = None) -> None:
+    """
+    Discard cached flow state for user_id (or all users if None) after the
+    UserStates table was modified outside this API.
+    """
+    _flow_manager.invalidate_user_state(user_id)
+
+# --------------------------------------------------------
+# Async Variants (for callers on the event loop)
+# --------------------------------------------------------
+async def start_flow_async(user_id: str, flow_name: str) -> None:
+    """
+    Awaitable version of start_flow; never blocks the event loop on the database.
+    """
+    await _flow_manager.start_flow_async(user_id, flow_name)
+
+async def pause_flow_async(user_id: str, flow_name: str) -> None:
+    """
+    Awaitable version of pause_flow.
+    """
+    await _flow_manager.pause_flow_async(user_id, flow_name)
+
+async def resume_flow_async(user_id: str, flow_name: str) -> None:
+    """
+    Awaitable version of resume_flow.
+    """
+    await _flow_manager.resume_flow_async(user_id, flow_name)
+
+async def get_active_flow_async(user_id: str) -> Optional[str]:
+    """
+    Awaitable version of get_active_flow.
+    """
+    return await _flow_manager.get_active_flow_async(user_id)
+
+async def handle_flow_input_async(user_id: str, user_input: str) -> str:
+    """
+    Awaitable version of handle_flow_input.
+    """
+    return await _flow_manager.handle_flow_input_async(user_id, user_input)
+
+async def list_flows_async(user_id: str) -> dict:
+    """
+    Awaitable version of list_flows.
+    """
+    return await _flow_manager.list_flows_async(user_id)
+
+async def users_in_flow_async(flow_name: str, step: Optional[str] = None) -> List[str]:
+    """
+    Awaitable version of users_in_flow.
+    """
+    return await _flow_manager.users_in_flow_async(flow_name, step)
+
+async def count_users_by_step_async(flow_name: str) -> Dict[str, int]:
+    """
+    Awaitable version of count_users_by_step.
+    """
+    return await _flow_manager.count_users_by_step_async(flow_name)
+
+async def count_active_flows_async() -> Dict[str, int]:
+    """
+    Awaitable version of count_active_flows.
+    """
+    return await _flow_manager.count_active_flows_async()
+
 # End of core/api/flow_state_api.py
\ No newline at end of file
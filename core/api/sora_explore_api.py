@@ -1,31 +1,79 @@
 #!/usr/bin/env python3
 """
 core/api/sora_explore_api.py --- Sora Explore API for managing sessions with improved video handling.
+Browser automation blocks, so every session operation runs as a job on a worker thread.
+Callers await the job from the event loop, and the bot stays responsive while a capture
+runs. Jobs report progress through PluginManagerForSora as the session changes state, and
+they can be cancelled or time out. A cancelled job stops at the next state change or wait.
+
+Browser sessions come from a SoraSessionPool. The pool keeps up to POOL_MAX_SIZE
+pre-warmed sessions on the Explore page, and concurrent downloads each check one out, so
+they run in parallel. Chrome locks a profile directory to one browser, so each pooled
+session runs on its own copy of the configured profile (see ProfileSlots). A capture
+opens the detail page in a second tab and closes it afterwards, so the Explore page
+never has to be loaded again.
+
+Downloaded media is kept in a content-addressed MediaCache in DOWNLOAD_DIR, indexed by
+media URL and detail page URL. A repeat capture of the same item is served from disk
+without opening the page or downloading anything.
 """
 import os
 import time
+import queue
+import shutil
+import asyncio
+import itertools
 import logging
+import threading
 import requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass, field
 from enum import Enum, auto
+from typing import Any, Callable, Deque, List, Optional
 from urllib.parse import urlparse, unquote
 
 import undetected_chromedriver as uc
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.common.by import By
 
+from core.media_cache import CachedMedia, MediaCache
+
 logger = logging.getLogger(__name__)
 
 # -----------------------------
 # Configuration
 # -----------------------------
 BASE_URL = "https://www.sora.com/explore"
-KEEP_BROWSER_OPEN = True
-BROWSER_STAY_DURATION = 5  # Seconds to keep the browser open
 USE_EXISTING_PROFILE = True
 USER_DATA_DIR = r"C:\Users\Test\PROJECTS\sora\ChromeProfiles"
 PROFILE_DIRECTORY = "Profile 1"
+PROFILE_POOL_DIR = os.path.join(USER_DATA_DIR, "SoraPool")  # Per-session copies of the profile
 DOWNLOAD_DIR = "./explorer_downloads"
 DOWNLOAD_FILENAME = "downloaded_media.webp"
+NAVIGATION_SETTLE = 2  # Seconds allowed for the Explore page to load
+MEDIA_CACHE_MAX_MB = 2048  # Size of the media cache in DOWNLOAD_DIR before old files are evicted
+REQUEST_TIMEOUT = 30  # Seconds to wait for the media server to respond
+PAGE_LOAD_TIMEOUT = 60  # Seconds the browser may spend loading a page
+START_TIMEOUT = 90  # Seconds a start job may run before it is cancelled
+DOWNLOAD_TIMEOUT = 120  # Seconds a download job may run before it is cancelled
+STOP_TIMEOUT = 30  # Seconds a stop job may run before it is cancelled
+JOB_HISTORY = 20  # Finished jobs kept for status
+THUMBNAIL_SELECTOR = "a[href^='/g/']"
+BULK_MAX_ITEMS = 25  # Most items one bulk download may request
+BULK_CONCURRENCY = 4  # Bulk items captured and downloaded at once
+BULK_DOWNLOAD_TIMEOUT = 600  # Seconds a bulk download job may run before it is cancelled
+BULK_MAX_SCROLLS = 10  # Times the Explore page is scrolled to load more thumbnails
+SCROLL_SETTLE = 1  # Seconds allowed for new thumbnails to load after scrolling
+DOWNLOAD_RETRIES = 3  # Retries of a failed media request, and resumes of a broken transfer
+DOWNLOAD_CHUNK_SIZE = 64 * 1024  # Bytes written per chunk of a media download
+POOL_MAX_SIZE = 3  # Browser sessions open at most, and captures run in parallel
+POOL_MIN_SIZE = 1  # Sessions warmed by 'start' and kept through idle eviction
+POOL_IDLE_TIMEOUT = 300  # Seconds an unused session above POOL_MIN_SIZE stays open
+POOL_EVICT_INTERVAL = 30  # Seconds between idle-eviction checks by idle workers
 
 # -----------------------------
 # State Definition
@@ -41,6 +89,24 @@ class State(Enum):
     CLOSING = auto()
     COMPLETED = auto()
 
+class JobStatus(Enum):
+    QUEUED = auto()
+    RUNNING = auto()
+    DONE = auto()
+    FAILED = auto()
+    CANCELLED = auto()
+    TIMED_OUT = auto()
+
+class SoraJobCancelled(Exception):
+    """
+    Raised inside a job when it is cancelled or has timed out.
+    """
+
+class SoraPoolClosed(Exception):
+    """
+    Raised when a session is requested from a pool that has been closed.
+    """
+
 # -----------------------------
 # Plugin Manager for Sora
 # -----------------------------
@@ -66,6 +132,174 @@ class LoggingPlugin:
     def on_state_change(self, previous_state, new_state, opener):
         logger.info(f"(Sora) State changed from {previous_state.name} to {new_state.name}.")
 
+class JobProgressPlugin:
+    """
+    Records each session state change as the progress of the job running on that thread.
+    """
+    def __init__(self, worker):
+        self.worker = worker
+
+    def on_state_change(self, previous_state, new_state, opener):
+        job = self.worker.current_job()
+        if job is not None:
+            job.progress = new_state
+
+# -----------------------------
+# Browser Profiles
+# -----------------------------
+# Chrome's per-process locks and caches, which a profile copy must not carry over.
+_PROFILE_COPY_SKIP = shutil.ignore_patterns("Singleton*", "lockfile", "Cache", "Code Cache", "GPUCache")
+
+class ProfileSlots:
+    """
+    Gives each open browser session its own profile directory. Slot n is a copy of the
+    seed profile in directory/slot-n, made the first time the slot is used and kept, so
+    its logins survive restarts. A slot is reused once the session holding it closes.
+
+    Args:
+        seed (str): Profile directory the slots are copied from.
+        directory (str): Directory holding the slots.
+    """
+    def __init__(self, seed: str, directory: str):
+        self.seed = seed
+        self.directory = directory
+        self._taken: set = set()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> Optional[str]:
+        """
+        Return the lowest free slot's directory, copying the seed into it if needed,
+        or None if the seed profile does not exist.
+        """
+        if not os.path.isdir(self.seed):
+            return None
+        with self._lock:
+            path = next(p for p in (self._slot(n) for n in itertools.count()) if p not in self._taken)
+            self._taken.add(path)
+        try:
+            if not os.path.isdir(path):
+                shutil.copytree(self.seed, path + ".tmp", ignore=_PROFILE_COPY_SKIP, dirs_exist_ok=True)
+                os.replace(path + ".tmp", path)
+                logger.info(f"(Sora) Copied profile '{self.seed}' to '{path}'.")
+        except BaseException:
+            self.release(path)
+            raise
+        return path
+
+    def release(self, path: Optional[str]) -> None:
+        with self._lock:
+            self._taken.discard(path)
+
+    def _slot(self, n: int) -> str:
+        return os.path.join(self.directory, f"slot-{n}")
+
+# -----------------------------
+# Media Downloads
+# -----------------------------
+def media_filename(media_url: str, media_type: str) -> str:
+    """
+    Derive a file name from a media URL's path, with .mp4 for videos and .webp by default.
+    """
+    parsed_url = urlparse(media_url)
+    decoded_path = unquote(parsed_url.path)
+    prefix = "/vg-assets/"
+    if decoded_path.startswith(prefix):
+        decoded_path = decoded_path[len(prefix):]
+    name_without_ext, ext = os.path.splitext(decoded_path)
+
+    # Force correct file extension: override any existing extension if media is video.
+    if media_type == "video":
+        ext = ".mp4"
+    elif not ext:
+        ext = ".webp"
+    return name_without_ext.replace("/", "_") + ext
+
+class MediaDownloader:
+    """
+    Downloads media over one pooled HTTP session shared by all threads. Connection
+    errors and 429/5xx responses are retried with backoff. A download is written to
+    "<path>.part" first; a broken transfer, or a later download of the same path,
+    resumes from the bytes already on disk with a Range request.
+
+    Args:
+        pool_size (int): HTTP connections kept per host.
+        retries (int): Retries per request, and resumes per download.
+        backoff (float): Backoff factor in seconds between retries.
+        chunk_size (int): Bytes read per chunk.
+        timeout (float): Seconds to wait for the server to respond.
+    """
+    def __init__(self, pool_size: int = BULK_CONCURRENCY, retries: int = DOWNLOAD_RETRIES,
+                 backoff: float = 0.5, chunk_size: int = DOWNLOAD_CHUNK_SIZE,
+                 timeout: float = REQUEST_TIMEOUT):
+        self.retries = retries
+        self.backoff = backoff
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+        retry = Retry(total=retries, backoff_factor=backoff, status_forcelist=(429, 500, 502, 503, 504),
+                      allowed_methods=frozenset(["GET"]), raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def download(self, url: str, path: str, cancel_event: Optional[threading.Event] = None) -> str:
+        """
+        Download url to path and return path. Raises SoraJobCancelled once cancel_event is set.
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        partial = path + ".part"
+        attempt = 0
+        while True:
+            offset = os.path.getsize(partial) if os.path.exists(partial) else 0
+            headers = {"Range": f"bytes={offset}-"} if offset else {}
+            try:
+                with self.session.get(url, stream=True, timeout=self.timeout, headers=headers) as response:
+                    if response.status_code == 416 and offset:
+                        break  # The partial file already holds the whole body.
+                    response.raise_for_status()
+                    # A server that ignores Range answers 200 with the whole body.
+                    mode = "ab" if offset and response.status_code == 206 else "wb"
+                    with open(partial, mode) as f:
+                        for chunk in response.iter_content(chunk_size=self.chunk_size):
+                            if cancel_event is not None and cancel_event.is_set():
+                                raise SoraJobCancelled("(Sora) Job cancelled.")
+                            f.write(chunk)
+                break
+            except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError) as e:
+                if attempt >= self.retries:
+                    raise
+                attempt += 1
+                logger.warning(f"(Sora) Download of {url} interrupted ({e}); resuming, attempt {attempt}.")
+                delay = self.backoff * (2 ** (attempt - 1))
+                if cancel_event is not None and cancel_event.wait(delay):
+                    raise SoraJobCancelled("(Sora) Job cancelled.")
+                elif cancel_event is None:
+                    time.sleep(delay)
+        os.replace(partial, path)
+        logger.info(f"(Sora) Media saved to: {path}")
+        return path
+
+def save_media(media_url: str, filename: str, detailed_info: Optional[dict] = None,
+               page_url: Optional[str] = None, cancel_event: Optional[threading.Event] = None) -> str:
+    """
+    Return the cached file for media_url, downloading it into the media cache first if
+    needed. detailed_info is stored as the file's metadata, and page_url is recorded so
+    a later capture of the same page is served from the cache without opening it.
+    """
+    media = _media_cache.fetch(
+        media_url, filename,
+        lambda tmp_path: _downloader.download(media_url, tmp_path, cancel_event),
+        metadata=detailed_info, aliases=[page_url] if page_url else ())
+    return media.path
+
+def _cached_result(media: CachedMedia) -> dict:
+    return {
+        "file_path": media.path,
+        "media_type": media.metadata.get("media_type", ""),
+        "detailed_info": media.metadata,
+        "cached": True,
+    }
+
 # -----------------------------
 # SimpleOpener Implementation
 # -----------------------------
@@ -75,12 +309,14 @@ class SimpleOpener:
     and manages state transitions. The download/capture operation is triggered separately
     via capture_detailed_info().
     """
-    def __init__(self, driver_path=None, plugin_manager=None):
+    def __init__(self, driver_path=None, plugin_manager=None, cancel_event=None):
         self.driver = None
         self.wait = None
         self.driver_path = driver_path
+        self.profile_dir = None
         self.state = State.INITIAL
         self.plugin_manager = plugin_manager
+        self.cancel_event = cancel_event
         self._state_transition(State.SETUP)
         self.setup_driver()
 
@@ -89,6 +325,21 @@ class SimpleOpener:
         self.state = new_state
         if self.plugin_manager:
             self.plugin_manager.notify_state_change(previous_state, new_state, self)
+        if new_state not in (State.IDLE, State.CLOSING, State.COMPLETED):
+            self._check_cancelled()
+
+    def _check_cancelled(self):
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            raise SoraJobCancelled("(Sora) Job cancelled.")
+
+    def _sleep(self, seconds):
+        """
+        Sleep for seconds, waking early and raising SoraJobCancelled if the job is cancelled.
+        """
+        if self.cancel_event is None:
+            time.sleep(seconds)
+        elif self.cancel_event.wait(seconds):
+            raise SoraJobCancelled("(Sora) Job cancelled.")
 
     def setup_driver(self):
         chrome_options = uc.ChromeOptions()
@@ -99,26 +350,44 @@ class SimpleOpener:
         chrome_options.add_experimental_option("prefs", prefs)
 
         if USE_EXISTING_PROFILE:
-            full_profile_path = os.path.join(USER_DATA_DIR, PROFILE_DIRECTORY)
-            if os.path.exists(full_profile_path):
-                chrome_options.add_argument(f"--user-data-dir={full_profile_path}")
-                logger.info(f"(Sora) Using dedicated profile from '{full_profile_path}'.")
+            self.profile_dir = _profiles.acquire()
+            if self.profile_dir is not None:
+                chrome_options.add_argument(f"--user-data-dir={self.profile_dir}")
+                logger.info(f"(Sora) Using a copy of profile '{_profiles.seed}' in '{self.profile_dir}'.")
             else:
-                logger.warning(f"(Sora) Profile '{full_profile_path}' does not exist; launching default profile.")
+                logger.warning(f"(Sora) Profile '{_profiles.seed}' does not exist; launching default profile.")
         else:
             logger.info("(Sora) Not using an existing profile. Launching with default profile.")
 
-        if self.driver_path:
-            self.driver = uc.Chrome(driver_executable_path=self.driver_path, options=chrome_options)
-        else:
-            self.driver = uc.Chrome(options=chrome_options)
+        try:
+            if self.driver_path:
+                self.driver = uc.Chrome(driver_executable_path=self.driver_path, options=chrome_options)
+            else:
+                self.driver = uc.Chrome(options=chrome_options)
+        except BaseException:
+            _profiles.release(self.profile_dir)
+            self.profile_dir = None
+            raise
+        self.driver.set_page_load_timeout(PAGE_LOAD_TIMEOUT)
         self.wait = WebDriverWait(self.driver, 20)
 
+    def is_healthy(self) -> bool:
+        """
+        True if the session is idle and its browser still answers on the Explore page.
+        """
+        if self.state is not State.IDLE or self.driver is None:
+            return False
+        try:
+            return "sora.com/explore" in self.driver.current_url
+        except Exception as e:
+            logger.warning(f"(Sora) Session failed its health check: {e}")
+            return False
+
     def open_url(self):
         self._state_transition(State.NAVIGATING)
         logger.info(f"(Sora) Attempting to navigate to {BASE_URL}")
         self.driver.get(BASE_URL)
-        time.sleep(2)  # Allow time for navigation to complete
+        self._sleep(NAVIGATION_SETTLE)  # Allow time for navigation to complete
 
         current_url = self.driver.current_url
         if "sora.com/explore" in current_url:
@@ -165,7 +434,8 @@ class SimpleOpener:
     def capture_detailed_info(self) -> dict:
         """
         Captures and downloads info from the first thumbnail link on the page,
-        including proper video handling, then returns to the previous page.
+        including proper video handling. The detail page is opened in a new tab, which
+        is closed afterwards, leaving the Explore page as it was.
         Transitions the session through CAPTURING -> DOWNLOADING -> IDLE states.
         
         Returns:
@@ -176,12 +446,19 @@ class SimpleOpener:
         """
         self._state_transition(State.CAPTURING)
         try:
-            thumbnail = self.wait.until(lambda d: d.find_element(By.CSS_SELECTOR, "a[href^='/g/']"))
+            thumbnail = self.wait.until(lambda d: d.find_element(By.CSS_SELECTOR, THUMBNAIL_SELECTOR))
         except Exception as e:
             logger.warning(f"(Sora) Detailed page link not found: {e}")
             self._state_transition(State.IDLE)
             return {}
-        
+
+        detailed_url, artist = self._read_thumbnail(thumbnail)
+        return self.capture_detail_page(detailed_url, artist)
+
+    def _read_thumbnail(self, thumbnail) -> tuple:
+        """
+        Return the detail page URL of a thumbnail link and the artist shown with it.
+        """
         detailed_path = thumbnail.get_attribute("href")
         detailed_url = "https://sora.com" + detailed_path if detailed_path.startswith("/") else detailed_path
 
@@ -193,8 +470,58 @@ class SimpleOpener:
             artist = artist_element.text.strip()
         except Exception as e:
             logger.warning(f"(Sora) Artist not found: {e}")
+        return detailed_url, artist
+
+    def collect_detail_links(self, limit: int) -> list:
+        """
+        Collect up to limit distinct thumbnail links from the Explore page in one pass,
+        scrolling down while more are needed and the page keeps loading new ones.
 
+        Returns:
+            A list of {"detailed_url": ..., "artist": ...} dictionaries in page order.
+        """
+        self._state_transition(State.CAPTURING)
+        links = {}
+        try:
+            self.wait.until(lambda d: d.find_element(By.CSS_SELECTOR, THUMBNAIL_SELECTOR))
+        except Exception as e:
+            logger.warning(f"(Sora) Detailed page link not found: {e}")
+            self._state_transition(State.IDLE)
+            return []
+        for _ in range(BULK_MAX_SCROLLS + 1):
+            found_before = len(links)
+            for thumbnail in self.driver.find_elements(By.CSS_SELECTOR, THUMBNAIL_SELECTOR):
+                detailed_url, artist = self._read_thumbnail(thumbnail)
+                links.setdefault(detailed_url, artist)
+                if len(links) >= limit:
+                    break
+            if len(links) >= limit or (found_before and len(links) == found_before):
+                break
+            self.driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+            self._sleep(SCROLL_SETTLE)
+        logger.info(f"(Sora) Collected {len(links)} detailed page link(s).")
+        self._state_transition(State.IDLE)
+        return [{"detailed_url": url, "artist": artist} for url, artist in links.items()]
+
+    def capture_detail_page(self, detailed_url: str, artist: str = "", download: bool = True) -> dict:
+        """
+        Capture the media and details of one detail page, opened in a new tab. A page
+        captured before is served from the media cache without opening it. With
+        download=False the media is not fetched; its URL and file name are returned
+        in detailed_info for the caller to download.
+        """
+        if self.state is not State.CAPTURING:
+            self._state_transition(State.CAPTURING)
+        cached = _media_cache.get(detailed_url)
+        if cached is not None:
+            logger.info(f"(Sora) Serving {detailed_url} from the media cache: {cached.path}")
+            self._state_transition(State.IDLE)
+            return _cached_result(cached)
+
+        media_type = ""
         logger.info(f"(Sora) Navigating to detailed page: {detailed_url}")
+        self._check_cancelled()
+        self.driver.switch_to.new_window("tab")
         self.driver.get(detailed_url)
 
         try:
@@ -210,34 +537,14 @@ class SimpleOpener:
                 except Exception as e:
                     raise Exception(f"(Sora) Video source not available: {e}")
 
-            # Transition to downloading state
-            self._state_transition(State.DOWNLOADING)
             logger.info(f"(Sora) Detailed page {media_type} URL: {media_url}")
-
-            parsed_url = urlparse(media_url)
-            decoded_path = unquote(parsed_url.path)
-            prefix = "/vg-assets/"
-            if decoded_path.startswith(prefix):
-                decoded_path = decoded_path[len(prefix):]
-            name_without_ext, ext = os.path.splitext(decoded_path)
-
-            # Force correct file extension: override any existing extension if media is video.
-            if media_type == "video":
-                ext = ".mp4"
-            elif not ext:
-                ext = ".webp"
-            final_filename = name_without_ext.replace("/", "_") + ext
-
-            try:
-                file_path = self._save_media(media_url, final_filename)
-            except Exception as e:
-                logger.warning(f"(Sora) Error while downloading media: {e}")
-                file_path = ""
+            final_filename = media_filename(media_url, media_type)
+        except SoraJobCancelled:
+            raise
         except Exception as e:
             logger.warning(f"(Sora) Error while processing detailed page media: {e}")
             media_url = ""
             final_filename = DOWNLOAD_FILENAME
-            file_path = ""
 
         # Capture prompt
         prompt = ""
@@ -265,13 +572,19 @@ class SimpleOpener:
             "summary": summary,
             "prompt": prompt,
             "media_url": media_url,
+            "media_type": media_type,
             "downloaded_media": final_filename
         }
         logger.info(f"(Sora) Captured detailed info: {detailed_info}")
 
-        logger.info("(Sora) Returning to the previous page.")
-        self.driver.back()
-        time.sleep(1)  # Let the page revert
+        logger.info("(Sora) Closing the detailed page.")
+        self._close_extra_tabs()
+
+        file_path = ""
+        if download and media_url:
+            # Transition to downloading state
+            self._state_transition(State.DOWNLOADING)
+            file_path = self._save_media(media_url, final_filename, detailed_info, detailed_url)
         self._state_transition(State.IDLE)
 
         return {
@@ -280,24 +593,43 @@ class SimpleOpener:
             "detailed_info": detailed_info
         }
 
-    def _save_media(self, media_url, filename) -> str:
-        os.makedirs(DOWNLOAD_DIR, exist_ok=True)
-        file_path = os.path.join(DOWNLOAD_DIR, filename)
+    def _save_media(self, media_url, filename, detailed_info=None, page_url=None) -> str:
+        """
+        Fetch media_url through the media cache and return the cached file's path,
+        or "" if the download failed.
+        """
         try:
-            response = requests.get(media_url, stream=True)
-            response.raise_for_status()
-            with open(file_path, "wb") as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    f.write(chunk)
-            logger.info(f"(Sora) Media saved to: {file_path}")
+            return save_media(media_url, filename, detailed_info, page_url, self.cancel_event)
+        except SoraJobCancelled:
+            raise
         except Exception as e:
             logger.error(f"(Sora) Failed to download media: {e}")
-        return file_path
+            return ""
 
     def wait_for_duration(self, duration):
         self._state_transition(State.WAITING)
         logger.info(f"(Sora) Browser remaining open for {duration} second(s).")
-        time.sleep(duration)
+        self._sleep(duration)
+        self._state_transition(State.IDLE)
+
+    def _close_extra_tabs(self):
+        handles = self.driver.window_handles
+        for handle in handles[1:]:
+            self.driver.switch_to.window(handle)
+            self.driver.close()
+        self.driver.switch_to.window(handles[0])
+
+    def return_to_explore(self):
+        """
+        Put the browser back on the Explore page after a capture was interrupted.
+        """
+        logger.info("(Sora) Returning to the Explore page.")
+        try:
+            self._close_extra_tabs()
+            if "sora.com/explore" not in self.driver.current_url:
+                self.driver.get(BASE_URL)
+        except Exception as e:
+            logger.warning(f"(Sora) Could not return to the Explore page: {e}")
         self._state_transition(State.IDLE)
 
     def close(self):
@@ -307,28 +639,510 @@ class SimpleOpener:
                 self.driver.quit()
             except Exception as e:
                 logger.info(f"(Sora) Driver quit encountered an error: {e}")
+        _profiles.release(self.profile_dir)
+        self.profile_dir = None
         self._state_transition(State.COMPLETED)
 
+# -----------------------------
+# Session Pool
+# -----------------------------
+@dataclass
+class _PooledSession:
+    opener: SimpleOpener
+    last_used: float
+    uses: int = 0
+
+class SoraSessionPool:
+    """
+    Keeps warm SimpleOpener sessions for reuse. A checked-out session is used by one
+    thread until it is checked back in. Idle sessions are health-checked on checkout,
+    and sessions above min_size are closed once they have been idle for idle_timeout.
+
+    Args:
+        factory: Creates a session on the Explore page: factory(cancel_event) -> SimpleOpener.
+        max_size (int): Sessions open at most, idle and checked out together.
+        min_size (int): Sessions kept open through idle eviction.
+        idle_timeout (float): Seconds an idle session above min_size is kept.
+        clock (callable): Monotonic time source, replaceable in tests.
+    """
+    def __init__(self, factory: Callable[[Optional[threading.Event]], SimpleOpener],
+                 max_size: int = POOL_MAX_SIZE, min_size: int = POOL_MIN_SIZE,
+                 idle_timeout: float = POOL_IDLE_TIMEOUT,
+                 clock: Callable[[], float] = time.monotonic):
+        self.factory = factory
+        self.max_size = max(1, max_size)
+        self.min_size = min(max(0, min_size), self.max_size)
+        self.idle_timeout = idle_timeout
+        self._clock = clock
+        self._idle: Deque[_PooledSession] = deque()
+        self._busy: dict = {}
+        self._creating = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+    @property
+    def size(self) -> int:
+        with self._cond:
+            return len(self._idle) + len(self._busy) + self._creating
+
+    @property
+    def idle_count(self) -> int:
+        return len(self._idle)
+
+    @property
+    def busy_count(self) -> int:
+        return len(self._busy)
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def warm(self, cancel_event: Optional[threading.Event] = None) -> int:
+        """
+        Open sessions until min_size are available. Returns the number opened.
+        """
+        opened = 0
+        while True:
+            with self._cond:
+                if self._closed or len(self._idle) + len(self._busy) + self._creating >= self.min_size:
+                    return opened
+                self._creating += 1
+            self._create(cancel_event, busy=False)
+            opened += 1
+
+    def checkout(self, cancel_event: Optional[threading.Event] = None,
+                 timeout: Optional[float] = None) -> SimpleOpener:
+        """
+        Return a healthy session, opening one if none is idle and the pool is below
+        max_size, otherwise waiting for one to be checked in. Waiting ends with
+        SoraJobCancelled once cancel_event is set or timeout seconds have passed.
+        """
+        deadline = None if timeout is None else self._clock() + timeout
+        while True:
+            with self._cond:
+                session = self._reserve(cancel_event, deadline)
+            if session is None:
+                session = self._create(cancel_event, busy=True)
+            elif not session.opener.is_healthy():
+                logger.warning("(Sora) Discarding unhealthy browser session.")
+                with self._cond:
+                    del self._busy[id(session.opener)]
+                    self._cond.notify()
+                self._quit(session)
+                continue
+            session.uses += 1
+            return session.opener
+
+    def _reserve(self, cancel_event: Optional[threading.Event], deadline: Optional[float]) -> Optional[_PooledSession]:
+        # Called with self._cond held. Returns an idle session marked busy, or None
+        # after reserving a slot for a new one.
+        while True:
+            if self._closed:
+                raise SoraPoolClosed("(Sora) The session pool is closed.")
+            if cancel_event is not None and cancel_event.is_set():
+                raise SoraJobCancelled("(Sora) Job cancelled.")
+            if self._idle:
+                session = self._idle.pop()  # Most recently used, so the rest can age out.
+                self._busy[id(session.opener)] = session
+                return session
+            if len(self._idle) + len(self._busy) + self._creating < self.max_size:
+                self._creating += 1
+                return None
+            if deadline is not None and self._clock() >= deadline:
+                raise SoraJobCancelled("(Sora) Timed out waiting for a browser session.")
+            self._cond.wait(0.1)
+
+    def checkin(self, opener: SimpleOpener, healthy: bool = True) -> None:
+        """
+        Return a checked-out session. Unhealthy sessions, and any session checked in
+        after the pool was closed, are closed.
+        """
+        with self._cond:
+            session = self._busy.pop(id(opener), None)
+            keep = session is not None and healthy and not self._closed
+            if keep:
+                session.last_used = self._clock()
+                self._idle.append(session)
+            self._cond.notify()
+        if session is not None and not keep:
+            self._quit(session)
+
+    @contextmanager
+    def session(self, cancel_event: Optional[threading.Event] = None):
+        """
+        Check out a session for the with-block. It is checked in as healthy unless the
+        block raised something other than SoraJobCancelled.
+        """
+        opener = self.checkout(cancel_event)
+        healthy = True
+        try:
+            yield opener
+        except SoraJobCancelled:
+            raise
+        except BaseException:
+            healthy = False
+            raise
+        finally:
+            self.checkin(opener, healthy)
+
+    def evict_idle(self) -> int:
+        """
+        Close idle sessions unused for idle_timeout, keeping min_size sessions open.
+        Returns the number closed.
+        """
+        now = self._clock()
+        evicted = []
+        with self._cond:
+            surplus = len(self._idle) + len(self._busy) + self._creating - self.min_size
+            # The deque's left end holds the sessions idle the longest.
+            while surplus > 0 and self._idle and now - self._idle[0].last_used >= self.idle_timeout:
+                evicted.append(self._idle.popleft())
+                surplus -= 1
+        for session in evicted:
+            logger.info(f"(Sora) Closing browser session idle for {now - session.last_used:.0f}s.")
+            self._quit(session)
+        return len(evicted)
+
+    def close(self) -> None:
+        """
+        Close idle sessions now and checked-out ones when they are checked in.
+        """
+        with self._cond:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._cond.notify_all()
+        for session in idle:
+            self._quit(session)
+
+    def _create(self, cancel_event: Optional[threading.Event], busy: bool) -> _PooledSession:
+        # Fills a slot reserved by incrementing self._creating.
+        try:
+            opener = self.factory(cancel_event)
+        except BaseException:
+            with self._cond:
+                self._creating -= 1
+                self._cond.notify()
+            raise
+        session = _PooledSession(opener, self._clock())
+        with self._cond:
+            self._creating -= 1
+            closed = self._closed
+            if not closed:
+                if busy:
+                    self._busy[id(opener)] = session
+                else:
+                    self._idle.append(session)
+            self._cond.notify()
+        if closed:
+            self._quit(session)
+            raise SoraPoolClosed("(Sora) The session pool is closed.")
+        return session
+
+    @staticmethod
+    def _quit(session: _PooledSession) -> None:
+        try:
+            session.opener.close()
+        except Exception as e:
+            logger.info(f"(Sora) Closing a browser session failed: {e}")
+
+# -----------------------------
+# Worker
+# -----------------------------
+@dataclass
+class SoraJob:
+    id: int
+    kind: str
+    func: Callable[["SoraJob"], Any]
+    timeout: float
+    status: JobStatus = JobStatus.QUEUED
+    progress: Optional[State] = None
+    note: str = ""
+    result: Any = None
+    error: Optional[BaseException] = None
+    cancel_event: threading.Event = field(default_factory=threading.Event)
+    future: Optional[asyncio.Future] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status not in (JobStatus.QUEUED, JobStatus.RUNNING)
+
+    def describe(self) -> str:
+        text = f"#{self.id} {self.kind}: {self.status.name}"
+        if self.status is JobStatus.RUNNING and self.progress is not None:
+            text += f" ({self.progress.name})"
+        if self.note:
+            text += f" [{self.note}]"
+        return text
+
+class SoraWorker:
+    """
+    Runs Sora jobs on a set of worker threads. Jobs start in the order they were
+    submitted, but up to workers of them run at once, so they may finish in any order.
+    The threads are started on the first submit. An idle thread calls on_idle every
+    idle_interval seconds, e.g. to evict unused browser sessions.
+    """
+    def __init__(self, name: str = "sora-worker", workers: int = POOL_MAX_SIZE,
+                 on_idle: Optional[Callable[[], Any]] = None,
+                 idle_interval: float = POOL_EVICT_INTERVAL):
+        self.name = name
+        self.workers = max(1, workers)
+        self.on_idle = on_idle
+        self.idle_interval = idle_interval
+        self._queue: "queue.Queue[SoraJob]" = queue.Queue()
+        self._ids = itertools.count(1)
+        self._threads: List[threading.Thread] = []
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.jobs: Deque[SoraJob] = deque(maxlen=JOB_HISTORY)
+        self.active: List[SoraJob] = []
+
+    def current_job(self) -> Optional[SoraJob]:
+        """
+        The job running on the calling thread, if it is a worker thread.
+        """
+        return getattr(self._local, "job", None)
+
+    def submit(self, kind: str, func: Callable[[SoraJob], Any], timeout: float) -> SoraJob:
+        """
+        Queue func to run on a worker thread. Must be called from the event loop;
+        the job's future completes there.
+        """
+        job = SoraJob(next(self._ids), kind, func, timeout)
+        job.future = asyncio.get_running_loop().create_future()
+        with self._lock:
+            self.active.append(job)
+            self._threads = [t for t in self._threads if t.is_alive()]
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._run, daemon=True,
+                                          name=f"{self.name}-{len(self._threads) + 1}")
+                thread.start()
+                self._threads.append(thread)
+        self._queue.put(job)
+        return job
+
+    async def run(self, kind: str, func: Callable[[SoraJob], Any], timeout: float) -> SoraJob:
+        """
+        Submit a job and wait for it to finish, cancelling it after timeout seconds.
+        The returned job holds the result, or the error and final status.
+        """
+        job = self.submit(kind, func, timeout)
+        try:
+            await asyncio.wait_for(asyncio.shield(job.future), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"(Sora) Job {job.describe()} timed out after {timeout}s.")
+            self._cancel(job, JobStatus.TIMED_OUT)
+        except asyncio.CancelledError:
+            self._cancel(job, JobStatus.CANCELLED)
+            raise
+        return job
+
+    def cancel(self, job_id: Optional[int] = None) -> List[SoraJob]:
+        """
+        Cancel the job with job_id, or every queued and running job. Returns the jobs cancelled.
+        """
+        with self._lock:
+            targets = [j for j in self.active if job_id is None or j.id == job_id]
+        for job in targets:
+            self._cancel(job, JobStatus.CANCELLED)
+        return targets
+
+    def _cancel(self, job: SoraJob, status: JobStatus) -> None:
+        job.cancel_event.set()
+        with self._lock:
+            if job.finished:
+                return
+            if job.status is JobStatus.QUEUED:
+                self._finish(job, status)
+            else:
+                # Its worker thread finishes it at the job's next state change or wait.
+                job.status = status
+
+    def _finish(self, job: SoraJob, status: JobStatus) -> None:
+        # Called with self._lock held.
+        if job.status is JobStatus.RUNNING or job.status is JobStatus.QUEUED:
+            job.status = status
+        if job in self.active:
+            self.active.remove(job)
+        self.jobs.append(job)
+        future = job.future
+        if future is not None and not future.done():
+            try:
+                future.get_loop().call_soon_threadsafe(_resolve, future)
+            except RuntimeError:
+                pass  # The loop that submitted the job has closed.
+
+    def _run(self) -> None:
+        while True:
+            try:
+                job = self._queue.get(timeout=self.idle_interval)
+            except queue.Empty:
+                if self.on_idle is not None:
+                    try:
+                        self.on_idle()
+                    except Exception as e:
+                        logger.error(f"(Sora) Idle task failed: {e}", exc_info=True)
+                continue
+            with self._lock:
+                if job.finished:
+                    continue
+                job.status = JobStatus.RUNNING
+            self._local.job = job
+            status = JobStatus.DONE
+            try:
+                job.result = job.func(job)
+            except SoraJobCancelled:
+                status = JobStatus.CANCELLED
+                logger.info(f"(Sora) Job {job.describe()} stopped.")
+            except Exception as e:
+                job.error = e
+                status = JobStatus.FAILED
+                logger.error(f"(Sora) Job #{job.id} {job.kind} failed: {e}", exc_info=True)
+            finally:
+                self._local.job = None
+                with self._lock:
+                    self._finish(job, status)
+
+def _resolve(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
 # -----------------------------
 # API Implementation
 # -----------------------------
-_sora_opener = None
+_pool: Optional[SoraSessionPool] = None
+_profiles = ProfileSlots(os.path.join(USER_DATA_DIR, PROFILE_DIRECTORY), PROFILE_POOL_DIR)
+_downloader = MediaDownloader()
+_media_cache = MediaCache(DOWNLOAD_DIR, MEDIA_CACHE_MAX_MB * 1024 * 1024)
 _plugin_manager = PluginManagerForSora()
 _plugin_manager.register_plugin(LoggingPlugin())
 
-def start_sora_explore_session() -> str:
-    global _sora_opener
-    if _sora_opener is not None:
+def _evict_idle_sessions() -> None:
+    pool = _pool
+    if pool is not None:
+        pool.evict_idle()
+
+_worker = SoraWorker(on_idle=_evict_idle_sessions)
+_plugin_manager.register_plugin(JobProgressPlugin(_worker))
+
+def _job_failure(job: SoraJob) -> Optional[str]:
+    if job.status is JobStatus.TIMED_OUT:
+        return f"(Sora) {job.kind.capitalize()} timed out after {job.timeout}s and was cancelled."
+    if job.status is JobStatus.CANCELLED:
+        return f"(Sora) {job.kind.capitalize()} was cancelled."
+    if job.status is JobStatus.FAILED:
+        return f"(Sora) {job.kind.capitalize()} failed: {job.error}"
+    return None
+
+def _new_session(cancel_event: Optional[threading.Event]) -> SimpleOpener:
+    opener = SimpleOpener(driver_path='chromedriver.exe', plugin_manager=_plugin_manager,
+                          cancel_event=cancel_event)
+    try:
+        opener.open_url()
+    except BaseException:
+        opener.close()
+        raise
+    opener.cancel_event = None
+    return opener
+
+def _download_job(pool: SoraSessionPool, job: SoraJob) -> dict | str:
+    try:
+        with pool.session(job.cancel_event) as opener:
+            opener.cancel_event = job.cancel_event
+            try:
+                result = opener.capture_detailed_info()
+            except SoraJobCancelled:
+                opener.cancel_event = None
+                opener.return_to_explore()
+                raise
+            finally:
+                opener.cancel_event = None
+    except SoraPoolClosed:
+        return "(Sora) Session is not available for downloads. Please start again."
+    if not result.get("file_path"):
+        return "(Sora) Download command executed, but no file was saved."
+    return {"file_path": result["file_path"]}
+
+def _capture_item(pool: SoraSessionPool, link: dict, cancel_event: threading.Event) -> str:
+    # Items captured before come straight from the media cache. Otherwise a browser
+    # session is held only while reading the detail page; the media is downloaded
+    # after the session is back in the pool.
+    cached = _media_cache.get(link["detailed_url"])
+    if cached is not None:
+        return cached.path
+    with pool.session(cancel_event) as opener:
+        opener.cancel_event = cancel_event
+        try:
+            info = opener.capture_detail_page(link["detailed_url"], link["artist"], download=False)
+        except SoraJobCancelled:
+            opener.cancel_event = None
+            opener.return_to_explore()
+            raise
+        finally:
+            opener.cancel_event = None
+    detailed_info = info["detailed_info"]
+    if info.get("cached"):
+        return info["file_path"]
+    if not detailed_info["media_url"]:
+        return ""
+    return save_media(detailed_info["media_url"], detailed_info["downloaded_media"], detailed_info,
+                      link["detailed_url"], cancel_event)
+
+def _bulk_download_job(pool: SoraSessionPool, count: int, job: SoraJob) -> dict | str:
+    try:
+        with pool.session(job.cancel_event) as opener:
+            opener.cancel_event = job.cancel_event
+            try:
+                links = opener.collect_detail_links(count)
+            finally:
+                opener.cancel_event = None
+    except SoraPoolClosed:
+        return "(Sora) Session is not available for downloads. Please start again."
+    if not links:
+        return "(Sora) No items found on the Explore page."
+    file_paths, failed = [], 0
+    job.note = f"0/{len(links)}"
+    with ThreadPoolExecutor(max_workers=BULK_CONCURRENCY, thread_name_prefix="sora-bulk") as executor:
+        futures = [executor.submit(_capture_item, pool, link, job.cancel_event) for link in links]
+        for future in as_completed(futures):
+            try:
+                path = future.result()
+            except SoraJobCancelled:
+                continue
+            except Exception as e:
+                logger.warning(f"(Sora) Bulk item failed: {e}")
+                path = ""
+            if path:
+                file_paths.append(path)
+            else:
+                failed += 1
+            job.note = f"{len(file_paths) + failed}/{len(links)}"
+    if job.cancel_event.is_set():
+        raise SoraJobCancelled("(Sora) Job cancelled.")
+    return {"file_paths": file_paths, "requested": count, "found": len(links), "failed": failed}
+
+async def start_sora_explore_session() -> str:
+    """
+    Create the session pool and warm its first sessions on a worker thread.
+    """
+    global _pool
+    if _pool is not None:
         return "(Sora) Already started. Use 'stop' first if you want to restart."
-    _sora_opener = SimpleOpener(driver_path='chromedriver.exe', plugin_manager=_plugin_manager)
-    _sora_opener.open_url()
-    if KEEP_BROWSER_OPEN:
-        _sora_opener.wait_for_duration(BROWSER_STAY_DURATION)
+    pool = _pool = SoraSessionPool(_new_session)
+    job = await _worker.run("start", lambda job: pool.warm(job.cancel_event), START_TIMEOUT)
+    failure = _job_failure(job)
+    if failure:
+        pool.close()
+        if _pool is pool:
+            _pool = None
+        return failure
     return "(Sora) Browser launched and idle, ready for downloads."
 
 async def download_sora_explore_session(ctx) -> dict | str:
     """
     Asynchronously triggers the download/capture process if a session is active and returns the file path for Discord delivery.
+    The capture runs on a worker thread with a session from the pool, so concurrent downloads
+    run in parallel; it is cancelled if it takes longer than DOWNLOAD_TIMEOUT.
 
     Args:
         ctx: The Discord context (e.g., discord.Message or interaction). This is passed through unchanged; the API does not use it today, but may use it in the future for direct messaging or richer context.
@@ -337,28 +1151,62 @@ async def download_sora_explore_session(ctx) -> dict | str:
         dict: { 'file_path': ... } on success
         str: Short error message on failure
     """
-    global _sora_opener
-    if _sora_opener is None:
+    pool = _pool
+    if pool is None:
         return "(Sora) No active session. Use 'start' to open a browser first."
-    current_state = _sora_opener.state
-    if current_state in [State.CLOSING, State.COMPLETED]:
-        return "(Sora) Session is not available for downloads. Please start again."
-    result = _sora_opener.capture_detailed_info()
-    if not result.get("file_path"):
-        return "(Sora) Download command executed, but no file was saved."
-    return {"file_path": result["file_path"]}
+    job = await _worker.run("download", lambda job: _download_job(pool, job), DOWNLOAD_TIMEOUT)
+    return _job_failure(job) or job.result
 
-def stop_sora_explore_session() -> str:
-    global _sora_opener
-    if _sora_opener is None:
+async def download_sora_explore_bulk(ctx, count: int) -> dict | str:
+    """
+    Capture up to count items from the Explore page: their links are collected in one
+    page pass, then BULK_CONCURRENCY items at a time are read with pooled browser
+    sessions and downloaded over the shared HTTP session.
+
+    Returns:
+        dict: { 'file_paths': [...], 'requested': n, 'found': n, 'failed': n } on success
+        str: Short error message on failure
+    """
+    if not 1 <= count <= BULK_MAX_ITEMS:
+        return f"(Sora) Choose between 1 and {BULK_MAX_ITEMS} items."
+    pool = _pool
+    if pool is None:
+        return "(Sora) No active session. Use 'start' to open a browser first."
+    job = await _worker.run("bulk download", lambda job: _bulk_download_job(pool, count, job),
+                            BULK_DOWNLOAD_TIMEOUT)
+    return _job_failure(job) or job.result
+
+async def stop_sora_explore_session() -> str:
+    """
+    Cancel any queued or running jobs, then close every browser session.
+    """
+    global _pool
+    pool, _pool = _pool, None
+    if pool is None:
         return "(Sora) No active session to stop."
-    _sora_opener.close()
-    _sora_opener = None
-    return "(Sora) Browser closed."
-    
+    _worker.cancel()
+    job = await _worker.run("stop", lambda job: pool.close(), STOP_TIMEOUT)
+    return _job_failure(job) or "(Sora) Browser closed."
+
+def cancel_sora_explore_job(job_id: Optional[int] = None) -> str:
+    """
+    Cancel one job by id, or every queued and running job.
+    """
+    cancelled = _worker.cancel(job_id)
+    if not cancelled:
+        return "(Sora) No matching job to cancel." if job_id is not None else "(Sora) No jobs to cancel."
+    return "(Sora) Cancelled " + ", ".join(f"#{j.id} {j.kind}" for j in cancelled) + "."
+
 def get_sora_explore_session_status() -> str:
-    if _sora_opener is None:
-        return "(Sora) No active session. Use 'start' to launch one."
-    return f"(Sora) Current state: {_sora_opener.state.name}."
+    pool = _pool
+    if pool is None:
+        status = "(Sora) No active session. Use 'start' to launch one."
+    else:
+        status = (f"(Sora) Sessions: {pool.size} open ({pool.idle_count} idle, "
+                  f"{pool.busy_count} busy), max {pool.max_size}.")
+    jobs = list(_worker.active)
+    if jobs:
+        status += "\nJobs: " + "; ".join(j.describe() for j in jobs)
+    return status
 
 # End of core/api/sora_explore_api.py
\ No newline at end of file
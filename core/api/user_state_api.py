@@ -42,4 +42,24 @@ def mark_user_has_seen_welcome(phone: str) -> None:
     """
     _flow_manager.mark_welcome_seen(phone)
 
+async def has_user_seen_welcome_async(phone: str) -> bool:
+    """
+    has_user_seen_welcome_async(phone) -> bool
+    ------------------------------------------
+    Awaitable version of has_user_seen_welcome for code running on the event loop.
+
+    Usage Example:
+        if not await has_user_seen_welcome_async("+15551234567"):
+            await mark_user_has_seen_welcome_async("+15551234567")
+    """
+    return await _flow_manager.has_seen_welcome_async(phone)
+
+async def mark_user_has_seen_welcome_async(phone: str) -> None:
+    """
+    mark_user_has_seen_welcome_async(phone) -> None
+    -----------------------------------------------
+    Awaitable version of mark_user_has_seen_welcome.
+    """
+    await _flow_manager.mark_welcome_seen_async(phone)
+
 # End of core/api/user_state_api.py
\ No newline at end of file
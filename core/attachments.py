@@ -0,0 +1,367 @@
+#!/usr/bin/env python
+"""
+core/attachments.py - Lazy, size-capped attachment downloads with content-hash reuse.
+Transports attach an AttachmentSet of AttachmentHandle objects to each ParsedMessage.
+Nothing is downloaded until a plugin asks for the content; then the file is streamed
+in chunks, kept in memory when small or spooled to disk when large, and checked
+against the configured size and MIME limits.
+
+Downloaded content is stored once per SHA-256 digest. Asking again for a URL that was
+already fetched, or fetching an upload whose content matches one already held, reuses
+the stored copy.
+
+Usage Example:
+    for att in parsed.attachments:
+        data = await att.read()
+
+    await parsed.attachments.fetch_all()   # download every attachment concurrently
+"""
+
+import asyncio
+import hashlib
+import io
+import logging
+import os
+import shutil
+import tempfile
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import AsyncIterator, BinaryIO, Callable, Dict, Optional, Set
+
+from core.config import (
+    ATTACHMENT_MAX_BYTES,
+    ATTACHMENT_SPOOL_THRESHOLD,
+    ATTACHMENT_ALLOWED_TYPES,
+    ATTACHMENT_FETCH_CONCURRENCY,
+    ATTACHMENT_CACHE_MAX_BYTES,
+    ATTACHMENT_CACHE_DIR,
+)
+from core.exceptions import AttachmentError
+
+logger = logging.getLogger(__name__)
+
+_CHUNK_SIZE = 64 * 1024
+
+# Streams the body of a URL as chunks of bytes.
+Fetcher = Callable[[str], AsyncIterator[bytes]]
+
+_session = None
+
+async def _get_session():
+    global _session
+    import aiohttp
+    if _session is None or _session.closed:
+        _session = aiohttp.ClientSession()
+    return _session
+
+async def http_fetch(url: str) -> AsyncIterator[bytes]:
+    """
+    Default fetcher: stream url over a shared aiohttp session.
+    """
+    session = await _get_session()
+    async with session.get(url) as resp:
+        if resp.status != 200:
+            raise AttachmentError(f"Download of {url} failed with HTTP {resp.status}.")
+        async for chunk in resp.content.iter_chunked(_CHUNK_SIZE):
+            yield chunk
+
+async def file_fetch(url: str) -> AsyncIterator[bytes]:
+    """
+    Fetcher for attachments already on local disk (file:// URLs or plain paths),
+    such as those signal-cli stores when it receives a message.
+    """
+    path = url[len("file://"):] if url.startswith("file://") else url
+    try:
+        f = await asyncio.to_thread(open, path, "rb")
+    except OSError as e:
+        raise AttachmentError(f"Attachment file {path} could not be opened: {e}")
+    try:
+        while True:
+            chunk = await asyncio.to_thread(f.read, _CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        f.close()
+
+async def close_http_session() -> None:
+    """
+    Close the shared HTTP session used by http_fetch.
+    """
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+
+@dataclass
+class _Blob:
+    digest: str
+    size: int
+    data: Optional[bytes] = None
+    path: Optional[str] = None
+    urls: Set[str] = field(default_factory=set)
+
+class AttachmentCache:
+    """
+    AttachmentCache - Content-addressed store of downloaded attachments, LRU-bounded by bytes.
+
+    Args:
+        max_bytes (int): Total size of content kept before least recently used entries are dropped.
+        directory (str): Where content larger than spool_threshold is written.
+        spool_threshold (int): Content up to this size is held in memory.
+        concurrency (int): Maximum number of downloads running at once.
+    """
+    def __init__(self, max_bytes: int = ATTACHMENT_CACHE_MAX_BYTES,
+                 directory: str = ATTACHMENT_CACHE_DIR,
+                 spool_threshold: int = ATTACHMENT_SPOOL_THRESHOLD,
+                 concurrency: int = ATTACHMENT_FETCH_CONCURRENCY):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.spool_threshold = spool_threshold
+        self._semaphore = asyncio.Semaphore(max(1, concurrency))
+        self._blobs: "OrderedDict[str, _Blob]" = OrderedDict()
+        self._urls: Dict[str, str] = {}
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, url: str) -> Optional[_Blob]:
+        """
+        Return the stored content for url, or None if it has not been fetched or its
+        spooled file has since been removed.
+        """
+        digest = self._urls.get(url)
+        if digest is None:
+            return None
+        return self._stored(digest)
+
+    async def fetch(self, url: str, fetcher: Fetcher, limit: int) -> _Blob:
+        """
+        Return the content for url, downloading it at most once even if requested concurrently.
+        """
+        blob = self.lookup(url)
+        if blob is not None:
+            self.hits += 1
+            return blob
+        task = self._inflight.get(url)
+        if task is None:
+            self.misses += 1
+            task = asyncio.ensure_future(self._download(url, fetcher, limit))
+            self._inflight[url] = task
+            task.add_done_callback(lambda _t: self._inflight.pop(url, None))
+        return await asyncio.shield(task)
+
+    def clear(self) -> None:
+        """
+        Drop all stored content and remove spooled files.
+        """
+        while self._blobs:
+            self._evict_oldest()
+
+    def __len__(self) -> int:
+        return len(self._blobs)
+
+    async def _download(self, url: str, fetcher: Fetcher, limit: int) -> _Blob:
+        async with self._semaphore:
+            sha = hashlib.sha256()
+            size = 0
+            buf = bytearray()
+            spool = None
+            try:
+                async for chunk in fetcher(url):
+                    size += len(chunk)
+                    if size > limit:
+                        raise AttachmentError(f"Attachment exceeds the {limit} byte limit.")
+                    sha.update(chunk)
+                    if spool is None and size > self.spool_threshold:
+                        os.makedirs(self.directory, exist_ok=True)
+                        spool = tempfile.NamedTemporaryFile(dir=self.directory, suffix=".part", delete=False)
+                        spool.write(buf)
+                        buf = None
+                    if spool is not None:
+                        spool.write(chunk)
+                    else:
+                        buf.extend(chunk)
+                if spool is not None:
+                    spool.close()
+            except BaseException:
+                if spool is not None:
+                    spool.close()
+                    os.unlink(spool.name)
+                raise
+        digest = sha.hexdigest()
+        existing = self._stored(digest)
+        if existing is not None:
+            # Same content uploaded again under a new URL: keep the stored copy.
+            if spool is not None:
+                os.unlink(spool.name)
+            self.hits += 1
+            blob = existing
+            self._blobs.move_to_end(digest)
+        else:
+            blob = _Blob(digest=digest, size=size)
+            if spool is not None:
+                blob.path = os.path.join(self.directory, digest)
+                os.replace(spool.name, blob.path)
+            else:
+                blob.data = bytes(buf)
+            self._blobs[digest] = blob
+            self._bytes += size
+            while self._bytes > self.max_bytes and len(self._blobs) > 1:
+                self._evict_oldest()
+        blob.urls.add(url)
+        self._urls[url] = digest
+        return blob
+
+    def _stored(self, digest: str) -> Optional[_Blob]:
+        # The stored blob for digest, marked most recently used. A blob whose spooled
+        # file is gone (e.g. removed by a temp-file cleaner) is dropped instead.
+        blob = self._blobs.get(digest)
+        if blob is None:
+            return None
+        if blob.path and not os.path.exists(blob.path):
+            logger.warning(f"Cached attachment {blob.path} is missing; it will be downloaded again.")
+            self._drop(digest)
+            return None
+        self._blobs.move_to_end(digest)
+        return blob
+
+    def _evict_oldest(self) -> None:
+        self._drop(next(iter(self._blobs)))
+
+    def _drop(self, digest: str) -> None:
+        blob = self._blobs.pop(digest)
+        self._bytes -= blob.size
+        for url in blob.urls:
+            self._urls.pop(url, None)
+        if blob.path:
+            try:
+                os.unlink(blob.path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"Could not remove cached attachment {blob.path}: {e}")
+
+_default_cache: Optional[AttachmentCache] = None
+
+def get_attachment_cache() -> AttachmentCache:
+    """
+    Return the process-wide AttachmentCache, creating it on first use.
+    """
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = AttachmentCache()
+    return _default_cache
+
+class AttachmentHandle:
+    """
+    AttachmentHandle - Reference to one attachment; the content is fetched on first access.
+
+    Args:
+        filename (str): Original file name.
+        url (str): Where the content can be downloaded.
+        size (int, optional): Size declared by the sender, checked before downloading.
+        content_type (str, optional): MIME type declared by the sender.
+        fetcher (Fetcher, optional): Streams the content; defaults to http_fetch.
+        cache (AttachmentCache, optional): Defaults to the process-wide cache.
+    """
+    def __init__(self, filename: str, url: str, size: Optional[int] = None,
+                 content_type: Optional[str] = None,
+                 fetcher: Optional[Fetcher] = None,
+                 cache: Optional[AttachmentCache] = None,
+                 max_bytes: int = ATTACHMENT_MAX_BYTES):
+        self.filename = filename
+        self.url = url
+        self.size = size
+        self.content_type = content_type
+        self.max_bytes = max_bytes
+        self._fetcher = fetcher or http_fetch
+        self._cache = cache
+        self._blob: Optional[_Blob] = None
+
+    def __repr__(self) -> str:
+        return f"AttachmentHandle({self.filename!r}, size={self.size}, content_type={self.content_type!r})"
+
+    @property
+    def digest(self) -> Optional[str]:
+        """
+        SHA-256 of the content, or None until it has been fetched.
+        """
+        return self._blob.digest if self._blob else None
+
+    def check(self) -> None:
+        """
+        Raise AttachmentError if the declared size or MIME type is outside the configured limits.
+        """
+        if self.size is not None and self.size > self.max_bytes:
+            raise AttachmentError(
+                f"Attachment {self.filename!r} is {self.size} bytes; the limit is {self.max_bytes}."
+            )
+        if ATTACHMENT_ALLOWED_TYPES:
+            ctype = (self.content_type or "").split(";")[0].strip().lower()
+            if not any(ctype == t or (t.endswith("/") and ctype.startswith(t)) for t in ATTACHMENT_ALLOWED_TYPES):
+                raise AttachmentError(f"Attachment {self.filename!r} has disallowed type {ctype or 'unknown'!r}.")
+
+    async def fetch(self) -> "AttachmentHandle":
+        """
+        Download the content if it is not already available. Returns self.
+        """
+        self.check()
+        cache = self._cache if self._cache is not None else get_attachment_cache()
+        self._blob = await cache.fetch(self.url, self._fetcher, self.max_bytes)
+        return self
+
+    async def read(self) -> bytes:
+        """
+        Return the full content as bytes.
+        """
+        await self.fetch()
+        if self._blob.data is not None:
+            return self._blob.data
+        return await asyncio.to_thread(_read_file, self._blob.path)
+
+    async def open(self) -> BinaryIO:
+        """
+        Return a readable binary file object over the content. The caller closes it.
+        """
+        await self.fetch()
+        if self._blob.data is not None:
+            return io.BytesIO(self._blob.data)
+        return open(self._blob.path, "rb")
+
+    async def save(self, path: str) -> str:
+        """
+        Write the content to path and return path.
+        """
+        await self.fetch()
+        blob = self._blob
+        if blob.data is not None:
+            await asyncio.to_thread(_write_file, path, blob.data)
+        else:
+            await asyncio.to_thread(shutil.copyfile, blob.path, path)
+        return path
+
+class AttachmentSet(list):
+    """
+    AttachmentSet - List of AttachmentHandle objects for one message.
+    """
+    async def fetch_all(self, return_exceptions: bool = False) -> list:
+        """
+        Download every attachment concurrently (bounded by ATTACHMENT_FETCH_CONCURRENCY).
+
+        Args:
+            return_exceptions (bool): If True, a failed attachment yields its exception
+                in the result instead of raising.
+        """
+        return await asyncio.gather(*(h.fetch() for h in self), return_exceptions=return_exceptions)
+
+def _read_file(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+def _write_file(path: str, data: bytes) -> None:
+    with open(path, "wb") as f:
+        f.write(data)
+
+# End of core/attachments.py
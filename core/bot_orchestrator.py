@@ -1,7 +1,10 @@
-from typing import Any
+from typing import Any, AsyncIterator, Union
 
 from core.transport import Transport
+from core.outbound import OutboundScheduler, set_default_scheduler
+from core import tracing
 
+import asyncio
 import logging
 
 class BotOrchestrator:
@@ -9,19 +12,38 @@ class BotOrchestrator:
         self.transport = transport
         from managers.message_manager import MessageManager
         self._mm = MessageManager()
+        self._stop_task = None
+        # Replies go through the scheduler for chunking, pacing, and merging per channel.
+        self.outbound = OutboundScheduler(self._transport_send)
+        set_default_scheduler(self.outbound)
         logging.getLogger(__name__).info("BotOrchestrator initialised")
 
-    async def _send(self, ctx, content: str):
-        if hasattr(ctx, "channel"):
-            await self.transport.send_message(ctx.channel, content)
-        else:
-            await self.transport.send_message(ctx, content)
+    async def _transport_send(self, target, content: str, files=None):
+        if files:
+            return await self.transport.send_message(target, content, files=files)
+        return await self.transport.send_message(target, content)
+
+    async def _send(self, ctx, content: Union[str, AsyncIterator[str]]):
+        target = ctx.channel if hasattr(ctx, "channel") else ctx
+        with tracing.span("send"):
+            if isinstance(content, str):
+                await self.outbound.send(target, content)
+            else:
+                # A streamed reply: edited in place where the transport can, else sent once complete.
+                edit = self.transport.edit_message if getattr(self.transport, "supports_edit", False) else None
+                await self.outbound.stream(target, content, edit)
 
     async def dispatch(self, parsed, ctx: Any):
         result = await self._mm.process_message(parsed, ctx)
         if result:
             await self._send(ctx, result)
+        if not self._mm.state_machine.should_continue() and self._stop_task is None:
+            # Drain from a separate task: this dispatch is itself one of the jobs being drained.
+            self._stop_task = asyncio.create_task(self.stop())
 
     async def start(self):
         await self.transport.start(self.dispatch)
 
+    async def stop(self):
+        await self.transport.stop()
+
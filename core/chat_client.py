@@ -0,0 +1,277 @@
+#!/usr/bin/env python
+"""
+core/chat_client.py - Shared, cached chat-completion client.
+One AsyncOpenAI client is kept for the process, so its pooled HTTP connections are
+reused across calls instead of a new client being built per message. Replies are cached
+by normalized prompt (case and whitespace folded) plus any earlier conversation sent
+with it, for CHAT_CACHE_TTL seconds in an LRU of CHAT_CACHE_SIZE entries. Identical prompts that arrive while the first is still
+being answered wait for that answer instead of calling the API again. Each user may
+have CHAT_USER_CONCURRENCY requests in flight; beyond that, ChatBusyError is raised
+at once rather than the request being queued. stream() yields the reply as it is
+generated, for plugins that stream their answer.
+
+Usage Example:
+    reply = await get_chat_client().complete(prompt, user_id)
+    async for part in get_chat_client().stream(prompt, user_id): ...
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Sequence, Tuple
+
+from core import metrics
+from core.config import (
+    CHAT_MODEL,
+    CHAT_API_BASE_URL,
+    CHAT_TIMEOUT,
+    CHAT_CACHE_SIZE,
+    CHAT_CACHE_TTL,
+    CHAT_USER_CONCURRENCY,
+)
+
+logger = logging.getLogger(__name__)
+
+class ChatBusyError(RuntimeError):
+    """
+    Raised when a user already has the maximum number of chat requests in flight.
+    """
+
+def normalize_prompt(prompt: str) -> str:
+    return " ".join(prompt.casefold().split())
+
+def request_key(prompt: str, history: Sequence[Dict[str, str]] = ()) -> str:
+    """
+    Return the cache and coalescing key of prompt asked after history: the normalized
+    prompt, prefixed with a digest of the history when there is any.
+    """
+    key = normalize_prompt(prompt)
+    if history:
+        digest = hashlib.sha256(json.dumps(list(history), sort_keys=True).encode("utf-8")).hexdigest()
+        key = f"{digest}:{key}"
+    return key
+
+def _messages(prompt: str, history: Sequence[Dict[str, str]]) -> List[Dict[str, str]]:
+    return [*history, {"role": "user", "content": prompt}]
+
+def _default_client_factory():
+    from openai import AsyncOpenAI
+    return AsyncOpenAI(base_url=CHAT_API_BASE_URL or None, timeout=CHAT_TIMEOUT)
+
+class ChatClient:
+    """
+    ChatClient - Chat completions with a shared client, TTL/LRU cache, coalescing, and per-user caps.
+
+    Args:
+        model (str): Model name sent with each request.
+        cache_size (int): Replies kept in the cache (0 disables caching).
+        cache_ttl (float): Seconds a cached reply stays valid.
+        user_concurrency (int): Requests one user may have in flight (0 disables the cap).
+        client_factory (callable): Builds the AsyncOpenAI-compatible client on first use.
+        clock (callable): Monotonic time source, replaceable in tests.
+    """
+    def __init__(self, model: str = CHAT_MODEL, cache_size: int = CHAT_CACHE_SIZE,
+                 cache_ttl: float = CHAT_CACHE_TTL, user_concurrency: int = CHAT_USER_CONCURRENCY,
+                 client_factory: Callable[[], Any] = _default_client_factory,
+                 clock: Callable[[], float] = time.monotonic):
+        self.model = model
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self.user_concurrency = user_concurrency
+        self._client_factory = client_factory
+        self._clock = clock
+        self._client = None
+        self._cache: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._active: Dict[str, int] = {}
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = self._client_factory()
+        return self._client
+
+    async def complete(self, prompt: str, user_id: Optional[str] = None,
+                       history: Sequence[Dict[str, str]] = ()) -> str:
+        """
+        Return the reply to prompt, following the earlier messages in history, from the
+        cache, from an identical request already in flight, or from the API. Raises
+        ChatBusyError if user_id is at its cap.
+        """
+        key = request_key(prompt, history)
+        cached = self._cache_get(key)
+        if cached is not None:
+            metrics.CHAT_REQUESTS.labels(outcome="hit").inc()
+            return cached
+        self._acquire(user_id)
+        try:
+            pending = self._inflight.get(key)
+            if pending is not None:
+                metrics.CHAT_REQUESTS.labels(outcome="coalesced").inc()
+            else:
+                pending = self._track(key, asyncio.ensure_future(self._fetch(key, _messages(prompt, history))))
+            # Shielded, so one caller giving up does not cancel the others' answer.
+            return await asyncio.shield(pending)
+        finally:
+            self._release(user_id)
+
+    def stream(self, prompt: str, user_id: Optional[str] = None,
+               history: Sequence[Dict[str, str]] = ()) -> AsyncIterator[str]:
+        """
+        Return an async iterator over the reply to prompt as it is generated. Cached and
+        coalesced replies arrive as a single part. The finished reply is cached like one
+        from complete(). Raises ChatBusyError at once if user_id is at its cap; otherwise
+        the user's slot is held from now until the iterator finishes or is closed.
+        """
+        key = request_key(prompt, history)
+        cached = self._cache_get(key)
+        if cached is not None:
+            metrics.CHAT_REQUESTS.labels(outcome="hit").inc()
+            return _single(cached)
+        self._acquire(user_id)
+        return _SlotStream(self._stream(key, _messages(prompt, history)), lambda: self._release(user_id))
+
+    async def _stream(self, key: str, messages: List[Dict[str, str]]) -> AsyncIterator[str]:
+        pending = self._inflight.get(key)
+        if pending is not None:
+            metrics.CHAT_REQUESTS.labels(outcome="coalesced").inc()
+            yield await asyncio.shield(pending)
+            return
+        # Identical prompts arriving meanwhile wait on this future for the whole reply.
+        future = self._track(key, asyncio.get_running_loop().create_future())
+        parts = []
+        try:
+            with metrics.timed(metrics.CHAT_LATENCY, metrics.CHAT_REQUESTS) as labels:
+                rsp = await self.client.chat.completions.create(
+                    model=self.model, messages=messages, stream=True
+                )
+                async for chunk in rsp:
+                    delta = chunk.choices[0].delta.content if chunk.choices else None
+                    if delta:
+                        parts.append(delta)
+                        yield delta
+                labels["outcome"] = "upstream"
+            reply = "".join(parts)
+            self._cache_put(key, reply)
+            future.set_result(reply)
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            # The consumer stopped early; waiting callers get cancelled.
+            if not future.done():
+                future.cancel()
+
+    async def _fetch(self, key: str, messages: List[Dict[str, str]]) -> str:
+        with metrics.timed(metrics.CHAT_LATENCY, metrics.CHAT_REQUESTS) as labels:
+            rsp = await self.client.chat.completions.create(model=self.model, messages=messages)
+            labels["outcome"] = "upstream"
+        reply = rsp.choices[0].message.content
+        self._cache_put(key, reply)
+        return reply
+
+    def _track(self, key: str, future: asyncio.Future) -> asyncio.Future:
+        """
+        Register future as the in-flight request for key until it completes.
+        """
+        def done(f: asyncio.Future) -> None:
+            self._inflight.pop(key, None)
+            if not f.cancelled():
+                f.exception()  # Retrieved here so an error nobody awaited is not reported as lost.
+        self._inflight[key] = future
+        future.add_done_callback(done)
+        return future
+
+    def _busy(self, user_id: Optional[str]) -> bool:
+        return (user_id is not None and self.user_concurrency > 0
+                and self._active.get(user_id, 0) >= self.user_concurrency)
+
+    def _acquire(self, user_id: Optional[str]) -> None:
+        if self._busy(user_id):
+            metrics.CHAT_REQUESTS.labels(outcome="rejected").inc()
+            raise ChatBusyError(f"User {user_id} already has {self.user_concurrency} chat request(s) in flight.")
+        if user_id is not None:
+            self._active[user_id] = self._active.get(user_id, 0) + 1
+
+    def _release(self, user_id: Optional[str]) -> None:
+        if user_id is not None and user_id in self._active:
+            self._active[user_id] -= 1
+            if self._active[user_id] <= 0:
+                del self._active[user_id]
+
+    def _cache_get(self, key: str) -> Optional[str]:
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        expires, reply = entry
+        if self._clock() >= expires:
+            del self._cache[key]
+            return None
+        self._cache.move_to_end(key)
+        return reply
+
+    def _cache_put(self, key: str, reply: str) -> None:
+        if self.cache_size <= 0 or self.cache_ttl <= 0:
+            return
+        self._cache[key] = (self._clock() + self.cache_ttl, reply)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+    async def close(self) -> None:
+        client, self._client = self._client, None
+        if client is not None:
+            await client.close()
+
+async def _single(text: str) -> AsyncIterator[str]:
+    yield text
+
+class _SlotStream:
+    """
+    Async iterator over parts that calls release once the stream ends, fails, or is
+    closed, including when it is closed (or dropped) before its first part.
+    """
+    def __init__(self, parts: AsyncIterator[str], release: Callable[[], None]):
+        self._parts = parts
+        self._release = release
+
+    def __aiter__(self) -> "_SlotStream":
+        return self
+
+    async def __anext__(self) -> str:
+        try:
+            return await self._parts.__anext__()
+        except BaseException:
+            self._done()
+            raise
+
+    async def aclose(self) -> None:
+        self._done()
+        await self._parts.aclose()
+
+    def _done(self) -> None:
+        release, self._release = self._release, None
+        if release is not None:
+            release()
+
+    def __del__(self) -> None:
+        self._done()
+
+_chat_client: Optional[ChatClient] = None
+
+def get_chat_client() -> ChatClient:
+    """
+    Return the process-wide ChatClient, creating it on first use.
+    """
+    global _chat_client
+    if _chat_client is None:
+        _chat_client = ChatClient()
+    return _chat_client
+
+# End of core/chat_client.py
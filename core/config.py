@@ -7,6 +7,7 @@ Loads configuration settings from environment variables with default values.
 import os
 import logging
 import json
+import tempfile
 from dotenv import load_dotenv
 
 logger = logging.getLogger(__name__)
@@ -81,7 +82,385 @@ DISK_BACKUP_RETENTION_COUNT: int = int(os.getenv("DISK_BACKUP_RETENTION_COUNT",
 # For backward compatibility; canonical backup interval
 DISK_BACKUP_INTERVAL = BACKUP_INTERVAL
 
+# How backups are taken: "backup" copies pages with SQLite's online backup API;
+# "vacuum" writes a compacted snapshot with VACUUM INTO.
+BACKUP_MODE: str = os.environ.get("BACKUP_MODE", "backup").strip().lower()
+
+# Pages copied per step of an online backup; the database is free for writers between steps.
+BACKUP_PAGES_PER_STEP: int = parse_int_env(
+    os.environ.get("BACKUP_PAGES_PER_STEP", "256"),
+    256,
+    "BACKUP_PAGES_PER_STEP"
+)
+
+# Milliseconds an online backup pauses between steps.
+BACKUP_STEP_SLEEP_MS: int = parse_int_env(
+    os.environ.get("BACKUP_STEP_SLEEP_MS", "5"),
+    5,
+    "BACKUP_STEP_SLEEP_MS"
+)
+
+# Skip a scheduled backup when nothing was committed since the previous one.
+BACKUP_SKIP_UNCHANGED: bool = os.environ.get("BACKUP_SKIP_UNCHANGED", "1") in ("1", "true", "yes")
+
+# Keep backups in the deduplicated, compressed store (db/backup_store.py) instead of as
+# one full .db copy each.
+BACKUP_STORE_ENABLED: bool = os.environ.get("BACKUP_STORE_ENABLED", "1") in ("1", "true", "yes")
+
+# Compression of stored backup chunks: "gzip", or "zstd" (faster and smaller; needs the
+# optional zstandard package).
+BACKUP_COMPRESSION: str = os.environ.get("BACKUP_COMPRESSION", "gzip").strip().lower()
+
+# Database pages per stored backup chunk; snapshots share chunks whose pages did not change.
+BACKUP_CHUNK_PAGES: int = parse_int_env(
+    os.environ.get("BACKUP_CHUNK_PAGES", "16"),
+    16,
+    "BACKUP_CHUNK_PAGES"
+)
+
+# Journal every user state change to an append-only log next to the backups, so the
+# database can be recovered to any point in time (see db/journal.py, db/recovery.py).
+CHANGE_JOURNAL_ENABLED: bool = os.environ.get("CHANGE_JOURNAL_ENABLED", "1") in ("1", "true", "yes")
+
+# fsync the journal after every entry; otherwise entries survive a process crash but
+# not necessarily a power loss.
+CHANGE_JOURNAL_FSYNC: bool = os.environ.get("CHANGE_JOURNAL_FSYNC", "0") in ("1", "true", "yes")
+
 # === API Keys ===
 OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY", "")
 
+# === Chat ===
+# Model used by the chat plugin.
+CHAT_MODEL: str = os.environ.get("CHAT_MODEL", "gpt-4o-mini")
+
+# OpenAI-compatible API base URL; empty means the SDK default.
+CHAT_API_BASE_URL: str = os.environ.get("CHAT_API_BASE_URL", "")
+
+# Seconds before a chat completion request is abandoned.
+CHAT_TIMEOUT: int = parse_int_env(
+    os.environ.get("CHAT_TIMEOUT", "60"),
+    60,
+    "CHAT_TIMEOUT"
+)
+
+# Number of chat replies kept in the response cache (0 disables caching).
+CHAT_CACHE_SIZE: int = parse_int_env(
+    os.environ.get("CHAT_CACHE_SIZE", "256"),
+    256,
+    "CHAT_CACHE_SIZE"
+)
+
+# Seconds a cached chat reply is reused for the same prompt.
+CHAT_CACHE_TTL: int = parse_int_env(
+    os.environ.get("CHAT_CACHE_TTL", "300"),
+    300,
+    "CHAT_CACHE_TTL"
+)
+
+# Stream chat replies as they are generated (edited into one message where the transport can).
+CHAT_STREAMING: bool = os.environ.get("CHAT_STREAMING", "1") in ("1", "true", "yes")
+
+# Chat requests one user may have in flight at once (0 means no limit).
+CHAT_USER_CONCURRENCY: int = parse_int_env(
+    os.environ.get("CHAT_USER_CONCURRENCY", "1"),
+    1,
+    "CHAT_USER_CONCURRENCY"
+)
+
+# === Conversation memory ===
+# Tokens of earlier turns sent with each chat prompt, per user and channel.
+CONVERSATION_TOKEN_BUDGET: int = parse_int_env(
+    os.environ.get("CONVERSATION_TOKEN_BUDGET", "2000"),
+    2000,
+    "CONVERSATION_TOKEN_BUDGET"
+)
+
+# Most turns kept in memory per conversation, whatever their size.
+CONVERSATION_MAX_TURNS: int = parse_int_env(
+    os.environ.get("CONVERSATION_MAX_TURNS", "40"),
+    40,
+    "CONVERSATION_MAX_TURNS"
+)
+
+# Conversations kept in memory; the least recently used are reloaded from the database.
+CONVERSATION_CACHE_SIZE: int = parse_int_env(
+    os.environ.get("CONVERSATION_CACHE_SIZE", "2048"),
+    2048,
+    "CONVERSATION_CACHE_SIZE"
+)
+
+# Turns kept in the database per conversation (0 keeps all of them).
+CONVERSATION_KEEP_TURNS: int = parse_int_env(
+    os.environ.get("CONVERSATION_KEEP_TURNS", "200"),
+    200,
+    "CONVERSATION_KEEP_TURNS"
+)
+
+# === Database Connection Pool ===
+# Maximum number of SQLite connections held open by the pool.
+DB_POOL_SIZE: int = parse_int_env(
+    os.environ.get("DB_POOL_SIZE", "8"),
+    8,
+    "DB_POOL_SIZE"
+)
+
+# Seconds to wait for a free pooled connection before raising an error.
+DB_POOL_TIMEOUT: int = parse_int_env(
+    os.environ.get("DB_POOL_TIMEOUT", "30"),
+    30,
+    "DB_POOL_TIMEOUT"
+)
+
+# Idle seconds after which a pooled connection is health-checked before reuse.
+DB_POOL_HEALTH_CHECK_INTERVAL: int = parse_int_env(
+    os.environ.get("DB_POOL_HEALTH_CHECK_INTERVAL", "30"),
+    30,
+    "DB_POOL_HEALTH_CHECK_INTERVAL"
+)
+
+# Bytes of the database file to memory-map per connection (0 disables mmap).
+DB_MMAP_SIZE: int = parse_int_env(
+    os.environ.get("DB_MMAP_SIZE", str(64 * 1024 * 1024)),
+    64 * 1024 * 1024,
+    "DB_MMAP_SIZE"
+)
+
+# Number of reader threads serving the async database API (writes use one dedicated thread).
+DB_ASYNC_READERS: int = parse_int_env(
+    os.environ.get("DB_ASYNC_READERS", "4"),
+    4,
+    "DB_ASYNC_READERS"
+)
+
+# === User State Cache ===
+# Maximum number of decoded user states FlowManager keeps in memory.
+USER_STATE_CACHE_SIZE: int = parse_int_env(
+    os.environ.get("USER_STATE_CACHE_SIZE", "1024"),
+    1024,
+    "USER_STATE_CACHE_SIZE"
+)
+
+# Seconds between write-back flushes of modified user states.
+# A value of 0 disables write-back and persists every change immediately.
+USER_STATE_FLUSH_INTERVAL: int = parse_int_env(
+    os.environ.get("USER_STATE_FLUSH_INTERVAL", "5"),
+    5,
+    "USER_STATE_FLUSH_INTERVAL"
+)
+
+# Users moved per transaction when migrating flow states from the JSON blob to the
+# Flows table; writers get the database between batches.
+FLOW_MIGRATION_BATCH_SIZE: int = parse_int_env(
+    os.environ.get("FLOW_MIGRATION_BATCH_SIZE", "500"),
+    500,
+    "FLOW_MIGRATION_BATCH_SIZE"
+)
+
+# === Message Pipeline ===
+# Number of worker tasks processing incoming messages concurrently.
+PIPELINE_WORKERS: int = parse_int_env(
+    os.environ.get("PIPELINE_WORKERS", "8"),
+    8,
+    "PIPELINE_WORKERS"
+)
+
+# Maximum number of messages waiting to be processed; further messages are shed.
+PIPELINE_MAX_QUEUE: int = parse_int_env(
+    os.environ.get("PIPELINE_MAX_QUEUE", "256"),
+    256,
+    "PIPELINE_MAX_QUEUE"
+)
+
+# Messages sharing a key are processed one at a time, in arrival order ("user" or "channel").
+PIPELINE_ORDER_BY: str = os.environ.get("PIPELINE_ORDER_BY", "user").strip().lower()
+
+# Seconds to wait for queued messages to finish during shutdown.
+PIPELINE_DRAIN_TIMEOUT: int = parse_int_env(
+    os.environ.get("PIPELINE_DRAIN_TIMEOUT", "10"),
+    10,
+    "PIPELINE_DRAIN_TIMEOUT"
+)
+
+# === Attachments ===
+# Largest attachment, in bytes, that will be downloaded.
+ATTACHMENT_MAX_BYTES: int = parse_int_env(
+    os.environ.get("ATTACHMENT_MAX_BYTES", str(25 * 1024 * 1024)),
+    25 * 1024 * 1024,
+    "ATTACHMENT_MAX_BYTES"
+)
+
+# Attachments up to this many bytes are kept in memory; larger ones are spooled to disk.
+ATTACHMENT_SPOOL_THRESHOLD: int = parse_int_env(
+    os.environ.get("ATTACHMENT_SPOOL_THRESHOLD", str(1024 * 1024)),
+    1024 * 1024,
+    "ATTACHMENT_SPOOL_THRESHOLD"
+)
+
+# Comma-separated MIME types or prefixes (e.g. "image/,application/pdf") allowed for download.
+# Empty allows every type.
+ATTACHMENT_ALLOWED_TYPES: list = [
+    t.strip().lower() for t in os.environ.get("ATTACHMENT_ALLOWED_TYPES", "").split(",") if t.strip()
+]
+
+# Maximum number of attachment downloads running at once.
+ATTACHMENT_FETCH_CONCURRENCY: int = parse_int_env(
+    os.environ.get("ATTACHMENT_FETCH_CONCURRENCY", "4"),
+    4,
+    "ATTACHMENT_FETCH_CONCURRENCY"
+)
+
+# Total bytes of downloaded attachment content kept for reuse by content hash.
+ATTACHMENT_CACHE_MAX_BYTES: int = parse_int_env(
+    os.environ.get("ATTACHMENT_CACHE_MAX_BYTES", str(256 * 1024 * 1024)),
+    256 * 1024 * 1024,
+    "ATTACHMENT_CACHE_MAX_BYTES"
+)
+
+# Directory for spooled attachment files.
+ATTACHMENT_CACHE_DIR: str = os.environ.get(
+    "ATTACHMENT_CACHE_DIR", os.path.join(tempfile.gettempdir(), "bot_attachments")
+)
+
+# === Outbound messages ===
+# Longest message sent in one piece; longer replies are split (Discord's limit is 2000).
+OUTBOUND_MAX_CHARS: int = parse_int_env(
+    os.environ.get("OUTBOUND_MAX_CHARS", "2000"),
+    2000,
+    "OUTBOUND_MAX_CHARS"
+)
+
+# Per-channel pacing: at most OUTBOUND_CHANNEL_BURST sends every OUTBOUND_CHANNEL_PERIOD seconds.
+OUTBOUND_CHANNEL_BURST: int = parse_int_env(
+    os.environ.get("OUTBOUND_CHANNEL_BURST", "5"),
+    5,
+    "OUTBOUND_CHANNEL_BURST"
+)
+OUTBOUND_CHANNEL_PERIOD: int = parse_int_env(
+    os.environ.get("OUTBOUND_CHANNEL_PERIOD", "5"),
+    5,
+    "OUTBOUND_CHANNEL_PERIOD"
+)
+
+# Sends per second across all channels.
+OUTBOUND_GLOBAL_LIMIT: int = parse_int_env(
+    os.environ.get("OUTBOUND_GLOBAL_LIMIT", "40"),
+    40,
+    "OUTBOUND_GLOBAL_LIMIT"
+)
+
+# Times a send rejected with a rate limit (HTTP 429) is retried before giving up.
+OUTBOUND_MAX_RETRIES: int = parse_int_env(
+    os.environ.get("OUTBOUND_MAX_RETRIES", "3"),
+    3,
+    "OUTBOUND_MAX_RETRIES"
+)
+
+# Milliseconds between edits of a reply that is being streamed into a message in place.
+OUTBOUND_EDIT_INTERVAL_MS: int = parse_int_env(
+    os.environ.get("OUTBOUND_EDIT_INTERVAL_MS", "1000"),
+    1000,
+    "OUTBOUND_EDIT_INTERVAL_MS"
+)
+
+# === Metrics ===
+# Port of the local HTTP server exposing /metrics in Prometheus text format; 0 disables it.
+METRICS_PORT: int = parse_int_env(
+    os.environ.get("METRICS_PORT", "0"),
+    0,
+    "METRICS_PORT"
+)
+
+# Interface the metrics server listens on.
+METRICS_HOST: str = os.environ.get("METRICS_HOST", "127.0.0.1")
+
+# === Tracing ===
+# Messages taking longer than this many milliseconds are logged with their span breakdown.
+TRACE_SLOW_THRESHOLD_MS: int = parse_int_env(
+    os.environ.get("TRACE_SLOW_THRESHOLD_MS", "1000"),
+    1000,
+    "TRACE_SLOW_THRESHOLD_MS"
+)
+
+# Number of recent slow messages kept for the perf command.
+TRACE_SLOW_LOG_SIZE: int = parse_int_env(
+    os.environ.get("TRACE_SLOW_LOG_SIZE", "50"),
+    50,
+    "TRACE_SLOW_LOG_SIZE"
+)
+
+# Invocations of a slow command run under cProfile afterwards; 0 disables profiling.
+TRACE_PROFILE_RUNS: int = parse_int_env(
+    os.environ.get("TRACE_PROFILE_RUNS", "1"),
+    1,
+    "TRACE_PROFILE_RUNS"
+)
+
+# Rows of each captured profile kept, by cumulative time.
+TRACE_PROFILE_LINES: int = parse_int_env(
+    os.environ.get("TRACE_PROFILE_LINES", "25"),
+    25,
+    "TRACE_PROFILE_LINES"
+)
+
+# === Event-loop monitor ===
+# Start the loop lag monitor with the bot; it can also be switched on with "perf monitor on".
+LOOP_MONITOR_ENABLED: bool = os.environ.get("LOOP_MONITOR_ENABLED", "0") in ("1", "true", "yes")
+
+# Milliseconds between the monitor's heartbeats.
+LOOP_MONITOR_INTERVAL_MS: int = parse_int_env(
+    os.environ.get("LOOP_MONITOR_INTERVAL_MS", "100"),
+    100,
+    "LOOP_MONITOR_INTERVAL_MS"
+)
+
+# A heartbeat late by more than this many milliseconds counts as a blocked loop, and the
+# loop thread's stack is captured.
+LOOP_BLOCK_THRESHOLD_MS: int = parse_int_env(
+    os.environ.get("LOOP_BLOCK_THRESHOLD_MS", "250"),
+    250,
+    "LOOP_BLOCK_THRESHOLD_MS"
+)
+
+# Number of recent blocks kept for the perf command.
+LOOP_MONITOR_HISTORY: int = parse_int_env(
+    os.environ.get("LOOP_MONITOR_HISTORY", "20"),
+    20,
+    "LOOP_MONITOR_HISTORY"
+)
+
+# === Transport ===
+# Which transport main.py starts: "discord" or "signal".
+BOT_TRANSPORT: str = os.environ.get("BOT_TRANSPORT", "discord").strip().lower()
+
+# === Signal ===
+# Phone number of the bot's Signal account, in E.164 format.
+BOT_NUMBER: str = os.environ.get("BOT_NUMBER", "")
+
+# Command used to start signal-cli; it is run once, in JSON-RPC mode, for the bot's lifetime.
+SIGNAL_CLI_COMMAND: str = os.environ.get("SIGNAL_CLI_COMMAND", os.path.join("bin", "signal-cli"))
+
+# Address of an already running "signal-cli daemon" to connect to instead of starting one:
+# "host:port" for --tcp, or a path for --socket. Empty starts signal-cli as a child process.
+SIGNAL_RPC_ADDRESS: str = os.environ.get("SIGNAL_RPC_ADDRESS", "").strip()
+
+# Seconds to wait for signal-cli to answer a request.
+SIGNAL_RPC_TIMEOUT: int = parse_int_env(
+    os.environ.get("SIGNAL_RPC_TIMEOUT", "30"),
+    30,
+    "SIGNAL_RPC_TIMEOUT"
+)
+
+# Seconds to wait before restarting (or reconnecting to) signal-cli after it goes away.
+SIGNAL_RESTART_DELAY: int = parse_int_env(
+    os.environ.get("SIGNAL_RESTART_DELAY", "5"),
+    5,
+    "SIGNAL_RESTART_DELAY"
+)
+
+# Directory where signal-cli stores received attachments.
+SIGNAL_ATTACHMENTS_DIR: str = os.environ.get(
+    "SIGNAL_ATTACHMENTS_DIR",
+    os.path.join(os.path.expanduser("~"), ".local", "share", "signal-cli", "attachments")
+)
+
 # End of config.py
\ No newline at end of file
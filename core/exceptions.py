@@ -14,4 +14,18 @@ class VolunteerError(DomainError):
     """
     Raised when user input fails validation in volunteer-related flows.
     """
-    pass
\ No newline at end of file
+    pass
+
+class AttachmentError(DomainError):
+    """
+    Raised when an attachment is rejected (size or type limits) or cannot be downloaded.
+    """
+    pass
+
+class SignalRpcError(RuntimeError):
+    """
+    Raised when signal-cli rejects a JSON-RPC request or goes away before answering it.
+    """
+    def __init__(self, message: str, code: int | None = None):
+        super().__init__(message)
+        self.code = code
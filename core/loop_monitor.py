@@ -0,0 +1,200 @@
+#!/usr/bin/env python
+"""
+core/loop_monitor.py - Event-loop lag monitor and blocking-call detector.
+A heartbeat task sleeps for LOOP_MONITOR_INTERVAL_MS and measures how late it wakes
+up. That lateness is the loop lag, and it is observed into a histogram. A watchdog
+thread checks the heartbeat. When the heartbeat has been silent for more than
+LOOP_BLOCK_THRESHOLD_MS, the loop is blocked by synchronous code, and the watchdog
+captures the loop thread's stack, the running task, and the plugin module on that
+stack. Once the loop recovers, the block is recorded with its duration and counted
+per plugin.
+
+The monitor can be switched on and off at runtime (see the "perf monitor" command).
+It starts disabled unless LOOP_MONITOR_ENABLED is set.
+
+Usage Example:
+    monitor = get_loop_monitor()
+    monitor.start()        # from within the running event loop
+    ...
+    monitor.blocks         # recent BlockRecord objects, newest last
+    monitor.stop()
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Optional
+
+from core import metrics
+from core.config import (
+    LOOP_MONITOR_INTERVAL_MS,
+    LOOP_BLOCK_THRESHOLD_MS,
+    LOOP_MONITOR_HISTORY,
+)
+
+logger = logging.getLogger(__name__)
+
+_STACK_LIMIT = 30
+_PLUGIN_DIR = os.sep + "plugins" + os.sep
+
+@dataclass
+class BlockRecord:
+    started_at: float          # Unix time the block was detected
+    duration: float            # Seconds the loop was blocked
+    task: Optional[str]        # Name and coroutine of the task that was running
+    plugin: Optional[str]      # Plugin module on the stack, if any
+    stack: Optional[str]       # Stack of the loop thread while blocked
+
+    def summary(self) -> str:
+        where = self.plugin or self.task or "unknown"
+        return f"{self.duration * 1000:.0f}ms blocked in {where}"
+
+def _plugin_on_stack(frame) -> Optional[str]:
+    while frame is not None:
+        if _PLUGIN_DIR in frame.f_code.co_filename:
+            return frame.f_globals.get("__name__")
+        frame = frame.f_back
+    return None
+
+def _describe_task(task) -> Optional[str]:
+    if task is None:
+        return None
+    coro = task.get_coro()
+    return f"{task.get_name()} ({getattr(coro, '__qualname__', coro)})"
+
+class LoopMonitor:
+    """
+    LoopMonitor - Measures event-loop lag and captures stacks of blocking calls.
+
+    Args:
+        interval (float): Seconds between heartbeats.
+        threshold (float): Seconds without a heartbeat (beyond interval) that count as a block.
+        history (int): Number of recent blocks kept.
+    """
+    def __init__(self, interval: float = LOOP_MONITOR_INTERVAL_MS / 1000.0,
+                 threshold: float = LOOP_BLOCK_THRESHOLD_MS / 1000.0,
+                 history: int = LOOP_MONITOR_HISTORY):
+        self.interval = interval
+        self.threshold = threshold
+        self.blocks: Deque[BlockRecord] = deque(maxlen=max(1, history))
+        self.max_lag = 0.0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._heartbeat: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+        self._last_beat = 0.0
+        self._pending: Optional[BlockRecord] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self._heartbeat is not None and not self._heartbeat.done()
+
+    def start(self) -> None:
+        """
+        Start monitoring the running event loop. Must be called from within it.
+        """
+        if self.enabled:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.perf_counter()
+        # Each watchdog thread gets its own event, so a quick restart cannot revive an old one.
+        self._stopping = threading.Event()
+        self._heartbeat = self._loop.create_task(self._run_heartbeat(), name="loop-monitor")
+        self._watchdog = threading.Thread(target=self._run_watchdog, args=(self._stopping,),
+                                          name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+        logger.info(f"Loop monitor started (interval {self.interval * 1000:.0f}ms, "
+                    f"block threshold {self.threshold * 1000:.0f}ms).")
+
+    def stop(self) -> None:
+        """
+        Stop the heartbeat and signal the watchdog thread to exit.
+        """
+        self._stopping.set()
+        heartbeat, self._heartbeat = self._heartbeat, None
+        if heartbeat is not None:
+            heartbeat.cancel()
+        self._watchdog = None
+        self._pending = None
+        logger.info("Loop monitor stopped.")
+
+    def reset(self) -> None:
+        self.blocks.clear()
+        self.max_lag = 0.0
+
+    async def _run_heartbeat(self) -> None:
+        while True:
+            expected = time.perf_counter() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.perf_counter()
+            lag = max(0.0, now - expected)
+            self._last_beat = now
+            metrics.LOOP_LAG.observe(lag)
+            metrics.LOOP_LAG_LAST.set(lag)
+            if lag > self.max_lag:
+                self.max_lag = lag
+            if lag > self.threshold:
+                self._record_block(lag)
+
+    def _record_block(self, lag: float) -> None:
+        with self._lock:
+            record, self._pending = self._pending, None
+        if record is None:
+            # Shorter than the watchdog's polling granularity; no stack was captured.
+            record = BlockRecord(time.time() - lag, lag, None, None, None)
+        record.duration = lag
+        self.blocks.append(record)
+        metrics.LOOP_BLOCKS.labels(plugin=record.plugin or "unknown").inc()
+        metrics.LOOP_BLOCK_DURATION.observe(lag)
+        logger.warning(f"Event loop {record.summary()}" + (f"\n{record.stack}" if record.stack else ""))
+
+    def _run_watchdog(self, stopping: threading.Event) -> None:
+        poll = max(0.001, self.threshold / 4)
+        captured_for = None
+        while not stopping.wait(poll):
+            beat = self._last_beat
+            if beat == captured_for:
+                continue
+            if time.perf_counter() - beat - self.interval > self.threshold:
+                captured_for = beat
+                self._capture(beat)
+
+    def _capture(self, beat: float) -> None:
+        frame = sys._current_frames().get(self._loop_thread_id)
+        if frame is None:
+            return
+        try:
+            task = asyncio.current_task(self._loop)
+        except RuntimeError:
+            task = None
+        record = BlockRecord(
+            started_at=time.time() - (time.perf_counter() - beat - self.interval),
+            duration=0.0,
+            task=_describe_task(task),
+            plugin=_plugin_on_stack(frame),
+            stack="".join(traceback.format_stack(frame, limit=_STACK_LIMIT)),
+        )
+        with self._lock:
+            self._pending = record
+
+_monitor: Optional[LoopMonitor] = None
+
+def get_loop_monitor() -> LoopMonitor:
+    """
+    Return the process-wide LoopMonitor, creating it on first use.
+    """
+    global _monitor
+    if _monitor is None:
+        _monitor = LoopMonitor()
+    return _monitor
+
+# End of core/loop_monitor.py
@@ -0,0 +1,235 @@
+#!/usr/bin/env python
+"""
+core/media_cache.py - Content-addressed on-disk media cache.
+Files are stored once per content hash, at objects/<sha[:2]>/<sha>/<filename>, so two
+URLs that serve the same bytes share one file. A JSON index maps each source URL and
+any alias (e.g. the page the media was found on) to a hash. It also holds per-file
+metadata and last-use times. URLs are keyed without their query string, because CDN
+links carry signatures that change between visits. When the cache grows past
+max_bytes, the least recently used files are evicted. Downloads land in tmp/ and are
+renamed into place, and the index is rewritten through a temp file, so a crash never
+leaves a half-written entry.
+
+Usage Example:
+    cache = MediaCache("./explorer_downloads", max_bytes=2 * 1024 ** 3)
+    media = cache.fetch(url, "clip.mp4", lambda tmp: downloader.download(url, tmp),
+                        metadata={"artist": artist}, aliases=[page_url])
+    media.path   # served from disk on the next fetch or get of url or page_url
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional
+from urllib.parse import urlsplit, urlunsplit
+
+logger = logging.getLogger(__name__)
+
+_INDEX_FILE = "index.json"
+_HASH_CHUNK = 1024 * 1024
+
+@dataclass
+class CachedMedia:
+    sha256: str
+    path: str
+    size: int
+    metadata: dict
+
+def cache_key(url: str) -> str:
+    """
+    Normalize url for lookups: drop the query string and fragment.
+    """
+    parts = urlsplit(url)
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, "", ""))
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(_HASH_CHUNK), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+class MediaCache:
+    """
+    MediaCache - Stores downloaded media by content hash with an LRU size bound.
+
+    Args:
+        root (str): Directory holding objects/, tmp/, and the index.
+        max_bytes (int): Total size of cached files above which the least recently used are evicted.
+        clock (callable): Time source for last-use times, replaceable in tests.
+    """
+    def __init__(self, root: str, max_bytes: int, clock: Callable[[], float] = time.time):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.tmp_dir = os.path.join(root, "tmp")
+        self._clock = clock
+        self._lock = threading.RLock()
+        self._entries: Dict[str, dict] = {}
+        self._keys: Dict[str, str] = {}
+        self._fetching: Dict[str, list] = {}
+        self._load()
+
+    @property
+    def total_bytes(self) -> int:
+        with self._lock:
+            return sum(entry["size"] for entry in self._entries.values())
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, url: str) -> Optional[CachedMedia]:
+        """
+        Return the cached media for url or an alias, marking it used, or None.
+        An entry whose file has gone missing is dropped.
+        """
+        with self._lock:
+            sha = self._keys.get(cache_key(url))
+            entry = self._entries.get(sha) if sha else None
+            if entry is None:
+                return None
+            if not os.path.exists(entry["path"]):
+                logger.warning(f"Cached media {entry['path']} is missing; dropping it from the index.")
+                self._drop(sha)
+                self._save()
+                return None
+            entry["last_used"] = self._clock()
+            self._save()
+            return self._media(sha, entry)
+
+    def fetch(self, url: str, filename: str, download: Callable[[str], object],
+              metadata: Optional[dict] = None, aliases: Iterable[str] = ()) -> CachedMedia:
+        """
+        Return the cached media for url, or call download(tmp_path) to fetch it and
+        add it to the cache under filename. Aliases are recorded either way.
+        Concurrent fetches of one URL share a single download.
+        """
+        key = cache_key(url)
+        with self._lock:
+            pending = self._fetching.setdefault(key, [threading.Lock(), 0])
+            pending[1] += 1
+        try:
+            with pending[0]:
+                media = self.get(url)
+                if media is None:
+                    os.makedirs(self.tmp_dir, exist_ok=True)
+                    ext = os.path.splitext(filename)[1]
+                    # Named after the URL, so an interrupted download can be resumed next time.
+                    tmp_path = os.path.join(self.tmp_dir, hashlib.sha256(key.encode()).hexdigest() + ext)
+                    download(tmp_path)
+                    return self.put_file(url, tmp_path, filename, metadata, aliases)
+        finally:
+            with self._lock:
+                pending[1] -= 1
+                if pending[1] == 0:
+                    del self._fetching[key]
+        if aliases or metadata:
+            with self._lock:
+                self._remember(media.sha256, aliases, metadata)
+                self._save()
+            media.metadata = dict(self._entries[media.sha256]["metadata"])
+        return media
+
+    def put_file(self, url: str, src_path: str, filename: str, metadata: Optional[dict] = None,
+                 aliases: Iterable[str] = ()) -> CachedMedia:
+        """
+        Move src_path into the cache as the content of url and return the entry.
+        If the same content is already cached, src_path is removed and the existing
+        file is used.
+        """
+        sha = file_sha256(src_path)
+        size = os.path.getsize(src_path)
+        with self._lock:
+            entry = self._entries.get(sha)
+            if entry is not None and os.path.exists(entry["path"]):
+                os.remove(src_path)
+            else:
+                directory = os.path.join(self.root, "objects", sha[:2], sha)
+                os.makedirs(directory, exist_ok=True)
+                path = os.path.join(directory, os.path.basename(filename))
+                os.replace(src_path, path)
+                entry = self._entries[sha] = {"path": path, "size": size, "urls": [], "metadata": {}}
+            entry["last_used"] = self._clock()
+            self._remember(sha, [url, *aliases], metadata)
+            self._evict(keep=sha)
+            self._save()
+            return self._media(sha, entry)
+
+    def search(self, text: str) -> List[CachedMedia]:
+        """
+        Return cached media whose metadata values contain text (case-insensitive),
+        most recently used first.
+        """
+        needle = text.lower()
+        with self._lock:
+            found = [
+                (entry["last_used"], self._media(sha, entry))
+                for sha, entry in self._entries.items()
+                if any(needle in str(value).lower() for value in entry["metadata"].values())
+            ]
+        return [media for _, media in sorted(found, key=lambda pair: pair[0], reverse=True)]
+
+    def _remember(self, sha: str, urls: Iterable[str], metadata: Optional[dict]) -> None:
+        entry = self._entries[sha]
+        for url in urls:
+            key = cache_key(url)
+            if key not in entry["urls"]:
+                entry["urls"].append(key)
+            self._keys[key] = sha
+        if metadata:
+            entry["metadata"].update(metadata)
+
+    def _evict(self, keep: Optional[str] = None) -> None:
+        total = sum(entry["size"] for entry in self._entries.values())
+        if total <= self.max_bytes:
+            return
+        for sha, entry in sorted(self._entries.items(), key=lambda item: item[1]["last_used"]):
+            if total <= self.max_bytes:
+                break
+            if sha == keep:
+                continue
+            total -= entry["size"]
+            logger.info(f"Evicting cached media {entry['path']} ({entry['size']} bytes).")
+            try:
+                os.remove(entry["path"])
+                os.rmdir(os.path.dirname(entry["path"]))
+            except OSError:
+                pass
+            self._drop(sha)
+
+    def _drop(self, sha: str) -> None:
+        entry = self._entries.pop(sha)
+        for key in entry["urls"]:
+            if self._keys.get(key) == sha:
+                del self._keys[key]
+
+    def _media(self, sha: str, entry: dict) -> CachedMedia:
+        return CachedMedia(sha, entry["path"], entry["size"], dict(entry["metadata"]))
+
+    def _load(self) -> None:
+        path = os.path.join(self.root, _INDEX_FILE)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                self._entries = json.load(f)["entries"]
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Media cache index {path} is unreadable ({e}); starting empty.")
+            self._entries = {}
+            return
+        for sha, entry in self._entries.items():
+            for key in entry["urls"]:
+                self._keys[key] = sha
+
+    def _save(self) -> None:
+        os.makedirs(self.root, exist_ok=True)
+        path = os.path.join(self.root, _INDEX_FILE)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"entries": self._entries}, f)
+        os.replace(tmp_path, path)
+
+# End of core/media_cache.py
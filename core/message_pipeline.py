@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+"""
+core/message_pipeline.py - Bounded, concurrent message processing with per-key ordering.
+Transports submit one job per incoming message together with an ordering key (the user
+or channel id). A fixed pool of worker tasks runs jobs concurrently, but jobs sharing a
+key run one at a time in arrival order, so a slow command only delays its own sender.
+When the queue is full, new messages are shed instead of piling up.
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+from core import metrics, tracing
+from core.config import PIPELINE_WORKERS, PIPELINE_MAX_QUEUE, PIPELINE_DRAIN_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+Job = Callable[[], Awaitable[None]]
+
+class MessagePipeline:
+    """
+    MessagePipeline - Worker pool with a bounded ingress queue and per-key sequential lanes.
+
+    Args:
+        workers (int): Number of concurrent worker tasks.
+        max_queue (int): Maximum number of jobs waiting to run (running jobs excluded).
+    """
+    def __init__(self, workers: int = PIPELINE_WORKERS, max_queue: int = PIPELINE_MAX_QUEUE):
+        self.workers = max(1, workers)
+        self.max_queue = max(1, max_queue)
+        self._lanes: Dict[str, Deque[Tuple[float, Job]]] = {}
+        self._ready: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._pending = 0
+        self._running = 0
+        self._accepting = False
+        self._changed: Optional[asyncio.Condition] = None
+
+    @property
+    def depth(self) -> int:
+        """
+        Number of jobs waiting to run.
+        """
+        return self._pending
+
+    def start(self) -> None:
+        """
+        Start the worker tasks. Must be called from within the running event loop.
+        """
+        if self._tasks:
+            return
+        self._ready = asyncio.Queue()
+        self._changed = asyncio.Condition()
+        self._accepting = True
+        self._tasks = [
+            asyncio.create_task(self._worker(), name=f"pipeline-worker-{i}")
+            for i in range(self.workers)
+        ]
+
+    def submit(self, key: str, job: Job) -> bool:
+        """
+        Enqueue job behind any earlier jobs with the same key.
+
+        Returns:
+            bool: True if accepted, False if the job was shed (queue full or pipeline stopping).
+        """
+        if not self._accepting or self._pending >= self.max_queue:
+            metrics.increment_pipeline_shed_count()
+            logger.warning(f"Message pipeline full ({self._pending} queued); shedding message for key {key!r}.")
+            return False
+        lane = self._lanes.get(key)
+        if lane is None:
+            lane = self._lanes[key] = deque()
+            # A key is placed on the ready queue only when its lane becomes non-empty,
+            # so at most one worker ever runs jobs for a given key.
+            self._ready.put_nowait(key)
+        lane.append((time.monotonic(), job))
+        self._pending += 1
+        metrics.set_pipeline_queue_depth(self._pending)
+        return True
+
+    async def submit_wait(self, key: str, job: Job, timeout: Optional[float] = None) -> bool:
+        """
+        Like submit(), but wait up to timeout seconds for queue space instead of shedding.
+        """
+        async def _wait_for_space():
+            async with self._changed:
+                await self._changed.wait_for(lambda: self._pending < self.max_queue or not self._accepting)
+        try:
+            await asyncio.wait_for(_wait_for_space(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return self.submit(key, job)
+
+    async def stop(self, timeout: float = PIPELINE_DRAIN_TIMEOUT) -> None:
+        """
+        Stop accepting jobs, wait up to timeout seconds for queued and running jobs
+        to finish, then cancel the workers.
+        """
+        if not self._tasks:
+            return
+        self._accepting = False
+        async with self._changed:
+            self._changed.notify_all()
+        try:
+            async def _drained():
+                async with self._changed:
+                    await self._changed.wait_for(lambda: self._pending == 0 and self._running == 0)
+            await asyncio.wait_for(_drained(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Message pipeline drain timed out with {self._pending} job(s) still queued.")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _worker(self) -> None:
+        while True:
+            key = await self._ready.get()
+            lane = self._lanes[key]
+            enqueued_at, job = lane.popleft()
+            self._pending -= 1
+            self._running += 1
+            metrics.set_pipeline_queue_depth(self._pending)
+            waited = time.monotonic() - enqueued_at
+            metrics.record_pipeline_wait(waited)
+            try:
+                with tracing.trace(key) as t:
+                    t.add("queue", waited, offset=-waited)
+                    await job()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.exception(f"Unhandled error processing message for key {key!r}: {e}")
+            finally:
+                self._running -= 1
+                if lane:
+                    self._ready.put_nowait(key)
+                else:
+                    del self._lanes[key]
+                async with self._changed:
+                    self._changed.notify_all()
+
+# End of core/message_pipeline.py
@@ -1,33 +1,530 @@
 """
-core/metrics.py - Metrics tracking for the Signal bot.
-Tracks process uptime and number of messages sent.
+core/metrics.py - Metrics registry for the Signal bot.
+Counters, gauges, and fixed-bucket histograms, optionally labelled, collected in a
+registry that renders the Prometheus text exposition format. start_http_server()
+serves it at /metrics from a small local HTTP server.
+
+Each labelled series is a separate child object with its own lock, so updates to
+different series never contend and an update costs one uncontended lock acquisition.
+Look a child up once with labels() when it is updated in a hot loop.
+
+The bot's own metrics are defined at the bottom of this module, followed by the
+helper functions older call sites use (increment_message_count, get_pipeline_stats,
+and so on).
+
+Usage Example:
+    with metrics.timed(metrics.COMMAND_LATENCY, metrics.COMMANDS, command="help") as labels:
+        ...                             # labels["outcome"] defaults to "ok" or "error"
+    metrics.PIPELINE_QUEUE_DEPTH.set(3)
+    text = metrics.REGISTRY.exposition()
 """
 
+import bisect
+import math
+import threading
 import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if value == -math.inf:
+        return "-Inf"
+    if isinstance(value, float) and value.is_integer():
+        return f"{value:.1f}"
+    return repr(value)
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape_label(v)}"' for k, v in labels.items()) + "}"
+
+class _CounterChild:
+    __slots__ = ("_value", "_lock")
+
+    def __init__(self):
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1) -> None:
+        if amount < 0:
+            raise ValueError("Counters can only increase.")
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+class _GaugeChild:
+    __slots__ = ("_value", "_lock")
+
+    def __init__(self):
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def set(self, value: float) -> None:
+        self._value = float(value)
+
+    def inc(self, amount: float = 1) -> None:
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount: float = 1) -> None:
+        self.inc(-amount)
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+class _HistogramChild:
+    __slots__ = ("_upper", "_counts", "_sum", "_lock")
+
+    def __init__(self, upper: Tuple[float, ...]):
+        self._upper = upper
+        self._counts = [0] * (len(upper) + 1)  # last slot is +Inf
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        i = bisect.bisect_left(self._upper, value)
+        with self._lock:
+            self._counts[i] += 1
+            self._sum += value
+
+    @contextmanager
+    def time(self):
+        """
+        Observe the duration of the with-block in seconds.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    @property
+    def count(self) -> int:
+        return sum(self._counts)
+
+    @property
+    def sum(self) -> float:
+        return self._sum
+
+    def buckets(self) -> List[Tuple[float, int]]:
+        """
+        Return (upper bound, cumulative count) pairs, ending with +Inf.
+        """
+        with self._lock:
+            counts = list(self._counts)
+        result, total = [], 0
+        for bound, n in zip(self._upper + (math.inf,), counts):
+            total += n
+            result.append((bound, total))
+        return result
+
+    def quantile(self, q: float) -> float:
+        """
+        Estimate the q-quantile (0 < q <= 1) of the observations; see quantile_from_buckets.
+        """
+        return quantile_from_buckets(self.buckets(), q)
+
+def quantile_from_buckets(buckets: Sequence[Tuple[float, int]], q: float) -> float:
+    """
+    Estimate the q-quantile from (upper bound, cumulative count) pairs ending with +Inf,
+    by linear interpolation within its bucket as Prometheus' histogram_quantile does.
+    Returns 0.0 with no observations.
+    """
+    total = buckets[-1][1] if buckets else 0
+    if total == 0:
+        return 0.0
+    rank = q * total
+    lower, below = 0.0, 0
+    for bound, cumulative in buckets:
+        if cumulative >= rank:
+            if bound == math.inf:
+                return lower
+            in_bucket = cumulative - below
+            return lower + (bound - lower) * ((rank - below) / in_bucket if in_bucket else 0.0)
+        lower, below = bound, cumulative
+    return lower
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 registry: Optional["Registry"] = None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        self._unlabelled = None if self.labelnames else self.labels()
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values, **kwargs):
+        """
+        Return the series for the given label values (positional, or by label name).
+        """
+        if kwargs:
+            try:
+                key = tuple(str(kwargs[n]) for n in self.labelnames)
+            except KeyError as e:
+                raise ValueError(f"Metric {self.name} is missing label {e.args[0]!r}.")
+            if len(kwargs) != len(self.labelnames):
+                raise ValueError(f"Metric {self.name} takes labels {self.labelnames}, got {tuple(kwargs)}.")
+        else:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"Metric {self.name} takes labels {self.labelnames}, got {values}.")
+            key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def series(self) -> Iterator[Tuple[Dict[str, str], object]]:
+        for key, child in list(self._children.items()):
+            yield dict(zip(self.labelnames, key)), child
+
+    def clear(self) -> None:
+        """
+        Drop every labelled series (used by tests).
+        """
+        with self._lock:
+            self._children.clear()
+            if not self.labelnames:
+                self._unlabelled = self._children[()] = self._new_child()
+
+    def samples(self) -> Iterator[Tuple[str, Dict[str, str], float]]:
+        for labels, child in self.series():
+            yield self.name, labels, child.value
+
+class Counter(_Metric):
+    """
+    Counter - Monotonically increasing value, e.g. requests handled.
+    """
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1) -> None:
+        self._unlabelled.inc(amount)
+
+    @property
+    def value(self) -> float:
+        return self._unlabelled.value
+
+    def total(self) -> float:
+        """
+        Sum of the counter over all label values.
+        """
+        return sum(child.value for _, child in self.series())
+
+class Gauge(_Metric):
+    """
+    Gauge - Value that goes up and down, e.g. queue depth.
+    """
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value: float) -> None:
+        self._unlabelled.set(value)
+
+    def inc(self, amount: float = 1) -> None:
+        self._unlabelled.inc(amount)
+
+    def dec(self, amount: float = 1) -> None:
+        self._unlabelled.dec(amount)
+
+    @property
+    def value(self) -> float:
+        return self._unlabelled.value
+
+class Histogram(_Metric):
+    """
+    Histogram - Distribution of observed values (usually seconds) over fixed buckets.
+
+    Args:
+        buckets (Sequence[float]): Upper bounds; +Inf is added automatically.
+    """
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS, registry: Optional["Registry"] = None):
+        self._upper = tuple(sorted(b for b in buckets if b != math.inf))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramChild(self._upper)
+
+    def observe(self, value: float) -> None:
+        self._unlabelled.observe(value)
+
+    def time(self):
+        return self._unlabelled.time()
+
+    def samples(self) -> Iterator[Tuple[str, Dict[str, str], float]]:
+        for labels, child in self.series():
+            for bound, cumulative in child.buckets():
+                yield f"{self.name}_bucket", {**labels, "le": _format_value(float(bound))}, cumulative
+            yield f"{self.name}_sum", labels, child.sum
+            yield f"{self.name}_count", labels, child.count
+
+class Registry:
+    """
+    Registry - Named collection of metrics rendered together.
+    """
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> None:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered.")
+            self._metrics[metric.name] = metric
+
+    def unregister(self, metric: _Metric) -> None:
+        with self._lock:
+            self._metrics.pop(metric.name, None)
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def exposition(self) -> str:
+        """
+        Render every metric in the Prometheus text exposition format (version 0.0.4).
+        """
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+REGISTRY = Registry()
+
+@contextmanager
+def timed(histogram: Histogram, counter: Optional[Counter] = None, **labels):
+    """
+    Time the with-block into histogram and count it in counter, both labelled with
+    labels plus "outcome". The yielded dict holds the labels; the block may change
+    them, e.g. labels["outcome"] = "denied". Outcome defaults to "ok", or "error"
+    if the block raises.
+    """
+    start = time.perf_counter()
+    try:
+        yield labels
+    except BaseException:
+        labels.setdefault("outcome", "error")
+        raise
+    finally:
+        labels.setdefault("outcome", "ok")
+        histogram.labels(**labels).observe(time.perf_counter() - start)
+        if counter is not None:
+            counter.labels(**labels).inc()
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry: Registry = REGISTRY
+
+    def do_GET(self):
+        if self.path.split("?", 1)[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = self.registry.exposition().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_http_server(port: int, host: str = "127.0.0.1", registry: Optional[Registry] = None) -> ThreadingHTTPServer:
+    """
+    Serve the registry at http://host:port/metrics from a daemon thread.
+    Pass port 0 to pick a free port (see server.server_address). Call
+    server.shutdown() to stop it.
+    """
+    handler = type("MetricsHandler", (_MetricsHandler,), {"registry": registry or REGISTRY})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+# === Bot metrics ===
 
 process_start_time = time.time()
-messages_sent = 0
-discord_messages_processed = 0
+
+PROCESS_START_TIME = Gauge("bot_process_start_time_seconds", "Unix time the process started.")
+PROCESS_START_TIME.set(process_start_time)
+
+MESSAGES_RECEIVED = Counter(
+    "bot_messages_received_total", "Messages received from chat users.", ["transport"])
+MESSAGES_PROCESSED = Counter(
+    "bot_messages_processed_total", "Messages handled by MessageManager.", ["route", "outcome"])
+MESSAGE_LATENCY = Histogram(
+    "bot_message_duration_seconds", "Time MessageManager spent on a message.", ["route", "outcome"])
+COMMANDS = Counter(
+    "bot_commands_total", "Plugin commands dispatched.", ["command", "outcome"])
+COMMAND_LATENCY = Histogram(
+    "bot_command_duration_seconds", "Time to dispatch and run a plugin command.", ["command", "outcome"])
+DB_QUERIES = Counter(
+    "bot_db_queries_total", "SQL statements run through execute_sql.", ["operation", "outcome"])
+DB_QUERY_LATENCY = Histogram(
+    "bot_db_query_duration_seconds", "Time to run a SQL statement through execute_sql.", ["operation", "outcome"])
+MESSAGES_SENT = Counter(
+    "bot_messages_sent_total", "Messages sent by the transport.", ["transport", "outcome"])
+SEND_LATENCY = Histogram(
+    "bot_send_duration_seconds", "Time for the transport to send one message.", ["transport", "outcome"])
+
+PIPELINE_QUEUE_DEPTH = Gauge(
+    "bot_pipeline_queue_depth", "Messages waiting in the message pipeline.")
+PIPELINE_SHED = Counter(
+    "bot_pipeline_shed_total", "Messages dropped because the pipeline queue was full.")
+PIPELINE_WAIT = Histogram(
+    "bot_pipeline_wait_seconds", "Time a message waited in the pipeline before a worker picked it up.")
+
+OUTBOUND_QUEUE_DEPTH = Gauge(
+    "bot_outbound_queue_depth", "Message chunks waiting in the outbound scheduler.")
+OUTBOUND_MERGED = Counter(
+    "bot_outbound_merged_total", "Queued replies folded into an earlier send to the same channel.")
+OUTBOUND_RATE_LIMITED = Counter(
+    "bot_outbound_rate_limited_total", "Sends rejected with a rate limit and retried.")
+
+OUTBOUND_EDITS = Counter(
+    "bot_outbound_edits_total", "Edits of a sent message while its reply was streamed.")
+
+LOOP_LAG = Histogram(
+    "bot_event_loop_lag_seconds", "How late the loop monitor's heartbeat woke up.",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0))
+LOOP_LAG_LAST = Gauge(
+    "bot_event_loop_lag_last_seconds", "Lag measured by the most recent heartbeat.")
+LOOP_BLOCKS = Counter(
+    "bot_event_loop_blocks_total", "Times the event loop was blocked longer than the threshold.", ["plugin"])
+LOOP_BLOCK_DURATION = Histogram(
+    "bot_event_loop_block_duration_seconds", "How long the event loop stayed blocked.")
+
+CHAT_REQUESTS = Counter(
+    "bot_chat_requests_total", "Chat prompts by how they were answered.", ["outcome"])
+CHAT_LATENCY = Histogram(
+    "bot_chat_upstream_duration_seconds", "Time for an upstream chat completion.", ["outcome"])
+
+# === Helpers for existing call sites ===
+
+def __getattr__(name: str):
+    # Former module-level counters, now read from the registry.
+    if name == "messages_sent":
+        return int(sum(child.value for labels, child in MESSAGES_SENT.series() if labels["outcome"] == "ok"))
+    if name == "discord_messages_processed":
+        return int(MESSAGES_RECEIVED.labels(transport="discord").value)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 def increment_discord_message_count() -> None:
     """
     Increment the count of Discord messages processed.
     """
-    global discord_messages_processed
-    discord_messages_processed += 1
+    MESSAGES_RECEIVED.labels(transport="discord").inc()
 
 def get_discord_messages_processed() -> int:
     """
     Return the number of Discord messages processed.
     """
-    return discord_messages_processed
+    return int(MESSAGES_RECEIVED.labels(transport="discord").value)
 
 def increment_message_count() -> None:
     """
-    Increment the count of messages sent.
+    Increment the count of messages sent (for senders not instrumented with timed()).
+    """
+    MESSAGES_SENT.labels(transport="other", outcome="ok").inc()
+
+def set_pipeline_queue_depth(depth: int) -> None:
+    """
+    Record the number of messages currently waiting in the message pipeline.
+    """
+    PIPELINE_QUEUE_DEPTH.set(depth)
+
+def record_pipeline_wait(seconds: float) -> None:
+    """
+    Record how long a message waited in the pipeline before a worker picked it up.
+    """
+    PIPELINE_WAIT.observe(seconds)
+
+def increment_pipeline_shed_count() -> None:
+    """
+    Increment the count of messages dropped because the pipeline queue was full.
+    """
+    PIPELINE_SHED.inc()
+
+def get_pipeline_stats() -> dict:
+    """
+    Return queue depth, shed count, and mean/p99 wait time of the message pipeline.
+    """
+    wait = PIPELINE_WAIT.labels()
+    completed = wait.count
+    return {
+        "queue_depth": int(PIPELINE_QUEUE_DEPTH.value),
+        "shed": int(PIPELINE_SHED.value),
+        "completed": completed,
+        "mean_wait_seconds": wait.sum / completed if completed else 0.0,
+        "p99_wait_seconds": wait.quantile(0.99),
+    }
+
+def set_outbound_queue_depth(depth: int) -> None:
+    """
+    Record the number of message chunks waiting in the outbound scheduler.
+    """
+    OUTBOUND_QUEUE_DEPTH.set(depth)
+
+def increment_outbound_merged_count(count: int = 1) -> None:
+    """
+    Increment the count of queued messages folded into an earlier send to the same channel.
+    """
+    OUTBOUND_MERGED.inc(count)
+
+def increment_outbound_rate_limited_count() -> None:
+    """
+    Increment the count of sends rejected with a rate limit and retried.
+    """
+    OUTBOUND_RATE_LIMITED.inc()
+
+def increment_outbound_edit_count() -> None:
+    """
+    Increment the count of edits made to a message while streaming a reply into it.
+    """
+    OUTBOUND_EDITS.inc()
+
+def get_outbound_stats() -> dict:
+    """
+    Return queue depth, sent, merged, and rate-limited counts of the outbound scheduler.
     """
-    global messages_sent
-    messages_sent += 1
+    return {
+        "queue_depth": int(OUTBOUND_QUEUE_DEPTH.value),
+        "sent": __getattr__("messages_sent"),
+        "merged": int(OUTBOUND_MERGED.value),
+        "rate_limited": int(OUTBOUND_RATE_LIMITED.value),
+        "edits": int(OUTBOUND_EDITS.value),
+    }
 
 def get_uptime() -> float:
     """
@@ -35,4 +532,4 @@ def get_uptime() -> float:
     """
     return time.time() - process_start_time
 
-# End of core/metrics.py
\ No newline at end of file
+# End of core/metrics.py
@@ -0,0 +1,408 @@
+#!/usr/bin/env python
+"""
+core/outbound.py - Rate-limit-aware outbound message scheduler.
+Replies are queued per channel and sent by one task per busy channel, paced by a
+per-channel token bucket and a global one so sends stay under the platform's limits
+instead of running into HTTP 429s. Replies longer than OUTBOUND_MAX_CHARS are split at
+line or word boundaries. Short replies go ahead of the chunks of long ones, and while
+a channel waits for a token, replies queued behind each other are merged into a single
+send, so bursts cost fewer requests. A send rejected with a rate limit is retried after
+the delay the platform asks for. Replies produced in parts can be streamed: a
+placeholder is posted and edited as text arrives, at a pace the channel's budget allows.
+
+Usage Example:
+    scheduler = OutboundScheduler(transport_send)
+    await scheduler.send(ctx.channel, reply)   # returns once every chunk is delivered
+    await scheduler.stream(ctx.channel, parts, edit=transport.edit_message)
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+from core import metrics
+from core.config import (
+    OUTBOUND_MAX_CHARS,
+    OUTBOUND_CHANNEL_BURST,
+    OUTBOUND_CHANNEL_PERIOD,
+    OUTBOUND_GLOBAL_LIMIT,
+    OUTBOUND_MAX_RETRIES,
+    OUTBOUND_EDIT_INTERVAL_MS,
+)
+
+logger = logging.getLogger(__name__)
+
+HIGH = 0  # Replies that fit in one message
+BULK = 1  # Chunks of long replies and messages with files
+
+# Idle channels are forgotten once this many are tracked and their bucket has refilled.
+_MAX_IDLE_CHANNELS = 1024
+
+# send(target, content, files) delivers one message through the transport and
+# returns what the transport returns for it (e.g. the sent message).
+Sender = Callable[[Any, str, Optional[list]], Awaitable[Any]]
+# edit(message, content) replaces the text of a message returned by a Sender.
+Editor = Callable[[Any, str], Awaitable[Any]]
+
+# Texts shown by a streamed reply before its first part, when it produced nothing,
+# and after it failed part-way.
+STREAM_PLACEHOLDER = "…"
+STREAM_EMPTY = "(no reply)"
+STREAM_INTERRUPTED = "(reply interrupted)"
+
+def split_message(text: str, limit: int = OUTBOUND_MAX_CHARS) -> List[str]:
+    """
+    Split text into chunks of at most limit characters, breaking at the last newline
+    or, failing that, the last space before the limit. The separator at a break is
+    dropped; a word longer than limit is cut.
+    """
+    chunks = []
+    while len(text) > limit:
+        cut = text.rfind("\n", 0, limit + 1)
+        if cut <= 0:
+            cut = text.rfind(" ", 0, limit + 1)
+        if cut <= 0:
+            chunks.append(text[:limit])
+            text = text[limit:]
+        else:
+            chunks.append(text[:cut])
+            text = text[cut + 1:]
+    if text or not chunks:
+        chunks.append(text)
+    return chunks
+
+def channel_key(target: Any) -> Any:
+    """
+    Return the value identifying target's channel: its id attribute, or target itself.
+    """
+    return getattr(target, "id", target)
+
+class TokenBucket:
+    """
+    TokenBucket - Allows capacity operations at once, refilled at rate per second.
+
+    Args:
+        rate (float): Tokens added per second.
+        capacity (float): Maximum tokens held (the burst size).
+        clock (callable): Monotonic time source, replaceable in tests.
+    """
+    def __init__(self, rate: float, capacity: float, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._tokens = capacity
+        self._updated = clock()
+        self._paused_until = 0.0
+
+    def _refill(self) -> float:
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        return now
+
+    def delay(self) -> float:
+        """
+        Seconds until a token is available (0 if one is available now).
+        """
+        now = self._refill()
+        wait = max(0.0, self._paused_until - now)
+        if self._tokens < 1:
+            wait = max(wait, (1 - self._tokens) / self.rate)
+        return wait
+
+    @property
+    def full(self) -> bool:
+        self._refill()
+        return self._tokens >= self.capacity and self._clock() >= self._paused_until
+
+    def take(self) -> None:
+        self._tokens -= 1
+
+    def pause(self, seconds: float) -> None:
+        """
+        Hand out no tokens for the next seconds, e.g. after the server reports a rate limit.
+        """
+        self._paused_until = max(self._paused_until, self._clock() + seconds)
+        self._tokens = min(self._tokens, 1.0)
+
+    async def acquire(self) -> None:
+        """
+        Wait for a token and take it.
+        """
+        while True:
+            wait = self.delay()
+            if wait <= 0:
+                self.take()
+                return
+            await asyncio.sleep(wait)
+
+@dataclass
+class _Message:
+    future: asyncio.Future
+    remaining: int
+
+@dataclass
+class _Item:
+    text: str
+    message: _Message
+    files: Optional[list] = None
+
+class _Channel:
+    __slots__ = ("target", "lanes", "bucket", "task")
+
+    def __init__(self, target: Any, bucket: TokenBucket):
+        self.target = target
+        self.lanes: Tuple[Deque[_Item], Deque[_Item]] = (deque(), deque())
+        self.bucket = bucket
+        self.task: Optional[asyncio.Task] = None
+
+    def idle(self) -> bool:
+        return self.task is None and not self.lanes[HIGH] and not self.lanes[BULK]
+
+class OutboundScheduler:
+    """
+    OutboundScheduler - Per-channel send queues with pacing, chunking, merging, and priority.
+
+    Args:
+        send (Sender): Delivers one message: send(target, content, files).
+        max_chars (int): Longest message sent in one piece.
+        channel_burst (int): Sends allowed at once per channel.
+        channel_period (float): Seconds in which channel_burst sends are allowed.
+        global_limit (int): Sends per second across all channels.
+        max_retries (int): Retries of a send rejected with a rate limit.
+    """
+    def __init__(self, send: Sender, max_chars: int = OUTBOUND_MAX_CHARS,
+                 channel_burst: int = OUTBOUND_CHANNEL_BURST,
+                 channel_period: float = OUTBOUND_CHANNEL_PERIOD,
+                 global_limit: int = OUTBOUND_GLOBAL_LIMIT,
+                 max_retries: int = OUTBOUND_MAX_RETRIES):
+        self._send = send
+        self.max_chars = max(1, max_chars)
+        self.channel_burst = max(1, channel_burst)
+        self.channel_period = channel_period
+        self.max_retries = max_retries
+        self._global = TokenBucket(max(1, global_limit), max(1, global_limit))
+        self._channels: Dict[Any, _Channel] = {}
+        self._pending = 0
+
+    @property
+    def depth(self) -> int:
+        """
+        Number of message chunks waiting to be sent.
+        """
+        return self._pending
+
+    def enqueue(self, target: Any, content: str, files: Optional[list] = None,
+                priority: Optional[int] = None) -> asyncio.Future:
+        """
+        Queue content for target and return a future that completes once every chunk
+        has been sent, or fails with the error of the send that failed.
+
+        Args:
+            priority (int, optional): HIGH or BULK. By default replies that fit in one
+                message without files are HIGH and everything else is BULK.
+        """
+        chunks = split_message(content, self.max_chars)
+        if priority is None:
+            priority = HIGH if len(chunks) == 1 and not files else BULK
+        future = asyncio.get_running_loop().create_future()
+        message = _Message(future, len(chunks))
+        channel = self._channel(target)
+        lane = channel.lanes[priority]
+        for i, chunk in enumerate(chunks):
+            lane.append(_Item(chunk, message, files if i == len(chunks) - 1 else None))
+        self._pending += len(chunks)
+        metrics.set_outbound_queue_depth(self._pending)
+        if channel.task is None:
+            channel.task = asyncio.create_task(self._run(channel))
+        return future
+
+    async def send(self, target: Any, content: str, files: Optional[list] = None,
+                   priority: Optional[int] = None) -> None:
+        """
+        Queue content for target and wait until it has been sent.
+        """
+        await self.enqueue(target, content, files, priority)
+
+    async def drain(self, timeout: Optional[float] = None) -> None:
+        """
+        Wait up to timeout seconds for every queued message to be sent.
+        """
+        tasks = [c.task for c in self._channels.values() if c.task is not None]
+        if tasks:
+            await asyncio.wait(tasks, timeout=timeout)
+
+    def _channel(self, target: Any) -> _Channel:
+        key = channel_key(target)
+        channel = self._channels.get(key)
+        if channel is None:
+            if len(self._channels) >= _MAX_IDLE_CHANNELS:
+                for k in [k for k, c in self._channels.items() if c.idle() and c.bucket.full]:
+                    del self._channels[k]
+            bucket = TokenBucket(self.channel_burst / self.channel_period, self.channel_burst)
+            channel = self._channels[key] = _Channel(target, bucket)
+        return channel
+
+    async def _run(self, channel: _Channel) -> None:
+        try:
+            while channel.lanes[HIGH] or channel.lanes[BULK]:
+                await channel.bucket.acquire()
+                await self._global.acquire()
+                # Taken after waiting for tokens, so replies queued meanwhile are merged.
+                batch = self._take_batch(channel)
+                if batch:
+                    await self._deliver(channel, batch)
+        finally:
+            channel.task = None
+
+    def _take_batch(self, channel: _Channel) -> List[_Item]:
+        """
+        Pop the next item and any that can be merged with it into one message.
+        Chunks of messages that already failed or were cancelled are discarded.
+        """
+        batch: List[_Item] = []
+        size = -1
+        for lane in channel.lanes:
+            while lane:
+                item = lane[0]
+                if item.message.future.done():
+                    lane.popleft()
+                    self._pending -= 1
+                    continue
+                if batch and (batch[-1].files or item.files or size + 1 + len(item.text) > self.max_chars):
+                    break
+                lane.popleft()
+                self._pending -= 1
+                batch.append(item)
+                size += 1 + len(item.text)
+            if batch:
+                break
+        metrics.set_outbound_queue_depth(self._pending)
+        return batch
+
+    async def _deliver(self, channel: _Channel, batch: List[_Item]) -> None:
+        text = "\n".join(item.text for item in batch)
+        files = batch[-1].files
+        try:
+            await self._retrying(channel, lambda: self._send(channel.target, text, files))
+        except Exception as e:
+            logger.warning(f"Send to channel {channel_key(channel.target)!r} failed: {e}")
+            for item in batch:
+                if not item.message.future.done():
+                    item.message.future.set_exception(e)
+            return
+        if len(batch) > 1:
+            metrics.increment_outbound_merged_count(len(batch) - 1)
+        for item in batch:
+            item.message.remaining -= 1
+            if item.message.remaining == 0 and not item.message.future.done():
+                item.message.future.set_result(None)
+
+    async def _retrying(self, channel: _Channel, call: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Return the result of call(), retrying it after the delay the platform asks for
+        while it is rejected with a rate limit, at most max_retries times.
+        """
+        attempt = 0
+        while True:
+            try:
+                return await call()
+            except Exception as e:
+                retry_after = _retry_after(e)
+                if retry_after is None or attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                metrics.increment_outbound_rate_limited_count()
+                logger.info(f"Rate limited on channel {channel_key(channel.target)!r}; retrying in {retry_after:.2f}s.")
+                channel.bucket.pause(retry_after)
+                await channel.bucket.acquire()
+
+    async def _paced(self, channel: _Channel, call: Callable[[], Awaitable[Any]]) -> Any:
+        await channel.bucket.acquire()
+        await self._global.acquire()
+        return await self._retrying(channel, call)
+
+    async def stream(self, target: Any, parts: AsyncIterator[str], edit: Optional[Editor] = None,
+                     placeholder: str = STREAM_PLACEHOLDER,
+                     interval: float = OUTBOUND_EDIT_INTERVAL_MS / 1000) -> None:
+        """
+        Deliver a reply that arrives in parts. With edit, a placeholder is posted at once
+        and edited to show the text received so far, at most once every interval seconds
+        and within the channel's send budget; text past max_chars continues in a new
+        message. Without edit, the parts are collected and sent as one reply at the end.
+
+        If parts raises, the message is finished with what was received and the error
+        is re-raised.
+        """
+        if edit is None:
+            text = "".join([part async for part in parts])
+            if text:
+                await self.send(target, text)
+            return
+        channel = self._channel(target)
+        handle = await self._paced(channel, lambda: self._send(target, placeholder, None))
+        shown, text = placeholder, ""
+        last_edit = time.monotonic()
+        try:
+            async for part in parts:
+                text += part
+                while len(text) > self.max_chars:
+                    head = split_message(text, self.max_chars)[0]
+                    text = text[len(head):].lstrip()
+                    await self._edit(channel, edit, handle, head)
+                    shown = text or placeholder
+                    handle = await self._paced(channel, lambda body=shown: self._send(target, body, None))
+                    last_edit = time.monotonic()
+                if text and text != shown and time.monotonic() - last_edit >= interval:
+                    await self._edit(channel, edit, handle, text)
+                    shown, last_edit = text, time.monotonic()
+        except Exception:
+            text = f"{text}\n\n{STREAM_INTERRUPTED}" if text else STREAM_INTERRUPTED
+            if text != shown:
+                await self._edit(channel, edit, handle, text[:self.max_chars])
+            raise
+        finally:
+            aclose = getattr(parts, "aclose", None)
+            if aclose is not None:
+                await aclose()
+        text = text or STREAM_EMPTY
+        if text != shown:
+            await self._edit(channel, edit, handle, text)
+
+    async def _edit(self, channel: _Channel, edit: Editor, handle: Any, text: str) -> None:
+        await self._paced(channel, lambda: edit(handle, text))
+        metrics.increment_outbound_edit_count()
+
+_default: Optional[OutboundScheduler] = None
+
+def set_default_scheduler(scheduler: Optional[OutboundScheduler]) -> None:
+    """
+    Make scheduler the one send_files() uses; the orchestrator registers its own.
+    """
+    global _default
+    _default = scheduler
+
+async def send_files(target: Any, content: str, files: list) -> None:
+    """
+    Send files to target through the running bot's scheduler, for plugins that
+    deliver attachments in addition to their text reply.
+    """
+    if _default is None:
+        raise RuntimeError("No outbound scheduler is running.")
+    await _default.send(target, content, files)
+
+def _retry_after(error: Exception) -> Optional[float]:
+    """
+    Return the delay a rate-limit error asks for, or None if error is not a rate limit.
+    """
+    retry_after = getattr(error, "retry_after", None)
+    if retry_after is not None:
+        return float(retry_after)
+    if getattr(error, "status", None) == 429:
+        return 1.0
+    return None
+
+# End of core/outbound.py
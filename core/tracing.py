@@ -0,0 +1,284 @@
+#!/usr/bin/env python
+"""
+core/tracing.py - Per-message latency spans and a slow-command profiler.
+The message pipeline opens a Trace for each message it runs. Code on the message's
+path marks its stages with span("parse"), span("flow_check"), span("plugin"), and so
+on. Each span records its wall time and the event-loop lag it caused, which is the
+time before the loop got control back. A span that never awaits blocks the loop for
+its whole duration. The trace is carried in a context variable, so nothing has to be
+passed down explicitly. Outside a trace, span() does nothing.
+
+When a traced message takes longer than TRACE_SLOW_THRESHOLD_MS, its span breakdown
+is logged and kept in the slow log. Its command is then armed: the next
+TRACE_PROFILE_RUNS invocations of that plugin run under cProfile, and the profile is
+kept for the admin "perf" command. The profiler follows the whole loop thread while
+the plugin awaits, so other work interleaved with it also appears in the profile.
+
+Usage Example:
+    with tracing.span("plugin"), tracing.profiled(canonical):
+        response = await plugin_func(args, ctx, state_machine)
+"""
+
+import asyncio
+import cProfile
+import io
+import logging
+import pstats
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Deque, Dict, List, Optional, Tuple
+
+from core import metrics
+from core.config import (
+    TRACE_SLOW_THRESHOLD_MS,
+    TRACE_SLOW_LOG_SIZE,
+    TRACE_PROFILE_RUNS,
+    TRACE_PROFILE_LINES,
+)
+
+logger = logging.getLogger(__name__)
+
+# A command that is slow again is profiled again once its last profile is this old.
+_PROFILE_REFRESH_SECONDS = 300
+
+@dataclass
+class Span:
+    name: str
+    offset: float     # Seconds from the start of the trace
+    duration: float   # Wall time in seconds
+    loop_lag: float   # Seconds before the event loop regained control
+
+@dataclass
+class Trace:
+    label: str
+    started: float = field(default_factory=time.perf_counter)
+    wall_started: float = field(default_factory=time.time)
+    command: Optional[str] = None
+    spans: List[Span] = field(default_factory=list)
+    duration: Optional[float] = None
+
+    def add(self, name: str, duration: float, loop_lag: float = 0.0, offset: Optional[float] = None) -> None:
+        """
+        Record a stage measured elsewhere, e.g. time spent queued before the trace began.
+        """
+        if offset is None:
+            offset = time.perf_counter() - self.started - duration
+        self.spans.append(Span(name, offset, duration, loop_lag))
+
+    @property
+    def loop_lag(self) -> float:
+        return sum(s.loop_lag for s in self.spans)
+
+    def summary(self) -> str:
+        """
+        One line: command, total time, and each span with the lag it caused.
+        """
+        total = self.duration if self.duration is not None else time.perf_counter() - self.started
+        parts = ", ".join(
+            f"{s.name} {s.duration * 1000:.1f}ms" + (f" (lag {s.loop_lag * 1000:.1f}ms)" if s.loop_lag >= 0.001 else "")
+            for s in self.spans
+        )
+        return f"{self.command or self.label} {total * 1000:.1f}ms: {parts}"
+
+_current: ContextVar[Optional[Trace]] = ContextVar("trace", default=None)
+
+def current_trace() -> Optional[Trace]:
+    return _current.get()
+
+@contextmanager
+def trace(label: str = ""):
+    """
+    Open a Trace for the with-block, make it current, and hand it to the tracker when done.
+    """
+    t = Trace(label)
+    token = _current.set(t)
+    try:
+        yield t
+    finally:
+        _current.reset(token)
+        t.duration = time.perf_counter() - t.started
+        tracker.finish(t)
+
+class _LagProbe:
+    __slots__ = ("ran_at",)
+
+    def __init__(self):
+        self.ran_at: Optional[float] = None
+
+    def __call__(self) -> None:
+        self.ran_at = time.perf_counter()
+
+@contextmanager
+def span(name: str):
+    """
+    Time the with-block as a stage of the current trace. No-op without a trace.
+    """
+    t = _current.get()
+    if t is None:
+        yield
+        return
+    probe = None
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        loop = None
+    start = time.perf_counter()
+    if loop is not None:
+        probe = _LagProbe()
+        loop.call_soon(probe)
+    try:
+        yield
+    finally:
+        end = time.perf_counter()
+        if probe is None:
+            lag = 0.0
+        else:
+            lag = (probe.ran_at if probe.ran_at is not None else end) - start
+        t.spans.append(Span(name, start - t.started, end - start, lag))
+
+def set_command(command: str) -> None:
+    """
+    Name the plugin command the current trace is running, if there is a trace.
+    """
+    t = _current.get()
+    if t is not None:
+        t.command = command
+
+@contextmanager
+def profiled(command: str):
+    """
+    Run the with-block under cProfile if command is armed after a slow invocation.
+    """
+    profile = tracker.begin_profile(command)
+    if profile is None:
+        yield
+        return
+    try:
+        profile.enable()
+        yield
+    finally:
+        profile.disable()
+        tracker.end_profile(command, profile)
+
+@dataclass
+class CapturedProfile:
+    command: str
+    captured_at: float
+    text: str
+
+class SlowCommandTracker:
+    """
+    SlowCommandTracker - Keeps slow traces, worst times per command, and sampled profiles.
+
+    Args:
+        threshold (float): Seconds above which a trace counts as slow.
+        log_size (int): Number of recent slow traces kept.
+        profile_runs (int): Invocations profiled after a command is slow (0 disables profiling).
+        profile_lines (int): Rows of profile output kept, by cumulative time.
+    """
+    def __init__(self, threshold: float = TRACE_SLOW_THRESHOLD_MS / 1000.0,
+                 log_size: int = TRACE_SLOW_LOG_SIZE,
+                 profile_runs: int = TRACE_PROFILE_RUNS,
+                 profile_lines: int = TRACE_PROFILE_LINES):
+        self.threshold = threshold
+        self.profile_runs = profile_runs
+        self.profile_lines = profile_lines
+        self.slow: Deque[Trace] = deque(maxlen=max(1, log_size))
+        self.worst: Dict[str, Tuple[float, str]] = {}
+        self.profiles: Dict[str, Deque[CapturedProfile]] = {}
+        self._armed: Dict[str, int] = {}
+        self._profiling = False
+        self._lock = threading.Lock()
+
+    def finish(self, t: Trace) -> None:
+        if t.command is not None:
+            worst = self.worst.get(t.command)
+            if worst is None or t.duration > worst[0]:
+                self.worst[t.command] = (t.duration, t.summary())
+        if t.duration < self.threshold:
+            return
+        self.slow.append(t)
+        logger.warning(f"Slow message: {t.summary()}")
+        if t.command is not None and self.profile_runs > 0 and self._profile_stale(t.command):
+            with self._lock:
+                self._armed.setdefault(t.command, self.profile_runs)
+
+    def _profile_stale(self, command: str) -> bool:
+        captured = self.profiles.get(command)
+        return not captured or time.time() - captured[-1].captured_at > _PROFILE_REFRESH_SECONDS
+
+    def begin_profile(self, command: str) -> Optional[cProfile.Profile]:
+        """
+        Return a profiler if command is armed and no other profile is running, else None.
+        """
+        if not self._armed:
+            return None
+        with self._lock:
+            if self._profiling or self._armed.get(command, 0) <= 0:
+                return None
+            self._armed[command] -= 1
+            if self._armed[command] <= 0:
+                del self._armed[command]
+            self._profiling = True
+        return cProfile.Profile()
+
+    def end_profile(self, command: str, profile: cProfile.Profile) -> None:
+        try:
+            out = io.StringIO()
+            pstats.Stats(profile, stream=out).sort_stats("cumulative").print_stats(self.profile_lines)
+            captured = CapturedProfile(command, time.time(), out.getvalue())
+            self.profiles.setdefault(command, deque(maxlen=3)).append(captured)
+            logger.info(f"Captured profile of slow command '{command}'.")
+        finally:
+            with self._lock:
+                self._profiling = False
+
+    def arm(self, command: str, runs: int = 1) -> None:
+        """
+        Profile the next runs invocations of command regardless of their speed.
+        """
+        with self._lock:
+            self._armed[command] = self._armed.get(command, 0) + runs
+
+    def reset(self) -> None:
+        with self._lock:
+            self.slow.clear()
+            self.worst.clear()
+            self.profiles.clear()
+            self._armed.clear()
+
+tracker = SlowCommandTracker()
+
+def command_latency_summary() -> List[dict]:
+    """
+    Per-command latency from the COMMAND_LATENCY histogram (all outcomes combined),
+    slowest p99 first. Each entry has command, count, p50, p99, and max in seconds.
+    """
+    combined: Dict[str, List[Tuple[float, int]]] = {}
+    for labels, child in metrics.COMMAND_LATENCY.series():
+        buckets = child.buckets()
+        current = combined.get(labels["command"])
+        if current is None:
+            combined[labels["command"]] = buckets
+        else:
+            combined[labels["command"]] = [(b, n + m) for (b, n), (_, m) in zip(current, buckets)]
+    summary = []
+    for command, buckets in combined.items():
+        count = buckets[-1][1]
+        if not count:
+            continue
+        summary.append({
+            "command": command,
+            "count": count,
+            "p50": metrics.quantile_from_buckets(buckets, 0.5),
+            "p99": metrics.quantile_from_buckets(buckets, 0.99),
+            "max": tracker.worst.get(command, (None,))[0],
+        })
+    summary.sort(key=lambda row: row["p99"], reverse=True)
+    return summary
+
+# End of core/tracing.py
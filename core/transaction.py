@@ -4,9 +4,10 @@ core/transaction.py - Provides a context manager for atomic DB transactions.
 Ensures critical writes use SQLite's transaction locking.
 Changes:
  - Added an 'exclusive' parameter. If True, uses BEGIN EXCLUSIVE to force serialization.
+ - Connections now come from the shared pool in db.connection; close() returns them to it.
 """
 from contextlib import contextmanager
-from db.connection import get_connection
+from db.connection import get_pooled_connection
 
 @contextmanager
 def atomic_transaction(exclusive: bool = False):
@@ -20,7 +21,7 @@ def atomic_transaction(exclusive: bool = False):
     Yields:
         A SQLite connection with an active transaction.
     """
-    conn = get_connection()
+    conn = get_pooled_connection()
     try:
         if exclusive:
             conn.execute("BEGIN EXCLUSIVE")
@@ -3,11 +3,27 @@ from abc import ABC, abstractmethod
 class Transport(ABC):
     """
     Abstract base class for bot transport layers (Signal, Discord, etc).
+    Transports that can change a message after sending it set supports_edit and
+    implement edit_message; streamed replies are then edited in place.
     """
+    supports_edit = False
+
     @abstractmethod
     async def send_message(self, *args, **kwargs):
         pass
 
+    async def edit_message(self, message, content: str):
+        """
+        Replace the text of message, a value returned by send_message.
+        """
+        raise NotImplementedError(f"{type(self).__name__} cannot edit sent messages.")
+
     @abstractmethod
     async def receive_messages(self, *args, **kwargs):
         pass
+
+    async def stop(self):
+        """
+        Gracefully stop the transport, finishing in-flight messages. No-op by default.
+        """
+        pass
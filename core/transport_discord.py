@@ -1,16 +1,25 @@
 import os
 import asyncio
-import tempfile
-import shutil
+import logging
 from typing import Callable, Any, Awaitable, Optional
 
 import discord
 from discord import Intents, Message
 
 from core.transport import Transport
+from core.attachments import AttachmentHandle, AttachmentSet, close_http_session
+from core.message_pipeline import MessagePipeline
+from core.config import PIPELINE_ORDER_BY
+from core import metrics, tracing
+from core.utils.user_helpers import extract_user_id
 from parsers.message_parser import parse_message
 
+logger = logging.getLogger(__name__)
+
 class DiscordTransport(Transport):
+    name = "discord"
+    supports_edit = True
+
     def __init__(self):
         self.client = None
         self.token = os.getenv("DISCORD_TOKEN")
@@ -18,10 +27,12 @@ class DiscordTransport(Transport):
             raise RuntimeError("DISCORD_TOKEN not set in environment.")
         self._on_message = None
         self._running = False
+        self.pipeline = MessagePipeline()
 
     async def send_message(self, channel, content: str = "", files: Optional[list[str]] = None):
         """
         Send a message to a Discord channel. Accepts either a channel_id (int) or a discord.abc.Messageable object.
+        Returns the sent discord.Message.
         """
         if not self.client:
             raise RuntimeError("Discord client is not running.")
@@ -33,14 +44,22 @@ class DiscordTransport(Transport):
         else:
             channel_obj = channel
         discord_files = []
-        try:
-            if files:
-                for fpath in files:
-                    discord_files.append(discord.File(fpath))
-            await channel_obj.send(content=content, files=discord_files)
-        finally:
-            for f in discord_files:
-                f.close()
+        with metrics.timed(metrics.SEND_LATENCY, metrics.MESSAGES_SENT, transport=self.name):
+            try:
+                if files:
+                    for fpath in files:
+                        discord_files.append(discord.File(fpath))
+                return await channel_obj.send(content=content, files=discord_files)
+            finally:
+                for f in discord_files:
+                    f.close()
+
+    async def edit_message(self, message, content: str):
+        """
+        Replace the text of a discord.Message returned by send_message.
+        """
+        with tracing.span("edit"):
+            return await message.edit(content=content)
 
     async def receive_messages(self):
         """
@@ -54,7 +73,7 @@ class DiscordTransport(Transport):
             if msg.author.bot:
                 return
             parsed = parse_message(msg.content)
-            setattr(parsed, "attachments", [att.url for att in msg.attachments])
+            parsed.attachments = self._attachment_handles(msg)
             await queue.put(parsed)
 
         self.client.add_listener(_on_message, 'on_message')
@@ -62,31 +81,61 @@ class DiscordTransport(Transport):
             parsed = await queue.get()
             yield parsed
 
+    def _ordering_key(self, msg: Message) -> str:
+        """
+        Return the key whose messages must be handled sequentially (user or channel).
+        """
+        if PIPELINE_ORDER_BY == "channel" and getattr(msg, "channel", None) is not None:
+            return f"channel:{msg.channel.id}"
+        return f"user:{extract_user_id(msg)}"
+
+    @staticmethod
+    def _attachment_handles(msg: Message) -> AttachmentSet:
+        """
+        Wrap the message's attachments in lazy handles; nothing is downloaded here.
+        """
+        return AttachmentSet(
+            AttachmentHandle(att.filename, att.url, size=att.size, content_type=att.content_type)
+            for att in msg.attachments
+        )
+
+    async def _handle_message(self, msg: Message) -> None:
+        """
+        Parse and dispatch one message. Runs on a pipeline worker.
+        """
+        with tracing.span("parse"):
+            parsed = parse_message(msg.content)
+            parsed.attachments = self._attachment_handles(msg)
+        await self._on_message(parsed, msg)
+
     async def start(self, on_message: Callable[[Any, Message], Awaitable[None]]):
         intents = Intents.default()
         intents.message_content = True
         self.client = discord.Client(intents=intents)
         self._on_message = on_message
         self._running = True
+        self.pipeline.start()
 
         # Register event handlers (add more if needed later)
         @self.client.event
         async def on_message(msg: Message):
             if msg.author.bot:
                 return
-            temp_dir = tempfile.mkdtemp(prefix="discord_attach_")
-            attachment_paths = []
-            try:
-                for att in msg.attachments:
-                    save_path = os.path.join(temp_dir, att.filename)
-                    await att.save(save_path)
-                    attachment_paths.append(save_path)
-                parsed = parse_message(msg.content)
-                setattr(parsed, "attachments", attachment_paths)
-                await self._on_message(parsed, msg)
-            finally:
-                shutil.rmtree(temp_dir, ignore_errors=True)
+            metrics.MESSAGES_RECEIVED.labels(transport=self.name).inc()
+            # Hand the message to the pipeline so the gateway callback returns immediately;
+            # messages from the same user (or channel) still run in arrival order.
+            self.pipeline.submit(self._ordering_key(msg), lambda: self._handle_message(msg))
 
         # Future: register on_message_edit, on_message_delete here as needed
 
         await self.client.start(self.token)
+
+    async def stop(self):
+        """
+        Stop accepting messages, let queued ones finish, then disconnect from Discord.
+        """
+        self._running = False
+        await self.pipeline.stop()
+        if self.client and not self.client.is_closed():
+            await self.client.close()
+        await close_http_session()
@@ -0,0 +1,341 @@
+#!/usr/bin/env python
+"""
+core/transport_signal.py - Signal transport over a persistent signal-cli JSON-RPC connection.
+One signal-cli process runs for the lifetime of the bot, either started here in
+"jsonRpc" mode (requests on stdin, responses and notifications on stdout) or already
+running as "signal-cli daemon --tcp/--socket" and reached at SIGNAL_RPC_ADDRESS. Both
+speak newline-delimited JSON-RPC 2.0, so no JVM is started per send or receive.
+
+Incoming "receive" notifications are parsed with parse_json_message and handed to the
+same MessagePipeline the Discord transport uses. Sends are written as soon as they are
+made and matched to their responses by id, so several can be in flight at once. If
+signal-cli exits or the connection drops, it is restarted after SIGNAL_RESTART_DELAY.
+"""
+
+import asyncio
+import itertools
+import json
+import logging
+import os
+import shlex
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from core.transport import Transport
+from core.attachments import AttachmentHandle, AttachmentSet, close_http_session, file_fetch
+from core.message_pipeline import MessagePipeline
+from core.config import (
+    BOT_NUMBER,
+    SIGNAL_CLI_COMMAND,
+    SIGNAL_RPC_ADDRESS,
+    SIGNAL_RPC_TIMEOUT,
+    SIGNAL_RESTART_DELAY,
+    SIGNAL_ATTACHMENTS_DIR,
+    PIPELINE_ORDER_BY,
+)
+from core.exceptions import SignalRpcError
+from core import metrics, tracing
+from parsers.message_parser import parse_json_message
+
+logger = logging.getLogger(__name__)
+
+# Envelopes carrying long messages can exceed asyncio's default 64 KiB line limit.
+_LINE_LIMIT = 16 * 1024 * 1024
+_EXIT_TIMEOUT = 5
+
+@dataclass
+class SignalAuthor:
+    id: str
+    name: Optional[str] = None
+    roles: list = field(default_factory=list)  # Signal has no roles; kept for resolve_role
+
+@dataclass(frozen=True)
+class SignalChannel:
+    """
+    Where a reply goes: the group the message was sent in, or the sender directly.
+    """
+    recipient: Optional[str] = None
+    group_id: Optional[str] = None
+
+    @property
+    def id(self) -> Optional[str]:
+        return f"group:{self.group_id}" if self.group_id else self.recipient
+
+@dataclass
+class SignalContext:
+    """
+    Context passed to BotOrchestrator.dispatch alongside the ParsedMessage.
+    """
+    author: SignalAuthor
+    channel: SignalChannel
+    envelope: dict
+
+class SignalTransport(Transport):
+    """
+    SignalTransport - Transport backed by one long-running signal-cli JSON-RPC connection.
+
+    Args:
+        account (str): The bot's phone number.
+        command (str): Command that starts signal-cli; "-a <account> jsonRpc" is appended.
+        address (str): "host:port" or socket path of a running signal-cli daemon. When set,
+            no process is started.
+    """
+    name = "signal"
+
+    def __init__(self, account: str = BOT_NUMBER, command: str = SIGNAL_CLI_COMMAND,
+                 address: str = SIGNAL_RPC_ADDRESS):
+        if not account and not address:
+            raise RuntimeError("BOT_NUMBER not set in environment.")
+        self.account = account
+        self.command = command
+        self.address = address
+        self.pipeline = MessagePipeline()
+        self._on_message = None
+        self._running = False
+        self._process: Optional[asyncio.subprocess.Process] = None
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._stderr_task: Optional[asyncio.Task] = None
+        self._ids = itertools.count(1)
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._listeners: List[asyncio.Queue] = []
+
+    @property
+    def connected(self) -> bool:
+        return self._writer is not None
+
+    async def send_message(self, channel, content: str = "", files: Optional[list[str]] = None):
+        """
+        Send a message to a SignalChannel, or to a phone number given as a string.
+        Returns signal-cli's result (including the sent message timestamp).
+        """
+        if isinstance(channel, SignalChannel) and channel.group_id:
+            params: Dict[str, Any] = {"groupId": channel.group_id}
+        else:
+            recipient = channel.recipient if isinstance(channel, SignalChannel) else str(channel)
+            params = {"recipient": [recipient]}
+        params["message"] = content
+        if files:
+            # signal-cli may run in another working directory.
+            params["attachments"] = [os.path.abspath(f) for f in files]
+        with metrics.timed(metrics.SEND_LATENCY, metrics.MESSAGES_SENT, transport=self.name):
+            return await self.call("send", params)
+
+    async def call(self, method: str, params: Optional[dict] = None) -> Any:
+        """
+        Send one JSON-RPC request and wait for its result. The request is written
+        immediately; other requests may be written before this one is answered.
+
+        Raises:
+            SignalRpcError: If signal-cli returns an error, is not running, or does not
+                answer within SIGNAL_RPC_TIMEOUT seconds.
+        """
+        if self._writer is None:
+            raise SignalRpcError("signal-cli is not running.")
+        request_id = next(self._ids)
+        request = {"jsonrpc": "2.0", "method": method, "id": request_id}
+        if params:
+            request["params"] = params
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        try:
+            self._writer.write(json.dumps(request).encode("utf-8") + b"\n")
+            await self._writer.drain()
+            return await asyncio.wait_for(future, SIGNAL_RPC_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise SignalRpcError(f"signal-cli did not answer {method!r} within {SIGNAL_RPC_TIMEOUT}s.")
+        except (ConnectionError, BrokenPipeError) as e:
+            raise SignalRpcError(f"Connection to signal-cli lost during {method!r}: {e}")
+        finally:
+            self._pending.pop(request_id, None)
+
+    async def receive_messages(self):
+        """
+        Async generator for unit testing: yields ParsedMessage objects as received.
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        self._listeners.append(queue)
+        try:
+            while True:
+                yield await queue.get()
+        finally:
+            self._listeners.remove(queue)
+
+    async def start(self, on_message: Callable[[Any, SignalContext], Awaitable[None]]):
+        """
+        Connect to signal-cli and dispatch incoming messages until stop() is called.
+        """
+        self._on_message = on_message
+        self._running = True
+        self.pipeline.start()
+        while self._running:
+            try:
+                await self._connect()
+            except OSError as e:
+                logger.error(f"Could not start or reach signal-cli: {e}")
+            else:
+                await self._read_loop()
+                await self._disconnect()
+            if self._running:
+                logger.warning(f"signal-cli connection lost; reconnecting in {SIGNAL_RESTART_DELAY}s.")
+                await asyncio.sleep(SIGNAL_RESTART_DELAY)
+
+    async def stop(self):
+        """
+        Stop accepting messages, let queued ones finish, then shut signal-cli down.
+        """
+        self._running = False
+        await self.pipeline.stop()
+        await self._disconnect()
+        await close_http_session()
+
+    async def _connect(self) -> None:
+        if self.address:
+            if ":" in self.address and not os.path.exists(self.address):
+                host, port = self.address.rsplit(":", 1)
+                self._reader, self._writer = await asyncio.open_connection(host, int(port), limit=_LINE_LIMIT)
+            else:
+                self._reader, self._writer = await asyncio.open_unix_connection(self.address, limit=_LINE_LIMIT)
+            logger.info(f"Connected to signal-cli daemon at {self.address}.")
+            return
+        args = shlex.split(self.command) + ["-a", self.account, "jsonRpc"]
+        self._process = await asyncio.create_subprocess_exec(
+            *args,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            limit=_LINE_LIMIT,
+        )
+        self._reader, self._writer = self._process.stdout, self._process.stdin
+        self._stderr_task = asyncio.create_task(self._log_stderr(self._process.stderr))
+        logger.info(f"Started signal-cli (pid {self._process.pid}) in JSON-RPC mode.")
+
+    async def _disconnect(self) -> None:
+        writer, self._writer = self._writer, None
+        process, self._process = self._process, None
+        if writer is not None:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except (ConnectionError, BrokenPipeError):
+                pass
+        if process is not None and process.returncode is None:
+            # signal-cli exits once its stdin is closed; terminate it if it lingers.
+            try:
+                await asyncio.wait_for(process.wait(), _EXIT_TIMEOUT)
+            except asyncio.TimeoutError:
+                process.terminate()
+                try:
+                    await asyncio.wait_for(process.wait(), _EXIT_TIMEOUT)
+                except asyncio.TimeoutError:
+                    process.kill()
+                    await process.wait()
+        if self._stderr_task is not None:
+            await asyncio.gather(self._stderr_task, return_exceptions=True)
+            self._stderr_task = None
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(SignalRpcError("signal-cli exited before answering."))
+        self._pending.clear()
+
+    async def _read_loop(self) -> None:
+        reader = self._reader
+        while True:
+            try:
+                line = await reader.readline()
+            except ValueError:
+                logger.warning(f"Dropped a signal-cli message longer than {_LINE_LIMIT} bytes.")
+                continue
+            except ConnectionError:
+                return
+            if not line:
+                return
+            try:
+                message = json.loads(line)
+            except ValueError:
+                logger.warning(f"Ignoring non-JSON output from signal-cli: {line[:200]!r}")
+                continue
+            if not isinstance(message, dict):
+                continue
+            if message.get("method") == "receive":
+                self._handle_envelope((message.get("params") or {}).get("envelope") or {})
+            elif "id" in message:
+                self._resolve(message)
+
+    def _resolve(self, message: dict) -> None:
+        future = self._pending.get(message["id"])
+        if future is None or future.done():
+            return
+        error = message.get("error")
+        if error:
+            future.set_exception(SignalRpcError(
+                f"signal-cli error: {error.get('message', error)}", code=error.get("code")
+            ))
+        else:
+            future.set_result(message.get("result"))
+
+    def _handle_envelope(self, envelope: dict) -> None:
+        """
+        Turn a received data message into a pipeline job. Receipts, typing
+        notifications, and sync messages are not dispatched.
+        """
+        data_message = envelope.get("dataMessage")
+        if not data_message or not (data_message.get("message") or data_message.get("attachments")):
+            return
+        sender = envelope.get("sourceNumber") or envelope.get("source") or envelope.get("sourceUuid")
+        if not sender or sender == self.account:
+            return
+        metrics.MESSAGES_RECEIVED.labels(transport=self.name).inc()
+        ctx = SignalContext(
+            author=SignalAuthor(id=str(sender), name=envelope.get("sourceName")),
+            channel=SignalChannel(recipient=str(sender), group_id=(data_message.get("groupInfo") or {}).get("groupId")),
+            envelope=envelope,
+        )
+        self.pipeline.submit(self._ordering_key(ctx), lambda: self._handle_message(envelope, ctx))
+
+    async def _handle_message(self, envelope: dict, ctx: SignalContext) -> None:
+        """
+        Parse and dispatch one message. Runs on a pipeline worker.
+        """
+        with tracing.span("parse"):
+            parsed = parse_json_message(envelope)
+            parsed.attachments = self._attachment_handles(envelope["dataMessage"])
+        for queue in self._listeners:
+            queue.put_nowait(parsed)
+        await self._on_message(parsed, ctx)
+
+    @staticmethod
+    def _ordering_key(ctx: SignalContext) -> str:
+        """
+        Return the key whose messages must be handled sequentially (user or channel).
+        """
+        if PIPELINE_ORDER_BY == "channel":
+            return f"channel:{ctx.channel.id}"
+        return f"user:{ctx.author.id}"
+
+    @staticmethod
+    def _attachment_handles(data_message: dict) -> AttachmentSet:
+        """
+        Wrap the files signal-cli saved for this message in lazy handles.
+        """
+        return AttachmentSet(
+            AttachmentHandle(
+                att.get("filename") or att["id"],
+                "file://" + os.path.join(SIGNAL_ATTACHMENTS_DIR, att["id"]),
+                size=att.get("size"),
+                content_type=att.get("contentType"),
+                fetcher=file_fetch,
+            )
+            for att in data_message.get("attachments") or []
+            if att.get("id")
+        )
+
+    @staticmethod
+    async def _log_stderr(stream: asyncio.StreamReader) -> None:
+        while True:
+            line = await stream.readline()
+            if not line:
+                return
+            logger.info(f"signal-cli: {line.decode('utf-8', 'replace').rstrip()}")
+
+# End of core/transport_signal.py
@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+"""
+db/async_db.py - Thread-backed executor for running SQLite work off the event loop.
+All writes run on a single dedicated writer thread, so they are applied in the order
+they were submitted. Reads run on a small pool of reader threads and, thanks to WAL
+mode on pooled connections, proceed concurrently with the writer.
+"""
+
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Optional
+from core.config import DB_ASYNC_READERS
+
+logger = logging.getLogger(__name__)
+
+class AsyncDatabase:
+    """
+    AsyncDatabase - Runs blocking database callables in worker threads.
+
+    Args:
+        readers (int): Number of reader threads.
+    """
+    def __init__(self, readers: int = DB_ASYNC_READERS):
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-writer")
+        self._readers = ThreadPoolExecutor(max_workers=max(1, readers), thread_name_prefix="db-reader")
+
+    async def run_read(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Run func(*args, **kwargs) on a reader thread and return its result.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._readers, partial(func, *args, **kwargs))
+
+    async def run_write(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Run func(*args, **kwargs) on the writer thread and return its result.
+        Writes submitted from the event loop are executed strictly in submission order.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._writer, partial(func, *args, **kwargs))
+
+    def shutdown(self, wait: bool = True) -> None:
+        """
+        Stop accepting work. If wait is True, block until queued writes have completed.
+        """
+        self._readers.shutdown(wait=wait)
+        self._writer.shutdown(wait=wait)
+
+_async_db: Optional[AsyncDatabase] = None
+_async_db_lock = threading.Lock()
+
+def get_async_db() -> AsyncDatabase:
+    """
+    get_async_db - Return the process-wide AsyncDatabase, creating it on first use.
+    """
+    global _async_db
+    with _async_db_lock:
+        if _async_db is None:
+            _async_db = AsyncDatabase()
+        return _async_db
+
+def shutdown_async_db(wait: bool = True) -> None:
+    """
+    shutdown_async_db - Drain queued writes and stop the worker threads.
+    The next call to get_async_db() starts a fresh executor.
+    """
+    global _async_db
+    with _async_db_lock:
+        db, _async_db = _async_db, None
+    if db is not None:
+        db.shutdown(wait=wait)
+
+# End of db/async_db.py
@@ -7,20 +7,50 @@ Changes:
  - Added an info-level log message upon successful backup creation.
  - Updated periodic backup to handle exceptions and log warnings on failure.
  - Updated restore_backup to check for truncated backups (≤ 16 bytes) and log as invalid/corrupted.
+ - Checkpoint the WAL before copying and close pooled connections before restoring.
+ - Take backups with SQLite's online backup API (or VACUUM INTO) instead of copying the file,
+   off the event loop, skipping them when nothing changed since the last one.
+ - Keep snapshots in the deduplicated, compressed backup store by default.
+ - Make every backup a checkpoint of the change journal (db/journal.py), so the database
+   can be recovered to any point in time (db/recovery.py).
 """
 
 import os
 import shutil
+import sqlite3
+import threading
+import time
 from datetime import datetime
+from functools import lru_cache
 import asyncio
 import logging
-from core.config import DB_NAME, BACKUP_INTERVAL
+from typing import Optional, Tuple
+from core.config import (
+    DB_NAME,
+    BACKUP_INTERVAL,
+    BACKUP_MODE,
+    BACKUP_PAGES_PER_STEP,
+    BACKUP_STEP_SLEEP_MS,
+    BACKUP_SKIP_UNCHANGED,
+    BACKUP_STORE_ENABLED,
+)
+from db.backup_store import BackupStore
+from db.connection import close_pool
+from db.journal import get_change_journal
 
 logger = logging.getLogger(__name__)
 
 # Define the backups directory relative to the DB_NAME location.
 BACKUP_DIR = os.path.join(os.path.dirname(DB_NAME), "backups")
 
+# One backup at a time; also guards the change-tracking state below.
+_backup_lock = threading.RLock()
+# Connection used only to read PRAGMA data_version, and (data_version, path) of the last backup.
+_version_conn: Optional[sqlite3.Connection] = None
+_last_backup: Optional[Tuple[int, str]] = None
+# Restarts caused by concurrent writes before an online backup falls back to VACUUM INTO.
+_MAX_BACKUP_RESTARTS = 3
+
 def _generate_backup_filename() -> str:
     """
     Generates a unique backup filename using the current date-time second.
@@ -34,64 +64,213 @@ def _generate_backup_filename() -> str:
             filename += f"_{suffix}"
         filename += ".db"
         fullpath = os.path.join(BACKUP_DIR, filename)
-        if not os.path.exists(fullpath):
+        if not os.path.exists(fullpath) and not os.path.exists(_store().manifest_path(filename)):
             return filename
         suffix += 1
 
-def create_backup() -> str:
+def create_backup(mode: str = BACKUP_MODE, skip_unchanged: bool = False,
+                  store: bool = BACKUP_STORE_ENABLED) -> str:
     """
-    Create a backup of the current database.
+    Create a consistent snapshot of the current database while it stays in use.
+
+    Args:
+        mode (str): "backup" copies BACKUP_PAGES_PER_STEP pages at a time with SQLite's
+            online backup API, so writers only wait for one step; "vacuum" writes a
+            compacted copy with VACUUM INTO.
+        skip_unchanged (bool): If True and nothing was committed since the previous
+            backup, no new file is written and that backup's path is returned.
+        store (bool): If True, the snapshot is added to the deduplicated backup store
+            (see db/backup_store.py) instead of being kept as a full .db file.
 
     Returns:
-        str: The file path of the created backup, or an empty string if creation failed.
+        str: The file path of the backup (its manifest when stored), or an empty string
+            if creation failed.
     """
-    try:
-        if not os.path.exists(BACKUP_DIR):
-            os.makedirs(BACKUP_DIR)
-    except OSError as e:
-        logger.warning(f"Failed to create backup directory '{BACKUP_DIR}'. Error: {e}")
-        return ""
-    
-    backup_filename = _generate_backup_filename()
-    backup_path = os.path.join(BACKUP_DIR, backup_filename)
+    with _backup_lock:
+        # Read before the snapshot, so a commit that lands during it counts as a change.
+        version = _data_version()
+        if skip_unchanged and version is not None and _last_backup is not None and _last_backup[0] == version \
+                and os.path.exists(_last_backup[1]):
+            logger.info(f"Database unchanged since backup {_last_backup[1]}; skipping.")
+            return _last_backup[1]
 
-    try:
-        shutil.copyfile(DB_NAME, backup_path)
+        try:
+            if not os.path.exists(BACKUP_DIR):
+                os.makedirs(BACKUP_DIR)
+        except OSError as e:
+            logger.warning(f"Failed to create backup directory '{BACKUP_DIR}'. Error: {e}")
+            return ""
+
+        backup_filename = _generate_backup_filename()
+        backup_path = os.path.join(BACKUP_DIR, backup_filename)
+        # Written under a temporary name, so a backup cut short is never listed.
+        tmp_path = backup_path + ".tmp"
+
+        try:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            # Changes from here on go to a new journal segment that replays on top of this backup.
+            get_change_journal().checkpoint(backup_filename)
+            if mode == "vacuum":
+                _vacuum_into(tmp_path)
+            else:
+                _online_backup(tmp_path)
+            if store:
+                _store().add_snapshot(tmp_path, backup_filename)
+                os.remove(tmp_path)
+                backup_path = _store().manifest_path(backup_filename)
+            else:
+                os.replace(tmp_path, backup_path)
+        except Exception as e:
+            logger.warning(f"Failed to create backup file at '{backup_path}'. Error: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return ""
+        _set_last_backup(version, backup_path)
         logger.info(f"Backup created at: {backup_path}")
         return backup_path
-    except Exception as e:
-        logger.warning(f"Failed to create backup file at '{backup_path}'. Error: {e}")
-        return ""
+
+class _BackupRestarting(Exception):
+    pass
+
+def _online_backup(dest_path: str) -> None:
+    """
+    Copy DB_NAME to dest_path with the online backup API, one step of
+    BACKUP_PAGES_PER_STEP pages at a time. SQLite starts the copy over when another
+    connection writes between steps; after _MAX_BACKUP_RESTARTS of those, the backup
+    is taken with VACUUM INTO instead, which reads a single snapshot.
+    """
+    restarts = 0
+    copied_before = 0
+
+    def progress(status, remaining, total):
+        nonlocal restarts, copied_before
+        # Each step copies more pages than the one before unless the copy started over.
+        copied = total - remaining
+        if copied <= copied_before:
+            restarts += 1
+            if restarts > _MAX_BACKUP_RESTARTS:
+                raise _BackupRestarting()
+        copied_before = copied
+        if remaining:
+            # sqlite3 only sleeps between steps when the source is busy; pause here so writers get a turn.
+            time.sleep(BACKUP_STEP_SLEEP_MS / 1000)
+
+    source = sqlite3.connect(DB_NAME)
+    dest = sqlite3.connect(dest_path)
+    try:
+        source.backup(dest, pages=max(1, BACKUP_PAGES_PER_STEP), progress=progress)
+    except _BackupRestarting:
+        logger.info(f"Online backup restarted {restarts} times by concurrent writes; using VACUUM INTO.")
+    else:
+        return
+    finally:
+        dest.close()
+        source.close()
+    os.remove(dest_path)
+    _vacuum_into(dest_path)
+
+def _vacuum_into(dest_path: str) -> None:
+    """
+    Write a compacted, consistent copy of DB_NAME to dest_path.
+    """
+    source = sqlite3.connect(DB_NAME)
+    try:
+        source.execute("VACUUM INTO ?", (dest_path,))
+    finally:
+        source.close()
+
+def _data_version() -> Optional[int]:
+    """
+    Return PRAGMA data_version from a connection kept open for the purpose. It changes
+    whenever another connection commits, so an unchanged value means the database is
+    the same as when it was last read. None if the database cannot be read.
+    """
+    global _version_conn
+    try:
+        if _version_conn is None:
+            _version_conn = sqlite3.connect(DB_NAME, check_same_thread=False)
+        return _version_conn.execute("PRAGMA data_version").fetchone()[0]
+    except sqlite3.Error as e:
+        logger.warning(f"Could not read data_version of '{DB_NAME}': {e}")
+        return None
+
+def _set_last_backup(version: Optional[int], path: str) -> None:
+    global _last_backup
+    _last_backup = (version, path) if version is not None else None
+
+def _reset_change_tracking() -> None:
+    """
+    Forget the last backup and close the data_version connection, e.g. when the
+    database file is replaced.
+    """
+    global _version_conn, _last_backup
+    with _backup_lock:
+        _last_backup = None
+        if _version_conn is not None:
+            _version_conn.close()
+            _version_conn = None
+
+def _store() -> BackupStore:
+    return _store_at(BACKUP_DIR)
+
+@lru_cache(maxsize=4)
+def _store_at(root: str) -> BackupStore:
+    # One store per directory, so its settings are checked (and warned about) once.
+    return BackupStore(root)
+
+def backup_time(backup_filename: str) -> Optional[float]:
+    """
+    Return when the backup finished being written, as a Unix timestamp, or None if it
+    does not exist.
+    """
+    path = os.path.join(BACKUP_DIR, backup_filename)
+    if os.path.exists(path):
+        return os.path.getmtime(path)
+    try:
+        return _store().manifest(backup_filename)["created"]
+    except (OSError, ValueError, KeyError):
+        return None
 
 def list_backups() -> list:
     """
-    List all backup files in the backup directory.
+    List all backups: full .db files in the backup directory and snapshots in the store.
 
     Returns:
-        list: A sorted list of backup file names.
+        list: A sorted list of backup names.
     """
     if not os.path.exists(BACKUP_DIR):
         return []
     backups = [f for f in os.listdir(BACKUP_DIR) if f.endswith(".db")]
+    backups.extend(_store().snapshots())
     backups.sort()
     return backups
 
 def restore_backup(backup_filename: str) -> bool:
     """
-    Restore the database from a specified backup file.
+    Restore the database from a specified backup file or stored snapshot.
 
     Args:
-        backup_filename (str): The name of the backup file (found in the backups folder).
+        backup_filename (str): The name of the backup, as returned by list_backups().
 
     Returns:
         bool: True if restoration is successful, False otherwise.
     """
     backup_path = os.path.join(BACKUP_DIR, backup_filename)
-    if not os.path.exists(backup_path):
+    stored = not os.path.exists(backup_path)
+    if stored and not os.path.exists(_store().manifest_path(backup_filename)):
         return False
 
     try:
-        shutil.copyfile(backup_path, DB_NAME)
+        # Pooled connections must not keep the old file (and its WAL) open across the swap.
+        close_pool()
+        _reset_change_tracking()
+        if stored:
+            _store().restore(backup_filename, DB_NAME)
+        else:
+            shutil.copyfile(backup_path, DB_NAME)
     except Exception as e:
         logger.warning(f"Failed to restore backup '{backup_filename}' to '{DB_NAME}'. Error: {e}")
         return False
@@ -106,27 +285,38 @@ def _prune_backups(max_backups: int | None = None):
         return
     backups = list_backups()
     if len(backups) > max_backups:
+        store = _store()
         # Remove oldest backups
         for old in backups[:-max_backups]:
             try:
-                os.remove(os.path.join(BACKUP_DIR, old))
+                path = os.path.join(BACKUP_DIR, old)
+                if os.path.exists(path):
+                    os.remove(path)
+                else:
+                    store.delete(old)
                 logger.info(f"Deleted old backup: {old}")
             except Exception as e:
                 logger.warning(f"Failed to delete old backup '{old}': {e}")
+        # Free the chunks and journal segments no remaining backup uses.
+        store.gc()
+        get_change_journal().prune(backups[-max_backups])
 
 async def start_periodic_backups(interval_seconds: int = BACKUP_INTERVAL, max_backups: int | None = None) -> None:
     """
     Schedule periodic backups at the specified interval.
 
+    Backups with no commits since the previous one are skipped when BACKUP_SKIP_UNCHANGED is set.
+
     Args:
         interval_seconds (int): Time interval between backups in seconds (configurable via DISK_BACKUP_INTERVAL).
         max_backups (int | None): Maximum number of backups to retain. If None, unlimited.
     """
     while True:
         try:
-            backup_path = create_backup()
+            # Runs in a worker thread so the event loop keeps serving messages meanwhile.
+            backup_path = await asyncio.to_thread(create_backup, skip_unchanged=BACKUP_SKIP_UNCHANGED)
             if backup_path:
-                _prune_backups(max_backups)
+                await asyncio.to_thread(_prune_backups, max_backups)
         except Exception as e:
             logger.warning(f"Periodic backup failed: {e}")
         await asyncio.sleep(interval_seconds)
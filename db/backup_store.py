@@ -0,0 +1,233 @@
+#!/usr/bin/env python
+"""
+db/backup_store.py - Deduplicated, compressed storage for database snapshots.
+A snapshot is split into chunks of BACKUP_CHUNK_PAGES database pages. Each chunk is
+stored once under the SHA-256 of its content at chunks/<sha[:2]>/<sha>.<zst|gz>, and
+compressed with zstd when the zstandard package is installed, otherwise gzip. A JSON
+manifest in manifests/<name>.json lists the chunks of each snapshot in order. Pages
+that did not change between snapshots land in identical chunks, so consecutive
+snapshots share them and each new snapshot only adds the chunks that changed.
+
+Restoring reads the manifest and decompresses one chunk at a time into a temporary
+file next to the target, checks the result against the snapshot's hash, and renames it
+into place. Memory use does not grow with the database size. Chunks no longer listed
+by any manifest are removed by gc().
+
+Usage Example:
+    store = BackupStore("./backups")
+    store.add_snapshot("snapshot.db", "backup_20250101_120000")
+    store.restore("backup_20250101_120000", "bot_data.db")
+"""
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+import time
+from typing import BinaryIO, Iterator, List, Optional
+
+from core.config import BACKUP_CHUNK_PAGES, BACKUP_COMPRESSION
+
+logger = logging.getLogger(__name__)
+
+_SQLITE_HEADER = b"SQLite format 3\x00"
+_DEFAULT_PAGE_SIZE = 4096
+_COPY_BLOCK = 1024 * 1024
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+_EXTENSIONS = {"zstd": ".zst", "gzip": ".gz"}
+
+def page_size_of(path: str) -> int:
+    """
+    Return the page size recorded in the header of the SQLite file at path, or 4096
+    if the file is not a SQLite database.
+    """
+    with open(path, "rb") as f:
+        header = f.read(18)
+    if len(header) < 18 or not header.startswith(_SQLITE_HEADER):
+        return _DEFAULT_PAGE_SIZE
+    size = int.from_bytes(header[16:18], "big")
+    return 65536 if size == 1 else size
+
+class BackupStore:
+    """
+    BackupStore - Content-addressed chunk store with one manifest per snapshot.
+
+    Args:
+        root (str): Directory holding chunks/ and manifests/.
+        chunk_pages (int): Database pages per chunk.
+        compression (str): "zstd" or "gzip". zstd needs the zstandard package and falls
+            back to gzip without it.
+    """
+    def __init__(self, root: str, chunk_pages: int = BACKUP_CHUNK_PAGES,
+                 compression: str = BACKUP_COMPRESSION):
+        self.root = root
+        self.chunk_pages = max(1, chunk_pages)
+        if compression == "zstd" and zstandard is None:
+            logger.warning("zstandard is not installed; compressing backups with gzip.")
+            compression = "gzip"
+        if compression not in _EXTENSIONS:
+            raise ValueError(f"Unknown backup compression {compression!r}; use 'zstd' or 'gzip'.")
+        self.compression = compression
+        self.chunk_dir = os.path.join(root, "chunks")
+        self.manifest_dir = os.path.join(root, "manifests")
+
+    def add_snapshot(self, db_path: str, name: str) -> dict:
+        """
+        Store the database file at db_path as snapshot name and return its manifest.
+        Only chunks not already in the store are compressed and written.
+        """
+        page_size = page_size_of(db_path)
+        chunk_size = page_size * self.chunk_pages
+        digest = hashlib.sha256()
+        chunks: List[str] = []
+        written = 0
+        size = 0
+        with open(db_path, "rb") as f:
+            for data in iter(lambda: f.read(chunk_size), b""):
+                digest.update(data)
+                size += len(data)
+                sha = hashlib.sha256(data).hexdigest()
+                if self._chunk_path(sha) is None:
+                    self._write_chunk(sha, data)
+                    written += 1
+                chunks.append(sha)
+        manifest = {
+            "name": name,
+            "created": time.time(),
+            "page_size": page_size,
+            "chunk_size": chunk_size,
+            "size": size,
+            "sha256": digest.hexdigest(),
+            "chunks": chunks,
+        }
+        os.makedirs(self.manifest_dir, exist_ok=True)
+        _write_atomic(self.manifest_path(name), json.dumps(manifest).encode("utf-8"))
+        logger.info(f"Stored snapshot {name}: {len(chunks)} chunks, {written} new.")
+        return manifest
+
+    def restore(self, name: str, dest_path: str) -> None:
+        """
+        Rebuild snapshot name at dest_path, replacing it only once the rebuilt file
+        matches the snapshot's hash.
+
+        Raises:
+            FileNotFoundError: If the snapshot or one of its chunks is missing.
+            ValueError: If the rebuilt file does not match the snapshot.
+        """
+        manifest = self.manifest(name)
+        tmp_path = dest_path + ".restore"
+        digest = hashlib.sha256()
+        try:
+            with open(tmp_path, "wb") as out:
+                for sha in manifest["chunks"]:
+                    for block in self._read_chunk(sha):
+                        digest.update(block)
+                        out.write(block)
+                out.flush()
+                os.fsync(out.fileno())
+            if digest.hexdigest() != manifest["sha256"]:
+                raise ValueError(f"Snapshot {name} does not match its recorded hash.")
+            os.replace(tmp_path, dest_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def manifest(self, name: str) -> dict:
+        with open(self.manifest_path(name), "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def manifest_path(self, name: str) -> str:
+        return os.path.join(self.manifest_dir, name + ".json")
+
+    def snapshots(self) -> List[str]:
+        """
+        Return the names of stored snapshots, oldest first by name.
+        """
+        if not os.path.isdir(self.manifest_dir):
+            return []
+        return sorted(f[:-len(".json")] for f in os.listdir(self.manifest_dir) if f.endswith(".json"))
+
+    def delete(self, name: str) -> None:
+        """
+        Remove snapshot name's manifest. Its chunks are freed by the next gc().
+        """
+        os.remove(self.manifest_path(name))
+
+    def gc(self) -> int:
+        """
+        Delete chunks not listed by any manifest. Returns the number deleted.
+        """
+        live = set()
+        for name in self.snapshots():
+            live.update(self.manifest(name)["chunks"])
+        removed = 0
+        for path in self._chunk_files():
+            sha = os.path.basename(path).split(".", 1)[0]
+            if sha not in live:
+                os.remove(path)
+                removed += 1
+        return removed
+
+    def disk_usage(self) -> int:
+        """
+        Total bytes of stored chunks.
+        """
+        return sum(os.path.getsize(path) for path in self._chunk_files())
+
+    def _chunk_files(self) -> Iterator[str]:
+        if not os.path.isdir(self.chunk_dir):
+            return
+        for prefix in os.listdir(self.chunk_dir):
+            directory = os.path.join(self.chunk_dir, prefix)
+            for filename in os.listdir(directory):
+                if not filename.endswith(".tmp"):
+                    yield os.path.join(directory, filename)
+
+    def _chunk_path(self, sha: str) -> Optional[str]:
+        """
+        Return the path of the stored chunk sha in any compression, or None.
+        """
+        base = os.path.join(self.chunk_dir, sha[:2], sha)
+        for ext in _EXTENSIONS.values():
+            if os.path.exists(base + ext):
+                return base + ext
+        return None
+
+    def _write_chunk(self, sha: str, data: bytes) -> None:
+        directory = os.path.join(self.chunk_dir, sha[:2])
+        os.makedirs(directory, exist_ok=True)
+        if self.compression == "zstd":
+            packed = zstandard.ZstdCompressor(level=3).compress(data)
+        else:
+            packed = gzip.compress(data, compresslevel=6)
+        _write_atomic(os.path.join(directory, sha + _EXTENSIONS[self.compression]), packed)
+
+    def _read_chunk(self, sha: str) -> Iterator[bytes]:
+        path = self._chunk_path(sha)
+        if path is None:
+            raise FileNotFoundError(f"Backup chunk {sha} is missing.")
+        with open(path, "rb") as raw:
+            with _decompressing(path, raw) as stream:
+                for block in iter(lambda: stream.read(_COPY_BLOCK), b""):
+                    yield block
+
+def _decompressing(path: str, raw: BinaryIO):
+    if path.endswith(_EXTENSIONS["zstd"]):
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to restore zstd-compressed backups.")
+        return zstandard.ZstdDecompressor().stream_reader(raw)
+    return gzip.GzipFile(fileobj=raw, mode="rb")
+
+def _write_atomic(path: str, data: bytes) -> None:
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+# End of db/backup_store.py
@@ -2,20 +2,32 @@
 """
 db/connection.py - Provides database connection functions.
 Establishes and returns a connection to the SQLite database and includes a context manager for automatic handling.
+Also provides a pool of long-lived connections so hot paths (execute_sql, BaseRepository,
+atomic_transaction) do not pay an open/close cycle per query. Pooled connections run in WAL
+mode with synchronous=NORMAL and memory-mapped I/O, applied once when each connection is opened.
 """
 
 import sqlite3
 import logging
+import threading
+import time
 from sqlite3 import Connection
 from contextlib import contextmanager
-from core.config import DB_NAME
+from typing import List, Optional
+from core.config import (
+    DB_NAME,
+    DB_POOL_SIZE,
+    DB_POOL_TIMEOUT,
+    DB_POOL_HEALTH_CHECK_INTERVAL,
+    DB_MMAP_SIZE,
+)
 
 logger = logging.getLogger(__name__)
 
 def get_connection() -> Connection:
     """
     get_connection - Establish and return a connection to the SQLite database.
-    
+
     This function now includes basic error handling for OperationalError or OSError.
     Logs an error and then re-raises the exception if encountered.
 
@@ -38,7 +50,7 @@ def get_connection() -> Connection:
 def db_connection():
     """
     db_connection - Context manager for SQLite database connection.
-    
+
     Yields:
         Connection: The SQLite connection object with row_factory set.
     Ensures that the connection is closed after usage.
@@ -51,4 +63,239 @@ def db_connection():
         if conn:
             conn.close()
 
-# End of db/connection.py
\ No newline at end of file
+# --------------------------------------------------------
+# Connection Pool
+# --------------------------------------------------------
+class PooledConnection(sqlite3.Connection):
+    """
+    PooledConnection - sqlite3.Connection whose close() hands it back to its pool.
+    Existing code that calls conn.close() therefore works unchanged with pooled connections.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pool: Optional["ConnectionPool"] = None
+        self.checked_out = False
+        self.last_used = time.monotonic()
+
+    def close(self) -> None:
+        if self.pool is not None:
+            self.pool.release(self)
+        else:
+            super().close()
+
+    def close_physical(self) -> None:
+        """
+        Close the underlying SQLite handle, bypassing the pool.
+        """
+        self.pool = None
+        super().close()
+
+class ConnectionPool:
+    """
+    ConnectionPool - Bounded pool of long-lived SQLite connections.
+
+    Each caller checks a connection out for the duration of one query or transaction and
+    returns it with close() (or release()). Idle connections are reused most-recently-used
+    first, so a busy thread usually gets back the connection whose page cache is warm.
+
+    Args:
+        db_name (str): Path to the SQLite database file.
+        max_size (int): Maximum number of open connections.
+        timeout (float): Seconds to wait for a free connection before raising OperationalError.
+        health_check_interval (float): Idle seconds after which a connection is pinged before reuse.
+        mmap_size (int): Bytes to memory-map per connection (0 disables mmap).
+    """
+    def __init__(self, db_name: str, max_size: int = DB_POOL_SIZE,
+                 timeout: float = DB_POOL_TIMEOUT,
+                 health_check_interval: float = DB_POOL_HEALTH_CHECK_INTERVAL,
+                 mmap_size: int = DB_MMAP_SIZE):
+        self.db_name = db_name
+        self.max_size = max(1, max_size)
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        self.mmap_size = mmap_size
+        self._idle: List[PooledConnection] = []
+        self._created = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def acquire(self) -> PooledConnection:
+        """
+        Check out a connection, opening a new one if the pool is below max_size.
+
+        Raises:
+            sqlite3.OperationalError: If no connection becomes free within the timeout.
+        """
+        deadline = time.monotonic() + self.timeout
+        while True:
+            conn = None
+            with self._cond:
+                while not self._idle and self._created >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0 or not self._cond.wait(remaining):
+                        raise sqlite3.OperationalError(
+                            f"Timed out waiting for a pooled connection to {self.db_name!r}"
+                        )
+                if self._idle:
+                    conn = self._idle.pop()
+                else:
+                    self._created += 1
+            if conn is None:
+                try:
+                    conn = self._open()
+                except Exception:
+                    with self._cond:
+                        self._created -= 1
+                        self._cond.notify()
+                    raise
+            elif not self._is_healthy(conn):
+                self._discard(conn)
+                continue
+            conn.checked_out = True
+            return conn
+
+    def release(self, conn: PooledConnection) -> None:
+        """
+        Return a connection to the pool. Any open transaction is rolled back first.
+        """
+        if not conn.checked_out:
+            return
+        conn.checked_out = False
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error as e:
+            logger.warning(f"Discarding pooled connection after failed rollback: {e}")
+            self._discard(conn)
+            return
+        conn.last_used = time.monotonic()
+        with self._cond:
+            if self._closed:
+                self._created -= 1
+                conn.close_physical()
+            else:
+                self._idle.append(conn)
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        """
+        Context manager that checks out a connection and always returns it.
+        """
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close_all(self) -> None:
+        """
+        Close idle connections and stop pooling; connections still checked out are
+        closed when they are released.
+        """
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._created -= len(idle)
+            self._cond.notify_all()
+        for conn in idle:
+            try:
+                conn.close_physical()
+            except sqlite3.Error:
+                pass
+
+    def stats(self) -> dict:
+        """
+        Return the number of open and idle connections.
+        """
+        with self._cond:
+            return {"open": self._created, "idle": len(self._idle), "max_size": self.max_size}
+
+    def _open(self) -> PooledConnection:
+        try:
+            conn = sqlite3.connect(
+                self.db_name,
+                factory=PooledConnection,
+                check_same_thread=False,
+                cached_statements=256,
+            )
+        except (sqlite3.OperationalError, OSError) as e:
+            logger.error(f"Error connecting to SQLite database {self.db_name!r}: {e}")
+            raise
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA mmap_size={int(self.mmap_size)}")
+        conn.pool = self
+        return conn
+
+    def _is_healthy(self, conn: PooledConnection) -> bool:
+        if time.monotonic() - conn.last_used < self.health_check_interval:
+            return True
+        try:
+            conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error as e:
+            logger.warning(f"Pooled connection failed health check: {e}")
+            return False
+
+    def _discard(self, conn: PooledConnection) -> None:
+        try:
+            conn.close_physical()
+        except sqlite3.Error:
+            pass
+        with self._cond:
+            self._created -= 1
+            self._cond.notify()
+
+_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+
+def get_pool() -> ConnectionPool:
+    """
+    get_pool - Return the process-wide connection pool for DB_NAME, creating it on first use.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ConnectionPool(DB_NAME)
+        return _pool
+
+def get_pooled_connection() -> PooledConnection:
+    """
+    get_pooled_connection - Check out a connection from the shared pool.
+    Calling close() on the returned connection returns it to the pool.
+    """
+    return get_pool().acquire()
+
+@contextmanager
+def pooled_connection():
+    """
+    pooled_connection - Context manager yielding a pooled connection and returning it afterwards.
+    """
+    conn = get_pooled_connection()
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+def close_pool() -> None:
+    """
+    close_pool - Close every pooled connection. The next pooled access opens a fresh pool.
+    Call before replacing the database file (e.g., when restoring a backup).
+    """
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.close_all()
+
+def checkpoint() -> None:
+    """
+    checkpoint - Fold the WAL file back into the main database file so that a plain
+    file copy of DB_NAME contains every committed transaction.
+    """
+    with pooled_connection() as conn:
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+# End of db/connection.py
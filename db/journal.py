@@ -0,0 +1,278 @@
+#!/usr/bin/env python
+"""
+db/journal.py - Append-only journal of user state changes for point-in-time recovery.
+Every write to a journaled table made through BaseRepository or FlowManager is appended
+to the journal, as one JSON line, before it is executed. A write that then fails is
+followed by an abort line, so replay skips it. Changes committed in one transaction
+are journaled as one batch entry and replayed together.
+
+The journal is split into segments, one file per segment in JOURNAL_DIR named by the
+time it was opened. Each backup is a checkpoint: db.backup starts a new segment, headed
+by the backup's name, just before it takes the snapshot. A segment therefore holds the
+changes made after its checkpoint's snapshot began. Some of them may already be in the
+snapshot, which does no harm, since every entry sets a row to a given state and
+replaying it again leaves the same result.
+
+db/recovery.py restores the newest checkpoint taken before a given time and replays the
+segments from there on, so recovery reads only the changes made since that checkpoint.
+
+The journal lock is held from appending an entry until its write commits, so entries
+are journaled in commit order. Lock order is therefore journal first, then SQLite's
+write lock: a caller that opens its own transaction (BEGIN) and journals writes inside
+it must take locked() before BEGIN, or it deadlocks against other journaled writers
+until SQLite's busy timeout.
+
+Usage Example:
+    with get_change_journal().logged("UserStates", "update", "user_id", user_id, {"flow_state": encoded}):
+        cursor.execute(...)
+        conn.commit()
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional
+
+from core.config import DB_NAME, CHANGE_JOURNAL_ENABLED, CHANGE_JOURNAL_FSYNC
+
+logger = logging.getLogger(__name__)
+
+# Journal segments live next to the backups they extend.
+JOURNAL_DIR = os.path.join(os.path.dirname(DB_NAME), "backups", "journal")
+
+# Tables whose changes are journaled.
+JOURNALED_TABLES = frozenset({"UserStates", "Flows"})
+
+class Segment(NamedTuple):
+    path: str
+    checkpoint: Optional[str]
+    opened: float
+
+class ChangeJournal:
+    """
+    ChangeJournal - Thread-safe writer and reader of journal segments.
+
+    Args:
+        directory (str): Directory holding the segment files.
+        enabled (bool): If False, logged() runs writes without journaling them.
+        fsync (bool): fsync the segment after every entry.
+        tables (frozenset): Tables whose changes are journaled.
+    """
+    def __init__(self, directory: str = JOURNAL_DIR, enabled: bool = CHANGE_JOURNAL_ENABLED,
+                 fsync: bool = CHANGE_JOURNAL_FSYNC, tables: frozenset = JOURNALED_TABLES):
+        self.directory = directory
+        self.enabled = enabled
+        self.fsync = fsync
+        self.tables = tables
+        self._file = None
+        # Held from appending an entry until its write has committed, so a checkpoint
+        # never starts a segment between the two.
+        self._lock = threading.RLock()
+
+    @contextmanager
+    def logged(self, table: str, op: str, key_column: Optional[str] = None, key: Any = None,
+               data: Optional[Dict[str, Any]] = None) -> Iterator[None]:
+        """
+        Journal a change, then run the body that writes and commits it.
+
+        Args:
+            table (str): Table being changed; changes to other tables are not journaled.
+            op (str): "insert" (data is the whole row), "upsert" (data is the row to insert
+                or update), "upsert_many" (data is a list of such rows), "update" (data
+                holds the changed columns), "delete", or "delete_where" (data holds the
+                conditions).
+            key_column (str): Primary key column(s) of the row changed.
+            key: Primary key value of the row changed.
+            data (dict): Column values of the change.
+        """
+        with self.logged_batch([change(table, op, key_column, key, data)]):
+            yield
+
+    @contextmanager
+    def logged_batch(self, changes: List[Dict[str, Any]]) -> Iterator[None]:
+        """
+        Journal several changes (built with change()) as one entry, then run the body
+        that writes and commits them in one transaction. Replay applies all or none.
+        Must not be entered with a transaction already open, unless inside locked().
+        """
+        changes = [c for c in changes if c["table"] in self.tables]
+        if not self.enabled or not changes:
+            yield
+            return
+        with self._lock:
+            # Stamped under the lock, so timestamps never go backwards within a segment.
+            if len(changes) == 1:
+                entry = {"ts": time.time(), **changes[0]}
+            else:
+                entry = {"ts": time.time(), "batch": changes}
+            self._append(entry)
+            try:
+                yield
+            except BaseException:
+                self._append({"ts": time.time(), "abort": True})
+                raise
+
+    @contextmanager
+    def locked(self) -> Iterator[None]:
+        """
+        Hold the journal lock for a caller that opens its own transaction and journals
+        writes in it. Enter before BEGIN; logged() and logged_batch() re-enter it.
+        """
+        with self._lock:
+            yield
+
+    def checkpoint(self, name: str) -> None:
+        """
+        Start a new segment for the changes made after backup name begins.
+        """
+        with self._lock:
+            self._open(name)
+
+    def segments(self) -> List[Segment]:
+        """
+        Return all segments, oldest first.
+        """
+        if not os.path.isdir(self.directory):
+            return []
+        segments = []
+        for filename in sorted(os.listdir(self.directory)):
+            if not filename.endswith(".jsonl"):
+                continue
+            path = os.path.join(self.directory, filename)
+            header = next(_read_lines(path), None) or {}
+            segments.append(Segment(path, header.get("checkpoint"), header.get("ts", 0.0)))
+        return segments
+
+    def entries(self, segment: Segment) -> Iterator[Dict[str, Any]]:
+        """
+        Yield the committed changes of segment in the order they were made. Entries
+        followed by an abort line are skipped.
+        """
+        pending = None
+        lines = _read_lines(segment.path)
+        next(lines, None)
+        for line in lines:
+            if line.get("abort"):
+                pending = None
+                continue
+            if pending is not None:
+                yield from _changes(pending)
+            pending = line
+        if pending is not None:
+            yield from _changes(pending)
+
+    def prune(self, oldest_checkpoint: str) -> int:
+        """
+        Delete the segments before the one started by checkpoint oldest_checkpoint,
+        which no remaining backup needs. Returns the number deleted.
+        """
+        with self._lock:
+            segments = self.segments()
+            names = [s.checkpoint for s in segments]
+            if oldest_checkpoint not in names:
+                return 0
+            stale = segments[:names.index(oldest_checkpoint)]
+            for segment in stale:
+                os.remove(segment.path)
+            return len(stale)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def _open(self, checkpoint: Optional[str]) -> None:
+        self.close()
+        os.makedirs(self.directory, exist_ok=True)
+        opened = time.time()
+        stamp = time.time_ns()
+        path = os.path.join(self.directory, f"{stamp:020d}.jsonl")
+        while os.path.exists(path):
+            stamp += 1
+            path = os.path.join(self.directory, f"{stamp:020d}.jsonl")
+        self._file = open(path, "a", encoding="utf-8")
+        self._write({"checkpoint": checkpoint, "ts": opened})
+
+    def _append(self, entry: Dict[str, Any]) -> None:
+        if self._file is None:
+            # A segment opened before any checkpoint in this process continues the last one.
+            self._open(None)
+        self._write(entry)
+
+    def _write(self, entry: Dict[str, Any]) -> None:
+        self._file.write(json.dumps(entry) + "\n")
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+
+def change(table: str, op: str, key_column: Optional[str] = None, key: Any = None,
+           data: Any = None) -> Dict[str, Any]:
+    """
+    Describe one change for logged_batch(); see logged() for the arguments.
+    """
+    return {"table": table, "op": op, "key_column": key_column, "key": key, "data": data}
+
+def _changes(entry: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    if "batch" in entry:
+        for item in entry["batch"]:
+            yield {"ts": entry["ts"], **item}
+    else:
+        yield entry
+
+def _read_lines(path: str) -> Iterator[Dict[str, Any]]:
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                # Only the last line can be torn, by a crash mid-write.
+                logger.warning(f"Ignoring unreadable journal line in {path}.")
+                return
+
+def apply_entry(conn: sqlite3.Connection, entry: Dict[str, Any]) -> None:
+    """
+    Apply one journaled change to conn. Inserts replace any existing row, so applying
+    a change the database already has leaves it unchanged.
+    """
+    table, op, data = entry["table"], entry["op"], entry.get("data") or {}
+    if op == "insert":
+        columns = ", ".join(data.keys())
+        placeholders = ", ".join(["?"] * len(data))
+        conn.execute(f"INSERT OR REPLACE INTO {table} ({columns}) VALUES ({placeholders})",
+                     tuple(data.values()))
+    elif op in ("upsert", "upsert_many"):
+        from db.repository import upsert_sql
+        rows = data if op == "upsert_many" else [data]
+        if rows:
+            columns = tuple(rows[0].keys())
+            conn.executemany(upsert_sql(table, entry["key_column"], columns),
+                             [tuple(row[column] for column in columns) for row in rows])
+    elif op == "update":
+        fields = ", ".join(f"{column} = ?" for column in data.keys())
+        conn.execute(f"UPDATE {table} SET {fields} WHERE {entry['key_column']} = ?",
+                     tuple(data.values()) + (entry["key"],))
+    elif op == "delete":
+        conn.execute(f"DELETE FROM {table} WHERE {entry['key_column']} = ?", (entry["key"],))
+    elif op == "delete_where":
+        conditions = " AND ".join(f"{column} = ?" for column in data.keys())
+        conn.execute(f"DELETE FROM {table} WHERE {conditions}", tuple(data.values()))
+    else:
+        raise ValueError(f"Unknown journal operation {op!r}.")
+
+_journal: Optional[ChangeJournal] = None
+
+def get_change_journal() -> ChangeJournal:
+    """
+    Return the process-wide ChangeJournal, creating it on first use.
+    """
+    global _journal
+    if _journal is None:
+        _journal = ChangeJournal()
+    return _journal
+
+# End of db/journal.py
@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+"""
+db/recovery.py - Point-in-time recovery from backups and the change journal.
+Restores the newest backup finished before the requested time, then replays the journal
+segments from that backup's checkpoint on (see db/journal.py), up to the requested time.
+Only the changes made since the checkpoint are read and applied, however large the
+database is. A new backup is taken afterwards, so later recoveries start from the
+recovered state instead of replaying the history it undid.
+
+Stop the bot before recovering: it would keep writing to the replaced database, and its
+cached user states would not reflect the recovered ones.
+
+Usage:
+    python -m db.recovery --list
+    python -m db.recovery "2025-01-01 12:00:00"
+    python -m db.recovery 1735732800
+"""
+
+import argparse
+import logging
+import sqlite3
+import sys
+from datetime import datetime
+from typing import List, Optional
+
+from core.config import DB_NAME
+from db.backup import backup_time, create_backup, list_backups, restore_backup
+from db.journal import Segment, apply_entry, get_change_journal
+from db.schema import init_db
+
+logger = logging.getLogger(__name__)
+
+def checkpoints(segments: Optional[List[Segment]] = None) -> List[tuple]:
+    """
+    Return (backup name, finished at) for each backup recovery can start from, oldest first.
+    """
+    if segments is None:
+        segments = get_change_journal().segments()
+    backups = set(list_backups())
+    result = []
+    for segment in segments:
+        finished = backup_time(segment.checkpoint) if segment.checkpoint in backups else None
+        if finished is not None:
+            result.append((segment.checkpoint, finished))
+    return result
+
+def restore_to_time(until: float, checkpoint: bool = True) -> bool:
+    """
+    Restore the database to its state at Unix time until.
+
+    Args:
+        until (float): The point in time to recover.
+        checkpoint (bool): If True, take a backup of the recovered database.
+
+    Returns:
+        bool: True if the database was recovered, False if no backup was finished
+            before until or the restore failed.
+    """
+    segments = get_change_journal().segments()
+    usable = {name for name, finished in checkpoints(segments) if finished <= until}
+    base = max((i for i, segment in enumerate(segments) if segment.checkpoint in usable), default=None)
+    if base is None:
+        logger.warning(f"No backup finished before {datetime.fromtimestamp(until)}; cannot recover.")
+        return False
+    name = segments[base].checkpoint
+    if not restore_backup(name):
+        return False
+    try:
+        # A backup from before a schema change lacks tables that later changes write to.
+        init_db()
+        applied = _replay(segments[base:], until)
+    except Exception as e:
+        logger.warning(f"Failed to replay the change journal onto backup '{name}': {e}")
+        return False
+    logger.info(f"Recovered to {datetime.fromtimestamp(until)}: backup '{name}' plus {applied} journaled changes.")
+    if checkpoint:
+        create_backup()
+    return True
+
+def _replay(segments: List[Segment], until: float) -> int:
+    """
+    Apply the journaled changes in segments made at or before until to DB_NAME in one
+    transaction. Returns the number applied.
+    """
+    journal = get_change_journal()
+    applied = 0
+    conn = sqlite3.connect(DB_NAME)
+    try:
+        with conn:
+            for segment in segments:
+                for entry in journal.entries(segment):
+                    if entry["ts"] > until:
+                        return applied
+                    apply_entry(conn, entry)
+                    applied += 1
+        return applied
+    finally:
+        conn.close()
+
+def _parse_time(value: str) -> float:
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m db.recovery",
+                                     description="Recover the database to a point in time.")
+    parser.add_argument("time", nargs="?",
+                        help="Unix timestamp or local ISO date-time (e.g. '2025-01-01 12:00:00')")
+    parser.add_argument("--list", action="store_true", help="list the backups recovery can start from")
+    args = parser.parse_args(argv)
+    if args.list:
+        for name, finished in checkpoints():
+            print(f"{datetime.fromtimestamp(finished).isoformat(sep=' ', timespec='seconds')}  {name}")
+        return 0
+    if args.time is None:
+        parser.print_usage()
+        return 2
+    try:
+        until = _parse_time(args.time)
+    except ValueError:
+        parser.error(f"invalid time: {args.time!r}")
+    return 0 if restore_to_time(until) else 1
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main())
+
+# End of db/recovery.py
@@ -3,12 +3,20 @@
 db/repository.py
 ----------------
 Unified repository code with helpers for database operations.
-Now only includes user states.
+Now only includes user states and their flows.
+All helpers check connections out of the shared pool in db.connection by default.
+BaseRepository writes to journaled tables are recorded in the change journal (db/journal.py).
 """
 
+import functools
+import json
 import sqlite3
 import logging
-from db.connection import get_connection
+import time
+from db.connection import get_pooled_connection
+from db.journal import change, get_change_journal
+from db.schema import is_legacy_state
+from core import metrics
 
 logger = logging.getLogger(__name__)
 
@@ -28,29 +36,44 @@ def execute_sql(query: str, params: tuple = (), commit: bool = False,
         The fetched row(s) if fetch flags are set, else None.
     """
     conn = None
-    try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute(query, params)
-        if fetchone:
-            result = cursor.fetchone()
-        elif fetchall:
-            result = cursor.fetchall()
-        else:
-            result = None
-        if commit:
-            conn.commit()
-        return result
-    except sqlite3.Error as e:
-        logger.error(f"SQL error in execute_sql: {e} | Query: {query}")
-        raise
-    finally:
-        if conn:
-            conn.close()
+    operation = query.lstrip().split(None, 1)[0].upper() if query.strip() else "EMPTY"
+    with metrics.timed(metrics.DB_QUERY_LATENCY, metrics.DB_QUERIES, operation=operation):
+        try:
+            conn = get_pooled_connection()
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            if fetchone:
+                result = cursor.fetchone()
+            elif fetchall:
+                result = cursor.fetchall()
+            else:
+                result = None
+            if commit:
+                conn.commit()
+            return result
+        except sqlite3.Error as e:
+            logger.error(f"SQL error in execute_sql: {e} | Query: {query}")
+            raise
+        finally:
+            if conn:
+                conn.close()
+
+@functools.lru_cache(maxsize=64)
+def upsert_sql(table: str, primary_key: str, columns: tuple) -> str:
+    """
+    Return an INSERT ... ON CONFLICT(primary_key) DO UPDATE statement writing columns.
+    primary_key may list several comma-separated columns for a composite key.
+    """
+    keys = {k.strip() for k in primary_key.split(",")}
+    placeholders = ", ".join(["?"] * len(columns))
+    updates = ", ".join(f"{c} = excluded.{c}" for c in columns if c not in keys)
+    conflict = f"DO UPDATE SET {updates}" if updates else "DO NOTHING"
+    return (f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders}) "
+            f"ON CONFLICT({primary_key}) {conflict}")
 
 class BaseRepository:
     def __init__(self, table_name: str, primary_key: str = "id",
-                 connection_provider=get_connection, external_connection: bool = False):
+                 connection_provider=get_pooled_connection, external_connection: bool = False):
         self.table_name = table_name
         self.primary_key = primary_key
         self.connection_provider = connection_provider
@@ -67,20 +90,62 @@ class BaseRepository:
         query = f"{operator} INTO {self.table_name} ({columns}) VALUES ({placeholders})"
         params = tuple(data.values())
         conn = self.connection_provider()
-        cursor = conn.cursor()
-        cursor.execute(query, params)
-        conn.commit()
-        last_id = cursor.lastrowid
-        self._maybe_close(conn)
+        try:
+            with get_change_journal().logged(self.table_name, "insert", self.primary_key,
+                                             data.get(self.primary_key), data):
+                cursor = conn.cursor()
+                cursor.execute(query, params)
+                conn.commit()
+            last_id = cursor.lastrowid
+        finally:
+            self._maybe_close(conn)
         return last_id
 
+    def upsert(self, data: dict) -> None:
+        """
+        Insert the row, or update its other columns if a row with the same primary key
+        exists, in a single statement.
+        """
+        conn = self.connection_provider()
+        try:
+            with get_change_journal().logged(self.table_name, "upsert", self.primary_key,
+                                             data.get(self.primary_key), data):
+                conn.execute(self._upsert_sql(tuple(data.keys())), tuple(data.values()))
+                conn.commit()
+        finally:
+            self._maybe_close(conn)
+
+    def upsert_many(self, rows: list) -> int:
+        """
+        Upsert every row in one transaction with executemany. All rows must have the
+        same columns. Returns the number of rows written.
+        """
+        if not rows:
+            return 0
+        columns = tuple(rows[0].keys())
+        params = [tuple(row[column] for column in columns) for row in rows]
+        conn = self.connection_provider()
+        try:
+            with get_change_journal().logged(self.table_name, "upsert_many", self.primary_key, data=rows):
+                conn.executemany(self._upsert_sql(columns), params)
+                conn.commit()
+        finally:
+            self._maybe_close(conn)
+        return len(rows)
+
+    def _upsert_sql(self, columns: tuple) -> str:
+        # Always the same text for the same columns, so pooled connections reuse the prepared statement.
+        return upsert_sql(self.table_name, self.primary_key, columns)
+
     def get_by_id(self, id_value):
         query = f"SELECT * FROM {self.table_name} WHERE {self.primary_key} = ?"
         conn = self.connection_provider()
-        cursor = conn.cursor()
-        cursor.execute(query, (id_value,))
-        row = cursor.fetchone()
-        self._maybe_close(conn)
+        try:
+            cursor = conn.cursor()
+            cursor.execute(query, (id_value,))
+            row = cursor.fetchone()
+        finally:
+            self._maybe_close(conn)
         return row
 
     def update(self, id_value, data: dict) -> None:
@@ -88,18 +153,24 @@ class BaseRepository:
         query = f"UPDATE {self.table_name} SET {fields} WHERE {self.primary_key} = ?"
         params = tuple(data.values()) + (id_value,)
         conn = self.connection_provider()
-        cursor = conn.cursor()
-        cursor.execute(query, params)
-        conn.commit()
-        self._maybe_close(conn)
+        try:
+            with get_change_journal().logged(self.table_name, "update", self.primary_key, id_value, data):
+                cursor = conn.cursor()
+                cursor.execute(query, params)
+                conn.commit()
+        finally:
+            self._maybe_close(conn)
 
     def delete(self, id_value) -> None:
         query = f"DELETE FROM {self.table_name} WHERE {self.primary_key} = ?"
         conn = self.connection_provider()
-        cursor = conn.cursor()
-        cursor.execute(query, (id_value,))
-        conn.commit()
-        self._maybe_close(conn)
+        try:
+            with get_change_journal().logged(self.table_name, "delete", self.primary_key, id_value):
+                cursor = conn.cursor()
+                cursor.execute(query, (id_value,))
+                conn.commit()
+        finally:
+            self._maybe_close(conn)
 
     def list_all(self, filters: dict = None, order_by: str = None) -> list:
         query = f"SELECT * FROM {self.table_name}"
@@ -111,10 +182,12 @@ class BaseRepository:
         if order_by:
             query += f" ORDER BY {order_by}"
         conn = self.connection_provider()
-        cursor = conn.cursor()
-        cursor.execute(query, params)
-        rows = cursor.fetchall()
-        self._maybe_close(conn)
+        try:
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            rows = cursor.fetchall()
+        finally:
+            self._maybe_close(conn)
         return rows or []
 
     def delete_by_conditions(self, conditions: dict) -> None:
@@ -122,21 +195,110 @@ class BaseRepository:
         query = f"DELETE FROM {self.table_name} WHERE {cond_str}"
         params = tuple(conditions.values())
         conn = self.connection_provider()
-        cursor = conn.cursor()
-        cursor.execute(query, params)
-        conn.commit()
-        self._maybe_close(conn)
+        try:
+            with get_change_journal().logged(self.table_name, "delete_where", data=conditions):
+                cursor = conn.cursor()
+                cursor.execute(query, params)
+                conn.commit()
+        finally:
+            self._maybe_close(conn)
 
 # --- UserStates Repository (for multi-step flows) ---
 
 class UserStatesRepository(BaseRepository):
     """
-    UserStatesRepository - Manages read/write of the UserStates table, keyed by user_id.
-    The 'flow_state' column stores the JSON state.
+    UserStatesRepository - Manages read/write of user states, keyed by user_id.
+    Each user's flows are rows of the Flows table; UserStates holds the active flow in
+    'active_flow' and any other state keys as JSON in 'flow_state'. Rows not yet
+    migrated from schema version 1 still hold the whole state in 'flow_state'.
     """
-    def __init__(self, connection_provider=get_connection, external_connection=False):
+    def __init__(self, connection_provider=get_pooled_connection, external_connection=False):
         super().__init__("UserStates", primary_key="user_id",
                          connection_provider=connection_provider,
                          external_connection=external_connection)
 
+    def load_state(self, user_id: str):
+        """
+        Return the user's state as {"flows": {...}, "active_flow": ..., ...}, or None if
+        the user has no row. Raises ValueError if the stored JSON is unreadable.
+        """
+        conn = self.connection_provider()
+        try:
+            row = conn.execute(
+                "SELECT flow_state, active_flow FROM UserStates WHERE user_id = ?", (user_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            state = json.loads(row["flow_state"] or "{}")
+            if not isinstance(state, dict) or is_legacy_state(state):
+                # Not migrated yet: the blob holds the whole state.
+                return state
+            flows = conn.execute(
+                "SELECT flow_name, step, data, updated_at FROM Flows WHERE user_id = ?", (user_id,)
+            ).fetchall()
+        finally:
+            self._maybe_close(conn)
+        state["flows"] = {
+            f["flow_name"]: {"step": f["step"], "data": json.loads(f["data"] or "{}"), "updated_at": f["updated_at"]}
+            for f in flows
+        }
+        state["active_flow"] = row["active_flow"]
+        return state
+
+    def save_states(self, states: dict) -> int:
+        """
+        Write each user's state (user_id -> state dict) as its UserStates row and Flows
+        rows, all in one transaction. Returns the number of users written.
+        """
+        if not states:
+            return 0
+        now = time.time()
+        user_rows, flow_rows = [], []
+        for user_id, state in states.items():
+            user_row, flows = state_rows(user_id, state, now)
+            user_rows.append(user_row)
+            flow_rows.extend(flows)
+        changes = [change("UserStates", "upsert_many", "user_id", data=user_rows)]
+        changes.extend(change("Flows", "delete_where", data={"user_id": user_id}) for user_id in states)
+        if flow_rows:
+            changes.append(change("Flows", "upsert_many", FLOWS_KEY, data=flow_rows))
+        conn = self.connection_provider()
+        try:
+            with get_change_journal().logged_batch(changes):
+                conn.executemany(upsert_sql("UserStates", "user_id", USER_STATE_COLUMNS),
+                                 [tuple(r[c] for c in USER_STATE_COLUMNS) for r in user_rows])
+                # A user's flows are replaced as a whole; users have only a handful.
+                conn.executemany("DELETE FROM Flows WHERE user_id = ?", [(user_id,) for user_id in states])
+                if flow_rows:
+                    conn.executemany(upsert_sql("Flows", FLOWS_KEY, FLOW_COLUMNS),
+                                     [tuple(r[c] for c in FLOW_COLUMNS) for r in flow_rows])
+                conn.commit()
+        finally:
+            self._maybe_close(conn)
+        return len(states)
+
+USER_STATE_COLUMNS = ("user_id", "flow_state", "active_flow")
+FLOW_COLUMNS = ("user_id", "flow_name", "step", "data", "updated_at")
+FLOWS_KEY = "user_id, flow_name"
+
+def state_rows(user_id: str, state: dict, now: float):
+    """
+    Split a user state into its UserStates row and its Flows rows. Flows without an
+    updated_at (such as ones migrated from the JSON blob) are stamped with now.
+    """
+    extras = {k: v for k, v in state.items() if k not in ("flows", "active_flow")}
+    user_row = {"user_id": user_id, "flow_state": json.dumps(extras), "active_flow": state.get("active_flow")}
+    flow_rows = [
+        {
+            "user_id": user_id,
+            "flow_name": flow_name,
+            "step": flow.get("step"),
+            "data": json.dumps(flow.get("data") or {}),
+            "updated_at": flow.get("updated_at") or now,
+        }
+        for flow_name, flow in (state.get("flows") or {}).items()
+        if isinstance(flow, dict)
+    ]
+    return user_row, flow_rows
+
 # End of db/repository.py
\ No newline at end of file
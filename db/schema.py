@@ -2,14 +2,38 @@
 """
 db/schema.py --- Database schema initialization for the bot.
 Ensures the SQLite database file exists.
+
+Schema version 2 keeps each user's flows as rows of the Flows table, indexed by
+(flow_name, step), and the active flow in the indexed UserStates.active_flow column,
+instead of one JSON blob per user. init_db creates the new table and column; the blobs
+are then moved over by migrate_flow_states, in small batches while the bot keeps
+running. Until a user's row has been moved, it is read from the blob as before.
 """
 
-from .connection import db_connection
+import asyncio
+import json
+import logging
+from typing import Optional
+
+from core.config import FLOW_MIGRATION_BATCH_SIZE
+from .connection import db_connection, get_pooled_connection
+from .journal import get_change_journal
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_VERSION = 2
+
+# Set once the flow-state migration is known to be complete.
+_flows_migrated = False
 
 def init_db() -> None:
     """
-    init_db - Ensure the SQLite database file exists and has UserStates and SchemaVersion tables.
+    init_db - Ensure the SQLite database file exists and has UserStates, Flows,
+    ConversationTurns, and SchemaVersion tables.
     """
+    global _flows_migrated
+    # The database may have been replaced (e.g. restored from a backup); check again.
+    _flows_migrated = False
     with db_connection() as conn:
         cursor = conn.cursor()
         # UserStates table
@@ -28,14 +52,134 @@ def init_db() -> None:
             cursor.execute("""
             ALTER TABLE UserStates RENAME COLUMN phone TO user_id
             """)
-        # SchemaVersion table
-        cursor.execute("DROP TABLE IF EXISTS SchemaVersion")
+        # active_flow column (schema version 2), indexed for "who is in flow X" lookups
+        if not any(row[1] == 'active_flow' for row in rows):
+            cursor.execute("ALTER TABLE UserStates ADD COLUMN active_flow TEXT")
+        cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_userstates_active_flow
+        ON UserStates (active_flow) WHERE active_flow IS NOT NULL
+        """)
+        # Flows table: one row per user and flow
         cursor.execute("""
-        CREATE TABLE SchemaVersion (
+        CREATE TABLE IF NOT EXISTS Flows (
+            user_id TEXT NOT NULL,
+            flow_name TEXT NOT NULL,
+            step TEXT,
+            data TEXT DEFAULT '{}',
+            updated_at REAL,
+            PRIMARY KEY (user_id, flow_name)
+        ) WITHOUT ROWID
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_flows_name_step ON Flows (flow_name, step)")
+        # ConversationTurns table: chat history per conversation, oldest turn first by seq
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS ConversationTurns (
+            conversation_id TEXT NOT NULL,
+            seq INTEGER NOT NULL,
+            role TEXT NOT NULL,
+            content TEXT NOT NULL,
+            tokens INTEGER NOT NULL,
+            PRIMARY KEY (conversation_id, seq)
+        ) WITHOUT ROWID
+        """)
+        # SchemaVersion table; version 2 is recorded once migrate_flow_states has finished.
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS SchemaVersion (
             version INTEGER PRIMARY KEY
         )
         """)
-        cursor.execute("INSERT INTO SchemaVersion (version) VALUES (1)")
+        cursor.execute("INSERT INTO SchemaVersion (version) SELECT 1 WHERE NOT EXISTS (SELECT 1 FROM SchemaVersion)")
         conn.commit()
 
+def is_legacy_state(state: dict) -> bool:
+    """
+    Return True if a decoded flow_state blob still holds the whole state (schema
+    version 1) rather than only the keys besides flows and the active flow.
+    """
+    return "flows" in state or "active_flow" in state
+
+def schema_version() -> int:
+    """
+    Return the schema version recorded in the database.
+    """
+    with db_connection() as conn:
+        row = conn.execute("SELECT MAX(version) FROM SchemaVersion").fetchone()
+    return row[0] or 0
+
+def flow_states_migrated() -> bool:
+    """
+    Return True once every user's flows have been moved to the Flows table.
+    """
+    global _flows_migrated
+    if not _flows_migrated:
+        _flows_migrated = schema_version() >= SCHEMA_VERSION
+    return _flows_migrated
+
+def migrate_flow_states_batch(after: str = "", batch_size: int = FLOW_MIGRATION_BATCH_SIZE) -> Optional[str]:
+    """
+    Move the flows of the next batch_size users after user_id after out of their JSON
+    blobs, in one transaction. Returns the last user_id of the batch, or None once no
+    users are left, after recording schema version 2.
+    """
+    global _flows_migrated
+    from db.repository import UserStatesRepository
+    conn = get_pooled_connection()
+    # The journal lock comes before SQLite's write lock (see db/journal.py), since
+    # save_states() journals inside this transaction.
+    with get_change_journal().locked():
+        try:
+            # Taking the write lock first means no writer can change these rows mid-batch.
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute(
+                "SELECT user_id, flow_state FROM UserStates WHERE user_id > ? ORDER BY user_id LIMIT ?",
+                (after, max(1, batch_size)),
+            ).fetchall()
+            if not rows:
+                conn.execute("UPDATE SchemaVersion SET version = ?", (SCHEMA_VERSION,))
+                conn.commit()
+                _flows_migrated = True
+                return None
+            states = {}
+            for row in rows:
+                try:
+                    state = json.loads(row["flow_state"] or "{}")
+                except ValueError:
+                    logger.warning(f"Unreadable flow state for {row['user_id']!r}; resetting it.")
+                    state = {"flows": {}}
+                if isinstance(state, dict) and is_legacy_state(state):
+                    states[row["user_id"]] = state
+                elif not isinstance(state, dict):
+                    states[row["user_id"]] = {"flows": {}}
+            repository = UserStatesRepository(connection_provider=lambda: conn, external_connection=True)
+            if not repository.save_states(states):
+                conn.commit()
+            return rows[-1]["user_id"]
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+def migrate_flow_states(batch_size: int = FLOW_MIGRATION_BATCH_SIZE) -> None:
+    """
+    Run the flow-state migration to completion on this thread.
+    """
+    after = ""
+    while not flow_states_migrated() and after is not None:
+        after = migrate_flow_states_batch(after, batch_size)
+
+async def migrate_flow_states_async(batch_size: int = FLOW_MIGRATION_BATCH_SIZE) -> None:
+    """
+    Run the flow-state migration in the background, one batch at a time on the async
+    DB writer thread, so message handling interleaves with it.
+    """
+    from db.async_db import get_async_db
+    after = ""
+    migrated = 0
+    while not flow_states_migrated() and after is not None:
+        after = await get_async_db().run_write(migrate_flow_states_batch, after, batch_size)
+        migrated += 1
+        await asyncio.sleep(0)
+    logger.info(f"Flow states are in the Flows table (schema version {SCHEMA_VERSION}); {migrated} batches migrated.")
+
 # End of db/schema.py
\ No newline at end of file
@@ -14,16 +14,25 @@ import db.schema
 import logging
 from core.bot_orchestrator import BotOrchestrator
 
-from core.transport_discord import DiscordTransport
 from db.backup import create_backup, start_periodic_backups
-from core.config import BACKUP_INTERVAL, DISK_BACKUP_RETENTION_COUNT
+from core.config import BACKUP_INTERVAL, DISK_BACKUP_RETENTION_COUNT, USER_STATE_FLUSH_INTERVAL, BOT_TRANSPORT, METRICS_PORT, METRICS_HOST, LOOP_MONITOR_ENABLED
+from core import metrics
+from core.loop_monitor import get_loop_monitor
 from plugins.manager import load_plugins
+from managers.flow_manager import user_state_cache
+from managers.user_state_cache import run_periodic_flush
+from db.async_db import shutdown_async_db
+from db.schema import flow_states_migrated, migrate_flow_states_async
 
 logger = logging.getLogger(__name__)
 
 async def main() -> None:
     # Initialize the SQLite database (creates tables if they do not exist)
     db.schema.init_db()
+
+    # Move flow states out of the version 1 JSON blobs while the bot serves messages.
+    if not flow_states_migrated():
+        asyncio.create_task(migrate_flow_states_async())
     
     # Create an automatic backup at startup
     backup_path = create_backup()
@@ -34,6 +43,19 @@ async def main() -> None:
         interval_seconds=BACKUP_INTERVAL,
         max_backups=DISK_BACKUP_RETENTION_COUNT))
     
+    # Write cached user-state changes back to the database on an interval.
+    if USER_STATE_FLUSH_INTERVAL > 0:
+        asyncio.create_task(run_periodic_flush(user_state_cache, USER_STATE_FLUSH_INTERVAL))
+
+    # Expose counters and latency histograms for scraping.
+    if METRICS_PORT > 0:
+        metrics.start_http_server(METRICS_PORT, METRICS_HOST)
+        logger.info(f"Metrics available at http://{METRICS_HOST}:{METRICS_PORT}/metrics")
+
+    # Watch for synchronous code blocking the event loop.
+    if LOOP_MONITOR_ENABLED:
+        get_loop_monitor().start()
+
     # Load all plugin modules so that they register their commands.
     load_plugins()
 
@@ -42,9 +64,20 @@ async def main() -> None:
         logger.info("FAST_EXIT_FOR_TESTS is set, stopping early for test.")
         return
     
-    transport = DiscordTransport()
+    if BOT_TRANSPORT == "signal":
+        from core.transport_signal import SignalTransport
+        transport = SignalTransport()
+    else:
+        from core.transport_discord import DiscordTransport
+        transport = DiscordTransport()
     bot = BotOrchestrator(transport)
-    await bot.start()
+    try:
+        await bot.start()
+    finally:
+        # Persist any user-state changes still held in the write-back cache,
+        # then let the async DB writer drain its queue.
+        user_state_cache.flush()
+        shutdown_async_db(wait=True)
 
 if __name__ == "__main__":
     asyncio.run(main())
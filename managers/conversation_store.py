@@ -0,0 +1,254 @@
+#!/usr/bin/env python
+"""
+managers/conversation_store.py
+------------------------------
+Per-user, per-channel chat history with a bounded token budget.
+Each conversation keeps its recent turns in memory as a ring, trimmed from the oldest
+end as turns are added, so its token total never exceeds CONVERSATION_TOKEN_BUDGET and
+it never holds more than CONVERSATION_MAX_TURNS turns. A turn's token count is computed
+once when it is added and stored with it. Building the context for the next request
+reads the ring from its newest end, keeping the turns that fit the budget left after the
+new prompt, so a request never carries more history than fits with it. Only the prompt
+is counted per request, and prompt counts are cached by digest, since the same prompts
+recur; replies rarely do and are counted once, when stored.
+
+Every turn is also written to the ConversationTurns table, so a conversation evicted
+from memory, or one from before a restart, is reloaded from SQLite on its next use. Only
+the newest turns that fit the budget are read back. At most CONVERSATION_CACHE_SIZE
+conversations are kept in memory, evicting the least recently used. Memory is bounded
+by that count times the per-conversation budget, however many users are active.
+Older rows past CONVERSATION_KEEP_TURNS are pruned as new turns are written.
+
+Usage Example:
+    store = get_conversation_store()
+    history = await store.context(conversation_id(ctx), prompt)
+    ...
+    await store.add_exchange(conversation_id(ctx), prompt, reply)
+"""
+
+import logging
+import hashlib
+from collections import OrderedDict, deque
+from functools import lru_cache
+from typing import Any, Callable, Deque, Dict, List, NamedTuple, Optional
+
+from core.api import db_api, async_db_api
+from core.config import (
+    CONVERSATION_CACHE_SIZE,
+    CONVERSATION_MAX_TURNS,
+    CONVERSATION_TOKEN_BUDGET,
+    CONVERSATION_KEEP_TURNS,
+)
+from core.utils.user_helpers import extract_user_id
+
+logger = logging.getLogger(__name__)
+
+# Tokens a chat API spends on each message besides its content (role and separators).
+_TURN_OVERHEAD = 4
+
+# Prompt token counts kept per store.
+_PROMPT_CACHE_SIZE = 4096
+
+class Turn(NamedTuple):
+    role: str
+    content: str
+    tokens: int
+
+@lru_cache(maxsize=1)
+def _encoder():
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("o200k_base")
+    except Exception:
+        # tiktoken is optional, and its encoding files may not be downloadable.
+        return None
+
+def count_tokens(text: str) -> int:
+    """
+    Return the number of tokens in text: exact with tiktoken installed, otherwise
+    estimated at four characters per token.
+    """
+    encoder = _encoder()
+    if encoder is None:
+        return (len(text) + 3) // 4
+    return len(encoder.encode(text))
+
+class PromptTokenCache:
+    """
+    PromptTokenCache - LRU of token counts keyed by a digest of the text, so its memory
+    is bounded by max_size however long the texts are.
+
+    Args:
+        counter (callable): Returns the token count of a text.
+        max_size (int): Counts kept.
+    """
+    def __init__(self, counter: Callable[[str], int], max_size: int = _PROMPT_CACHE_SIZE):
+        self.counter = counter
+        self.max_size = max(1, max_size)
+        self._counts: "OrderedDict[bytes, int]" = OrderedDict()
+
+    def __call__(self, text: str) -> int:
+        key = hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+        count = self._counts.get(key)
+        if count is None:
+            count = self._counts[key] = self.counter(text)
+            if len(self._counts) > self.max_size:
+                self._counts.popitem(last=False)
+        else:
+            self._counts.move_to_end(key)
+        return count
+
+def conversation_id(ctx: Any) -> str:
+    """
+    Return the key of the conversation ctx belongs to: its sender within its channel.
+    """
+    channel = getattr(getattr(ctx, "channel", None), "id", None)
+    return f"{channel}:{extract_user_id(ctx)}"
+
+class _Conversation:
+    __slots__ = ("turns", "tokens")
+
+    def __init__(self):
+        self.turns: Deque[Turn] = deque()
+        self.tokens = 0
+
+class ConversationStore:
+    """
+    ConversationStore - LRU of per-conversation turn rings backed by SQLite.
+
+    Args:
+        max_conversations (int): Conversations kept in memory.
+        max_turns (int): Turns kept per conversation.
+        token_budget (int): Tokens of history kept per conversation.
+        keep_turns (int): Turns kept in SQLite per conversation (0 keeps all).
+        counter (callable): Returns the token count of a text; prompt counts are cached.
+    """
+    def __init__(self, max_conversations: int = CONVERSATION_CACHE_SIZE,
+                 max_turns: int = CONVERSATION_MAX_TURNS,
+                 token_budget: int = CONVERSATION_TOKEN_BUDGET,
+                 keep_turns: int = CONVERSATION_KEEP_TURNS,
+                 counter: Callable[[str], int] = count_tokens):
+        self.max_conversations = max(1, max_conversations)
+        self.max_turns = max(1, max_turns)
+        self.token_budget = token_budget
+        self.keep_turns = keep_turns
+        self._counter = counter
+        self._prompt_counter = PromptTokenCache(counter)
+        self._conversations: "OrderedDict[str, _Conversation]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._conversations)
+
+    @property
+    def memory_tokens(self) -> int:
+        """
+        Tokens of history held in memory across all conversations.
+        """
+        return sum(c.tokens for c in self._conversations.values())
+
+    async def context(self, conversation: str, prompt: Optional[str] = None) -> List[Dict[str, str]]:
+        """
+        Return the conversation's newest history that fits the token budget, after
+        reserving room for prompt if given, oldest first, as chat messages
+        ({"role": ..., "content": ...}). A reply whose prompt does not fit is left out.
+        """
+        convo = await self._get(conversation)
+        available = self.token_budget
+        if prompt is not None:
+            available -= self._prompt_counter(prompt) + _TURN_OVERHEAD
+        turns = []
+        for turn in reversed(convo.turns):
+            available -= turn.tokens
+            if available < 0:
+                break
+            turns.append(turn)
+        if turns and turns[-1].role == "assistant":
+            turns.pop()
+        return [{"role": turn.role, "content": turn.content} for turn in reversed(turns)]
+
+    async def add_exchange(self, conversation: str, prompt: str, reply: str) -> None:
+        """
+        Record a user prompt and the reply to it, in memory and in the database.
+        """
+        convo = await self._get(conversation)
+        turns = [self._turn("user", prompt), self._turn("assistant", reply)]
+        for turn in turns:
+            convo.turns.append(turn)
+            convo.tokens += turn.tokens
+        self._trim(convo)
+        try:
+            await async_db_api.run_transaction(lambda conn: self._write(conn, conversation, turns))
+        except Exception as e:
+            logger.warning(f"Failed to store conversation turns for {conversation!r}: {e}")
+
+    async def forget(self, conversation: str) -> None:
+        """
+        Delete the conversation's history from memory and the database.
+        """
+        self._conversations.pop(conversation, None)
+        await async_db_api.execute_query(
+            "DELETE FROM ConversationTurns WHERE conversation_id = ?", (conversation,), commit=True
+        )
+
+    def _turn(self, role: str, content: str) -> Turn:
+        counter = self._prompt_counter if role == "user" else self._counter
+        return Turn(role, content, counter(content) + _TURN_OVERHEAD)
+
+    def _trim(self, convo: _Conversation) -> None:
+        while convo.turns and (convo.tokens > self.token_budget or len(convo.turns) > self.max_turns):
+            convo.tokens -= convo.turns.popleft().tokens
+
+    async def _get(self, conversation: str) -> _Conversation:
+        convo = self._conversations.get(conversation)
+        if convo is not None:
+            self._conversations.move_to_end(conversation)
+            return convo
+        # Read on the writer thread, so turns of this conversation still being written are seen.
+        rows = await async_db_api.run_in_writer(self._read, conversation)
+        convo = self._conversations.get(conversation)
+        if convo is None:
+            convo = _Conversation()
+            for row in rows:
+                if convo.tokens + row["tokens"] > self.token_budget:
+                    break
+                convo.turns.appendleft(Turn(row["role"], row["content"], row["tokens"]))
+                convo.tokens += row["tokens"]
+            self._conversations[conversation] = convo
+            while len(self._conversations) > self.max_conversations:
+                self._conversations.popitem(last=False)
+        self._conversations.move_to_end(conversation)
+        return convo
+
+    def _read(self, conversation: str) -> List[Dict[str, Any]]:
+        return db_api.fetch_all(
+            "SELECT role, content, tokens FROM ConversationTurns WHERE conversation_id = ? "
+            "ORDER BY seq DESC LIMIT ?",
+            (conversation, self.max_turns),
+        )
+
+    def _write(self, conn, conversation: str, turns: List[Turn]) -> None:
+        for turn in turns:
+            conn.execute(
+                "INSERT INTO ConversationTurns (conversation_id, seq, role, content, tokens) "
+                "VALUES (?, (SELECT COALESCE(MAX(seq), 0) + 1 FROM ConversationTurns WHERE conversation_id = ?), ?, ?, ?)",
+                (conversation, conversation, turn.role, turn.content, turn.tokens),
+            )
+        if self.keep_turns > 0:
+            conn.execute(
+                "DELETE FROM ConversationTurns WHERE conversation_id = ? AND seq <= "
+                "(SELECT MAX(seq) FROM ConversationTurns WHERE conversation_id = ?) - ?",
+                (conversation, conversation, self.keep_turns),
+            )
+
+_store: Optional[ConversationStore] = None
+
+def get_conversation_store() -> ConversationStore:
+    """
+    Return the process-wide ConversationStore, creating it on first use.
+    """
+    global _store
+    if _store is None:
+        _store = ConversationStore()
+    return _store
+
+# End of managers/conversation_store.py
@@ -4,13 +4,23 @@ managers/flow_manager.py
 ------------------------
 Consolidated domain logic for multi-step volunteer flows and user states.
 All flow and user state management is now centralized here, including welcome state.
+User states are read and written through a shared in-process LRU cache (see
+managers/user_state_cache.py) and flushed to the DB on an interval.
+Each flow is stored as a row of the Flows table (see db/schema.py), so questions about
+all users, such as who is in a flow or how many users are at each step, are answered
+with indexed queries instead of decoding every user's state.
 """
 
+import copy
 import logging
-import json
-from typing import Optional, Dict
+import time
+from typing import Optional, Dict, List
 
-from core.api import db_api
+from core.api import db_api, async_db_api
+from core.config import USER_STATE_CACHE_SIZE, USER_STATE_FLUSH_INTERVAL
+from db.repository import UserStatesRepository
+from db.schema import flow_states_migrated, migrate_flow_states
+from managers.user_state_cache import UserStateCache
 
 logger = logging.getLogger(__name__)
 
@@ -22,6 +32,9 @@ class FlowManager:
       - start_flow, pause_flow, resume_flow
       - get_active_flow, handle_flow_input, list_flows
       - has_seen_welcome, mark_welcome_seen
+      - users_in_flow, count_users_by_step, count_active_flows
+      - flush_user_states, invalidate_user_state
+      - *_async variants of the above for use on the event loop
     All state operations are centralized here.
     """
 
@@ -68,17 +81,46 @@ class FlowManager:
         """
         Return a dictionary with "active_flow" and "flows" from the user state.
         """
-        user_state = self._load_flows_and_active(user_id)
-        results = {}
-        for flow_name, flow_info in user_state["flows"].items():
-            results[flow_name] = {
-                "step": flow_info.get("step"),
-                "data_count": len(flow_info.get("data", {}))
-            }
-        return {
-            "active_flow": user_state["active_flow"],
-            "flows": results
-        }
+        return self._summarize_flows(user_state_cache.peek(user_id))
+
+    # --------------------------------------------------------
+    # Public Aggregate Queries
+    # --------------------------------------------------------
+    # These read the Flows table and UserStates.active_flow through their indexes.
+    # Cached changes are flushed first, so the results include them.
+    def users_in_flow(self, flow_name: str, step: Optional[str] = None) -> List[str]:
+        """
+        Return the IDs of users who have the flow, optionally only those at step.
+        """
+        self._prepare_aggregate_query()
+        if step is None:
+            rows = db_api.fetch_all("SELECT user_id FROM Flows WHERE flow_name = ? ORDER BY user_id", (flow_name,))
+        else:
+            rows = db_api.fetch_all(
+                "SELECT user_id FROM Flows WHERE flow_name = ? AND step = ? ORDER BY user_id", (flow_name, step)
+            )
+        return [row["user_id"] for row in rows]
+
+    def count_users_by_step(self, flow_name: str) -> Dict[str, int]:
+        """
+        Return how many users are at each step of the flow.
+        """
+        self._prepare_aggregate_query()
+        rows = db_api.fetch_all(
+            "SELECT step, COUNT(*) AS users FROM Flows WHERE flow_name = ? GROUP BY step", (flow_name,)
+        )
+        return {row["step"]: row["users"] for row in rows}
+
+    def count_active_flows(self) -> Dict[str, int]:
+        """
+        Return how many users currently have each flow active.
+        """
+        self._prepare_aggregate_query()
+        rows = db_api.fetch_all(
+            "SELECT active_flow, COUNT(*) AS users FROM UserStates "
+            "WHERE active_flow IS NOT NULL GROUP BY active_flow"
+        )
+        return {row["active_flow"]: row["users"] for row in rows}
 
     # --------------------------------------------------------
     # Public Welcome-Tracking Methods
@@ -87,7 +129,7 @@ class FlowManager:
         """
         Return True if the user has previously seen the welcome message, otherwise False.
         """
-        user_state = self._load_flows_and_active(user_id)
+        user_state = user_state_cache.peek(user_id)
         return user_state.get("has_seen_start", False)
 
     def mark_welcome_seen(self, user_id: str) -> None:
@@ -98,6 +140,96 @@ class FlowManager:
         user_state["has_seen_start"] = True
         self._save_user_state(user_id, user_state)
 
+    # --------------------------------------------------------
+    # Public Async Methods
+    # --------------------------------------------------------
+    # Awaitable variants for code on the event loop. Cache hits are plain dictionary
+    # lookups; misses and writes run on the async DB layer's worker threads.
+    async def start_flow_async(self, user_id: str, flow_name: str) -> None:
+        """
+        Awaitable version of start_flow.
+        """
+        user_state = copy.deepcopy(await self._peek_async(user_id))
+        self._apply_create(user_state, flow_name)
+        await self._save_user_state_async(user_id, user_state)
+
+    async def pause_flow_async(self, user_id: str, flow_name: str) -> None:
+        """
+        Awaitable version of pause_flow.
+        """
+        user_state = copy.deepcopy(await self._peek_async(user_id))
+        if self._apply_pause(user_state, flow_name):
+            await self._save_user_state_async(user_id, user_state)
+
+    async def resume_flow_async(self, user_id: str, flow_name: str) -> None:
+        """
+        Awaitable version of resume_flow.
+        """
+        user_state = copy.deepcopy(await self._peek_async(user_id))
+        if self._apply_resume(user_state, flow_name):
+            await self._save_user_state_async(user_id, user_state)
+
+    async def get_active_flow_async(self, user_id: str) -> Optional[str]:
+        """
+        Awaitable version of get_active_flow.
+        """
+        return (await self._peek_async(user_id))["active_flow"]
+
+    async def handle_flow_input_async(self, user_id: str, user_input: str) -> str:
+        """
+        Awaitable version of handle_flow_input.
+        """
+        flow_name = await self.get_active_flow_async(user_id)
+        if not flow_name:
+            return ""
+        logger.info(f"Unknown flow '{flow_name}' with input '{user_input}'. Pausing.")
+        await self.pause_flow_async(user_id, flow_name)
+        return ""
+
+    async def list_flows_async(self, user_id: str) -> dict:
+        """
+        Awaitable version of list_flows.
+        """
+        return self._summarize_flows(await self._peek_async(user_id))
+
+    async def has_seen_welcome_async(self, user_id: str) -> bool:
+        """
+        Awaitable version of has_seen_welcome.
+        """
+        return (await self._peek_async(user_id)).get("has_seen_start", False)
+
+    async def mark_welcome_seen_async(self, user_id: str) -> None:
+        """
+        Awaitable version of mark_welcome_seen.
+        """
+        user_state = copy.deepcopy(await self._peek_async(user_id))
+        user_state["has_seen_start"] = True
+        await self._save_user_state_async(user_id, user_state)
+
+    async def users_in_flow_async(self, flow_name: str, step: Optional[str] = None) -> List[str]:
+        """
+        Awaitable version of users_in_flow, run on the ordered DB writer thread.
+        """
+        return await async_db_api.run_in_writer(self.users_in_flow, flow_name, step)
+
+    async def count_users_by_step_async(self, flow_name: str) -> Dict[str, int]:
+        """
+        Awaitable version of count_users_by_step.
+        """
+        return await async_db_api.run_in_writer(self.count_users_by_step, flow_name)
+
+    async def count_active_flows_async(self) -> Dict[str, int]:
+        """
+        Awaitable version of count_active_flows.
+        """
+        return await async_db_api.run_in_writer(self.count_active_flows)
+
+    async def flush_user_states_async(self) -> int:
+        """
+        Awaitable version of flush_user_states, run on the ordered DB writer thread.
+        """
+        return await async_db_api.run_in_writer(user_state_cache.flush)
+
     # --------------------------------------------------------
         # On the 'confirm' step, if user says 'delete', perform deletion.
         # Otherwise, cancel deletion.
@@ -108,31 +240,63 @@ class FlowManager:
         Create or reset a flow in the user's state and make it active.
         """
         user_state = self._load_flows_and_active(user_id)
-        user_state["flows"][flow_name] = {
-            "step": start_step,
-            "data": initial_data if initial_data else {}
-        }
-        user_state["active_flow"] = flow_name
+        self._apply_create(user_state, flow_name, start_step, initial_data)
         self._save_user_state(user_id, user_state)
 
     def _pause_flow_state(self, user_id: str, flow_name: str):
         user_state = self._load_flows_and_active(user_id)
-        if user_state["active_flow"] == flow_name:
-            user_state["active_flow"] = None
+        if self._apply_pause(user_state, flow_name):
             self._save_user_state(user_id, user_state)
 
     def _resume_flow_state(self, user_id: str, flow_name: str):
         user_state = self._load_flows_and_active(user_id)
+        if self._apply_resume(user_state, flow_name):
+            self._save_user_state(user_id, user_state)
+
+    # --------------------------------------------------------
+    # State Transforms (shared by sync and async paths)
+    # --------------------------------------------------------
+    @staticmethod
+    def _apply_create(user_state: dict, flow_name: str, start_step: str = "start", initial_data: dict = None) -> None:
+        user_state["flows"][flow_name] = {
+            "step": start_step,
+            "data": initial_data if initial_data else {},
+            "updated_at": time.time()
+        }
+        user_state["active_flow"] = flow_name
+
+    @staticmethod
+    def _apply_pause(user_state: dict, flow_name: str) -> bool:
+        if user_state["active_flow"] == flow_name:
+            user_state["active_flow"] = None
+            return True
+        return False
+
+    @staticmethod
+    def _apply_resume(user_state: dict, flow_name: str) -> bool:
         if flow_name in user_state["flows"]:
             user_state["active_flow"] = flow_name
-            self._save_user_state(user_id, user_state)
+            return True
+        return False
+
+    @staticmethod
+    def _summarize_flows(user_state: dict) -> dict:
+        results = {}
+        for flow_name, flow_info in user_state["flows"].items():
+            results[flow_name] = {
+                "step": flow_info.get("step"),
+                "data_count": len(flow_info.get("data", {}))
+            }
+        return {
+            "active_flow": user_state["active_flow"],
+            "flows": results
+        }
 
     def _get_active_flow_state(self, user_id: str) -> Optional[str]:
-        user_state = self._load_flows_and_active(user_id)
-        return user_state["active_flow"]
+        return user_state_cache.peek(user_id)["active_flow"]
 
     def _get_flow_step(self, user_id: str, flow_name: str) -> str:
-        user_state = self._load_flows_and_active(user_id)
+        user_state = user_state_cache.peek(user_id)
         flow = user_state["flows"].get(flow_name)
         if not flow:
             return ""
@@ -144,50 +308,117 @@ class FlowManager:
         if not flow:
             return
         flow["step"] = step
+        flow["updated_at"] = time.time()
         self._save_user_state(user_id, user_state)
 
+    # --------------------------------------------------------
+    # Cache Maintenance
+    # --------------------------------------------------------
+    def flush_user_states(self) -> int:
+        """
+        Persist all cached user states that have changed since the last flush.
+        Returns the number of users written.
+        """
+        return user_state_cache.flush()
+
+    def invalidate_user_state(self, user_id: Optional[str] = None) -> None:
+        """
+        Drop the cached state for user_id (or for every user if None) so the next
+        read comes from the database. Use after writing UserStates outside FlowManager.
+        """
+        user_state_cache.invalidate(user_id)
+
     # --------------------------------------------------------
     # Private User State Persistence
     # --------------------------------------------------------
-    def _get_user_state_row(self, user_id: str) -> Optional[Dict[str, any]]:
+    def _prepare_aggregate_query(self) -> None:
         """
-        Internal helper to retrieve the user's state row from the DB.
-        Returns a dict or None.
+        Make the tables answer for every user: write cached changes, and finish the
+        flow-state migration if it is still running.
         """
-        query = "SELECT user_id, flow_state FROM UserStates WHERE user_id = ?"
-        return db_api.fetch_one(query, (user_id,))
+        self.flush_user_states()
+        if not flow_states_migrated():
+            migrate_flow_states()
 
     def _save_user_state(self, user_id: str, state_data: dict) -> None:
         """
-        Insert or update the user's state row in the DB.
+        Store the user's state in the shared cache. It is written to the DB on the
+        next flush, or immediately when USER_STATE_FLUSH_INTERVAL is 0.
         """
-        encoded = json.dumps(state_data)
-        existing = self._get_user_state_row(user_id)
-        if existing:
-            query = "UPDATE UserStates SET flow_state = ? WHERE user_id = ?"
-            db_api.execute_query(query, (encoded, user_id), commit=True)
-        else:
-            data = {"user_id": user_id, "flow_state": encoded}
-            db_api.insert_record("UserStates", data)
+        user_state_cache.put(user_id, state_data)
 
     def _load_flows_and_active(self, user_id: str) -> dict:
         """
-        Parse the user's flow_state JSON into a dict with:
+        Return a private copy of the user's state with:
           { "flows": {...}, "active_flow": None or <flow_name> }
         """
-        row = self._get_user_state_row(user_id)
-        if not row:
-            return {"flows": {}, "active_flow": None}
+        return user_state_cache.get(user_id)
+
+    async def _peek_async(self, user_id: str) -> dict:
+        """
+        Return the cached (read-only) state, loading it on a reader thread on a miss.
+        A dirty entry evicted to make room is written on the writer thread.
+        """
+        user_state = user_state_cache.lookup(user_id)
+        if user_state is None:
+            user_state = await async_db_api.run_in_reader(user_state_cache.peek, user_id, write_evicted=False)
+        if user_state_cache.has_evicted():
+            await async_db_api.run_in_writer(user_state_cache.write_evicted)
+        return user_state
+
+    async def _save_user_state_async(self, user_id: str, state_data: dict) -> None:
+        """
+        Store the user's state without blocking the event loop. Any DB write it
+        triggers (write-through mode or an evicted dirty entry) runs on the writer thread.
+        """
+        if user_state_cache.write_through:
+            await async_db_api.run_in_writer(user_state_cache.put, user_id, state_data)
+            return
+        user_state_cache.put(user_id, state_data, write_evicted=False)
+        if user_state_cache.has_evicted():
+            await async_db_api.run_in_writer(user_state_cache.write_evicted)
+
+    def _read_user_state(self, user_id: str) -> dict:
+        """
+        Load the user's state from the DB into a dict with "flows" and "active_flow"
+        keys. Used as the cache loader.
+        """
         try:
-            parsed = json.loads(row["flow_state"])
-            if not isinstance(parsed, dict):
-                return {"flows": {}, "active_flow": None}
-            if "flows" not in parsed or not isinstance(parsed["flows"], dict):
-                parsed["flows"] = {}
-            if "active_flow" not in parsed:
-                parsed["active_flow"] = None
-            return parsed
-        except Exception:
+            parsed = _user_states.load_state(user_id)
+        except ValueError:
+            return {"flows": {}, "active_flow": None}
+        if not isinstance(parsed, dict):
             return {"flows": {}, "active_flow": None}
+        if "flows" not in parsed or not isinstance(parsed["flows"], dict):
+            parsed["flows"] = {}
+        if "active_flow" not in parsed:
+            parsed["active_flow"] = None
+        return parsed
+
+    def _write_user_state(self, user_id: str, state_data: dict) -> None:
+        """
+        Write the user's UserStates and Flows rows in one transaction. Used as the
+        cache writer.
+        """
+        _user_states.save_states({user_id: state_data})
+
+    def _write_user_states(self, states: Dict[str, dict]) -> None:
+        """
+        Write many users' states in one transaction. Used as the cache's batch writer.
+        """
+        _user_states.save_states(states)
+
+_user_states = UserStatesRepository()
+
+# Shared by every FlowManager instance (and therefore by flow_state_api and
+# user_state_api), so all readers and writers see the same cached state.
+_persistence = FlowManager()
+user_state_cache = UserStateCache(
+    USER_STATE_CACHE_SIZE,
+    loader=_persistence._read_user_state,
+    writer=_persistence._write_user_state,
+    batch_writer=_persistence._write_user_states,
+    write_through=USER_STATE_FLUSH_INTERVAL <= 0
+)
 
 # End of managers/flow_manager.py
\ No newline at end of file
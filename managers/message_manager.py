@@ -16,8 +16,9 @@ if TYPE_CHECKING:
     from parsers.message_parser import ParsedMessage
 
 import logging
+from core import metrics, tracing
 from core.state import BotStateMachine
-from core.api.flow_state_api import get_active_flow
+from core.api.flow_state_api import get_active_flow_async, handle_flow_input_async
 from plugins.manager import dispatch_message
 
 logger = logging.getLogger(__name__)
@@ -40,29 +41,34 @@ class MessageManager:
         If so, route the message to that flow and return its response.
         Otherwise, dispatch the message to the recognized plugin command.
         'ctx' is the Discord context (e.g., discord.Message).
-        Returns a single string response (or an empty string if no response).
-        Always returns an awaitable.
+        Returns a single string response (or an empty string if no response), or an
+        async iterator of text parts when the plugin streams its reply.
+        Always returns an awaitable. Flow-state lookups use the async DB layer,
+        so a cache miss never blocks the event loop on SQLite.
         """
         sender_id = extract_user_id(ctx)
-        # 1) Check if the user is in an active flow
-        active_flow = get_active_flow(sender_id)
-        if active_flow:
-            from managers.flow_manager import FlowManager
-            fm = FlowManager()
-            resp = fm.handle_flow_input(sender_id, parsed.body or "")
-            return resp
+        with metrics.timed(metrics.MESSAGE_LATENCY, metrics.MESSAGES_PROCESSED, route="flow") as labels:
+            # 1) Check if the user is in an active flow
+            with tracing.span("flow_check"):
+                active_flow = await get_active_flow_async(sender_id)
+            if active_flow:
+                with tracing.span("flow"):
+                    resp = await handle_flow_input_async(sender_id, parsed.body or "")
+                return resp
 
-        # 2) If not in a flow, check for a plugin command and dispatch it
-        if parsed.command:
-            resp = await dispatch_message(parsed, ctx, self.state_machine)
-            return resp or ""
+            # 2) If not in a flow, check for a plugin command and dispatch it
+            if parsed.command:
+                labels["route"] = "command"
+                resp = await dispatch_message(parsed, ctx, self.state_machine)
+                return resp or ""
 
-        # 3) Fallback: call chat plugin for idle chatter
-        resp = await dispatch_message(
-            dc_replace(parsed, command="chat", args=parsed.body or ""),
-            ctx,
-            self.state_machine
-        )
-        return resp or ""
+            # 3) Fallback: call chat plugin for idle chatter
+            labels["route"] = "chat"
+            resp = await dispatch_message(
+                dc_replace(parsed, command="chat", args=parsed.body or ""),
+                ctx,
+                self.state_machine
+            )
+            return resp or ""
 
 # End of managers/message_manager.py
\ No newline at end of file
@@ -0,0 +1,283 @@
+#!/usr/bin/env python
+"""
+managers/user_state_cache.py
+----------------------------
+Size-bounded LRU cache of decoded user states with write-back persistence.
+FlowManager reads and writes user state through one shared instance, so repeated
+lookups for the same user (such as the active-flow check made for every message)
+are served from memory instead of the database.
+
+Modified entries are marked dirty and written by flush(), which runs on an interval
+via run_periodic_flush() and once more at shutdown. Evicting a dirty entry writes it
+first, so no change is lost when the cache is full. Given a batch writer, a flush
+writes all dirty entries in one transaction.
+
+The map lock is never held during storage I/O, so an event-loop thread doing a
+lookup() is never stalled behind a load or write running in a worker thread.
+A separate write lock orders all writes, so an older snapshot never lands after a
+newer one.
+"""
+
+import asyncio
+import copy
+import logging
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# Reload attempts before giving up on a load that keeps racing with evictions.
+_MAX_LOAD_ATTEMPTS = 3
+
+class UserStateCache:
+    """
+    UserStateCache - LRU mapping of user_id -> decoded state dict.
+
+    Args:
+        max_size (int): Maximum number of users kept in memory.
+        loader (Callable[[str], dict]): Reads and decodes a user's state from storage.
+        writer (Callable[[str, dict], None]): Encodes and persists a user's state.
+        batch_writer (Callable[[Dict[str, dict]], None]): Persists many users' states in one
+            transaction. Optional; flushes fall back to writer one user at a time without it.
+        write_through (bool): If True, put() persists immediately instead of deferring to flush().
+    """
+    def __init__(self, max_size: int,
+                 loader: Callable[[str], dict],
+                 writer: Callable[[str, dict], None],
+                 batch_writer: Optional[Callable[[Dict[str, dict]], None]] = None,
+                 write_through: bool = False):
+        self.max_size = max(1, max_size)
+        self.write_through = write_through
+        self._loader = loader
+        self._writer = writer
+        self._batch_writer = batch_writer
+        self._entries: "OrderedDict[str, dict]" = OrderedDict()
+        self._dirty: Set[str] = set()
+        # Dirty states pushed out of _entries and not yet written; still readable.
+        self._evicted: Dict[str, dict] = {}
+        self._drops = 0
+        self._lock = threading.RLock()
+        self._write_lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, user_id: str) -> Optional[dict]:
+        """
+        Return the cached state for read-only use, or None on a miss. Never touches storage.
+        """
+        with self._lock:
+            state = self._entries.get(user_id)
+            if state is not None:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return state
+            state = self._evicted.get(user_id)
+            if state is not None:
+                self._insert(user_id, state, dirty=True)
+                self.hits += 1
+            return state
+
+    def peek(self, user_id: str, write_evicted: bool = True) -> dict:
+        """
+        Return the cached state for read-only use, loading it on a miss.
+        Callers must not mutate the returned dict; use get() for a private copy.
+
+        Args:
+            write_evicted (bool): If False, dirty entries evicted to make room are left
+                for the caller to persist via write_evicted(), as with put().
+        """
+        for attempt in range(_MAX_LOAD_ATTEMPTS):
+            state = self.lookup(user_id)
+            if state is not None:
+                return state
+            with self._lock:
+                self.misses += 1
+                drops_before = self._drops
+            loaded = self._loader(user_id)
+            with self._lock:
+                state = self._entries.get(user_id)
+                if state is None:
+                    state = self._evicted.get(user_id)
+                if state is not None:
+                    return state
+                # If an entry was evicted or invalidated while loading, its write may
+                # have landed after our read; load again rather than cache stale data.
+                if self._drops == drops_before or attempt == _MAX_LOAD_ATTEMPTS - 1:
+                    self._insert(user_id, loaded, dirty=False)
+                    break
+        if write_evicted:
+            self._write_evicted()
+        return loaded
+
+    def get(self, user_id: str) -> dict:
+        """
+        Return a private copy of the user's state that the caller may modify and put() back.
+        """
+        return copy.deepcopy(self.peek(user_id))
+
+    def put(self, user_id: str, state: dict, write_evicted: bool = True) -> None:
+        """
+        Store the user's new state. The write is persisted on the next flush(),
+        or immediately when the cache is in write-through mode.
+
+        Args:
+            write_evicted (bool): If False, dirty entries evicted to make room are left
+                for the caller to persist via write_evicted() (e.g., from a worker thread).
+        """
+        if self.write_through:
+            with self._write_lock:
+                with self._lock:
+                    self._evicted.pop(user_id, None)
+                    self._insert(user_id, state, dirty=False)
+                self._writer(user_id, state)
+        else:
+            with self._lock:
+                self._evicted.pop(user_id, None)
+                self._insert(user_id, state, dirty=True)
+        if write_evicted:
+            self._write_evicted()
+
+    def invalidate(self, user_id: Optional[str] = None) -> None:
+        """
+        Drop one user (or every user if user_id is None) from the cache so the next
+        read comes from storage. Pending writes for dropped users are flushed first.
+        """
+        with self._lock:
+            targets = [user_id] if user_id is not None else list(self._entries.keys())
+            for uid in targets:
+                self._drop(uid)
+        self._write_evicted()
+
+    def flush(self) -> int:
+        """
+        Persist every dirty entry. Returns the number of users written.
+        Entries that fail to write stay dirty and are retried on the next flush.
+        """
+        with self._write_lock:
+            with self._lock:
+                pending: Dict[str, dict] = {uid: self._entries[uid] for uid in self._dirty}
+                self._dirty.clear()
+            if self._write_batch(pending):
+                return len(pending) + self._write_evicted()
+            written = 0
+            for uid, state in pending.items():
+                try:
+                    self._writer(uid, state)
+                    written += 1
+                except Exception as e:
+                    logger.warning(f"Failed to flush user state for {uid!r}: {e}")
+                    with self._lock:
+                        if self._entries.get(uid) is state:
+                            self._dirty.add(uid)
+                        elif uid not in self._entries and uid not in self._evicted:
+                            self._evicted[uid] = state
+            return written + self._write_evicted()
+
+    def write_evicted(self) -> int:
+        """
+        Persist dirty entries that were evicted with put(write_evicted=False).
+        Returns the number of users written.
+        """
+        return self._write_evicted()
+
+    def has_evicted(self) -> bool:
+        """
+        Return True if evicted entries are waiting to be written.
+        """
+        return bool(self._evicted)
+
+    def clear(self) -> None:
+        """
+        Flush pending writes and empty the cache.
+        """
+        self.invalidate(None)
+
+    def dirty_count(self) -> int:
+        """
+        Return the number of users with changes not yet persisted.
+        """
+        with self._lock:
+            return len(self._dirty) + len(self._evicted)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def _insert(self, uid: str, state: dict, dirty: bool) -> None:
+        self._entries[uid] = state
+        self._entries.move_to_end(uid)
+        if dirty:
+            self._dirty.add(uid)
+        while len(self._entries) > self.max_size:
+            self._drop(next(iter(self._entries)))
+
+    def _drop(self, uid: str) -> None:
+        state = self._entries.pop(uid, None)
+        if state is None:
+            return
+        self._drops += 1
+        if uid in self._dirty:
+            self._dirty.discard(uid)
+            self._evicted[uid] = state
+
+    def _write_evicted(self) -> int:
+        if not self._evicted:
+            return 0
+        written = 0
+        with self._write_lock:
+            with self._lock:
+                pending = dict(self._evicted)
+            if self._write_batch(pending):
+                with self._lock:
+                    for uid, state in pending.items():
+                        if self._evicted.get(uid) is state:
+                            del self._evicted[uid]
+                return len(pending)
+            for uid, state in pending.items():
+                try:
+                    self._writer(uid, state)
+                    written += 1
+                except Exception as e:
+                    logger.warning(f"Failed to write evicted user state for {uid!r}: {e}")
+                    continue
+                with self._lock:
+                    if self._evicted.get(uid) is state:
+                        del self._evicted[uid]
+        return written
+
+    def _write_batch(self, pending: Dict[str, dict]) -> bool:
+        """
+        Write pending with the batch writer in one transaction. Returns False if there
+        is nothing worth batching or the batch failed, in which case the caller writes
+        the users one at a time.
+        """
+        if self._batch_writer is None or len(pending) < 2:
+            return False
+        try:
+            self._batch_writer(pending)
+        except Exception as e:
+            logger.warning(f"Batch write of {len(pending)} user states failed; writing them one at a time: {e}")
+            return False
+        return True
+
+async def run_periodic_flush(cache: UserStateCache, interval_seconds: float) -> None:
+    """
+    Flush the cache every interval_seconds until cancelled, then flush once more.
+    Flushes run in a worker thread so database writes never block the event loop.
+
+    Args:
+        cache (UserStateCache): The cache to flush.
+        interval_seconds (float): Time between flushes in seconds.
+    """
+    try:
+        while True:
+            await asyncio.sleep(interval_seconds)
+            try:
+                await asyncio.to_thread(cache.flush)
+            except Exception as e:
+                logger.warning(f"Periodic user state flush failed: {e}")
+    finally:
+        cache.flush()
+
+# End of managers/user_state_cache.py
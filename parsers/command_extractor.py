@@ -7,7 +7,7 @@ against registered aliases and considering group vs. private chat prefix rules.
 
 import re
 from typing import Optional, Tuple
-from plugins.manager import alias_mapping  # Import the alias mapping
+from plugins.manager import alias_index  # Trie of registered aliases
 
 def _validate_command(command: str) -> bool:
     """
@@ -27,16 +27,12 @@ def _parse_default_command(message: str) -> Tuple[Optional[str], Optional[str]]:
         Tuple[Optional[str], Optional[str]]: The canonical command and its arguments.
     """
     message_lower = message.lower()
-    # Get all aliases sorted by descending length to match longer phrases first.
-    aliases = sorted(alias_mapping.keys(), key=lambda x: len(x), reverse=True)
-    for alias in aliases:
-        if message_lower.startswith(alias) and (
-            len(message_lower) == len(alias) or message_lower[len(alias)] == " "
-        ):
-            args = message[len(alias):].strip()
-            # Map alias to canonical command.
-            canonical = alias_mapping[alias]
-            return canonical, args
+    # Longest registered alias (possibly multi-word) at the start of the message.
+    match = alias_index.longest_match(message_lower)
+    if match is not None:
+        canonical, alias_len = match
+        args = message[alias_len:].strip()
+        return canonical, args
     # Fallback: split by the first space.
     parts = message.split(" ", 1)
     command = parts[0].strip().lower()
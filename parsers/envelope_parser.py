@@ -2,10 +2,16 @@
 """
 parsers/envelope_parser.py - Provides envelope parsing utilities.
 Extracts sender, body, timestamp, group info, reply identifiers, and message type.
+
+parse_envelope() extracts every field in one call and is what parse_message uses;
+the individual parse_* functions remain for callers that need one field.
+envelope_from_json() builds the same Envelope from the JSON form signal-cli emits in
+JSON-RPC mode.
 """
 
 import re
-from typing import Optional
+from dataclasses import dataclass
+from typing import Iterable, List, Optional
 
 # Regex patterns for envelope parsing (as strings)
 SENDER_PATTERN: str = r'\s*from:\s*(?:["“]?.+?["”]?\s+)?(\+\d{1,15})'
@@ -22,16 +28,97 @@ TIMESTAMP_REGEX = re.compile(TIMESTAMP_PATTERN)
 GROUP_INFO_REGEX = re.compile(GROUP_INFO_PATTERN)
 REPLY_REGEX = re.compile(REPLY_PATTERN, re.DOTALL)
 MESSAGE_TIMESTAMP_REGEX = re.compile(MESSAGE_TIMESTAMP_PATTERN)
+CONTROL_CHARS_REGEX = re.compile(r'[\x00-\x1F\x7F]')
+
+@dataclass
+class Envelope:
+    sender: Optional[str] = None
+    body: Optional[str] = None
+    timestamp: Optional[int] = None
+    group_id: Optional[str] = None
+    reply_to: Optional[str] = None
+    message_timestamp: Optional[str] = None
+    message_type: str = "text"
 
 def sanitize_text(text: str) -> str:
     """
     Sanitize the input text by removing control characters and trimming whitespace.
     Allows only printable characters.
     """
-    # Remove non-printable control characters.
-    text = re.sub(r'[\x00-\x1F\x7F]', '', text)
+    # Remove non-printable control characters (skipped when there cannot be any).
+    if not text.isprintable():
+        text = CONTROL_CHARS_REGEX.sub('', text)
     return text.strip()
 
+def parse_envelope(message: str) -> Envelope:
+    """
+    Extract all envelope fields from the message in one call.
+
+    Returns the same values as calling parse_sender, parse_body, parse_timestamp,
+    parse_group_info, parse_reply_id, parse_message_timestamp, and parse_message_type
+    separately. Searches that cannot match (no group or quote section) are skipped.
+
+    Args:
+        message (str): The full incoming message text.
+
+    Returns:
+        Envelope: The extracted fields.
+    """
+    sender = SENDER_REGEX.search(message)
+    body = BODY_REGEX.search(message)
+    timestamp = TIMESTAMP_REGEX.search(message)
+    group = GROUP_INFO_REGEX.search(message) if "Group info:" in message else None
+    reply = REPLY_REGEX.search(message) if "Quote:" in message else None
+    message_ts = MESSAGE_TIMESTAMP_REGEX.search(message)
+    return Envelope(
+        sender=sanitize_text(sender.group(1)) if sender else None,
+        body=sanitize_text(body.group(1)) if body else None,
+        timestamp=int(timestamp.group(1)) if timestamp else None,
+        group_id=sanitize_text(group.group(1)) if group else None,
+        reply_to=sanitize_text(reply.group(1)) if reply else None,
+        message_timestamp=sanitize_text(message_ts.group(1)) if message_ts else None,
+        message_type=parse_message_type(message),
+    )
+
+def parse_envelopes(messages: Iterable[str]) -> List[Envelope]:
+    """
+    Parse a batch of envelopes. Equivalent to [parse_envelope(m) for m in messages].
+    """
+    return [parse_envelope(m) for m in messages]
+
+def envelope_from_json(data: dict) -> Envelope:
+    """
+    Build an Envelope from a signal-cli JSON envelope (the "envelope" object of a
+    JSON-RPC receive notification).
+
+    Args:
+        data (dict): The decoded envelope object.
+
+    Returns:
+        Envelope: The same fields parse_envelope extracts from the text form.
+    """
+    if "typingMessage" in data:
+        message_type = "typing"
+    elif "receiptMessage" in data:
+        message_type = "receipt"
+    else:
+        message_type = "text"
+    data_message = data.get("dataMessage") or {}
+    body = data_message.get("message")
+    group = data_message.get("groupInfo") or {}
+    quote = data_message.get("quote") or {}
+    sender = data.get("sourceNumber") or data.get("source") or data.get("sourceUuid")
+    message_ts = data_message.get("timestamp")
+    return Envelope(
+        sender=sanitize_text(str(sender)) if sender else None,
+        body=sanitize_text(body) if body else None,
+        timestamp=data.get("timestamp"),
+        group_id=group.get("groupId"),
+        reply_to=str(quote["id"]) if quote.get("id") is not None else None,
+        message_timestamp=str(message_ts) if message_ts is not None else None,
+        message_type=message_type,
+    )
+
 def parse_sender(message: str) -> Optional[str]:
     """
     Extract and return the sender phone number from the message.
@@ -97,10 +184,12 @@ def parse_message_type(message: str) -> str:
         "receipt" if the message indicates a receipt event.
         "text" for standard text messages.
     """
-    lower_message = message.lower()
-    if "typing message" in lower_message:
+    # Lowercasing the UTF-8 bytes only folds ASCII letters, which is all the phrases
+    # contain, and avoids str.lower()'s slow path on non-ASCII text.
+    lower_message = message.encode("utf-8", "surrogatepass").lower()
+    if b"typing message" in lower_message:
         return "typing"
-    elif "receipt message" in lower_message:
+    elif b"receipt message" in lower_message:
         return "receipt"
     return "text"
 
@@ -5,17 +5,9 @@ Produces a structured ParsedMessage dataclass with fields for sender, body, time
 reply identifier, message timestamp, command, arguments, and message type.
 """
 
-from typing import Optional
-from dataclasses import dataclass
-from parsers.envelope_parser import (
-    parse_sender,
-    parse_body,
-    parse_timestamp,
-    parse_group_info,
-    parse_reply_id,
-    parse_message_timestamp,
-    parse_message_type
-)
+from typing import Iterable, List, Optional
+from dataclasses import dataclass, field
+from parsers.envelope_parser import Envelope, envelope_from_json, parse_envelope
 from parsers.command_extractor import parse_command_from_body  # Import command extraction logic
 
 @dataclass
@@ -29,6 +21,7 @@ class ParsedMessage:
     command: Optional[str]
     args: Optional[str]
     message_type: str = "text"  # New field for message type
+    attachments: list = field(default_factory=list)  # Lazy handles set by the transport
 
 def parse_message(message: str) -> ParsedMessage:
     """
@@ -51,32 +44,57 @@ def parse_message(message: str) -> ParsedMessage:
     Returns:
         ParsedMessage: A dataclass instance with parsed message attributes.
     """
-    sender = parse_sender(message)  # Treated as generic string ID
-    body = parse_body(message)
-    timestamp = parse_timestamp(message)
-    group_id = parse_group_info(message)
-    reply_to = parse_reply_id(message)
-    message_timestamp = parse_message_timestamp(message)
-    msg_type = parse_message_type(message)
+    envelope = parse_envelope(message)  # All envelope fields in one call
+    return _from_envelope(envelope)
+
+def parse_json_message(envelope: dict) -> ParsedMessage:
+    """
+    Parse a signal-cli JSON envelope (as received over JSON-RPC) into a ParsedMessage.
+
+    Args:
+        envelope (dict): The decoded "envelope" object of a receive notification.
+
+    Returns:
+        ParsedMessage: The same fields parse_message produces for the text form.
+    """
+    return _from_envelope(envelope_from_json(envelope))
+
+def _from_envelope(envelope: Envelope) -> ParsedMessage:
+    """
+    Extract the command from the envelope body and assemble the ParsedMessage.
+    """
+    body = envelope.body
     
     # If the message is not standard text, set body to None
-    if msg_type != "text":
+    if envelope.message_type != "text":
         body = None
     
     # Determine if this is a group message (group_id is present).
-    is_group = group_id is not None
+    is_group = envelope.group_id is not None
     command, args = parse_command_from_body(body if body else "", is_group=is_group)
     
     return ParsedMessage(
-        sender=sender,
+        sender=envelope.sender,  # Treated as generic string ID
         body=body,
-        timestamp=timestamp,
-        group_id=group_id,
-        reply_to=reply_to,
-        message_timestamp=message_timestamp,
+        timestamp=envelope.timestamp,
+        group_id=envelope.group_id,
+        reply_to=envelope.reply_to,
+        message_timestamp=envelope.message_timestamp,
         command=command,
         args=args,
-        message_type=msg_type
+        message_type=envelope.message_type
     )
 
+def parse_messages(messages: Iterable[str]) -> List[ParsedMessage]:
+    """
+    Parse a batch of incoming messages, e.g. the envelopes from one signal-cli receive call.
+
+    Args:
+        messages (Iterable[str]): Full incoming message texts.
+
+    Returns:
+        List[ParsedMessage]: One ParsedMessage per input, in order.
+    """
+    return [parse_message(message) for message in messages]
+
 # End of parsers/message_parser.py
\ No newline at end of file
@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+"""
+plugins/alias_index.py
+----------------------
+Token trie over registered command aliases, used by the command extractor to find the
+longest alias at the start of a message in time proportional to the message length
+rather than the number of aliases.
+
+The plugin manager's alias_mapping is an AliasMapping: a dict that keeps its AliasIndex
+(and any other registered watchers, such as the fuzzy index) in step on every insert,
+delete, and clear, so plugin registration, clear_plugins(), and reload_plugins() update
+the indexes incrementally and they are never rebuilt per message.
+"""
+
+import threading
+from typing import Dict, Optional, Tuple
+
+class _Node:
+    __slots__ = ("children", "canonical")
+
+    def __init__(self):
+        self.children: Dict[str, "_Node"] = {}
+        self.canonical: Optional[str] = None
+
+class AliasIndex:
+    """
+    AliasIndex - Maps space-separated alias token sequences to canonical command names.
+    """
+    def __init__(self):
+        self._root = _Node()
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def add(self, alias: str, canonical: str) -> None:
+        """
+        Register alias (already normalized) for canonical, replacing any previous target.
+        """
+        with self._lock:
+            node = self._root
+            for token in alias.split(" "):
+                child = node.children.get(token)
+                if child is None:
+                    child = node.children[token] = _Node()
+                node = child
+            if node.canonical is None:
+                self._count += 1
+            node.canonical = canonical
+
+    def remove(self, alias: str) -> None:
+        """
+        Remove alias if present, pruning branches that no longer lead to an alias.
+        """
+        with self._lock:
+            path = []
+            node = self._root
+            for token in alias.split(" "):
+                child = node.children.get(token)
+                if child is None:
+                    return
+                path.append((node, token))
+                node = child
+            if node.canonical is None:
+                return
+            node.canonical = None
+            self._count -= 1
+            for parent, token in reversed(path):
+                child = parent.children[token]
+                if child.children or child.canonical is not None:
+                    break
+                del parent.children[token]
+
+    def clear(self) -> None:
+        """
+        Remove every alias.
+        """
+        with self._lock:
+            self._root = _Node()
+            self._count = 0
+
+    def longest_match(self, text: str) -> Optional[Tuple[str, int]]:
+        """
+        Find the longest alias that text starts with, ending at a space or end of text.
+
+        Args:
+            text (str): Lowercased message with single spaces between words.
+
+        Returns:
+            Optional[Tuple[str, int]]: (canonical command, length of the matched alias in text),
+            or None if no alias matches.
+        """
+        node = self._root
+        best = None
+        pos = 0
+        length = len(text)
+        while node.children:
+            end = text.find(" ", pos)
+            if end == -1:
+                end = length
+            node = node.children.get(text[pos:end])
+            if node is None:
+                break
+            if node.canonical is not None:
+                best = (node.canonical, end)
+            if end == length:
+                break
+            pos = end + 1
+        return best
+
+    def __len__(self) -> int:
+        return self._count
+
+class AliasMapping(dict):
+    """
+    AliasMapping - dict of normalized alias -> canonical command that mirrors every
+    change into an AliasIndex (available as .index) and any other watchers.
+
+    A watcher is any object with add(alias, canonical), remove(alias), and clear().
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__()
+        self.index = AliasIndex()
+        self._watchers = [self.index]
+        self.update(*args, **kwargs)
+
+    def add_watcher(self, watcher) -> None:
+        """
+        Register watcher and replay the current aliases into it.
+        """
+        self._watchers.append(watcher)
+        for alias, canonical in self.items():
+            watcher.add(alias, canonical)
+
+    def __setitem__(self, alias: str, canonical: str) -> None:
+        super().__setitem__(alias, canonical)
+        for watcher in self._watchers:
+            watcher.add(alias, canonical)
+
+    def __delitem__(self, alias: str) -> None:
+        super().__delitem__(alias)
+        for watcher in self._watchers:
+            watcher.remove(alias)
+
+    def pop(self, alias, *default):
+        if alias in self:
+            for watcher in self._watchers:
+                watcher.remove(alias)
+        return super().pop(alias, *default)
+
+    def popitem(self):
+        alias, canonical = super().popitem()
+        for watcher in self._watchers:
+            watcher.remove(alias)
+        return alias, canonical
+
+    def setdefault(self, alias, canonical=None):
+        if alias not in self:
+            self[alias] = canonical
+        return self[alias]
+
+    def update(self, *args, **kwargs) -> None:
+        for alias, canonical in dict(*args, **kwargs).items():
+            self[alias] = canonical
+
+    def clear(self) -> None:
+        super().clear()
+        for watcher in self._watchers:
+            watcher.clear()
+
+# End of plugins/alias_index.py
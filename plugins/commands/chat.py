@@ -1,6 +1,11 @@
+from typing import AsyncIterator
+
 from plugins.manager import plugin
 from core.permissions import EVERYONE
-from core.config import OPENAI_API_KEY
+from core.config import OPENAI_API_KEY, CHAT_STREAMING
+from core.chat_client import ChatBusyError, get_chat_client
+from core.utils.user_helpers import extract_user_id
+from managers.conversation_store import conversation_id, get_conversation_store
 
 @plugin(commands=["chat"], canonical="chat", required_role=EVERYONE)
 async def run_command(args: str, ctx, state_machine, **kwargs):
@@ -8,9 +13,28 @@ async def run_command(args: str, ctx, state_machine, **kwargs):
         return "OPENAI_API_KEY is not configured."
 
     prompt = args.strip() or "Hello!"
-    from openai import AsyncOpenAI
-    client = AsyncOpenAI()
-    rsp = await client.chat.completions.create(
-        model="gpt-4o-mini", messages=[{"role": "user", "content": prompt}]
-    )
-    return rsp.choices[0].message.content
+    client = get_chat_client()
+    store = get_conversation_store()
+    conversation = conversation_id(ctx)
+    history = await store.context(conversation, prompt)
+    try:
+        if CHAT_STREAMING:
+            return _remembered(conversation, prompt, client.stream(prompt, extract_user_id(ctx), history))
+        reply = await client.complete(prompt, extract_user_id(ctx), history)
+    except ChatBusyError:
+        return "Still working on your last message, please wait."
+    await store.add_exchange(conversation, prompt, reply)
+    return reply
+
+async def _remembered(conversation: str, prompt: str, parts: AsyncIterator[str]) -> AsyncIterator[str]:
+    """
+    Pass the streamed reply through, then record the exchange once it is complete.
+    """
+    reply = []
+    try:
+        async for part in parts:
+            reply.append(part)
+            yield part
+    finally:
+        await parts.aclose()
+    await get_conversation_store().add_exchange(conversation, prompt, "".join(reply))
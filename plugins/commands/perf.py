@@ -0,0 +1,166 @@
+"""
+plugins/commands/perf.py - Performance inspection command plugin.
+Shows the slowest commands, recent slow messages with their span breakdown, the
+cProfile output captured for slow commands, and switches the event-loop monitor.
+Usage:
+  @bot perf top
+  @bot perf slow
+  @bot perf profile <command>
+  @bot perf arm <command>
+  @bot perf reset
+  @bot perf monitor [on|off|blocks|stack]
+"""
+
+import logging
+import time
+from typing import List
+from plugins.manager import plugin
+from core.permissions import ADMIN
+from core import tracing
+from core.loop_monitor import get_loop_monitor
+from plugins.commands.subcommand_dispatcher import handle_subcommands, PluginArgError
+from plugins.abstract import BasePlugin
+
+logger = logging.getLogger(__name__)
+
+_SLOW_SHOWN = 10
+
+def _ms(seconds) -> str:
+    return "-" if seconds is None else f"{seconds * 1000:.1f}ms"
+
+@plugin(commands=['perf'], canonical='perf', required_role=ADMIN)
+class PerfCommand(BasePlugin):
+    """
+    Inspect command latency: top, slow, profile, arm, reset, monitor.
+    Usage:
+      @bot perf top
+      @bot perf slow
+      @bot perf profile <command>
+      @bot perf arm <command>
+      @bot perf reset
+      @bot perf monitor [on|off|blocks|stack]
+    """
+    def __init__(self):
+        super().__init__(
+            "perf",
+            help_text="Show slow commands and their profiles."
+        )
+        self.subcommands = {
+            "top": self._sub_top,
+            "slow": self._sub_slow,
+            "profile": self._sub_profile,
+            "arm": self._sub_arm,
+            "reset": self._sub_reset,
+            "monitor": self._sub_monitor,
+        }
+
+    async def run_command(
+        self,
+        args: str,
+        ctx,
+        state_machine,
+        **kwargs
+    ) -> str:
+        usage = (
+            "Usage: @bot perf <top|slow|profile|arm|reset|monitor> [command]\n"
+            "Examples:\n"
+            "  @bot perf top\n"
+            "  @bot perf slow\n"
+            "  @bot perf profile <command>\n"
+            "  @bot perf arm <command>\n"
+            "  @bot perf monitor on"
+        )
+        try:
+            return handle_subcommands(
+                args,
+                subcommands=self.subcommands,
+                usage_msg=usage,
+                unknown_subcmd_msg="Unknown subcommand. See usage: " + usage,
+                default_subcommand="top"
+            )
+        except PluginArgError as e:
+            logger.error(f"Argument parsing error in perf command: {e}", exc_info=True)
+            return str(e)
+        except Exception as e:
+            logger.error(f"Unexpected error in perf command: {e}", exc_info=True)
+            return "An internal error occurred."
+
+    def _sub_top(self, rest: List[str]) -> str:
+        rows = tracing.command_latency_summary()
+        if not rows:
+            return "No commands recorded yet."
+        lines = [
+            f"{row['command']}: p99 {_ms(row['p99'])}, p50 {_ms(row['p50'])}, "
+            f"max {_ms(row['max'])} (n={row['count']})"
+            for row in rows
+        ]
+        return "Slowest commands (by p99):\n" + "\n".join(lines)
+
+    def _sub_slow(self, rest: List[str]) -> str:
+        slow = list(tracing.tracker.slow)[-_SLOW_SHOWN:]
+        if not slow:
+            return f"No messages slower than {_ms(tracing.tracker.threshold)}."
+        lines = [
+            time.strftime("%H:%M:%S", time.localtime(t.wall_started)) + " " + t.summary()
+            for t in reversed(slow)
+        ]
+        return "Recent slow messages:\n" + "\n".join(lines)
+
+    def _sub_profile(self, rest: List[str]) -> str:
+        if not rest:
+            captured = sorted(tracing.tracker.profiles)
+            if not captured:
+                return "No profiles captured yet."
+            return "Profiles captured for: " + ", ".join(captured)
+        target = rest[0].lower()
+        profiles = tracing.tracker.profiles.get(target)
+        if not profiles:
+            return f"No profile captured for '{target}'. Use '@bot perf arm {target}' to profile its next run."
+        latest = profiles[-1]
+        when = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(latest.captured_at))
+        return f"Profile of '{target}' captured {when}:\n{latest.text}"
+
+    def _sub_arm(self, rest: List[str]) -> str:
+        if not rest:
+            return "Usage: @bot perf arm <command>"
+        target = rest[0].lower()
+        tracing.tracker.arm(target)
+        return f"The next run of '{target}' will be profiled."
+
+    def _sub_reset(self, rest: List[str]) -> str:
+        tracing.tracker.reset()
+        get_loop_monitor().reset()
+        return "Performance traces and profiles cleared."
+
+    def _sub_monitor(self, rest: List[str]) -> str:
+        monitor = get_loop_monitor()
+        action = rest[0].lower() if rest else "status"
+        if action == "on":
+            monitor.start()
+            return (f"Loop monitor on: heartbeat every {_ms(monitor.interval)}, "
+                    f"blocks over {_ms(monitor.threshold)} are captured.")
+        if action == "off":
+            monitor.stop()
+            return "Loop monitor off."
+        if action == "blocks":
+            blocks = list(monitor.blocks)[-_SLOW_SHOWN:]
+            if not blocks:
+                return f"No event-loop blocks over {_ms(monitor.threshold)} recorded."
+            lines = [
+                time.strftime("%H:%M:%S", time.localtime(b.started_at)) + " " + b.summary()
+                for b in reversed(blocks)
+            ]
+            return "Recent event-loop blocks:\n" + "\n".join(lines)
+        if action == "stack":
+            captured = [b for b in monitor.blocks if b.stack]
+            if not captured:
+                return "No blocking stack captured yet."
+            latest = captured[-1]
+            return f"{latest.summary()} (task {latest.task or 'unknown'}):\n{latest.stack}"
+        if action == "status":
+            state = "on" if monitor.enabled else "off"
+            return (f"Loop monitor is {state}. Max lag {_ms(monitor.max_lag)}, "
+                    f"{len(monitor.blocks)} recent blocks over {_ms(monitor.threshold)}.")
+        return "Usage: @bot perf monitor [on|off|blocks|stack]"
+
+# End of plugins/commands/perf.py
@@ -1,12 +1,16 @@
 #!/usr/bin/env python3
 """
 plugins/commands/sora_explore_scraper.py - Sora Explore plugin command for managing Sora Explore sessions.
-Handles start, stop, download, and status commands.
+Handles start, stop, download, status, and cancel commands.
+Browser work runs on the Sora API's worker thread, so the bot stays responsive meanwhile.
 Usage:
   @bot sora explore start   -> Launch browser and open Sora Explore page.
   @bot sora explore stop    -> Close the browser.
   @bot sora explore download -> Download/capture from the first thumbnail.
-  @bot sora explore status  -> Check current state.
+  @bot sora explore download N -> Download/capture the first N thumbnails in bulk.
+  @bot sora explore status  -> Check current state and running jobs.
+  @bot sora explore cancel [job] -> Cancel a job, or all of them.
+Downloaded files are sent back to the channel as attachments.
 """
 
 import logging
@@ -16,28 +20,35 @@ from core.permissions import OWNER
 from plugins.abstract import BasePlugin
 from plugins.commands.subcommand_dispatcher import handle_subcommands, PluginArgError
 from plugins.messages import INTERNAL_ERROR
+from core.outbound import send_files
 
 # Import the updated Sora Explore API
 from core.api.sora_explore_api import (
     start_sora_explore_session,
     stop_sora_explore_session,
     download_sora_explore_session,
-    get_sora_explore_session_status
+    download_sora_explore_bulk,
+    get_sora_explore_session_status,
+    cancel_sora_explore_job
 )
 
 logger = logging.getLogger(__name__)
 
+FILES_PER_MESSAGE = 10  # Discord's attachment limit per message
+
 @plugin(commands=["sora explore"], canonical="sora explore", required_role=OWNER)
 class SoraExploreScraperPlugin(BasePlugin):
     """
     Sora Explore plugin command that calls the stable Sora Explore API 
-    to manage a Sora Explore session (start, stop, download, status).
+    to manage a Sora Explore session (start, stop, download, status, cancel).
 
     Usage:
       @bot sora explore start   -> Launch browser and open Sora Explore page.
       @bot sora explore stop    -> Close the browser.
       @bot sora explore download -> Download/capture from the first thumbnail.
-      @bot sora explore status  -> Check current state.
+      @bot sora explore download N -> Download/capture the first N thumbnails in bulk.
+      @bot sora explore status  -> Check current state and running jobs.
+      @bot sora explore cancel [job] -> Cancel a job, or all of them.
     """
     def __init__(self):
         super().__init__(
@@ -53,6 +64,7 @@ class SoraExploreScraperPlugin(BasePlugin):
             "stop":      self._sub_stop,
             "download":  lambda rest: self._sub_download(rest, self.ctx),
             "status":    self._sub_status,
+            "cancel":    self._sub_cancel,
         }
 
     async def run_command(
@@ -68,7 +80,9 @@ class SoraExploreScraperPlugin(BasePlugin):
             "  @bot sora explore start   -> Launch browser and open Sora Explore page.\n"
             "  @bot sora explore stop    -> Close the browser.\n"
             "  @bot sora explore download -> Download/capture from the first thumbnail.\n"
-            "  @bot sora explore status  -> Check current state.\n"
+            "  @bot sora explore download N -> Download/capture the first N thumbnails in bulk.\n"
+            "  @bot sora explore status  -> Check current state and running jobs.\n"
+            "  @bot sora explore cancel [job] -> Cancel a job, or all of them.\n"
         )
         try:
             result = handle_subcommands(
@@ -105,10 +119,43 @@ class SoraExploreScraperPlugin(BasePlugin):
         """
         if ctx is None:
             return "(Sora) Error: No Discord context provided for download."
-        return download_sora_explore_session(ctx)
+        count = None
+        if rest_args:
+            try:
+                count = int(rest_args[0])
+            except ValueError:
+                raise PluginArgError("Usage: @bot sora explore download [N]")
+        return self._download(ctx, count)
+
+    async def _download(self, ctx, count):
+        if count is None:
+            result = await download_sora_explore_session(ctx)
+        else:
+            result = await download_sora_explore_bulk(ctx, count)
+        if isinstance(result, str):
+            return result
+        files = result["file_paths"] if "file_paths" in result else [result["file_path"]]
+        target = ctx.channel if hasattr(ctx, "channel") else ctx
+        for i in range(0, len(files), FILES_PER_MESSAGE):
+            await send_files(target, "", files[i:i + FILES_PER_MESSAGE])
+        if count is None:
+            return ""
+        summary = f"(Sora) Downloaded {len(files)} of {result['found']} item(s)"
+        if result["found"] < count:
+            summary += f"; only {result['found']} were found"
+        return summary + "."
 
     def _sub_status(self, rest_args):
         return get_sora_explore_session_status()
 
+    def _sub_cancel(self, rest_args):
+        if not rest_args:
+            return cancel_sora_explore_job()
+        try:
+            job_id = int(rest_args[0].lstrip("#"))
+        except ValueError:
+            raise PluginArgError("Usage: @bot sora explore cancel [job]")
+        return cancel_sora_explore_job(job_id)
+
 
 # End of plugins/commands/sora_explore_scraper.py
\ No newline at end of file
@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+"""
+plugins/fuzzy_index.py
+----------------------
+Symmetric-deletion index over command aliases and canonical names for resolving
+misspelled commands.
+
+Every term is stored under each string obtained by deleting up to MAX_EDITS characters
+from it. A query generates the same deletions of the misspelled word and looks them up,
+so any term within MAX_EDITS insertions, deletions, substitutions, or transpositions is
+found with a handful of dict lookups, however many plugins are registered. Candidates
+are then scored with difflib.SequenceMatcher and must reach the same 0.75 cutoff used
+before, so matches are never looser than difflib.get_close_matches.
+
+Recent queries (hits and misses) are remembered in a small LRU cache that is cleared
+whenever the index changes. The index is kept in step with plugin registration as a
+watcher of the plugin manager's alias_mapping.
+"""
+
+import difflib
+import threading
+from collections import Counter, OrderedDict
+from typing import Dict, Optional, Set, Tuple
+
+DEFAULT_CUTOFF = 0.75
+MAX_EDITS = 2
+QUERY_CACHE_SIZE = 1024
+# Longer words are not looked up; commands are short and this bounds per-query work.
+MAX_QUERY_LENGTH = 64
+
+def deletions(term: str, max_edits: int = MAX_EDITS) -> Set[str]:
+    """
+    Return term and every string obtained by deleting up to max_edits characters from it.
+    """
+    variants = {term}
+    frontier = {term}
+    for _ in range(max_edits):
+        next_frontier = set()
+        for word in frontier:
+            for i in range(len(word)):
+                next_frontier.add(word[:i] + word[i + 1:])
+        next_frontier -= variants
+        variants |= next_frontier
+        frontier = next_frontier
+    return variants
+
+class FuzzyIndex:
+    """
+    FuzzyIndex - Maps approximate spellings of aliases and canonical names to canonical commands.
+
+    Args:
+        cutoff (float): Minimum difflib similarity ratio for a match.
+        max_edits (int): Maximum deletions per side when looking for candidates.
+        cache_size (int): Number of recent queries remembered.
+    """
+    def __init__(self, cutoff: float = DEFAULT_CUTOFF, max_edits: int = MAX_EDITS,
+                 cache_size: int = QUERY_CACHE_SIZE):
+        self.cutoff = cutoff
+        self.max_edits = max_edits
+        self.cache_size = cache_size
+        self._aliases: Dict[str, str] = {}
+        self._canonical_refs: Counter = Counter()
+        self._variants: Dict[str, Set[str]] = {}
+        self._cache: "OrderedDict[str, Optional[str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    # Watcher interface used by AliasMapping.
+    def add(self, alias: str, canonical: str) -> None:
+        with self._lock:
+            previous = self._aliases.get(alias)
+            if previous is not None:
+                self._release_canonical(previous)
+            self._aliases[alias] = canonical
+            self._canonical_refs[canonical] += 1
+            self._index_term(alias)
+            self._index_term(canonical)
+            self._cache.clear()
+
+    def remove(self, alias: str) -> None:
+        with self._lock:
+            canonical = self._aliases.pop(alias, None)
+            if canonical is None:
+                return
+            self._release_canonical(canonical)
+            self._unindex_if_dead(alias)
+            self._cache.clear()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._aliases.clear()
+            self._canonical_refs.clear()
+            self._variants.clear()
+            self._cache.clear()
+
+    def match(self, word: str) -> Optional[str]:
+        """
+        Return the canonical command whose alias or name is closest to word, or None
+        if nothing reaches the cutoff. Ties go to the lexicographically greatest term,
+        as with difflib.get_close_matches.
+        """
+        with self._lock:
+            if word in self._cache:
+                self._cache.move_to_end(word)
+                self.hits += 1
+                return self._cache[word]
+            self.misses += 1
+            result = self._search(word)
+            self._cache[word] = result
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+            return result
+
+    def __len__(self) -> int:
+        return len(set(self._aliases) | set(self._canonical_refs))
+
+    def _search(self, word: str) -> Optional[str]:
+        if len(word) > MAX_QUERY_LENGTH:
+            return None
+        candidates: Set[str] = set()
+        for variant in deletions(word, self.max_edits):
+            terms = self._variants.get(variant)
+            if terms:
+                candidates |= terms
+        best: Optional[Tuple[float, str]] = None
+        for term in candidates:
+            score = difflib.SequenceMatcher(None, term, word).ratio()
+            if score >= self.cutoff and (best is None or (score, term) > best):
+                best = (score, term)
+        return self._target(best[1]) if best else None
+
+    def _target(self, term: str) -> Optional[str]:
+        canonical = self._aliases.get(term)
+        if canonical is not None:
+            return canonical
+        return term if self._canonical_refs.get(term) else None
+
+    def _release_canonical(self, canonical: str) -> None:
+        self._canonical_refs[canonical] -= 1
+        if self._canonical_refs[canonical] <= 0:
+            del self._canonical_refs[canonical]
+            self._unindex_if_dead(canonical)
+
+    def _index_term(self, term: str) -> None:
+        for variant in deletions(term, self.max_edits):
+            self._variants.setdefault(variant, set()).add(term)
+
+    def _unindex_if_dead(self, term: str) -> None:
+        if self._target(term) is not None:
+            return
+        for variant in deletions(term, self.max_edits):
+            terms = self._variants.get(variant)
+            if terms is not None:
+                terms.discard(term)
+                if not terms:
+                    del self._variants[variant]
+
+# End of plugins/fuzzy_index.py
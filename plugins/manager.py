@@ -14,7 +14,7 @@ import inspect
 import importlib
 import pkgutil
 import logging
-import difflib
+from collections.abc import AsyncIterator
 from typing import Callable, Any, Optional, Dict, List, Union, Set
 
 logger = logging.getLogger(__name__)
@@ -22,11 +22,19 @@ logger = logging.getLogger(__name__)
 # Import role constants and permission check
 from core.permissions import OWNER, has_permission
 from core.identity import resolve_role
+from plugins.alias_index import AliasMapping
+from plugins.fuzzy_index import FuzzyIndex
+from core import metrics, tracing
 
 # Registry: key = canonical command, value = dict with function, aliases, help_visible, category, help_text, required_role.
 plugin_registry: Dict[str, Dict[str, Any]] = {}
 # Alias mapping: key = alias (normalized), value = canonical command.
-alias_mapping: Dict[str, str] = {}
+# Every change is mirrored into alias_index, which the command extractor matches against.
+alias_mapping: Dict[str, str] = AliasMapping()
+alias_index = alias_mapping.index
+# Approximate lookup of misspelled aliases and canonical names.
+fuzzy_index = FuzzyIndex()
+alias_mapping.add_watcher(fuzzy_index)
 # Track disabled plugins by canonical command name.
 disabled_plugins: Set[str] = set()
 
@@ -208,7 +216,9 @@ async def dispatch_message(parsed, ctx, state_machine, logger=None) -> Any:
     Also enforces role-based permissions by comparing the user's role
     to the plugin's required_role.
 
-    Returns either a string or a coroutine that the caller should await.
+    Returns either a string or a coroutine that the caller should await. A plugin may
+    instead return an async iterator of text parts, which is passed through so the
+    reply can be streamed.
     """
     command: Optional[str] = parsed.command
     if command is None:
@@ -219,66 +229,68 @@ async def dispatch_message(parsed, ctx, state_machine, logger=None) -> Any:
 
     args: Optional[str] = parsed.args
 
-    # ctx is expected to be a discord.Message or compatible object
-    user_role = resolve_role(getattr(ctx, 'author', ctx))
-
-    # Attempt to find the plugin info by direct alias lookup
-    canonical_cmd = alias_mapping.get(normalize_alias(command))
-    plugin_info = None
-    if canonical_cmd is not None:
-        plugin_info = plugin_registry.get(canonical_cmd)
-
-    # If not found, attempt fuzzy matching
-    if not plugin_info:
-        available_commands = list(plugin_registry.keys())
-        matches = difflib.get_close_matches(normalize_alias(command), available_commands, n=1, cutoff=0.75)
-        if matches:
-            matched_cmd = matches[0]
-            plugin_info = plugin_registry[matched_cmd]
-            logger.info(f"Fuzzy matching: '{command}' -> '{matched_cmd}'")
-            # If the matched plugin is disabled, treat as None
-            if matched_cmd in disabled_plugins:
-                return f"Plugin '{matched_cmd}' is currently disabled."
-        else:
+    # Timed and counted per canonical command; unresolved commands are labelled "unknown".
+    with metrics.timed(metrics.COMMAND_LATENCY, metrics.COMMANDS, command="unknown") as labels:
+        with tracing.span("resolve"):
+            # ctx is expected to be a discord.Message or compatible object
+            user_role = resolve_role(getattr(ctx, 'author', ctx))
+
+            # Attempt to find the plugin info by direct alias or canonical name lookup
+            normalized = normalize_alias(command)
+            canon_name = alias_mapping.get(normalized)
+            if canon_name is None and normalized in plugin_registry:
+                canon_name = normalized
+            plugin_info = plugin_registry.get(canon_name) if canon_name is not None else None
+
+            # If not found, attempt fuzzy matching
+            if not plugin_info:
+                canon_name = fuzzy_index.match(normalized)
+                plugin_info = plugin_registry.get(canon_name) if canon_name is not None else None
+                if not plugin_info:
+                    labels["outcome"] = "unknown"
+                    return ""
+                logger.info(f"Fuzzy matching: '{command}' -> '{canon_name}'")
+        labels["command"] = canon_name
+        tracing.set_command(canon_name)
+
+        # Check if plugin is disabled
+        if canon_name in disabled_plugins:
+            labels["outcome"] = "disabled"
+            return f"Plugin '{canon_name}' is currently disabled."
+
+        # Enforce role-based permission
+        required_role = plugin_info.get("required_role", OWNER)
+
+        # User role is already determined by resolve_role(sender) in the calling context
+        with tracing.span("permission"):
+            allowed = has_permission(user_role, required_role)
+        if not allowed:
+            labels["outcome"] = "denied"
+            return "You do not have permission to use this command."
+
+        plugin_func = plugin_info.get("function")
+        if not plugin_func:
+            labels["outcome"] = "unknown"
             return ""
 
-    # If somehow still None, bail out
-    if not plugin_info:
-        return ""
-
-    # Check if plugin is disabled
-    canon_name = None
-    for k, v in plugin_registry.items():
-        if v is plugin_info:
-            canon_name = k
-            break
-    if canon_name and canon_name in disabled_plugins:
-        return f"Plugin '{canon_name}' is currently disabled."
-
-    # Enforce role-based permission
-    required_role = plugin_info.get("required_role", OWNER)
-
-    # User role is already determined by resolve_role(sender) in the calling context
-    if not has_permission(user_role, required_role):
-        return "You do not have permission to use this command."
-
-    plugin_func = plugin_info.get("function")
-    if not plugin_func:
-        return ""
-
-    try:
-        response = await plugin_func(args or "", ctx, state_machine)
-        if response is None or not isinstance(response, str):
-            logger.warning(
-                f"Plugin '{command}' returned non-string or None. Returning empty string."
+        try:
+            with tracing.span("plugin"), tracing.profiled(canon_name):
+                response = await plugin_func(args or "", ctx, state_machine)
+            if isinstance(response, AsyncIterator):
+                # Streamed reply; the orchestrator sends its parts as they arrive.
+                return response
+            if response is None or not isinstance(response, str):
+                logger.warning(
+                    f"Plugin '{command}' returned non-string or None. Returning empty string."
+                )
+                response = ""
+            return response
+        except Exception as e:
+            labels["outcome"] = "error"
+            logger.exception(
+                f"Error executing plugin for command '{command}' with args '{args}' "
+                f"from sender '{getattr(ctx, 'author', ctx)}': {e}"
             )
-            response = ""
-        return response
-    except Exception as e:
-        logger.exception(
-            f"Error executing plugin for command '{command}' with args '{args}' "
-            f"from sender '{getattr(ctx, 'author', ctx)}': {e}"
-        )
-        return "An internal error occurred while processing your command."
+            return "An internal error occurred while processing your command."
 
 # End of plugins/manager.py
\ No newline at end of file
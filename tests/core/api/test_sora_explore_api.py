@@ -0,0 +1,445 @@
+"""
+tests/core/api/test_sora_explore_api.py - Tests for the Sora Explore API's workers and session pool.
+Verifies that captures run off the event loop and in parallel, report progress, and can be cancelled
+or time out, that the pool reuses, health-checks, and evicts sessions, that each pooled browser gets
+its own profile directory, that bulk captures collect several items in parallel browsers, and that
+media downloads retry and resume, using a fake WebDriver and a local HTTP server.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from core.api import sora_explore_api as sora
+from core.api.sora_explore_api import JobStatus, SoraJobCancelled, SoraPoolClosed, SoraSessionPool, State
+from core.media_cache import MediaCache
+
+class FakeElement:
+    def __init__(self, text="", attrs=None, children=None):
+        self.text = text
+        self._attrs = attrs or {}
+        self._children = children or {}
+
+    def get_attribute(self, name):
+        return self._attrs.get(name)
+
+    def find_element(self, by, value):
+        if value not in self._children:
+            raise LookupError(value)
+        return self._children[value]
+
+class FakeSwitchTo:
+    def __init__(self, driver):
+        self._driver = driver
+
+    def new_window(self, kind):
+        handle = f"tab-{len(self._driver.urls)}"
+        self._driver.urls[handle] = "about:blank"
+        self._driver.handle = handle
+
+    def window(self, handle):
+        self._driver.handle = handle
+
+class FakeDriver:
+    thumbnails = 1
+
+    def __init__(self):
+        self.urls = {"tab-0": "about:blank"}
+        self.handle = "tab-0"
+        self.switch_to = FakeSwitchTo(self)
+        self.title = "Sora"
+        self.visits = []
+        self.alive = True
+        self.quit_called = False
+        self.scrolls = 0
+        self._thumbnails = [
+            FakeElement(attrs={"href": f"/g/gen_{i}"},
+                        children={"..": FakeElement(children={"button span.truncate": FakeElement(f"artist{i}")})})
+            for i in range(1, self.thumbnails + 1)
+        ]
+
+    @property
+    def current_url(self):
+        if not self.alive:
+            raise ConnectionError("browser is gone")
+        return self.urls[self.handle]
+
+    @property
+    def window_handles(self):
+        return list(self.urls)
+
+    def set_page_load_timeout(self, seconds):
+        pass
+
+    def get(self, url):
+        self.visits.append(url)
+        self.urls[self.handle] = url
+
+    def close(self):
+        del self.urls[self.handle]
+
+    def find_elements(self, by, value):
+        # Half of the thumbnails are loaded until the page is scrolled.
+        shown = len(self._thumbnails) if self.scrolls else (len(self._thumbnails) + 1) // 2
+        return self._thumbnails[:shown] if value == "a[href^='/g/']" else []
+
+    def execute_script(self, script):
+        self.scrolls += 1
+
+    def find_element(self, by, value):
+        if value == "a[href^='/g/']":
+            return self._thumbnails[0]
+        if value == "img[alt='Generated image']":
+            item = self.current_url.rsplit("/", 1)[-1]
+            return FakeElement(attrs={"src": f"https://cdn.test/vg-assets/a/{item}.webp"})
+        if "Prompt" in value or "surface-nav-element" in value:
+            return FakeElement("text")
+        raise LookupError(value)
+
+    def quit(self):
+        self.quit_called = True
+
+class FakeOpener(sora.SimpleOpener):
+    def setup_driver(self):
+        self.driver = FakeDriver()
+        self.wait = sora.WebDriverWait(self.driver, 0.05, poll_frequency=0.01)
+
+class FakeDownloader:
+    def __init__(self):
+        self.delay = 0.0
+        self.urls = []
+        # Downloads running now, and the most that ever ran at once.
+        self.active = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def download(self, url, path, cancel_event=None):
+        with self._lock:
+            self.urls.append(url)
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        try:
+            if cancel_event is not None and cancel_event.wait(self.delay):
+                raise SoraJobCancelled("cancelled")
+            elif cancel_event is None:
+                time.sleep(self.delay)
+        finally:
+            with self._lock:
+                self.active -= 1
+        with open(path, "wb") as f:
+            f.write(url.encode())
+        return path
+
+@pytest.fixture
+def downloader(monkeypatch, tmp_path):
+    fake = FakeDownloader()
+    monkeypatch.setattr(sora, "_downloader", fake)
+    monkeypatch.setattr(sora, "_media_cache", MediaCache(str(tmp_path / "cache"), 10 * 1024 * 1024))
+    return fake
+
+@pytest.fixture
+def fake_sora(monkeypatch, downloader):
+    worker = sora.SoraWorker()
+    manager = sora.PluginManagerForSora()
+    manager.register_plugin(sora.JobProgressPlugin(worker))
+    monkeypatch.setattr(sora, "_worker", worker)
+    monkeypatch.setattr(sora, "_plugin_manager", manager)
+    monkeypatch.setattr(sora, "_pool", None)
+    monkeypatch.setattr(sora, "SimpleOpener", FakeOpener)
+    monkeypatch.setattr(sora, "NAVIGATION_SETTLE", 0.01)
+    monkeypatch.setattr(sora, "SCROLL_SETTLE", 0.0)
+    return worker
+
+@pytest.mark.asyncio
+async def test_capture_runs_off_the_event_loop(fake_sora, monkeypatch):
+    assert "launched" in await sora.start_sora_explore_session()
+    monkeypatch.setattr(sora._downloader, "delay", 0.2)
+
+    ticks = 0
+    async def ticker():
+        nonlocal ticks
+        while True:
+            ticks += 1
+            await asyncio.sleep(0.01)
+
+    ticking = asyncio.create_task(ticker())
+    download = asyncio.create_task(sora.download_sora_explore_session(object()))
+    await asyncio.sleep(0.1)
+    assert "#2 download: RUNNING (DOWNLOADING)" in sora.get_sora_explore_session_status()
+    result = await download
+    ticking.cancel()
+    assert os.path.basename(result["file_path"]) == "a_gen_1.webp"
+    assert open(result["file_path"], "rb").read() == b"https://cdn.test/vg-assets/a/gen_1.webp"
+    assert ticks >= 10
+    assert [j.status for j in fake_sora.jobs] == [JobStatus.DONE, JobStatus.DONE]
+
+    # The detail page was opened in a tab that is closed again; Explore was loaded once.
+    opener = sora._pool.checkout()
+    sora._pool.checkin(opener)
+    assert opener.state is State.IDLE
+    assert opener.driver.window_handles == ["tab-0"]
+    assert opener.driver.visits == [sora.BASE_URL, "https://sora.com/g/gen_1"]
+
+    assert await sora.stop_sora_explore_session() == "(Sora) Browser closed."
+    assert opener.driver.quit_called and sora._pool is None
+
+@pytest.mark.asyncio
+async def test_download_times_out_and_returns_to_explore(fake_sora, monkeypatch):
+    await sora.start_sora_explore_session()
+    monkeypatch.setattr(sora._downloader, "delay", 5.0)
+    monkeypatch.setattr(sora, "DOWNLOAD_TIMEOUT", 0.1)
+    result = await sora.download_sora_explore_session(object())
+    assert "timed out" in result
+    # The capture stops at its next wait and the browser goes back to Explore.
+    await asyncio.sleep(0.1)
+    assert not fake_sora.active
+    assert [j.status for j in fake_sora.jobs] == [JobStatus.DONE, JobStatus.TIMED_OUT]
+    assert sora._pool.idle_count == 1
+    opener = sora._pool.checkout()
+    assert opener.state is State.IDLE
+    assert opener.driver.window_handles == ["tab-0"]
+    assert opener.driver.current_url == sora.BASE_URL
+
+@pytest.mark.asyncio
+async def test_cancel_running_and_queued_jobs(fake_sora, monkeypatch):
+    await sora.start_sora_explore_session()
+    monkeypatch.setattr(sora._downloader, "delay", 5.0)
+    first = asyncio.create_task(sora.download_sora_explore_session(object()))
+    second = asyncio.create_task(sora.download_sora_explore_session(object()))
+    await asyncio.sleep(0.1)
+    assert sora.cancel_sora_explore_job(99) == "(Sora) No matching job to cancel."
+    assert sora.cancel_sora_explore_job() == "(Sora) Cancelled #2 download, #3 download."
+    assert await first == "(Sora) Download was cancelled."
+    assert await second == "(Sora) Download was cancelled."
+    assert "launched" not in await sora.start_sora_explore_session()  # Session is still open.
+
+@pytest.mark.asyncio
+async def test_concurrent_downloads_run_in_parallel(fake_sora, monkeypatch):
+    await sora.start_sora_explore_session()
+    assert sora._pool.size == 1
+    monkeypatch.setattr(sora._downloader, "delay", 0.3)
+    results = await asyncio.gather(*(sora.download_sora_explore_session(object()) for _ in range(2)))
+    assert all(isinstance(r, dict) for r in results)
+    # A second session was opened because the first was busy: the captures overlapped.
+    assert sora._pool.size == 2 and sora._pool.idle_count == 2
+    assert "2 open (2 idle, 0 busy), max 3" in sora.get_sora_explore_session_status()
+    await sora.stop_sora_explore_session()
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def _fake_factory(cancel_event):
+    opener = FakeOpener(plugin_manager=None, cancel_event=cancel_event)
+    opener.driver.get(sora.BASE_URL)
+    opener._state_transition(State.IDLE)
+    return opener
+
+def test_pool_reuses_and_health_checks_sessions():
+    pool = SoraSessionPool(_fake_factory, max_size=2, min_size=1)
+    assert pool.warm() == 1 and pool.warm() == 0
+    first = pool.checkout()
+    pool.checkin(first)
+    assert pool.checkout() is first
+    pool.checkin(first)
+
+    first.driver.alive = False
+    replacement = pool.checkout()
+    assert replacement is not first and first.driver.quit_called
+    assert pool.size == 1
+    pool.checkin(replacement, healthy=False)
+    assert replacement.driver.quit_called and pool.size == 0
+
+def test_pool_is_bounded_and_evicts_idle_sessions():
+    clock = FakeClock()
+    pool = SoraSessionPool(_fake_factory, max_size=2, min_size=1, idle_timeout=60, clock=clock)
+    a, b = pool.checkout(), pool.checkout()
+    with pytest.raises(SoraJobCancelled):
+        pool.checkout(timeout=0)
+    pool.checkin(a)
+    clock.now = 30
+    pool.checkin(b)
+    clock.now = 70
+    assert pool.evict_idle() == 1  # a is past the timeout; b is not.
+    assert a.driver.quit_called and not b.driver.quit_called
+    clock.now = 200
+    assert pool.evict_idle() == 0  # min_size is kept.
+
+    held = pool.checkout()
+    pool.close()
+    with pytest.raises(SoraPoolClosed):
+        pool.checkout()
+    pool.checkin(held)
+    assert held.driver.quit_called and pool.size == 0
+
+@pytest.fixture
+def chrome_profiles(monkeypatch, tmp_path):
+    """
+    Seed a Chrome profile and replace uc.Chrome with a FakeDriver factory that records
+    the --user-data-dir each browser was launched with.
+    """
+    seed = tmp_path / "profiles" / "Profile 1"
+    seed.mkdir(parents=True)
+    (seed / "Cookies").write_text("session")
+    (seed / "SingletonLock").write_text("pid")
+    monkeypatch.setattr(sora, "_profiles", sora.ProfileSlots(str(seed), str(tmp_path / "pool")))
+    launched = []
+
+    def chrome(options, driver_executable_path=None):
+        [data_dir] = [a[len("--user-data-dir="):] for a in options.arguments if a.startswith("--user-data-dir=")]
+        launched.append(data_dir)
+        return FakeDriver()
+
+    monkeypatch.setattr(sora.uc, "Chrome", chrome)
+    return launched
+
+class ChromeOpener(FakeOpener):
+    # SimpleOpener's own setup_driver, launching the fake uc.Chrome.
+    def setup_driver(self):
+        super(FakeOpener, self).setup_driver()
+        self.wait = sora.WebDriverWait(self.driver, 0.05, poll_frequency=0.01)
+
+def test_pooled_sessions_get_their_own_profile_directories(chrome_profiles, tmp_path):
+    launched = chrome_profiles
+
+    def factory(cancel_event):
+        opener = ChromeOpener(cancel_event=cancel_event)
+        opener.driver.get(sora.BASE_URL)
+        opener._state_transition(State.IDLE)
+        return opener
+
+    pool = SoraSessionPool(factory, max_size=3, min_size=0)
+    openers = [pool.checkout() for _ in range(3)]
+    assert len(set(launched)) == 3
+    assert all(os.path.dirname(d) == str(tmp_path / "pool") for d in launched)
+    assert all(open(os.path.join(d, "Cookies")).read() == "session" for d in launched)
+    assert not any(os.path.exists(os.path.join(d, "SingletonLock")) for d in launched)
+
+    # A closed session's profile is reused by the next one, never shared with an open one.
+    pool.checkin(openers[1], healthy=False)
+    pool.checkout()
+    assert launched[3] == launched[1]
+    pool.close()
+
+@pytest.mark.asyncio
+async def test_bulk_download_collects_and_fetches_items(fake_sora, downloader, monkeypatch):
+    monkeypatch.setattr(FakeDriver, "thumbnails", 6)
+    downloader.delay = 0.2
+    await sora.start_sora_explore_session()
+    assert "between 1 and" in await sora.download_sora_explore_bulk(object(), 0)
+
+    result = await sora.download_sora_explore_bulk(object(), 5)
+    assert result["found"] == 5 and result["failed"] == 0
+    assert sorted(os.path.basename(p) for p in result["file_paths"]) == [f"a_gen_{i}.webp" for i in range(1, 6)]
+    assert len(downloader.urls) == 5
+    assert 1 < downloader.peak <= sora.BULK_CONCURRENCY
+    assert fake_sora.jobs[-1].note == "5/5"
+
+    result = await sora.download_sora_explore_bulk(object(), 10)
+    assert result["found"] == 6  # Only six exist, even after scrolling.
+    assert len(downloader.urls) == 6  # The first five came from the cache.
+    await sora.stop_sora_explore_session()
+
+@pytest.mark.asyncio
+async def test_bulk_captures_run_in_parallel_browsers(fake_sora, chrome_profiles, monkeypatch):
+    monkeypatch.setattr(sora, "SimpleOpener", ChromeOpener)
+    monkeypatch.setattr(FakeDriver, "thumbnails", 6)
+    pages = {"open": 0, "peak": 0}
+    lock = threading.Lock()
+    fake_get = FakeDriver.get
+
+    def slow_detail_page(driver, url):
+        fake_get(driver, url)
+        if "/g/" in url:
+            with lock:
+                pages["open"] += 1
+                pages["peak"] = max(pages["peak"], pages["open"])
+            time.sleep(0.2)
+            with lock:
+                pages["open"] -= 1
+
+    monkeypatch.setattr(FakeDriver, "get", slow_detail_page)
+    await sora.start_sora_explore_session()
+    result = await sora.download_sora_explore_bulk(object(), 6)
+    assert result["found"] == 6 and result["failed"] == 0
+    # Each browser ran on its own profile, and POOL_MAX_SIZE of them captured at once.
+    assert len(chrome_profiles) == len(set(chrome_profiles)) == sora.POOL_MAX_SIZE
+    assert pages["peak"] == sora.POOL_MAX_SIZE
+    await sora.stop_sora_explore_session()
+
+class FlakyMediaHandler(BaseHTTPRequestHandler):
+    body = bytes(range(256)) * 64
+    requests = []
+    failures = []
+
+    def do_GET(self):
+        range_header = self.headers.get("Range")
+        type(self).requests.append(range_header)
+        failure = type(self).failures.pop(0) if type(self).failures else None
+        if failure == 503:
+            self.send_response(503)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        start = int(range_header[len("bytes="):-1]) if range_header else 0
+        self.send_response(206 if start else 200)
+        self.send_header("Content-Length", str(len(self.body) - start))
+        self.end_headers()
+        if failure == "truncate":
+            self.wfile.write(self.body[start:start + 1000])
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        self.wfile.write(self.body[start:])
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def media_server():
+    FlakyMediaHandler.requests = []
+    FlakyMediaHandler.failures = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FlakyMediaHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/media.webp"
+    server.shutdown()
+    server.server_close()
+
+def test_media_download_retries_and_resumes(media_server, tmp_path):
+    downloader = sora.MediaDownloader(pool_size=2, retries=3, backoff=0.0, chunk_size=500)
+    FlakyMediaHandler.failures = [503, "truncate"]
+    path = downloader.download(media_server, str(tmp_path / "media.webp"))
+    assert open(path, "rb").read() == FlakyMediaHandler.body
+    assert FlakyMediaHandler.requests == [None, None, "bytes=1000-"]
+    assert not os.path.exists(path + ".part")
+
+def test_media_download_resumes_a_partial_file(media_server, tmp_path):
+    path = str(tmp_path / "media.webp")
+    with open(path + ".part", "wb") as f:
+        f.write(FlakyMediaHandler.body[:4000])
+    sora.MediaDownloader(retries=0).download(media_server, path)
+    assert open(path, "rb").read() == FlakyMediaHandler.body
+    assert FlakyMediaHandler.requests == ["bytes=4000-"]
+
+@pytest.mark.asyncio
+async def test_repeat_capture_is_served_from_the_cache(fake_sora, downloader):
+    await sora.start_sora_explore_session()
+    first = await sora.download_sora_explore_session(object())
+    opener = sora._pool.checkout()
+    sora._pool.checkin(opener)
+    visits = list(opener.driver.visits)
+
+    second = await sora.download_sora_explore_session(object())
+    assert second == first
+    assert len(downloader.urls) == 1
+    assert opener.driver.visits == visits  # The detail page was not opened again.
+    media = sora._media_cache.get("https://sora.com/g/gen_1")
+    assert media.metadata["artist"] == "artist1" and media.metadata["prompt"] == "text"
+    await sora.stop_sora_explore_session()
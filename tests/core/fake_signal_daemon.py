@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+"""
+tests/core/fake_signal_daemon.py
+--------------------------------
+Stand-in for "signal-cli -a <account> jsonRpc" used by the Signal transport tests.
+Speaks newline-delimited JSON-RPC 2.0 on stdin/stdout like the real daemon: emits a
+"receive" notification for each envelope given with --envelopes, answers "send" and
+"version", and returns a JSON-RPC error for anything else. Exits when stdin closes.
+
+With --batch N, "send" requests are only answered once N are outstanding, newest
+first, so a client that waits for each answer before sending the next stalls.
+"""
+
+import argparse
+import json
+import sys
+
+def _write(message: dict) -> None:
+    sys.stdout.write(json.dumps(message) + "\n")
+    sys.stdout.flush()
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--envelopes", help="JSON file holding a list of envelopes to emit on startup")
+    parser.add_argument("--batch", type=int, default=1)
+    parser.add_argument("--log", help="File that receives argv and every request, one JSON line each")
+    parser.add_argument("-a", dest="account", required=True)
+    parser.add_argument("mode", choices=["jsonRpc"])
+    opts = parser.parse_args()
+
+    log = open(opts.log, "a") if opts.log else None
+    if log:
+        log.write(json.dumps({"argv": sys.argv[1:]}) + "\n")
+        log.flush()
+
+    if opts.envelopes:
+        with open(opts.envelopes) as f:
+            for envelope in json.load(f):
+                _write({"jsonrpc": "2.0", "method": "receive",
+                        "params": {"envelope": envelope, "account": opts.account}})
+
+    pending = []
+    for line in sys.stdin:
+        request = json.loads(line)
+        if log:
+            log.write(line if line.endswith("\n") else line + "\n")
+            log.flush()
+        method = request.get("method")
+        if method == "send":
+            pending.append(request)
+            if len(pending) >= opts.batch:
+                for req in reversed(pending):
+                    _write({"jsonrpc": "2.0", "id": req["id"],
+                            "result": {"timestamp": 1000 + req["id"], "results": [{"type": "SUCCESS"}]}})
+                pending.clear()
+        elif method == "version":
+            _write({"jsonrpc": "2.0", "id": request["id"], "result": {"version": "fake"}})
+        else:
+            _write({"jsonrpc": "2.0", "id": request["id"],
+                    "error": {"code": -32601, "message": f"Method not implemented: {method}"}})
+
+if __name__ == "__main__":
+    main()
+
+# End of tests/core/fake_signal_daemon.py
@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+"""
+tests/core/test_async_db_api.py - Tests for the awaitable database API.
+Verifies reads and writes run off the event loop thread, writes keep submission order,
+transactions commit or roll back as a unit, and FlowManager's async variants.
+"""
+
+import asyncio
+import threading
+import pytest
+from core.api import async_db_api
+from managers import flow_manager
+from managers.flow_manager import FlowManager, user_state_cache
+from managers.user_state_cache import UserStateCache
+
+@pytest.fixture
+def table():
+    asyncio.run(async_db_api.execute_query(
+        "CREATE TABLE IF NOT EXISTS AsyncTest (id INTEGER PRIMARY KEY AUTOINCREMENT, value TEXT)",
+        commit=True))
+    asyncio.run(async_db_api.execute_query("DELETE FROM AsyncTest", commit=True))
+    yield "AsyncTest"
+
+@pytest.mark.asyncio
+async def test_queries_run_off_loop_thread(table):
+    loop_thread = threading.get_ident()
+
+    def which_thread(_conn=None):
+        return threading.get_ident()
+
+    assert await async_db_api.run_in_reader(which_thread) != loop_thread
+    assert await async_db_api.run_in_writer(which_thread) != loop_thread
+
+@pytest.mark.asyncio
+async def test_writes_apply_in_submission_order(table):
+    writes = [
+        async_db_api.insert_record(table, {"value": f"v{i}"})
+        for i in range(20)
+    ]
+    await asyncio.gather(*writes)
+    rows = await async_db_api.fetch_all(f"SELECT value FROM {table} ORDER BY id")
+    assert [r["value"] for r in rows] == [f"v{i}" for i in range(20)]
+
+@pytest.mark.asyncio
+async def test_fetch_one_returns_dict(table):
+    await async_db_api.execute_query(f"INSERT INTO {table} (value) VALUES (?)", ("hello",), commit=True)
+    row = await async_db_api.fetch_one(f"SELECT value FROM {table} WHERE value = ?", ("hello",))
+    assert row == {"value": "hello"}
+    assert await async_db_api.fetch_one(f"SELECT value FROM {table} WHERE value = ?", ("nope",)) is None
+
+@pytest.mark.asyncio
+async def test_upserts_insert_and_update(table):
+    await async_db_api.upsert_record(table, {"id": 1, "value": "a"})
+    assert await async_db_api.upsert_records(table, [{"id": 1, "value": "b"}, {"id": 2, "value": "c"}]) == 2
+    rows = await async_db_api.fetch_all(f"SELECT id, value FROM {table} ORDER BY id")
+    assert rows == [{"id": 1, "value": "b"}, {"id": 2, "value": "c"}]
+
+@pytest.mark.asyncio
+async def test_transaction_commits_and_rolls_back(table):
+    def insert_two(conn):
+        conn.execute(f"INSERT INTO {table} (value) VALUES ('a')")
+        conn.execute(f"INSERT INTO {table} (value) VALUES ('b')")
+        return 2
+
+    assert await async_db_api.run_transaction(insert_two) == 2
+
+    def insert_then_fail(conn):
+        conn.execute(f"INSERT INTO {table} (value) VALUES ('c')")
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        await async_db_api.run_transaction(insert_then_fail)
+    rows = await async_db_api.fetch_all(f"SELECT value FROM {table} ORDER BY id")
+    assert [r["value"] for r in rows] == ["a", "b"]
+
+@pytest.mark.asyncio
+async def test_flow_manager_async_variants():
+    user_id = "async-flow-user"
+    fm = FlowManager()
+    user_state_cache.invalidate(user_id)
+    await fm.start_flow_async(user_id, "survey")
+    assert await fm.get_active_flow_async(user_id) == "survey"
+    assert fm.get_active_flow(user_id) == "survey"
+    await fm.pause_flow_async(user_id, "survey")
+    assert await fm.get_active_flow_async(user_id) is None
+    await fm.resume_flow_async(user_id, "survey")
+    flows = await fm.list_flows_async(user_id)
+    assert flows["active_flow"] == "survey"
+    assert await fm.handle_flow_input_async(user_id, "hi") == ""
+    assert await fm.get_active_flow_async(user_id) is None
+    await fm.flush_user_states_async()
+    user_state_cache.invalidate(user_id)
+    assert await fm.list_flows_async(user_id) == flows | {"active_flow": None}
+
+@pytest.mark.asyncio
+async def test_async_read_writes_evicted_state_on_writer_thread(monkeypatch):
+    writer_thread = await async_db_api.run_in_writer(threading.get_ident)
+    writes = []
+    cache = UserStateCache(1, lambda uid: {"flows": {}, "active_flow": None},
+                           lambda uid, state: writes.append((uid, threading.get_ident())))
+    monkeypatch.setattr(flow_manager, "user_state_cache", cache)
+    cache.put("dirty-user", {"flows": {}, "active_flow": "survey"})
+    # Loading another user evicts the dirty one; its write must not run on the reader.
+    assert await FlowManager().get_active_flow_async("other-user") is None
+    assert writes == [("dirty-user", writer_thread)]
+
+# End of tests/core/test_async_db_api.py
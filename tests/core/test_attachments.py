@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+"""
+tests/core/test_attachments.py
+------------------------------
+Tests for lazy attachment handles: no download until requested, concurrent fetches,
+spooling of large files to disk, size/MIME limits, and content-hash reuse.
+"""
+
+import asyncio
+import os
+import pytest
+from unittest.mock import patch
+from core.attachments import AttachmentCache, AttachmentHandle, AttachmentSet
+from core.exceptions import AttachmentError
+
+def make_fetcher(contents, delay=0.0):
+    """
+    Build a fetcher serving contents[url] in small chunks and counting downloads.
+    """
+    calls = {"count": 0, "active": 0, "peak": 0}
+
+    async def fetch(url):
+        calls["count"] += 1
+        calls["active"] += 1
+        calls["peak"] = max(calls["peak"], calls["active"])
+        try:
+            await asyncio.sleep(delay)
+            data = contents[url]
+            for i in range(0, len(data), 4):
+                yield data[i:i + 4]
+        finally:
+            calls["active"] -= 1
+    return fetch, calls
+
+@pytest.fixture
+def cache(tmp_path):
+    c = AttachmentCache(max_bytes=1024, directory=str(tmp_path), spool_threshold=16, concurrency=2)
+    yield c
+    c.clear()
+
+@pytest.mark.asyncio
+async def test_nothing_downloaded_until_read(cache):
+    fetch, calls = make_fetcher({"u1": b"hello"})
+    handle = AttachmentHandle("a.txt", "u1", size=5, fetcher=fetch, cache=cache)
+    assert calls["count"] == 0
+    assert await handle.read() == b"hello"
+    assert await handle.read() == b"hello"
+    assert calls["count"] == 1
+
+@pytest.mark.asyncio
+async def test_large_content_spools_to_disk(cache, tmp_path):
+    data = b"x" * 100
+    fetch, _ = make_fetcher({"big": data})
+    handle = AttachmentHandle("big.bin", "big", fetcher=fetch, cache=cache)
+    with await handle.open() as f:
+        assert f.read() == data
+    assert os.path.exists(os.path.join(str(tmp_path), handle.digest))
+    out = await handle.save(str(tmp_path / "copy.bin"))
+    assert open(out, "rb").read() == data
+
+@pytest.mark.asyncio
+async def test_fetch_all_is_concurrent_and_bounded(cache):
+    contents = {f"u{i}": f"data{i}".encode() for i in range(4)}
+    fetch, calls = make_fetcher(contents, delay=0.01)
+    handles = AttachmentSet(AttachmentHandle(f"{u}.txt", u, fetcher=fetch, cache=cache) for u in contents)
+    await handles.fetch_all()
+    assert calls["peak"] == 2
+    assert [await h.read() for h in handles] == list(contents.values())
+
+@pytest.mark.asyncio
+async def test_same_content_is_stored_once(cache):
+    fetch, _ = make_fetcher({"first": b"same bytes", "second": b"same bytes"})
+    a = AttachmentHandle("a", "first", fetcher=fetch, cache=cache)
+    b = AttachmentHandle("b", "second", fetcher=fetch, cache=cache)
+    await AttachmentSet([a, b]).fetch_all()
+    assert a.digest == b.digest
+    assert len(cache) == 1
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_share_one_download(cache):
+    fetch, calls = make_fetcher({"u1": b"payload"}, delay=0.01)
+    handles = [AttachmentHandle("a", "u1", fetcher=fetch, cache=cache) for _ in range(3)]
+    await asyncio.gather(*(h.fetch() for h in handles))
+    assert calls["count"] == 1
+
+@pytest.mark.asyncio
+async def test_declared_size_over_limit_is_rejected_without_download(cache):
+    fetch, calls = make_fetcher({"u1": b"0123456789"})
+    handle = AttachmentHandle("a", "u1", size=10, fetcher=fetch, cache=cache, max_bytes=5)
+    with pytest.raises(AttachmentError):
+        await handle.read()
+    assert calls["count"] == 0
+
+@pytest.mark.asyncio
+async def test_stream_over_limit_is_aborted(cache, tmp_path):
+    fetch, _ = make_fetcher({"u1": b"y" * 64})
+    handle = AttachmentHandle("a", "u1", fetcher=fetch, cache=cache, max_bytes=32)
+    with pytest.raises(AttachmentError):
+        await handle.read()
+    assert len(cache) == 0
+    assert os.listdir(str(tmp_path)) == []
+
+@pytest.mark.asyncio
+async def test_disallowed_mime_type_is_rejected(cache):
+    fetch, calls = make_fetcher({"u1": b"MZ"})
+    handle = AttachmentHandle("a.exe", "u1", content_type="application/x-msdownload", fetcher=fetch, cache=cache)
+    with patch("core.attachments.ATTACHMENT_ALLOWED_TYPES", ["image/", "application/pdf"]):
+        with pytest.raises(AttachmentError):
+            await handle.read()
+        image = AttachmentHandle("a.png", "u1", content_type="image/png", fetcher=fetch, cache=cache)
+        assert await image.read() == b"MZ"
+
+@pytest.mark.asyncio
+async def test_eviction_removes_spooled_files(tmp_path):
+    small_cache = AttachmentCache(max_bytes=150, directory=str(tmp_path), spool_threshold=16)
+    fetch, calls = make_fetcher({"a": b"a" * 100, "b": b"b" * 100})
+    first = AttachmentHandle("a", "a", fetcher=fetch, cache=small_cache)
+    await first.fetch()
+    await AttachmentHandle("b", "b", fetcher=fetch, cache=small_cache).fetch()
+    assert len(small_cache) == 1
+    assert not os.path.exists(os.path.join(str(tmp_path), first.digest))
+    assert await first.read() == b"a" * 100
+    assert calls["count"] == 3
+
+@pytest.mark.asyncio
+async def test_deleted_spool_file_is_downloaded_again(cache, tmp_path):
+    data = b"y" * 100
+    fetch, calls = make_fetcher({"big": data})
+    handle = AttachmentHandle("big.bin", "big", fetcher=fetch, cache=cache)
+    assert await handle.read() == data
+    os.unlink(os.path.join(str(tmp_path), handle.digest))
+    assert await handle.read() == data
+    with await handle.open() as f:
+        assert f.read() == data
+    assert calls["count"] == 2 and len(cache) == 1
+
+# End of tests/core/test_attachments.py
@@ -0,0 +1,178 @@
+"""
+tests/core/test_chat_client.py - Tests for the shared chat client.
+Verifies that repeated prompts are served from the cache until their TTL expires, that identical
+concurrent prompts share one upstream call, that a user over the concurrency cap is rejected, and
+that streamed replies arrive in parts and are cached, against a local OpenAI-compatible HTTP server.
+"""
+
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from core.chat_client import ChatBusyError, ChatClient, normalize_prompt
+
+class StubCompletionHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    prompts = []
+    delay = 0.0
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        prompt = request["messages"][-1]["content"]
+        type(self).prompts.append(prompt)
+        time.sleep(self.delay)
+        reply = f"echo: {prompt}"
+        if request.get("stream"):
+            events = [
+                {"id": "stub", "object": "chat.completion.chunk", "created": 0, "model": request["model"],
+                 "choices": [{"index": 0, "delta": {"content": word}, "finish_reason": None}]}
+                for word in reply.split(" ")
+            ]
+            for event in events[1:]:
+                event["choices"][0]["delta"]["content"] = " " + event["choices"][0]["delta"]["content"]
+            body = "".join(f"data: {json.dumps(event)}\n\n" for event in events) + "data: [DONE]\n\n"
+            body = body.encode()
+            content_type = "text/event-stream"
+        else:
+            body = json.dumps({
+                "id": "stub", "object": "chat.completion", "created": 0, "model": request["model"],
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": reply}}],
+            }).encode()
+            content_type = "application/json"
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def chat_server():
+    StubCompletionHandler.prompts = []
+    StubCompletionHandler.delay = 0.0
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubCompletionHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/v1"
+    server.shutdown()
+    server.server_close()
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def make_client(base_url, **kwargs):
+    from openai import AsyncOpenAI
+    return ChatClient(model="stub", client_factory=lambda: AsyncOpenAI(api_key="test", base_url=base_url),
+                      **kwargs)
+
+def test_normalize_prompt():
+    assert normalize_prompt("  Hello\n  World ") == normalize_prompt("hello world")
+
+@pytest.mark.asyncio
+async def test_chat_client_caches_until_ttl(chat_server):
+    clock = FakeClock()
+    client = make_client(chat_server, cache_size=2, cache_ttl=60, clock=clock)
+    try:
+        assert await client.complete("Hello there", "u1") == "echo: Hello there"
+        assert await client.complete("hello   THERE", "u2") == "echo: Hello there"
+        assert StubCompletionHandler.prompts == ["Hello there"]
+
+        clock.now = 61
+        await client.complete("hello there", "u1")
+        assert len(StubCompletionHandler.prompts) == 2
+
+        # The least recently used prompt is evicted once the cache is full.
+        await client.complete("second", "u1")
+        await client.complete("third", "u1")
+        await client.complete("hello there", "u1")
+        assert len(StubCompletionHandler.prompts) == 5
+    finally:
+        await client.close()
+
+@pytest.mark.asyncio
+async def test_chat_client_coalesces_identical_prompts(chat_server):
+    StubCompletionHandler.delay = 0.2
+    client = make_client(chat_server, user_concurrency=1)
+    try:
+        replies = await asyncio.gather(*(client.complete("What is new?", f"user{i}") for i in range(5)))
+        assert replies == ["echo: What is new?"] * 5
+        assert StubCompletionHandler.prompts == ["What is new?"]
+    finally:
+        await client.close()
+
+@pytest.mark.asyncio
+async def test_chat_client_caps_requests_per_user(chat_server):
+    StubCompletionHandler.delay = 0.2
+    client = make_client(chat_server, cache_size=0, user_concurrency=1)
+    try:
+        first = asyncio.create_task(client.complete("one", "u1"))
+        await asyncio.sleep(0.05)
+        with pytest.raises(ChatBusyError):
+            await client.complete("two", "u1")
+        assert await client.complete("three", "u2") == "echo: three"
+        assert await first == "echo: one"
+        assert await client.complete("four", "u1") == "echo: four"
+        assert sorted(StubCompletionHandler.prompts) == ["four", "one", "three"]
+    finally:
+        await client.close()
+
+@pytest.mark.asyncio
+async def test_chat_client_streams_and_caches_reply(chat_server):
+    client = make_client(chat_server, user_concurrency=1)
+    try:
+        parts = [part async for part in client.stream("tell me a story", "u1")]
+        assert parts == ["echo:", " tell", " me", " a", " story"]
+        assert [part async for part in client.stream("Tell me a story", "u2")] == ["echo: tell me a story"]
+        assert await client.complete("tell me a story") == "echo: tell me a story"
+        assert StubCompletionHandler.prompts == ["tell me a story"]
+    finally:
+        await client.close()
+
+@pytest.mark.asyncio
+async def test_chat_client_stream_rejects_busy_user_before_iterating(chat_server):
+    StubCompletionHandler.delay = 0.2
+    client = make_client(chat_server, cache_size=0, user_concurrency=1)
+    try:
+        first = asyncio.create_task(client.complete("one", "u1"))
+        await asyncio.sleep(0.05)
+        with pytest.raises(ChatBusyError):
+            client.stream("two", "u1")
+        assert await first == "echo: one"
+    finally:
+        await client.close()
+
+@pytest.mark.asyncio
+async def test_chat_client_stream_holds_slot_from_creation(chat_server):
+    client = make_client(chat_server, cache_size=0, user_concurrency=1)
+    try:
+        first = client.stream("one", "u1")
+        with pytest.raises(ChatBusyError):
+            client.stream("two", "u1")
+        # Closing a stream that never started frees the slot.
+        await first.aclose()
+        assert [part async for part in client.stream("two", "u1")] == ["echo:", " two"]
+        assert await client.complete("three", "u1") == "echo: three"
+    finally:
+        await client.close()
+
+@pytest.mark.asyncio
+async def test_chat_client_keys_replies_by_history(chat_server):
+    client = make_client(chat_server)
+    history = [{"role": "user", "content": "hi"}, {"role": "assistant", "content": "echo: hi"}]
+    try:
+        await client.complete("and then?")
+        await client.complete("and then?", history=history)
+        await client.complete("And then?", history=history)
+        assert StubCompletionHandler.prompts == ["and then?", "and then?"]
+    finally:
+        await client.close()
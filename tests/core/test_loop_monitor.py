@@ -0,0 +1,76 @@
+"""
+tests/core/test_loop_monitor.py - Tests for the event-loop lag monitor.
+Verifies that lag is measured, that a blocking call is captured with its stack and plugin,
+and that the monitor can be switched off and on again while the loop runs.
+"""
+
+import asyncio
+import os
+import time
+
+import pytest
+
+from core import metrics
+from core.loop_monitor import LoopMonitor
+
+# A blocking "plugin" compiled with a plugin path, so the monitor attributes the block to it.
+_PLUGIN_SOURCE = """
+def blocking_handler(seconds):
+    time.sleep(seconds)
+"""
+_plugin_globals = {"__name__": "plugins.commands.fake_blocker", "time": time}
+exec(compile(_PLUGIN_SOURCE, os.path.join(os.sep, "bot", "plugins", "commands", "fake_blocker.py"), "exec"),
+     _plugin_globals)
+blocking_handler = _plugin_globals["blocking_handler"]
+
+@pytest.mark.asyncio
+async def test_loop_monitor_measures_lag():
+    monitor = LoopMonitor(interval=0.01, threshold=1.0)
+    before = metrics.LOOP_LAG.labels().count
+    monitor.start()
+    try:
+        await asyncio.sleep(0.1)
+    finally:
+        monitor.stop()
+    assert metrics.LOOP_LAG.labels().count > before
+    assert not monitor.blocks
+
+@pytest.mark.asyncio
+async def test_loop_monitor_captures_blocking_plugin():
+    monitor = LoopMonitor(interval=0.01, threshold=0.05)
+    blocked = metrics.LOOP_BLOCKS.labels(plugin="plugins.commands.fake_blocker").value
+    monitor.start()
+    try:
+        await asyncio.sleep(0.03)
+        blocking_handler(0.3)
+        await asyncio.sleep(0.05)
+    finally:
+        monitor.stop()
+    assert len(monitor.blocks) == 1
+    block = monitor.blocks[0]
+    assert block.duration >= 0.2
+    assert block.plugin == "plugins.commands.fake_blocker"
+    assert "blocking_handler" in block.stack
+    assert "test_loop_monitor_captures_blocking_plugin" in block.task
+    assert monitor.max_lag >= 0.2
+    assert metrics.LOOP_BLOCKS.labels(plugin="plugins.commands.fake_blocker").value == blocked + 1
+
+@pytest.mark.asyncio
+async def test_loop_monitor_toggles_at_runtime():
+    monitor = LoopMonitor(interval=0.01, threshold=0.05)
+    monitor.start()
+    watchdog = monitor._watchdog
+    assert monitor.enabled
+    monitor.stop()
+    await asyncio.sleep(0.05)
+    assert not monitor.enabled
+    watchdog.join(1.0)
+    assert not watchdog.is_alive()
+
+    time.sleep(0.1)  # Blocking while off is not recorded.
+    monitor.start()
+    try:
+        await asyncio.sleep(0.03)
+        assert monitor.enabled and not monitor.blocks
+    finally:
+        monitor.stop()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+"""
+tests/core/test_media_cache.py
+------------------------------
+Tests for the content-addressed media cache: lookups by URL and alias, sharing of
+identical content, coalesced downloads, LRU eviction, and reloading the index.
+"""
+
+import os
+import threading
+import time
+
+from core.media_cache import MediaCache
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+def _writer(data, calls=None, delay=0.0):
+    def download(path):
+        if calls is not None:
+            calls.append(path)
+        time.sleep(delay)
+        with open(path, "wb") as f:
+            f.write(data)
+    return download
+
+def test_fetch_caches_by_url_alias_and_content(tmp_path):
+    cache = MediaCache(str(tmp_path), max_bytes=1000)
+    calls = []
+    media = cache.fetch("https://cdn.test/a.webp?sig=1", "a.webp", _writer(b"A" * 10, calls),
+                        metadata={"artist": "Ann", "prompt": "red fox"}, aliases=["https://sora.com/g/1"])
+    assert os.path.basename(media.path) == "a.webp" and media.size == 10
+    assert open(media.path, "rb").read() == b"A" * 10
+    assert not os.listdir(cache.tmp_dir)
+
+    # A new signature, or the page alias, finds the same file without downloading.
+    again = cache.fetch("https://cdn.test/a.webp?sig=2", "a.webp", _writer(b"X", calls))
+    assert again.path == media.path and len(calls) == 1
+    assert cache.get("https://sora.com/g/1").metadata["artist"] == "Ann"
+
+    # Different URL, same bytes: stored once.
+    same = cache.fetch("https://cdn.test/copy.webp", "copy.webp", _writer(b"A" * 10, calls))
+    assert same.path == media.path and len(cache) == 1
+    assert [m.path for m in cache.search("FOX")] == [media.path]
+
+def test_concurrent_fetches_share_one_download(tmp_path):
+    cache = MediaCache(str(tmp_path), max_bytes=1000)
+    calls, paths = [], []
+    threads = [
+        threading.Thread(target=lambda: paths.append(
+            cache.fetch("https://cdn.test/v.mp4", "v.mp4", _writer(b"V", calls, delay=0.1)).path))
+        for _ in range(3)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1 and len(set(paths)) == 1
+
+def test_lru_eviction_and_index_reload(tmp_path):
+    clock = Clock()
+    cache = MediaCache(str(tmp_path), max_bytes=25, clock=clock)
+    old = cache.fetch("https://cdn.test/1", "1.webp", _writer(b"1" * 10))
+    clock.now += 1
+    kept = cache.fetch("https://cdn.test/2", "2.webp", _writer(b"2" * 10))
+    clock.now += 1
+    assert cache.get("https://cdn.test/1") is not None  # 1 is now the most recently used.
+    clock.now += 1
+    cache.fetch("https://cdn.test/3", "3.webp", _writer(b"3" * 10))
+    assert cache.get("https://cdn.test/2") is None and not os.path.exists(kept.path)
+    assert cache.total_bytes == 20
+
+    reloaded = MediaCache(str(tmp_path), max_bytes=25)
+    assert reloaded.get("https://cdn.test/1").path == old.path
+    os.remove(old.path)
+    assert reloaded.get("https://cdn.test/1") is None
+    assert len(reloaded) == 1
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+"""
+tests/core/test_message_pipeline.py
+-----------------------------------
+Tests for the bounded message pipeline: per-key ordering, concurrency across keys,
+load shedding when full, and draining on stop.
+"""
+
+import asyncio
+import pytest
+from core import metrics
+from core.message_pipeline import MessagePipeline
+
+@pytest.mark.asyncio
+async def test_same_key_runs_in_order():
+    pipeline = MessagePipeline(workers=4, max_queue=10)
+    pipeline.start()
+    seen = []
+
+    def make_job(i):
+        async def job():
+            await asyncio.sleep(0.01 * (3 - i))
+            seen.append(i)
+        return job
+
+    for i in range(3):
+        assert pipeline.submit("user:1", make_job(i))
+    await pipeline.stop()
+    assert seen == [0, 1, 2]
+
+@pytest.mark.asyncio
+async def test_different_keys_run_concurrently():
+    pipeline = MessagePipeline(workers=2, max_queue=10)
+    pipeline.start()
+    release = asyncio.Event()
+    started = []
+
+    def make_job(key):
+        async def job():
+            started.append(key)
+            await release.wait()
+        return job
+
+    pipeline.submit("user:slow", make_job("slow"))
+    pipeline.submit("user:fast", make_job("fast"))
+    await asyncio.sleep(0.01)
+    assert sorted(started) == ["fast", "slow"]
+    release.set()
+    await pipeline.stop()
+
+@pytest.mark.asyncio
+async def test_sheds_when_queue_full():
+    pipeline = MessagePipeline(workers=1, max_queue=2)
+    pipeline.start()
+    release = asyncio.Event()
+
+    async def job():
+        await release.wait()
+
+    shed_before = metrics.get_pipeline_stats()["shed"]
+    results = [pipeline.submit("user:1", job) for _ in range(3)]
+    assert results == [True, True, False]
+    assert metrics.get_pipeline_stats()["shed"] == shed_before + 1
+    release.set()
+    await pipeline.stop()
+
+@pytest.mark.asyncio
+async def test_stop_drains_queued_jobs_and_rejects_new_ones():
+    pipeline = MessagePipeline(workers=1, max_queue=10)
+    pipeline.start()
+    done = []
+
+    def make_job(i):
+        async def job():
+            await asyncio.sleep(0.005)
+            done.append(i)
+        return job
+
+    for i in range(5):
+        pipeline.submit(f"user:{i % 2}", make_job(i))
+    await pipeline.stop()
+    assert sorted(done) == [0, 1, 2, 3, 4]
+    assert pipeline.depth == 0
+    assert not pipeline.submit("user:0", make_job(99))
+
+@pytest.mark.asyncio
+async def test_failing_job_does_not_stop_lane():
+    pipeline = MessagePipeline(workers=1, max_queue=10)
+    pipeline.start()
+    done = []
+
+    async def boom():
+        raise RuntimeError("boom")
+
+    async def ok():
+        done.append("ok")
+
+    pipeline.submit("user:1", boom)
+    pipeline.submit("user:1", ok)
+    await pipeline.stop()
+    assert done == ["ok"]
+
+# End of tests/core/test_message_pipeline.py
@@ -1,9 +1,19 @@
 """
 tests/core/test_metrics.py - Tests for the metrics module.
-Ensures uptime and message counting functionality work as expected.
+Ensures uptime and message counting functionality work as expected, and covers the
+registry: labelled counters, gauges, histograms, text exposition, the HTTP endpoint,
+and the instrumentation of command dispatch and execute_sql.
 """
 
+import asyncio
+import threading
+import urllib.request
+from types import SimpleNamespace
+
+import pytest
+
 import core.metrics as metrics
+from core.metrics import Counter, Gauge, Histogram, Registry
 
 def test_get_uptime():
     uptime = metrics.get_uptime()
@@ -15,4 +25,106 @@ def test_increment_message_count():
     metrics.increment_message_count()
     assert metrics.messages_sent == initial_count + 1
 
+def test_labelled_counter_and_gauge():
+    registry = Registry()
+    requests = Counter("requests_total", "Requests.", ["command", "outcome"], registry=registry)
+    depth = Gauge("queue_depth", "Depth.", registry=registry)
+    requests.labels(command="help", outcome="ok").inc()
+    requests.labels("help", "ok").inc(2)
+    requests.labels(command="help", outcome="error").inc()
+    depth.set(5)
+    depth.dec()
+    assert requests.labels(command="help", outcome="ok").value == 3
+    assert requests.total() == 4
+    assert depth.value == 4
+    with pytest.raises(ValueError):
+        requests.labels(command="help")
+    with pytest.raises(ValueError):
+        requests.labels("help", "ok").inc(-1)
+
+def test_counter_is_exact_under_threads():
+    registry = Registry()
+    counter = Counter("hits_total", "Hits.", registry=registry)
+
+    def work():
+        for _ in range(10000):
+            counter.inc()
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert counter.value == 80000
+
+def test_histogram_buckets_and_quantile():
+    registry = Registry()
+    latency = Histogram("latency_seconds", "Latency.", buckets=(0.1, 0.5, 1.0), registry=registry)
+    for value in [0.05] * 90 + [0.3] * 9 + [2.0]:
+        latency.observe(value)
+    child = latency.labels()
+    assert child.buckets() == [(0.1, 90), (0.5, 99), (1.0, 99), (float("inf"), 100)]
+    assert child.count == 100
+    assert child.sum == pytest.approx(0.05 * 90 + 0.3 * 9 + 2.0)
+    assert 0.1 < child.quantile(0.99) <= 0.5
+    assert child.quantile(0.5) <= 0.1
+
+def test_exposition_format():
+    registry = Registry()
+    Counter("sent_total", "Messages sent.", ["transport"], registry=registry).labels(transport='disc"ord').inc()
+    Histogram("wait_seconds", "Wait.", buckets=(1.0,), registry=registry).observe(0.5)
+    text = registry.exposition()
+    assert "# HELP sent_total Messages sent.\n# TYPE sent_total counter\n" in text
+    assert 'sent_total{transport="disc\\"ord"} 1.0' in text
+    assert 'wait_seconds_bucket{le="1.0"} 1' in text
+    assert 'wait_seconds_bucket{le="+Inf"} 1' in text
+    assert "wait_seconds_sum 0.5" in text
+    assert "wait_seconds_count 1" in text
+
+def test_http_endpoint_serves_registry():
+    registry = Registry()
+    Gauge("up", "Up.", registry=registry).set(1)
+    server = metrics.start_http_server(0, registry=registry)
+    try:
+        port = server.server_address[1]
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics") as resp:
+            assert resp.headers["Content-Type"] == metrics.CONTENT_TYPE
+            assert "up 1.0" in resp.read().decode()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+def test_timed_records_outcome():
+    registry = Registry()
+    count = Counter("ops_total", "Ops.", ["op", "outcome"], registry=registry)
+    latency = Histogram("ops_seconds", "Ops.", ["op", "outcome"], registry=registry)
+    with metrics.timed(latency, count, op="a"):
+        pass
+    with pytest.raises(RuntimeError):
+        with metrics.timed(latency, count, op="a"):
+            raise RuntimeError("boom")
+    with metrics.timed(latency, count, op="a") as labels:
+        labels["outcome"] = "denied"
+    assert count.labels(op="a", outcome="ok").value == 1
+    assert count.labels(op="a", outcome="error").value == 1
+    assert count.labels(op="a", outcome="denied").value == 1
+    assert latency.labels(op="a", outcome="ok").count == 1
+
+def test_dispatch_message_is_instrumented():
+    from plugins.manager import dispatch_message
+
+    before = metrics.COMMANDS.labels(command="unknown", outcome="unknown").value
+    parsed = SimpleNamespace(command="definitelynotacommand", args="")
+    ctx = SimpleNamespace(author=SimpleNamespace(id=1, roles=[]))
+    assert asyncio.run(dispatch_message(parsed, ctx, None)) == ""
+    assert metrics.COMMANDS.labels(command="unknown", outcome="unknown").value == before + 1
+
+def test_execute_sql_is_instrumented():
+    from db.repository import execute_sql
+
+    before = metrics.DB_QUERIES.labels(operation="SELECT", outcome="ok").value
+    assert execute_sql("SELECT 1", fetchone=True)[0] == 1
+    assert metrics.DB_QUERIES.labels(operation="SELECT", outcome="ok").value == before + 1
+    assert metrics.DB_QUERY_LATENCY.labels(operation="SELECT", outcome="ok").count >= 1
+
 # End of tests/core/test_metrics.py
\ No newline at end of file
@@ -0,0 +1,213 @@
+#!/usr/bin/env python
+"""
+tests/core/test_outbound.py
+---------------------------
+Tests for the outbound scheduler: chunking, token-bucket pacing, merging of bursts,
+priority of short replies, rate-limit retries, streamed replies edited in place or sent
+once complete, and its use by BotOrchestrator._send and send_files.
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from core.outbound import (
+    BULK, STREAM_INTERRUPTED, STREAM_PLACEHOLDER, OutboundScheduler, TokenBucket, send_files, split_message,
+)
+
+class RateLimited(Exception):
+    def __init__(self, retry_after):
+        super().__init__("429 Too Many Requests")
+        self.retry_after = retry_after
+
+class Recorder:
+    def __init__(self, failures=()):
+        self.sent = []
+        self.failures = list(failures)
+
+    async def __call__(self, target, content, files=None):
+        if self.failures:
+            raise self.failures.pop(0)
+        self.sent.append((target, content, files))
+        return len(self.sent) - 1
+
+class EditRecorder(Recorder):
+    def __init__(self, failures=()):
+        super().__init__(failures)
+        self.edits = []
+
+    async def edit(self, message, content):
+        self.edits.append((message, content))
+
+    def shown(self):
+        """
+        Final text of each sent message after its edits.
+        """
+        messages = [content for _, content, _ in self.sent]
+        for message, content in self.edits:
+            messages[message] = content
+        return messages
+
+async def parts_of(text, size=4, delay=0.0):
+    for i in range(0, len(text), size):
+        await asyncio.sleep(delay)
+        yield text[i:i + size]
+
+def test_split_message_prefers_line_then_word_boundaries():
+    assert split_message("short", 10) == ["short"]
+    assert split_message("aaaa\nbbbb cccc", 10) == ["aaaa", "bbbb cccc"]
+    assert split_message("aaaa bbbb cccc", 10) == ["aaaa bbbb", "cccc"]
+    assert split_message("x" * 25, 10) == ["x" * 10, "x" * 10, "x" * 5]
+    text = "\n".join(f"line {i}" for i in range(500))
+    chunks = split_message(text, 2000)
+    assert all(len(c) <= 2000 for c in chunks)
+    assert "\n".join(chunks) == text
+
+def test_token_bucket_refills_at_rate():
+    now = [0.0]
+    bucket = TokenBucket(rate=2.0, capacity=2, clock=lambda: now[0])
+    bucket.take()
+    bucket.take()
+    assert bucket.delay() == pytest.approx(0.5)
+    now[0] = 0.5
+    assert bucket.delay() == 0
+    bucket.pause(3.0)
+    assert bucket.delay() == pytest.approx(3.0)
+
+@pytest.mark.asyncio
+async def test_long_reply_is_chunked_in_order():
+    send = Recorder()
+    scheduler = OutboundScheduler(send, max_chars=2000, channel_burst=100, channel_period=1)
+    text = "\n".join(f"{i:04d} " + "x" * 95 for i in range(100))
+    await scheduler.send("chan", text)
+    assert len(send.sent) > 1
+    assert all(len(content) <= 2000 for _, content, _ in send.sent)
+    assert "\n".join(content for _, content, _ in send.sent) == text
+
+@pytest.mark.asyncio
+async def test_burst_to_one_channel_is_merged_and_paced():
+    send = Recorder()
+    scheduler = OutboundScheduler(send, channel_burst=1, channel_period=0.05)
+    await asyncio.gather(*(scheduler.send("chan", f"reply {i}") for i in range(10)))
+    assert len(send.sent) < 10
+    assert "\n".join(content for _, content, _ in send.sent) == "\n".join(f"reply {i}" for i in range(10))
+
+@pytest.mark.asyncio
+async def test_channels_are_paced_independently():
+    send = Recorder()
+    scheduler = OutboundScheduler(send, channel_burst=1, channel_period=60)
+    await asyncio.wait_for(asyncio.gather(scheduler.send("a", "one"), scheduler.send("b", "two")), timeout=1)
+    assert sorted(target for target, _, _ in send.sent) == ["a", "b"]
+
+@pytest.mark.asyncio
+async def test_short_replies_go_ahead_of_bulk_chunks():
+    send = Recorder()
+    scheduler = OutboundScheduler(send, max_chars=10, channel_burst=1, channel_period=0.02)
+    bulk = scheduler.enqueue("chan", "aaaaaaaaa bbbbbbbbb ccccccccc ddddddddd")
+    await asyncio.sleep(0)
+    short = scheduler.enqueue("chan", "hi")
+    await asyncio.gather(bulk, short)
+    contents = [content for _, content, _ in send.sent]
+    assert contents.index("hi") < contents.index("ddddddddd")
+
+@pytest.mark.asyncio
+async def test_rate_limited_send_is_retried():
+    send = Recorder(failures=[RateLimited(0.01)])
+    scheduler = OutboundScheduler(send, channel_burst=5, channel_period=1)
+    await scheduler.send("chan", "hello")
+    assert [content for _, content, _ in send.sent] == ["hello"]
+
+@pytest.mark.asyncio
+async def test_failed_send_fails_the_message_and_drops_its_chunks():
+    send = Recorder(failures=[ValueError("channel gone")])
+    scheduler = OutboundScheduler(send, max_chars=5, channel_burst=100, channel_period=1)
+    with pytest.raises(ValueError):
+        await scheduler.send("chan", "aaaa bbbb cccc", priority=BULK)
+    await scheduler.drain()
+    assert send.sent == [] and scheduler.depth == 0
+
+@pytest.mark.asyncio
+async def test_streamed_reply_edits_placeholder_at_throttled_pace():
+    send = EditRecorder()
+    scheduler = OutboundScheduler(send, channel_burst=100, channel_period=1)
+    text = "The quick brown fox jumps over the lazy dog. " * 4
+    await scheduler.stream("chan", parts_of(text, delay=0.01), send.edit, interval=0.05)
+    assert send.sent[0][1] == STREAM_PLACEHOLDER
+    assert send.shown() == [text]
+    assert 1 < len(send.edits) < len(text) // 4
+    assert all(message == 0 for message, _ in send.edits)
+
+@pytest.mark.asyncio
+async def test_streamed_reply_continues_in_new_message_past_limit():
+    send = EditRecorder()
+    scheduler = OutboundScheduler(send, max_chars=20, channel_burst=100, channel_period=1)
+    text = "alpha beta gamma delta epsilon zeta eta theta"
+    await scheduler.stream("chan", parts_of(text), send.edit, interval=0)
+    shown = send.shown()
+    assert len(shown) == 3 and all(len(content) <= 20 for content in shown)
+    assert " ".join(shown) == text
+
+@pytest.mark.asyncio
+async def test_streamed_reply_without_edit_is_sent_once_complete():
+    send = Recorder()
+    scheduler = OutboundScheduler(send, channel_burst=100, channel_period=1)
+    await scheduler.stream("chan", parts_of("hello streaming world"))
+    assert [content for _, content, _ in send.sent] == ["hello streaming world"]
+
+@pytest.mark.asyncio
+async def test_failed_stream_finishes_its_message():
+    async def failing():
+        yield "partial answer"
+        raise RuntimeError("upstream closed")
+
+    send = EditRecorder()
+    scheduler = OutboundScheduler(send, channel_burst=100, channel_period=1)
+    with pytest.raises(RuntimeError):
+        await scheduler.stream("chan", failing(), send.edit, interval=10)
+    assert send.shown() == [f"partial answer\n\n{STREAM_INTERRUPTED}"]
+
+@pytest.mark.asyncio
+async def test_orchestrator_send_uses_scheduler():
+    from core.bot_orchestrator import BotOrchestrator
+
+    class FakeTransport:
+        def __init__(self):
+            self.sent = []
+            self.files = []
+
+        async def send_message(self, channel, content="", files=None):
+            self.sent.append((channel, content))
+            if files:
+                self.files.append(files)
+
+    transport = FakeTransport()
+    bot = BotOrchestrator(transport)
+    channel = SimpleNamespace(id=42)
+    await bot._send(SimpleNamespace(channel=channel), "word " * 1000)
+    assert len(transport.sent) == 3
+    assert all(target is channel and len(content) <= 2000 for target, content in transport.sent)
+    await send_files(channel, "", ["a.webp", "b.mp4"])
+    assert transport.files == [["a.webp", "b.mp4"]]
+
+@pytest.mark.asyncio
+async def test_orchestrator_streams_through_editing_transport():
+    from core.bot_orchestrator import BotOrchestrator
+
+    class EditingTransport:
+        supports_edit = True
+
+        def __init__(self):
+            self.recorder = EditRecorder()
+
+        async def send_message(self, channel, content="", files=None):
+            return await self.recorder(channel, content, files)
+
+        async def edit_message(self, message, content):
+            await self.recorder.edit(message, content)
+
+    transport = EditingTransport()
+    bot = BotOrchestrator(transport)
+    await bot._send(SimpleNamespace(channel="chan"), parts_of("streamed through the bot"))
+    assert transport.recorder.sent[0][1] == STREAM_PLACEHOLDER
+    assert transport.recorder.shown() == ["streamed through the bot"]
@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+"""
+tests/core/test_tracing.py
+--------------------------
+Tests for per-message spans, event-loop lag attribution, slow-message capture, and
+profiling of slow commands, including the spans dispatch_message records.
+"""
+
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from core import tracing
+from core.permissions import EVERYONE
+from core.tracing import SlowCommandTracker
+
+@pytest.fixture
+def tracker(monkeypatch):
+    fresh = SlowCommandTracker(threshold=0.05, log_size=10, profile_runs=1, profile_lines=10)
+    monkeypatch.setattr(tracing, "tracker", fresh)
+    return fresh
+
+@pytest.mark.asyncio
+async def test_spans_record_wall_time_and_loop_lag(tracker):
+    with tracing.trace("user:1") as t:
+        with tracing.span("blocking"):
+            time.sleep(0.02)
+        with tracing.span("awaiting"):
+            await asyncio.sleep(0.02)
+    blocking, awaiting = t.spans
+    assert blocking.duration >= 0.02 and blocking.loop_lag >= 0.02
+    assert awaiting.duration >= 0.02 and awaiting.loop_lag < 0.01
+    assert t.duration >= 0.04
+
+def test_span_outside_trace_is_noop():
+    with tracing.span("anything"):
+        pass
+    assert tracing.current_trace() is None
+
+@pytest.mark.asyncio
+async def test_slow_trace_is_logged_and_next_run_profiled(tracker):
+    with tracing.trace("user:1") as t:
+        tracing.set_command("slowcmd")
+        await asyncio.sleep(0.06)
+    assert list(tracker.slow) == [t]
+    assert tracker.worst["slowcmd"][0] >= 0.06
+
+    def busy():
+        return sum(i * i for i in range(20000))
+
+    with tracing.profiled("slowcmd"):
+        busy()
+    captured = tracker.profiles["slowcmd"][-1]
+    assert "busy" in captured.text
+    # Armed for one run only.
+    assert tracker.begin_profile("slowcmd") is None
+
+@pytest.mark.asyncio
+async def test_fast_trace_is_not_logged(tracker):
+    with tracing.trace("user:1"):
+        tracing.set_command("fastcmd")
+    assert not tracker.slow
+    assert tracker.begin_profile("fastcmd") is None
+
+@pytest.mark.asyncio
+async def test_dispatch_message_records_spans(tracker):
+    from plugins.manager import dispatch_message, plugin_registry, alias_mapping
+
+    async def slow_plugin(args, ctx, state_machine, **kwargs):
+        await asyncio.sleep(0.06)
+        return "done"
+
+    plugin_registry["tracedcmd"] = {"function": slow_plugin, "required_role": EVERYONE}
+    alias_mapping["tracedcmd"] = "tracedcmd"
+    try:
+        ctx = SimpleNamespace(author=SimpleNamespace(id=1, roles=[]))
+        parsed = SimpleNamespace(command="tracedcmd", args="")
+        with tracing.trace("user:1") as t:
+            assert await dispatch_message(parsed, ctx, None) == "done"
+    finally:
+        del alias_mapping["tracedcmd"]
+        del plugin_registry["tracedcmd"]
+    assert t.command == "tracedcmd"
+    assert [s.name for s in t.spans] == ["resolve", "permission", "plugin"]
+    assert t.spans[-1].duration >= 0.06
+    assert tracker.slow and tracker.slow[-1] is t
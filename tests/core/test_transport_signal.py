@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+"""
+tests/core/test_transport_signal.py
+-----------------------------------
+Tests for the Signal transport against a fake signal-cli JSON-RPC daemon: one process
+per transport lifetime, received envelopes dispatched with a Signal context, pipelined
+sends, error responses, attachments, and connecting to a daemon over TCP.
+"""
+
+import asyncio
+import json
+import os
+import shlex
+import sys
+
+import pytest
+
+import core.transport_signal as transport_signal
+from core.exceptions import SignalRpcError
+from core.transport_signal import SignalChannel, SignalTransport
+
+FAKE_DAEMON = os.path.join(os.path.dirname(__file__), "fake_signal_daemon.py")
+BOT = "+15550000000"
+
+def _envelope(source, text=None, group_id=None, **extra):
+    data_message = {"timestamp": 1700000000001, "message": text}
+    if group_id:
+        data_message["groupInfo"] = {"groupId": group_id, "type": "DELIVER"}
+    envelope = {"source": source, "sourceNumber": source, "sourceName": "Tester",
+                "timestamp": 1700000000000, "dataMessage": data_message}
+    envelope.update(extra)
+    return envelope
+
+def _fake_command(tmp_path, envelopes=(), batch=1):
+    env_file = tmp_path / "envelopes.json"
+    env_file.write_text(json.dumps(list(envelopes)))
+    log = tmp_path / "requests.log"
+    parts = [sys.executable, FAKE_DAEMON, "--envelopes", str(env_file), "--batch", str(batch), "--log", str(log)]
+    return " ".join(shlex.quote(p) for p in parts), log
+
+def _logged(log):
+    return [json.loads(line) for line in log.read_text().splitlines()]
+
+async def _wait_for(predicate, timeout=10.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        if asyncio.get_running_loop().time() > deadline:
+            raise AssertionError("condition not reached in time")
+        await asyncio.sleep(0.01)
+
+async def _run(transport, on_message=None):
+    received = []
+
+    async def _collect(parsed, ctx):
+        received.append((parsed, ctx))
+
+    task = asyncio.create_task(transport.start(on_message or _collect))
+    await _wait_for(lambda: transport.connected)
+    return task, received
+
+@pytest.mark.asyncio
+async def test_received_envelopes_are_dispatched_with_context(tmp_path):
+    envelopes = [
+        _envelope("+15551112222", "ping"),
+        {"source": "+15551112222", "timestamp": 1, "typingMessage": {"action": "STARTED"}},
+        {"source": "+15551112222", "timestamp": 2, "receiptMessage": {"isRead": True}},
+        _envelope("+15553334444", "@bot ping now", group_id="grp=="),
+    ]
+    command, log = _fake_command(tmp_path, envelopes)
+    transport = SignalTransport(account=BOT, command=command, address="")
+    task, received = await _run(transport)
+    await _wait_for(lambda: len(received) == 2)
+    await transport.stop()
+    await task
+
+    by_sender = {parsed.sender: (parsed, ctx) for parsed, ctx in received}
+    parsed, ctx = by_sender["+15551112222"]
+    assert (parsed.command, parsed.group_id) == ("ping", None)
+    assert ctx.author.id == "+15551112222" and ctx.author.roles == []
+    assert ctx.channel == SignalChannel(recipient="+15551112222")
+    parsed, ctx = by_sender["+15553334444"]
+    assert (parsed.command, parsed.args, parsed.group_id) == ("ping", "now", "grp==")
+    assert ctx.channel.group_id == "grp=="
+    # One daemon for the whole session, started in JSON-RPC mode for the bot's account.
+    starts = [entry for entry in _logged(log) if "argv" in entry]
+    assert len(starts) == 1
+    assert starts[0]["argv"][-3:] == ["-a", BOT, "jsonRpc"]
+
+@pytest.mark.asyncio
+async def test_sends_are_pipelined(tmp_path):
+    # The fake answers only once three sends are outstanding, so sequential sends would time out.
+    command, log = _fake_command(tmp_path, batch=3)
+    transport = SignalTransport(account=BOT, command=command, address="")
+    task, _ = await _run(transport)
+    results = await asyncio.wait_for(asyncio.gather(
+        transport.send_message("+15551112222", "one"),
+        transport.send_message(SignalChannel(recipient="+15551112222", group_id="grp=="), "two"),
+        transport.send_message(SignalChannel(recipient="+15553334444"), "three"),
+    ), timeout=10)
+    await transport.stop()
+    await task
+
+    sends = [entry for entry in _logged(log) if entry.get("method") == "send"]
+    assert [r["timestamp"] for r in results] == [1000 + s["id"] for s in sends]
+    assert sends[0]["params"] == {"recipient": ["+15551112222"], "message": "one"}
+    assert sends[1]["params"] == {"groupId": "grp==", "message": "two"}
+    assert sends[2]["params"]["recipient"] == ["+15553334444"]
+
+@pytest.mark.asyncio
+async def test_error_response_raises(tmp_path):
+    command, _ = _fake_command(tmp_path)
+    transport = SignalTransport(account=BOT, command=command, address="")
+    task, _ = await _run(transport)
+    assert await transport.call("version") == {"version": "fake"}
+    with pytest.raises(SignalRpcError) as excinfo:
+        await transport.call("listIdentities")
+    assert excinfo.value.code == -32601
+    await transport.stop()
+    await task
+    with pytest.raises(SignalRpcError):
+        await transport.call("version")
+
+@pytest.mark.asyncio
+async def test_attachments_are_read_from_signal_cli_storage(tmp_path, monkeypatch):
+    monkeypatch.setattr(transport_signal, "SIGNAL_ATTACHMENTS_DIR", str(tmp_path))
+    (tmp_path / "att123").write_bytes(b"image-bytes")
+    envelope = _envelope("+15551112222", None)
+    envelope["dataMessage"]["attachments"] = [
+        {"id": "att123", "filename": "photo.png", "contentType": "image/png", "size": 11}
+    ]
+    command, _ = _fake_command(tmp_path, [envelope])
+    transport = SignalTransport(account=BOT, command=command, address="")
+    task, received = await _run(transport)
+    await _wait_for(lambda: received)
+    parsed, _ = received[0]
+    attachment = parsed.attachments[0]
+    assert (attachment.filename, attachment.content_type) == ("photo.png", "image/png")
+    assert await attachment.read() == b"image-bytes"
+    await transport.stop()
+    await task
+
+@pytest.mark.asyncio
+async def test_connects_to_running_daemon_over_tcp():
+    requests = []
+
+    async def _daemon(reader, writer):
+        notification = {"jsonrpc": "2.0", "method": "receive",
+                        "params": {"envelope": _envelope("+15551112222", "ping")}}
+        writer.write(json.dumps(notification).encode() + b"\n")
+        async for line in reader:
+            request = json.loads(line)
+            requests.append(request)
+            writer.write(json.dumps({"jsonrpc": "2.0", "id": request["id"], "result": {"timestamp": 7}}).encode() + b"\n")
+            await writer.drain()
+        writer.close()
+
+    server = await asyncio.start_server(_daemon, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    transport = SignalTransport(account="", address=f"127.0.0.1:{port}")
+
+    async def _reply(parsed, ctx):
+        await transport.send_message(ctx.channel, f"pong to {parsed.command}")
+
+    task, _ = await _run(transport, _reply)
+    await _wait_for(lambda: requests)
+    await transport.stop()
+    await task
+    server.close()
+    await server.wait_closed()
+    assert requests[0]["method"] == "send"
+    assert requests[0]["params"] == {"recipient": ["+15551112222"], "message": "pong to ping"}
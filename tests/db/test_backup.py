@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+"""
+tests/db/test_backup.py - Tests for online database backups in db.backup.
+Verifies that backups taken with the online backup API and with VACUUM INTO are complete
+and consistent while another thread writes, that unchanged databases are not backed up
+again while commits made during a backup are, and that periodic backups run off the
+event loop thread.
+"""
+
+import asyncio
+import sqlite3
+import threading
+
+import pytest
+
+import db.backup as backup
+from core.config import DB_NAME
+
+@pytest.fixture
+def backup_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(backup, "BACKUP_DIR", str(tmp_path))
+    backup._reset_change_tracking()
+    conn = sqlite3.connect(DB_NAME)
+    conn.execute("CREATE TABLE IF NOT EXISTS BackupTest (id INTEGER PRIMARY KEY, value TEXT)")
+    conn.execute("DELETE FROM BackupTest")
+    conn.executemany("INSERT INTO BackupTest (value) VALUES (?)", [("x" * 500,)] * 500)
+    conn.commit()
+    conn.close()
+    yield tmp_path
+    backup._reset_change_tracking()
+
+def backup_rows(path):
+    conn = sqlite3.connect(path)
+    try:
+        assert conn.execute("PRAGMA integrity_check").fetchone()[0] == "ok"
+        return conn.execute("SELECT COUNT(*) FROM BackupTest").fetchone()[0]
+    finally:
+        conn.close()
+
+@pytest.mark.parametrize("mode", ["backup", "vacuum"])
+def test_backup_is_consistent_during_writes(backup_dir, monkeypatch, mode):
+    monkeypatch.setattr(backup, "BACKUP_PAGES_PER_STEP", 64)
+    stop = threading.Event()
+
+    def writer():
+        conn = sqlite3.connect(DB_NAME, timeout=5)
+        while not stop.is_set():
+            conn.execute("INSERT INTO BackupTest (value) VALUES (?)", ("y" * 500,))
+            conn.commit()
+            stop.wait(0.001)
+        conn.close()
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    try:
+        path = backup.create_backup(mode=mode, store=False)
+    finally:
+        stop.set()
+        thread.join()
+    assert path.startswith(str(backup_dir)) and path.endswith(".db")
+    assert backup_rows(path) >= 500
+    assert not list(backup_dir.glob("*.tmp"))
+
+def test_online_backup_falls_back_to_vacuum_when_writes_keep_restarting_it(backup_dir, monkeypatch):
+    monkeypatch.setattr(backup, "BACKUP_PAGES_PER_STEP", 1)
+    monkeypatch.setattr(backup, "_MAX_BACKUP_RESTARTS", 0)
+    vacuums = []
+    vacuum_into = backup._vacuum_into
+    monkeypatch.setattr(backup, "_vacuum_into", lambda path: vacuums.append(path) or vacuum_into(path))
+    monkeypatch.setattr(backup, "BACKUP_STEP_SLEEP_MS", 200)
+    writer = sqlite3.connect(DB_NAME, check_same_thread=False)
+    # Commit from another connection during the first pause between steps.
+    timer = threading.Timer(0.1, lambda: (
+        writer.execute("INSERT INTO BackupTest (value) VALUES ('during')"), writer.commit()))
+    timer.start()
+    try:
+        path = backup.create_backup(mode="backup", store=False)
+    finally:
+        timer.join()
+        writer.close()
+    assert len(vacuums) == 1
+    assert backup_rows(path) == 501
+
+def test_unchanged_database_is_not_backed_up_again(backup_dir):
+    first = backup.create_backup(skip_unchanged=True, store=False)
+    assert backup.create_backup(skip_unchanged=True, store=False) == first
+    assert backup.list_backups() == [first.rsplit("/", 1)[1]]
+
+    conn = sqlite3.connect(DB_NAME)
+    conn.execute("INSERT INTO BackupTest (value) VALUES ('new')")
+    conn.commit()
+    conn.close()
+    second = backup.create_backup(skip_unchanged=True, store=False)
+    assert second != first and backup_rows(second) == 501
+    assert backup.create_backup(skip_unchanged=False, store=False) not in (first, second)
+
+def test_commit_after_a_full_backup_is_not_skipped(backup_dir, monkeypatch):
+    online_backup = backup._online_backup
+
+    def commit_after_snapshot(path):
+        online_backup(path)
+        conn = sqlite3.connect(DB_NAME)
+        conn.execute("INSERT INTO BackupTest (value) VALUES ('late')")
+        conn.commit()
+        conn.close()
+
+    monkeypatch.setattr(backup, "_online_backup", commit_after_snapshot)
+    first = backup.create_backup(store=False)
+    assert backup_rows(first) == 500
+    monkeypatch.setattr(backup, "_online_backup", online_backup)
+    # The commit is in no backup yet, so the next one is taken.
+    second = backup.create_backup(skip_unchanged=True, store=False)
+    assert second != first and backup_rows(second) == 501
+
+@pytest.mark.asyncio
+async def test_periodic_backups_run_off_the_event_loop(backup_dir, monkeypatch):
+    threads = []
+
+    def recording_backup(**kwargs):
+        threads.append(threading.get_ident())
+        return ""
+
+    monkeypatch.setattr(backup, "create_backup", recording_backup)
+    task = asyncio.create_task(backup.start_periodic_backups(interval_seconds=0.01))
+    await asyncio.sleep(0.05)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    assert threads and threading.get_ident() not in threads
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+"""
+tests/db/test_backup_store.py - Tests for the deduplicated backup store in db.backup_store.
+Verifies that consecutive snapshots share unchanged chunks, that any snapshot restores
+byte-for-byte with either compression, that a damaged snapshot never replaces the target,
+and that db.backup creates, prunes, and restores backups through the store.
+"""
+
+import hashlib
+import json
+import sqlite3
+
+import pytest
+
+import db.backup as backup
+from core.config import DB_NAME
+from db.backup_store import BackupStore, page_size_of
+
+def file_sha(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+@pytest.fixture
+def sample_db(tmp_path):
+    path = str(tmp_path / "sample.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE Items (id INTEGER PRIMARY KEY, value TEXT)")
+    conn.executemany("INSERT INTO Items (value) VALUES (?)", [(f"item {i} " * 20,) for i in range(3000)])
+    conn.commit()
+    conn.close()
+    return path
+
+@pytest.mark.parametrize("compression", ["zstd", "gzip"])
+def test_snapshots_share_unchanged_chunks_and_restore_exactly(sample_db, tmp_path, compression):
+    store = BackupStore(str(tmp_path / "store"), chunk_pages=4, compression=compression)
+    first_sha = file_sha(sample_db)
+    first = store.add_snapshot(sample_db, "first")
+    first_usage = store.disk_usage()
+    assert first_usage < first["size"] / 2
+
+    conn = sqlite3.connect(sample_db)
+    conn.execute("UPDATE Items SET value = 'changed' WHERE id = 1500")
+    conn.commit()
+    conn.close()
+    second = store.add_snapshot(sample_db, "second")
+    shared = set(first["chunks"]) & set(second["chunks"])
+    assert len(shared) >= len(second["chunks"]) - 3
+    assert store.disk_usage() - first_usage < first_usage / 10
+
+    store.restore("first", str(tmp_path / "restored.db"))
+    assert file_sha(tmp_path / "restored.db") == first_sha
+    store.restore("second", str(tmp_path / "restored.db"))
+    assert file_sha(tmp_path / "restored.db") == file_sha(sample_db)
+    assert store.snapshots() == ["first", "second"]
+
+    store.delete("first")
+    assert store.gc() == len(set(first["chunks"]) - shared)
+    store.restore("second", str(tmp_path / "restored.db"))
+    assert file_sha(tmp_path / "restored.db") == file_sha(sample_db)
+
+def test_damaged_snapshot_does_not_replace_target(sample_db, tmp_path):
+    store = BackupStore(str(tmp_path / "store"), compression="gzip")
+    manifest = store.add_snapshot(sample_db, "snap")
+    assert page_size_of(sample_db) == manifest["page_size"]
+    target = tmp_path / "target.db"
+    target.write_bytes(b"keep me")
+
+    manifest["chunks"][1], manifest["chunks"][2] = manifest["chunks"][2], manifest["chunks"][1]
+    with open(store.manifest_path("snap"), "w") as f:
+        json.dump(manifest, f)
+    with pytest.raises(ValueError):
+        store.restore("snap", str(target))
+    assert target.read_bytes() == b"keep me"
+    assert not list(tmp_path.glob("*.restore"))
+
+def test_backup_module_stores_prunes_and_restores(tmp_path, monkeypatch):
+    monkeypatch.setattr(backup, "BACKUP_DIR", str(tmp_path))
+    backup._reset_change_tracking()
+    conn = sqlite3.connect(DB_NAME)
+    conn.execute("CREATE TABLE IF NOT EXISTS StoreTest (id INTEGER PRIMARY KEY, value TEXT)")
+    conn.execute("DELETE FROM StoreTest")
+    conn.execute("INSERT INTO StoreTest (value) VALUES ('before')")
+    conn.commit()
+    conn.close()
+    try:
+        assert backup._store() is backup._store()
+        paths = [backup.create_backup(store=True) for _ in range(3)]
+        assert all(path.endswith(".db.json") for path in paths)
+        names = backup.list_backups()
+        assert len(names) == 3 and not list(tmp_path.glob("*.db"))
+
+        backup._prune_backups(2)
+        assert backup.list_backups() == names[1:]
+
+        conn = sqlite3.connect(DB_NAME)
+        conn.execute("INSERT INTO StoreTest (value) VALUES ('after')")
+        conn.commit()
+        conn.close()
+        assert backup.restore_backup(names[-1])
+        conn = sqlite3.connect(DB_NAME)
+        assert [r[0] for r in conn.execute("SELECT value FROM StoreTest")] == ["before"]
+        conn.close()
+        assert not backup.restore_backup("backup_missing.db")
+    finally:
+        backup._reset_change_tracking()
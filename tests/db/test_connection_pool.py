@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+"""
+tests/db/test_connection_pool.py - Tests for the pooled SQLite connections in db.connection.
+Verifies connection reuse, pragmas, the size bound, health checks, rollback on release,
+and that execute_sql returns its connection to the shared pool.
+"""
+
+import sqlite3
+import threading
+import pytest
+from db.connection import ConnectionPool, PooledConnection, get_pool
+from db.repository import execute_sql
+
+@pytest.fixture
+def pool(tmp_path):
+    p = ConnectionPool(str(tmp_path / "pool.db"), max_size=2, timeout=0.2)
+    yield p
+    p.close_all()
+
+def test_close_returns_connection_for_reuse(pool):
+    conn = pool.acquire()
+    assert isinstance(conn, PooledConnection)
+    assert isinstance(conn, sqlite3.Connection)
+    conn.close()
+    again = pool.acquire()
+    assert again is conn
+    again.close()
+    assert pool.stats() == {"open": 1, "idle": 1, "max_size": 2}
+
+def test_pragmas_applied_once_per_connection(pool):
+    with pool.connection() as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        # synchronous=NORMAL is reported as 1.
+        assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1
+        assert conn.row_factory is sqlite3.Row
+
+def test_pool_is_bounded(pool):
+    a = pool.acquire()
+    b = pool.acquire()
+    with pytest.raises(sqlite3.OperationalError):
+        pool.acquire()
+    released = []
+
+    def release_later():
+        released.append(True)
+        a.close()
+
+    timer = threading.Timer(0.05, release_later)
+    timer.start()
+    c = pool.acquire()
+    timer.join()
+    assert released and c is a
+    b.close()
+    c.close()
+
+def test_release_rolls_back_open_transaction(pool):
+    with pool.connection() as conn:
+        conn.execute("CREATE TABLE T (v INTEGER)")
+        conn.commit()
+    conn = pool.acquire()
+    conn.execute("INSERT INTO T (v) VALUES (1)")
+    conn.close()
+    with pool.connection() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM T").fetchone()[0] == 0
+
+def test_unhealthy_idle_connection_is_replaced(pool):
+    pool.health_check_interval = 0
+    conn = pool.acquire()
+    conn.close()
+    # Break the idle connection behind the pool's back.
+    sqlite3.Connection.close(conn)
+    fresh = pool.acquire()
+    assert fresh is not conn
+    assert fresh.execute("SELECT 1").fetchone()[0] == 1
+    fresh.close()
+    assert pool.stats()["open"] == 1
+
+def test_execute_sql_uses_shared_pool():
+    execute_sql("SELECT 1", fetchone=True)
+    stats = get_pool().stats()
+    assert stats["open"] >= 1
+    assert stats["idle"] == stats["open"]
+
+# End of tests/db/test_connection_pool.py
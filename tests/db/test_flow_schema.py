@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+"""
+tests/db/test_flow_schema.py - Tests for the version 2 flow-state schema.
+Verifies that version 1 JSON blobs are readable before migration and move to the Flows
+table and active_flow column in batches without changing any user's state, and that
+aggregate flow queries use the new indexes.
+"""
+
+import json
+import sqlite3
+
+import pytest
+
+import db.schema as schema
+from core.config import DB_NAME
+from db.repository import UserStatesRepository
+from managers.flow_manager import FlowManager, user_state_cache
+
+LEGACY = {
+    "schema-a": {"flows": {"schema-survey": {"step": "q2", "data": {"q1": "yes"}}}, "active_flow": "schema-survey",
+                 "has_seen_start": True},
+    "schema-b": {"flows": {"schema-survey": {"step": "start", "data": {}},
+                           "schema-signup": {"step": "name", "data": {}}},
+                 "active_flow": None},
+    "schema-c": {"active_flow": "schema-signup"},
+}
+
+def query(sql, params=()):
+    conn = sqlite3.connect(DB_NAME)
+    try:
+        return conn.execute(sql, params).fetchall()
+    finally:
+        conn.close()
+
+@pytest.fixture
+def legacy_rows():
+    conn = sqlite3.connect(DB_NAME)
+    conn.execute("DELETE FROM UserStates WHERE user_id LIKE 'schema-%'")
+    conn.execute("DELETE FROM Flows WHERE user_id LIKE 'schema-%'")
+    conn.executemany("INSERT INTO UserStates (user_id, flow_state) VALUES (?, ?)",
+                     [(user_id, json.dumps(state)) for user_id, state in LEGACY.items()])
+    conn.execute("INSERT INTO UserStates (user_id, flow_state) VALUES ('schema-d', 'not json')")
+    conn.execute("DELETE FROM SchemaVersion")
+    conn.execute("INSERT INTO SchemaVersion (version) VALUES (1)")
+    conn.commit()
+    conn.close()
+    schema.init_db()
+    user_state_cache.invalidate(None)
+    yield
+    user_state_cache.invalidate(None)
+    schema.migrate_flow_states()
+
+def loaded_states():
+    fm = FlowManager()
+    return {user_id: fm.list_flows(user_id) | {"welcome": fm.has_seen_welcome(user_id)}
+            for user_id in ("schema-a", "schema-b", "schema-c", "schema-d")}
+
+def test_blobs_migrate_in_batches_without_changing_state(legacy_rows):
+    assert not schema.flow_states_migrated()
+    before = loaded_states()
+    assert before["schema-a"]["active_flow"] == "schema-survey" and before["schema-a"]["welcome"]
+    assert before["schema-c"]["active_flow"] == "schema-signup"
+
+    after = ""
+    while after is not None and after < "schema-d":
+        after = schema.migrate_flow_states_batch(after, batch_size=1)
+    schema.migrate_flow_states(batch_size=2)
+    assert schema.flow_states_migrated() and schema.schema_version() == 2
+
+    rows = query("SELECT user_id, flow_state, active_flow FROM UserStates WHERE user_id LIKE 'schema-%' ORDER BY user_id")
+    assert rows == [("schema-a", '{"has_seen_start": true}', "schema-survey"), ("schema-b", "{}", None),
+                    ("schema-c", "{}", "schema-signup"), ("schema-d", "{}", None)]
+    assert query("SELECT user_id, flow_name, step, data FROM Flows WHERE user_id LIKE 'schema-%' ORDER BY 1, 2") == [
+        ("schema-a", "schema-survey", "q2", '{"q1": "yes"}'),
+        ("schema-b", "schema-signup", "name", "{}"),
+        ("schema-b", "schema-survey", "start", "{}"),
+    ]
+    user_state_cache.invalidate(None)
+    assert loaded_states() == before
+    state = UserStatesRepository().load_state("schema-a")
+    assert state["flows"]["schema-survey"]["data"] == {"q1": "yes"}
+
+def test_writes_replace_a_users_flow_rows(legacy_rows):
+    fm = FlowManager()
+    fm._write_user_state("schema-b", {"flows": {"schema-survey": {"step": "done", "data": {}}},
+                                      "active_flow": "schema-survey"})
+    assert query("SELECT flow_name, step FROM Flows WHERE user_id = 'schema-b'") == [("schema-survey", "done")]
+    assert query("SELECT active_flow FROM UserStates WHERE user_id = 'schema-b'") == [("schema-survey",)]
+
+def test_aggregate_queries_use_indexes(legacy_rows):
+    fm = FlowManager()
+    fm.start_flow("schema-e", "schema-survey")
+    fm._set_flow_step("schema-e", "schema-survey", "q2")
+    assert fm.users_in_flow("schema-survey") == ["schema-a", "schema-b", "schema-e"]
+    assert fm.users_in_flow("schema-survey", step="q2") == ["schema-a", "schema-e"]
+    assert fm.count_users_by_step("schema-survey") == {"q2": 2, "start": 1}
+    counts = fm.count_active_flows()
+    assert counts["schema-survey"] == 2 and counts["schema-signup"] == 1
+    assert schema.flow_states_migrated()
+
+    plans = [
+        ("SELECT user_id FROM Flows WHERE flow_name = ? AND step = ?", ("schema-survey", "q2"), "idx_flows_name_step"),
+        ("SELECT step, COUNT(*) FROM Flows WHERE flow_name = ? GROUP BY step", ("schema-survey",), "idx_flows_name_step"),
+        ("SELECT active_flow, COUNT(*) FROM UserStates WHERE active_flow IS NOT NULL GROUP BY active_flow", (),
+         "idx_userstates_active_flow"),
+    ]
+    for sql, params, index in plans:
+        detail = " ".join(row[3] for row in query("EXPLAIN QUERY PLAN " + sql, params))
+        assert index in detail, detail
+    fm._write_user_state("schema-e", {"flows": {}, "active_flow": None})
+
+@pytest.mark.asyncio
+async def test_migration_runs_on_the_writer_thread(legacy_rows):
+    fm = FlowManager()
+    await schema.migrate_flow_states_async(batch_size=2)
+    assert schema.flow_states_migrated()
+    assert await fm.users_in_flow_async("schema-signup") == ["schema-b"]
+    assert (await fm.count_users_by_step_async("schema-signup")) == {"name": 1}
@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+"""
+tests/db/test_recovery.py - Tests for the change journal and point-in-time recovery.
+Verifies that UserStates writes made through FlowManager and BaseRepository are journaled,
+that failed writes are not replayed, that the database can be recovered to any moment
+after a backup by replaying only the changes since that backup, that a writer holding its
+own transaction does not deadlock other journaled writers, and that pruning backups drops
+the journal segments they no longer need.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+
+import pytest
+
+import db.backup as backup
+import db.journal as journal
+from core.config import DB_NAME
+from db.connection import get_pooled_connection
+from db.recovery import checkpoints, main, restore_to_time
+from db.repository import UserStatesRepository
+from managers.flow_manager import FlowManager
+
+@pytest.fixture
+def change_journal(tmp_path, monkeypatch):
+    monkeypatch.setattr(backup, "BACKUP_DIR", str(tmp_path / "backups"))
+    instance = journal.ChangeJournal(str(tmp_path / "journal"), enabled=True)
+    monkeypatch.setattr(journal, "_journal", instance)
+    backup._reset_change_tracking()
+    conn = sqlite3.connect(DB_NAME)
+    conn.execute("DELETE FROM UserStates WHERE user_id LIKE 'pitr-%'")
+    conn.execute("DELETE FROM Flows WHERE user_id LIKE 'pitr-%'")
+    conn.commit()
+    conn.close()
+    yield instance
+    instance.close()
+    backup._reset_change_tracking()
+
+def states():
+    conn = sqlite3.connect(DB_NAME)
+    try:
+        users = [row[0] for row in conn.execute("SELECT user_id FROM UserStates WHERE user_id LIKE 'pitr-%'")]
+    finally:
+        conn.close()
+    repo = UserStatesRepository()
+    return {user_id: repo.load_state(user_id) for user_id in users}
+
+def moment():
+    # Separate the timestamps of the writes on either side of the returned time.
+    time.sleep(0.01)
+    now = time.time()
+    time.sleep(0.01)
+    return now
+
+def test_failed_writes_are_journaled_as_aborted(change_journal):
+    repo = UserStatesRepository()
+    repo.create({"user_id": "pitr-a", "flow_state": "{}"})
+    with pytest.raises(sqlite3.IntegrityError):
+        repo.create({"user_id": "pitr-a", "flow_state": '{"dup": true}'})
+    repo.delete("pitr-a")
+    repo.create({"user_id": "pitr-a", "flow_state": "{}"})
+    repo.delete_by_conditions({"user_id": "pitr-a"})
+
+    [segment] = change_journal.segments()
+    entries = list(change_journal.entries(segment))
+    assert [e["op"] for e in entries] == ["insert", "delete", "insert", "delete_where"]
+    assert all(e["table"] == "UserStates" for e in entries)
+
+def test_recover_to_any_point_in_time(change_journal, caplog):
+    flows = FlowManager()
+    repo = UserStatesRepository()
+    flows._write_user_state("pitr-a", {"flows": {}, "active_flow": None})
+    assert restore_to_time(time.time(), checkpoint=False) is False
+
+    backup.create_backup(store=True)
+    flows._write_user_state("pitr-a", {"flows": {"f": {"step": "one"}}, "active_flow": "f"})
+    flows._write_user_state("pitr-b", {"flows": {}, "active_flow": None})
+    first = moment()
+    expected_first = states()
+    repo.delete("pitr-b")
+    flows._write_user_state("pitr-a", {"flows": {"f": {"step": "two"}}, "active_flow": "f"})
+    second = moment()
+    expected_second = states()
+
+    backup.create_backup(store=True)
+    repo.update("pitr-a", {"flow_state": json.dumps({"flows": {}, "active_flow": None})})
+    third = moment()
+    expected_third = states()
+    flows._write_user_state("pitr-c", {"flows": {}, "active_flow": None})
+
+    assert restore_to_time(first, checkpoint=False)
+    assert states() == expected_first
+    assert restore_to_time(second, checkpoint=False)
+    assert states() == expected_second
+
+    caplog.set_level("INFO", logger="db.recovery")
+    assert restore_to_time(third, checkpoint=False)
+    assert states() == expected_third
+    # Only the change made after the second backup was replayed.
+    assert "plus 1 journaled changes" in caplog.text
+
+def test_own_transaction_takes_journal_lock_first(change_journal):
+    began = threading.Event()
+    errors = []
+
+    def migration_like_batch():
+        conn = get_pooled_connection()
+        try:
+            with change_journal.locked():
+                conn.execute("BEGIN IMMEDIATE")
+                began.set()
+                time.sleep(0.2)
+                repo = UserStatesRepository(connection_provider=lambda: conn, external_connection=True)
+                repo.save_states({"pitr-a": {"flows": {}, "active_flow": "a"}})
+        except Exception as e:
+            errors.append(e)
+        finally:
+            conn.close()
+
+    thread = threading.Thread(target=migration_like_batch)
+    thread.start()
+    began.wait()
+    started = time.monotonic()
+    UserStatesRepository().save_states({"pitr-b": {"flows": {}, "active_flow": "b"}})
+    thread.join()
+    assert not errors and time.monotonic() - started < 2
+    # Entries are journaled in commit order.
+    [segment] = change_journal.segments()
+    keys = [e["data"][0]["user_id"] for e in change_journal.entries(segment) if e["op"] == "upsert_many"
+            and e["table"] == "UserStates"]
+    assert keys == ["pitr-a", "pitr-b"]
+    assert {uid: s["active_flow"] for uid, s in states().items()} == {"pitr-a": "a", "pitr-b": "b"}
+
+def test_pruning_backups_drops_unneeded_segments(change_journal, capsys):
+    names = [backup.create_backup(store=True).rsplit("/", 1)[1][:-len(".json")] for _ in range(3)]
+    assert [name for name, _ in checkpoints()] == names
+    backup._prune_backups(2)
+    assert [s.checkpoint for s in change_journal.segments()] == names[1:]
+
+    assert main(["--list"]) == 0
+    assert names[1] in capsys.readouterr().out
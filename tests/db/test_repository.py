@@ -41,4 +41,25 @@ def test_execute_sql_fetchall():
     values = [row["value"] for row in results]
     assert "val1" in values and "val2" in values and "val3" in values
 
+def test_upsert_inserts_then_updates_in_place():
+    """
+    Ensure upsert and upsert_many insert new rows and update existing ones without
+    replacing them, and that db_api exposes both.
+    """
+    from core.api.db_api import upsert_record, upsert_records
+    with db_connection() as conn:
+        conn.execute("CREATE TABLE IF NOT EXISTS UpsertTable (key TEXT PRIMARY KEY, value TEXT, note TEXT)")
+        conn.execute("DELETE FROM UpsertTable")
+        conn.execute("INSERT INTO UpsertTable VALUES ('a', 'old', 'kept')")
+        conn.commit()
+
+    upsert_record("UpsertTable", {"key": "a", "value": "new"}, key="key")
+    upsert_record("UpsertTable", {"key": "b", "value": "first"}, key="key")
+    assert upsert_records("UpsertTable", [{"key": k, "value": k * 2} for k in "bcd"], key="key") == 3
+    assert upsert_records("UpsertTable", [], key="key") == 0
+
+    rows = execute_sql("SELECT key, value, note FROM UpsertTable ORDER BY key", fetchall=True)
+    assert [tuple(r) for r in rows] == [
+        ("a", "new", "kept"), ("b", "bb", None), ("c", "cc", None), ("d", "dd", None)]
+
 # End of tests/db/test_repository.py
\ No newline at end of file
@@ -0,0 +1,84 @@
+"""
+tests/managers/test_conversation_store.py - Tests for the chat conversation store.
+Verifies that history is trimmed to the token budget as turns are added, that the context
+leaves room for the new prompt, that conversations evicted from memory are reloaded from
+SQLite within the budget, and that old rows are pruned.
+"""
+
+import uuid
+from types import SimpleNamespace
+
+import pytest
+
+from core.api import db_api, async_db_api
+from managers.conversation_store import ConversationStore, PromptTokenCache, conversation_id, count_tokens
+
+def one_token_per_char(text):
+    return len(text)
+
+@pytest.fixture
+def conversations():
+    ids = [f"test:{uuid.uuid4().hex}" for _ in range(3)]
+    yield ids
+    for conversation in ids:
+        db_api.execute_query("DELETE FROM ConversationTurns WHERE conversation_id = ?", (conversation,), commit=True)
+
+async def stored_turns(conversation):
+    rows = await async_db_api.fetch_all(
+        "SELECT content FROM ConversationTurns WHERE conversation_id = ? ORDER BY seq", (conversation,))
+    return [row["content"] for row in rows]
+
+def test_conversation_id_and_token_count():
+    ctx = SimpleNamespace(author=SimpleNamespace(id=7), channel=SimpleNamespace(id=42))
+    assert conversation_id(ctx) == "42:7"
+    assert count_tokens("x" * 40) == count_tokens("x" * 40) > 0
+
+def test_prompt_token_cache_is_bounded_and_keyed_by_digest():
+    calls = []
+    cache = PromptTokenCache(lambda text: calls.append(text) or len(text), max_size=2)
+    assert [cache("aa"), cache("bbb"), cache("aa"), cache("c"), cache("bbb")] == [2, 3, 2, 1, 3]
+    assert calls == ["aa", "bbb", "c", "bbb"]
+    assert len(cache._counts) == 2 and all(isinstance(key, bytes) for key in cache._counts)
+
+@pytest.mark.asyncio
+async def test_history_is_trimmed_to_token_budget(conversations):
+    conversation = conversations[0]
+    # Each turn costs its length plus 4 tokens of overhead, so an exchange costs 14 + 13.
+    store = ConversationStore(token_budget=60, max_turns=10, counter=one_token_per_char)
+    for i in range(5):
+        await store.add_exchange(conversation, f"question {i}", f"answer #{i}")
+    context = await store.context(conversation)
+    assert [m["content"] for m in context] == ["question 3", "answer #3", "question 4", "answer #4"]
+    assert [m["role"] for m in context] == ["user", "assistant", "user", "assistant"]
+    assert store.memory_tokens == 54
+    # A 16-token prompt (12 characters plus overhead) leaves room for the last exchange only.
+    context = await store.context(conversation, "new question")
+    assert [m["content"] for m in context] == ["question 4", "answer #4"]
+    assert await store.context(conversation, "x" * 60) == []
+    assert len(await stored_turns(conversation)) == 10
+    await store.forget(conversation)
+    assert await store.context(conversation) == []
+
+@pytest.mark.asyncio
+async def test_evicted_conversation_is_reloaded_within_budget(conversations):
+    first, second, third = conversations
+    store = ConversationStore(max_conversations=2, token_budget=60, counter=one_token_per_char)
+    for conversation in conversations:
+        for i in range(3):
+            await store.add_exchange(conversation, f"question {i}", f"answer #{i}")
+    assert len(store) == 2 and first not in store._conversations
+    expected = await store.context(third)
+
+    reloaded = ConversationStore(token_budget=60, counter=one_token_per_char)
+    assert await reloaded.context(third) == expected
+    context = await store.context(first)
+    assert [m["content"] for m in context] == ["question 1", "answer #1", "question 2", "answer #2"]
+    assert first in store._conversations and second not in store._conversations
+
+@pytest.mark.asyncio
+async def test_old_turns_are_pruned_from_database(conversations):
+    conversation = conversations[0]
+    store = ConversationStore(keep_turns=4, counter=one_token_per_char)
+    for i in range(5):
+        await store.add_exchange(conversation, f"q{i}", f"a{i}")
+    assert await stored_turns(conversation) == ["q3", "a3", "q4", "a4"]
@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+"""
+tests/managers/test_user_state_cache.py
+---------------------------------------
+Tests for the write-back user state cache: LRU eviction, deferred writes, flush,
+invalidation, and the FlowManager integration that serves repeat reads from memory.
+"""
+
+import asyncio
+import pytest
+from unittest.mock import patch
+from managers.user_state_cache import UserStateCache, run_periodic_flush
+from managers.flow_manager import FlowManager, user_state_cache
+from core.api import flow_state_api
+
+def make_cache(max_size=2, write_through=False):
+    """
+    Build a cache backed by a plain dict so storage reads and writes can be counted.
+    """
+    store = {}
+    calls = {"loads": 0, "writes": 0}
+
+    def loader(user_id):
+        calls["loads"] += 1
+        return dict(store.get(user_id, {"flows": {}, "active_flow": None}))
+
+    def writer(user_id, state):
+        calls["writes"] += 1
+        store[user_id] = dict(state)
+
+    cache = UserStateCache(max_size, loader, writer, write_through=write_through)
+    return cache, store, calls
+
+def test_repeat_reads_hit_memory():
+    cache, _, calls = make_cache()
+    cache.peek("u1")
+    cache.peek("u1")
+    cache.get("u1")
+    assert calls["loads"] == 1
+    assert cache.hits == 2
+
+def test_writes_are_deferred_until_flush():
+    cache, store, calls = make_cache()
+    cache.put("u1", {"flows": {}, "active_flow": "a"})
+    cache.put("u1", {"flows": {}, "active_flow": "b"})
+    assert calls["writes"] == 0
+    assert cache.dirty_count() == 1
+    assert cache.flush() == 1
+    assert store["u1"]["active_flow"] == "b"
+    assert cache.flush() == 0
+
+def test_write_through_mode_persists_immediately():
+    cache, store, calls = make_cache(write_through=True)
+    cache.put("u1", {"flows": {}, "active_flow": "a"})
+    assert store["u1"]["active_flow"] == "a"
+    assert cache.dirty_count() == 0
+
+def test_eviction_writes_dirty_entry():
+    cache, store, _ = make_cache(max_size=2)
+    cache.put("u1", {"flows": {}, "active_flow": "one"})
+    cache.put("u2", {"flows": {}, "active_flow": "two"})
+    cache.peek("u2")
+    cache.put("u3", {"flows": {}, "active_flow": "three"})
+    assert len(cache) == 2
+    # u1 was least recently used and dirty, so it was written on eviction.
+    assert store["u1"]["active_flow"] == "one"
+    assert "u2" not in store
+
+def test_deferred_eviction_stays_readable_until_written():
+    cache, store, _ = make_cache(max_size=1)
+    cache.put("u1", {"flows": {}, "active_flow": "one"})
+    cache.put("u2", {"flows": {}, "active_flow": "two"}, write_evicted=False)
+    assert cache.has_evicted()
+    assert "u1" not in store
+    assert cache.lookup("u1")["active_flow"] == "one"
+    cache.write_evicted()
+    assert store["u1"]["active_flow"] == "one"
+    assert not cache.has_evicted()
+
+def test_get_returns_private_copy():
+    cache, _, _ = make_cache()
+    state = cache.get("u1")
+    state["flows"]["x"] = {"step": "start"}
+    assert cache.peek("u1")["flows"] == {}
+
+def test_invalidate_flushes_and_reloads():
+    cache, store, calls = make_cache()
+    cache.put("u1", {"flows": {}, "active_flow": "a"})
+    cache.invalidate("u1")
+    assert store["u1"]["active_flow"] == "a"
+    store["u1"]["active_flow"] = "external"
+    assert cache.peek("u1")["active_flow"] == "external"
+    assert calls["loads"] == 1
+
+@pytest.mark.asyncio
+async def test_periodic_flush_runs_and_flushes_on_cancel():
+    cache, store, _ = make_cache()
+    task = asyncio.create_task(run_periodic_flush(cache, 0.01))
+    cache.put("u1", {"flows": {}, "active_flow": "a"})
+    await asyncio.sleep(0.05)
+    assert store["u1"]["active_flow"] == "a"
+    cache.put("u1", {"flows": {}, "active_flow": "b"})
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    assert store["u1"]["active_flow"] == "b"
+
+def test_flow_manager_active_flow_check_uses_cache():
+    user_id = "cache-test-user"
+    flow_state_api.start_flow(user_id, "survey")
+    with patch("core.api.db_api.fetch_one") as fetch_one:
+        for _ in range(5):
+            assert flow_state_api.get_active_flow(user_id) == "survey"
+        fetch_one.assert_not_called()
+    FlowManager()._save_user_state(user_id, {"flows": {}, "active_flow": None})
+    user_state_cache.flush()
+
+def test_flow_manager_flush_persists_to_db():
+    user_id = "cache-flush-user"
+    fm = FlowManager()
+    fm.start_flow(user_id, "survey")
+    fm.flush_user_states()
+    fm.invalidate_user_state(user_id)
+    assert fm.get_active_flow(user_id) == "survey"
+    fm._save_user_state(user_id, {"flows": {}, "active_flow": None})
+    fm.flush_user_states()
+
+def test_flush_writes_dirty_entries_in_one_batch():
+    cache, store, calls = make_cache(max_size=4)
+    batches = []
+
+    def batch_writer(states):
+        batches.append(sorted(states))
+        if len(batches) == 1:
+            raise RuntimeError("disk full")
+        store.update(states)
+
+    cache._batch_writer = batch_writer
+    for uid in ("u1", "u2", "u3"):
+        cache.put(uid, {"flows": {}, "active_flow": uid})
+    # A failed batch falls back to writing users one at a time.
+    assert cache.flush() == 3
+    assert calls["writes"] == 3
+    for uid in ("u1", "u2"):
+        cache.put(uid, {"flows": {}, "active_flow": "again"})
+    assert cache.flush() == 2
+    assert batches == [["u1", "u2", "u3"], ["u1", "u2"]]
+    assert calls["writes"] == 3 and store["u2"]["active_flow"] == "again"
+
+def test_flow_manager_batch_flush_upserts_rows():
+    fm = FlowManager()
+    users = [f"batch-user-{i}" for i in range(3)]
+    fm._write_user_state(users[0], {"flows": {}, "active_flow": "old"})
+    fm._write_user_states({uid: {"flows": {}, "active_flow": "new"} for uid in users})
+    for uid in users:
+        fm.invalidate_user_state(uid)
+        assert fm.get_active_flow(uid) == "new"
+        fm._write_user_state(uid, {"flows": {}, "active_flow": None})
+
+# End of tests/managers/test_user_state_cache.py
@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+"""
+tests/parsers/envelope_corpus.py - Realistic signal-cli "receive" envelopes.
+Used by the envelope parser parity tests and benchmarks/bench_envelope_parser.py.
+Covers direct and group text messages, quoted replies, typing indicators, read and
+delivery receipts, and sync messages, in the plain-text format signal-cli prints.
+"""
+
+import random
+from typing import List
+
+SAMPLE_ENVELOPES: List[str] = [
+    (
+        "Envelope from: “Alice Example” +15551234567 (device: 1) to +15557654321\n"
+        "Timestamp: 1700000000000 (2023-11-14T22:13:20.000Z)\n"
+        "Server timestamps: received: 1700000000100 (2023-11-14T22:13:20.100Z) delivered: 1700000000200 (2023-11-14T22:13:20.200Z)\n"
+        "Sent by unidentified/sealed sender\n"
+        "Message timestamp: 1700000000000 (2023-11-14T22:13:20.000Z)\n"
+        "Body: @bot volunteer status\n"
+        "With profile key\n"
+    ),
+    (
+        "Envelope from: +15550001111 (device: 2) to +15557654321\n"
+        "Timestamp: 1700000005000 (2023-11-14T22:13:25.000Z)\n"
+        "Server timestamps: received: 1700000005100 (2023-11-14T22:13:25.100Z) delivered: 1700000005200 (2023-11-14T22:13:25.200Z)\n"
+        "Message timestamp: 1700000005000 (2023-11-14T22:13:25.000Z)\n"
+        "Body: bot sora explore cats in space\n"
+        "Group info:\n"
+        "  Id: cVvbXkV0dGVzdGdyb3VwaWQ9PQ==\n"
+        "  Name: Volunteers\n"
+        "  Revision: 12\n"
+        "  Type: DELIVER\n"
+        "Quote: Id: 1699999999000\n"
+        "  Author: +15552223333\n"
+        "  Text: what should we draw?\n"
+        "With profile key\n"
+    ),
+    (
+        "Envelope from: “Bob” +15552223333 (device: 1) to +15557654321\n"
+        "Timestamp: 1700000010000 (2023-11-14T22:13:30.000Z)\n"
+        "Server timestamps: received: 1700000010100 (2023-11-14T22:13:30.100Z) delivered: 1700000010200 (2023-11-14T22:13:30.200Z)\n"
+        "Got typing message\n"
+        "  Action: STARTED\n"
+        "  Timestamp: 1700000010000 (2023-11-14T22:13:30.000Z)\n"
+    ),
+    (
+        "Envelope from: +15552223333 (device: 1) to +15557654321\n"
+        "Timestamp: 1700000020000 (2023-11-14T22:13:40.000Z)\n"
+        "Server timestamps: received: 1700000020100 (2023-11-14T22:13:40.100Z) delivered: 1700000020200 (2023-11-14T22:13:40.200Z)\n"
+        "Received a receipt message\n"
+        "  When: 1700000020000 (2023-11-14T22:13:40.000Z)\n"
+        "  Type: READ\n"
+        "  Timestamps:\n"
+        "  - 1700000000000 (2023-11-14T22:13:20.000Z)\n"
+    ),
+    (
+        "Envelope from: “Carol” +447700900123 (device: 3) to +15557654321\n"
+        "Timestamp: 1700000030000 (2023-11-14T22:13:50.000Z)\n"
+        "Server timestamps: received: 1700000030100 (2023-11-14T22:13:50.100Z) delivered: 1700000030200 (2023-11-14T22:13:50.200Z)\n"
+        "Received a sync message\n"
+        "Received sent message\n"
+        "  To: +15550001111\n"
+        "  Timestamp: 1700000030000 (2023-11-14T22:13:50.000Z)\n"
+        "  Body: thanks, see you at 5\n"
+    ),
+]
+
+_NAMES = ["Alice", "Bob", "Carol", "Dan", "Eve Organizer", "Frank", "Grace H."]
+_BODIES = [
+    "@bot help",
+    "bot volunteer status",
+    "@bot flow list",
+    "hi everyone, meeting moved to 6pm",
+    "@50501oc bot event create Rally at noon",
+    "bot sora explore sunset over the bay",
+    "see attached flyer\tplease share",
+    "￼ info",
+    "register Jane Doe",
+    "ok 👍",
+]
+_GROUPS = ["cVvbXkV0dGVzdGdyb3VwaWQ9PQ==", "QmF5QXJlYU9yZ2FuaXplcnM=", "Wm9uZTVWb2x1bnRlZXJz"]
+
+def _phone(rng: random.Random) -> str:
+    return "+1555" + "".join(str(rng.randint(0, 9)) for _ in range(7))
+
+def _header(rng: random.Random, ts: int) -> str:
+    sender = _phone(rng)
+    if rng.random() < 0.6:
+        sender = f"“{rng.choice(_NAMES)}” {sender}"
+    return (
+        f"Envelope from: {sender} (device: {rng.randint(1, 4)}) to +15557654321\n"
+        f"Timestamp: {ts} (2023-11-14T22:13:20.000Z)\n"
+        f"Server timestamps: received: {ts + 100} (2023-11-14T22:13:20.100Z) delivered: {ts + 200} (2023-11-14T22:13:20.200Z)\n"
+    )
+
+def build_corpus(count: int = 1000, seed: int = 0) -> List[str]:
+    """
+    Return count synthetic envelopes in signal-cli's plain-text format, mixing text,
+    group, quoted, typing, and receipt messages in roughly production proportions.
+    """
+    rng = random.Random(seed)
+    corpus = list(SAMPLE_ENVELOPES)
+    while len(corpus) < count:
+        ts = 1700000000000 + rng.randint(0, 10 ** 9)
+        env = _header(rng, ts)
+        kind = rng.random()
+        if kind < 0.15:
+            env += f"Got typing message\n  Action: STARTED\n  Timestamp: {ts} (2023-11-14T22:13:20.000Z)\n"
+        elif kind < 0.35:
+            env += (
+                f"Received a receipt message\n  When: {ts} (2023-11-14T22:13:20.000Z)\n"
+                f"  Type: {rng.choice(['READ', 'DELIVERY'])}\n  Timestamps:\n  - {ts - 5000} (2023-11-14T22:13:15.000Z)\n"
+            )
+        else:
+            if rng.random() < 0.3:
+                env += "Sent by unidentified/sealed sender\n"
+            env += f"Message timestamp: {ts} (2023-11-14T22:13:20.000Z)\n"
+            env += f"Body: {rng.choice(_BODIES)}\n"
+            if rng.random() < 0.5:
+                env += (
+                    f"Group info:\n  Id: {rng.choice(_GROUPS)}\n  Name: Volunteers\n"
+                    f"  Revision: {rng.randint(1, 40)}\n  Type: DELIVER\n"
+                )
+            if rng.random() < 0.2:
+                env += f"Quote: Id: {ts - 60000}\n  Author: {_phone(rng)}\n  Text: {rng.choice(_BODIES)}\n"
+            env += "With profile key\n"
+        corpus.append(env)
+    return corpus[:count]
+
+# End of tests/parsers/envelope_corpus.py
@@ -3,7 +3,11 @@ tests/parsers/test_envelope_parser.py - Tests for envelope parsing functionaliti
 This module tests extraction of sender, body, timestamps, group info, and reply details from message envelopes.
 """
 
+import random
+import pytest
 from parsers.envelope_parser import parse_sender, parse_body, parse_timestamp, parse_group_info, parse_reply_id, parse_message_timestamp
+from parsers.envelope_parser import parse_message_type, parse_envelope, parse_envelopes, sanitize_text
+from tests.parsers.envelope_corpus import SAMPLE_ENVELOPES, build_corpus
 
 def test_parse_sender():
     message = "Envelope\nfrom: +1234567890\nBody: Hello"
@@ -35,4 +39,69 @@ def test_parse_message_timestamp():
     msg_ts = parse_message_timestamp(message)
     assert msg_ts == "555666777"
 
+def _per_field(message):
+    return (
+        parse_sender(message),
+        parse_body(message),
+        parse_timestamp(message),
+        parse_group_info(message),
+        parse_reply_id(message),
+        parse_message_timestamp(message),
+        parse_message_type(message),
+    )
+
+def _fields(envelope):
+    return (
+        envelope.sender,
+        envelope.body,
+        envelope.timestamp,
+        envelope.group_id,
+        envelope.reply_to,
+        envelope.message_timestamp,
+        envelope.message_type,
+    )
+
+def _mutations(message, rng):
+    """
+    Yield variants that stress marker ordering, capitalization, and missing fields.
+    """
+    lines = message.split("\n")
+    yield message.upper()
+    yield message.replace("from:", "FrOm:")
+    yield message.replace("typing message", "Typing MESSAGE")
+    yield message.replace("Body: ", "Body:\n\n")
+    yield message.replace("Group info:", "")
+    yield "Quote: nothing here\n" + message
+    yield message + "\x07Body: late\x00"
+    yield "\n".join(rng.sample(lines, len(lines)))
+    yield "\n".join(line for line in lines if rng.random() < 0.5)
+
+def test_sample_envelopes():
+    assert parse_envelope(SAMPLE_ENVELOPES[0]).sender == "+15551234567"
+    group = parse_envelope(SAMPLE_ENVELOPES[1])
+    assert group.body == "bot sora explore cats in space"
+    assert group.group_id == "cVvbXkV0dGVzdGdyb3VwaWQ9PQ=="
+    assert group.reply_to == "1699999999000"
+    assert parse_envelope(SAMPLE_ENVELOPES[2]).message_type == "typing"
+    assert parse_envelope(SAMPLE_ENVELOPES[3]).message_type == "receipt"
+
+@pytest.mark.parametrize("seed", range(3))
+def test_parse_envelope_matches_per_field_functions(seed):
+    rng = random.Random(seed)
+    for message in build_corpus(300, seed=seed):
+        for variant in [message, *_mutations(message, rng)]:
+            assert _fields(parse_envelope(variant)) == _per_field(variant)
+
+def test_parse_envelope_on_plain_chat_text():
+    for text in ["", "hello there", "bot help me", "\u0130 typİng message", "ſtuff from: nobody"]:
+        assert _fields(parse_envelope(text)) == _per_field(text)
+
+def test_parse_envelopes_batch():
+    corpus = build_corpus(20)
+    assert parse_envelopes(corpus) == [parse_envelope(m) for m in corpus]
+
+def test_sanitize_text_strips_control_characters():
+    assert sanitize_text("  a\x00b\tc\x7f ") == "abc"
+    assert sanitize_text(" plain ") == "plain"
+
 # End of tests/parsers/test_envelope_parser.py
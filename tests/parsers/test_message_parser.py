@@ -2,7 +2,8 @@
 tests/parsers/test_message_parser.py - Tests for message parsing functionalities.
 """
 
-from parsers.message_parser import parse_message
+from parsers.message_parser import parse_json_message, parse_message, parse_messages
+from tests.parsers.envelope_corpus import build_corpus
 
 def test_message_parsing():
     sample_message = (
@@ -17,4 +18,30 @@ def test_message_parsing():
     assert parsed.sender == "+1234567890"
     assert parsed.body.startswith("@bot")
 
+def test_parse_messages_batch_matches_single():
+    corpus = build_corpus(50)
+    assert parse_messages(corpus) == [parse_message(m) for m in corpus]
+
+def test_json_envelope_matches_text_envelope():
+    text = (
+        "Envelope from: +1234567890 (device: 1)\n"
+        "Timestamp: 123456789\n"
+        "Message timestamp: 123456790\n"
+        "Body: @bot test now\n"
+        "Group info:\n"
+        "  Id: SomeGroup\n"
+    )
+    envelope = {
+        "source": "+1234567890",
+        "sourceNumber": "+1234567890",
+        "timestamp": 123456789,
+        "dataMessage": {"timestamp": 123456790, "message": "@bot test now",
+                        "groupInfo": {"groupId": "SomeGroup", "type": "DELIVER"}},
+    }
+    assert parse_json_message(envelope) == parse_message(text)
+
+def test_json_typing_envelope_has_no_body():
+    parsed = parse_json_message({"source": "+1234567890", "timestamp": 1, "typingMessage": {"action": "STARTED"}})
+    assert (parsed.message_type, parsed.body, parsed.command) == ("typing", None, None)
+
 # End of tests/parsers/test_message_parser.py
\ No newline at end of file
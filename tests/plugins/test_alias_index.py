@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+"""
+tests/plugins/test_alias_index.py
+---------------------------------
+Tests for the alias trie: longest multi-word match, incremental updates through
+alias_mapping and plugin registration, and parity with a linear prefix scan.
+"""
+
+import random
+from plugins.alias_index import AliasIndex, AliasMapping
+from plugins.manager import plugin, clear_plugins, alias_mapping, alias_index
+from parsers.command_extractor import parse_command_from_body
+
+def _linear_match(mapping, text):
+    """
+    Reference implementation: longest alias prefix ending at a word boundary.
+    """
+    for alias in sorted(mapping, key=len, reverse=True):
+        if text.startswith(alias) and (len(text) == len(alias) or text[len(alias)] == " "):
+            return mapping[alias], len(alias)
+    return None
+
+def test_longest_multi_word_alias_wins():
+    index = AliasIndex()
+    index.add("sora", "sora")
+    index.add("sora explore", "sora explore")
+    assert index.longest_match("sora explore 5 cats") == ("sora explore", len("sora explore"))
+    assert index.longest_match("sora explorer") == ("sora", 4)
+    assert index.longest_match("shut") is None
+
+def test_remove_prunes_only_target_alias():
+    index = AliasIndex()
+    index.add("shut down", "shutdown")
+    index.add("shut", "shut")
+    index.remove("shut down")
+    assert index.longest_match("shut down now") == ("shut", 4)
+    assert len(index) == 1
+
+def test_mapping_mirrors_changes_into_index():
+    mapping = AliasMapping({"a b": "ab"})
+    mapping["c"] = "c"
+    assert mapping.index.longest_match("a b x") == ("ab", 3)
+    mapping.pop("a b")
+    del mapping["c"]
+    assert mapping.index.longest_match("a b x") is None
+    assert mapping.index.longest_match("c") is None
+    mapping["d"] = "d"
+    mapping.clear()
+    assert len(mapping.index) == 0
+
+def test_parity_with_linear_scan():
+    rng = random.Random(7)
+    words = ["sora", "explore", "shut", "down", "help", "flow", "pause", "x", "y"]
+    mapping = AliasMapping()
+    for i in range(200):
+        alias = " ".join(rng.choice(words) for _ in range(rng.randint(1, 3)))
+        mapping[alias] = f"cmd{i}"
+    for _ in range(500):
+        text = " ".join(rng.choice(words) for _ in range(rng.randint(0, 5)))
+        assert mapping.index.longest_match(text) == _linear_match(dict(mapping), text)
+
+def test_plugin_registration_updates_extractor():
+    clear_plugins()
+    try:
+        @plugin(["shut down", "shutdown"], canonical="shutdown")
+        def _shutdown(args, ctx, state_machine):
+            return "bye"
+
+        assert parse_command_from_body("Shut Down now please") == ("shutdown", "now please")
+        clear_plugins()
+        assert len(alias_index) == 0
+        assert parse_command_from_body("shut down now") == ("shut", "down now")
+    finally:
+        clear_plugins()
+
+# End of tests/plugins/test_alias_index.py
@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+"""
+tests/plugins/test_fuzzy_index.py
+---------------------------------
+Tests for the deletion-index fuzzy matcher: parity with difflib.get_close_matches over
+nearby terms, alias resolution to canonical names, query caching, and dispatch integration.
+"""
+
+import difflib
+import random
+import string
+import pytest
+from types import SimpleNamespace
+from plugins.fuzzy_index import FuzzyIndex, deletions
+from plugins.manager import plugin, clear_plugins, dispatch_message, disable_plugin
+from parsers.message_parser import ParsedMessage
+
+def test_deletions():
+    assert deletions("abc", 1) == {"abc", "ab", "ac", "bc"}
+    assert "a" in deletions("abc", 2)
+
+def test_parity_with_difflib_over_nearby_terms():
+    rng = random.Random(3)
+    alphabet = string.ascii_lowercase[:8]
+    terms = {"".join(rng.choice(alphabet) for _ in range(rng.randint(2, 9))) for _ in range(300)}
+    index = FuzzyIndex()
+    for term in terms:
+        index.add(term, term)
+    term_variants = {t: deletions(t) for t in terms}
+    for _ in range(150):
+        word = "".join(rng.choice(alphabet) for _ in range(rng.randint(1, 10)))
+        word_variants = deletions(word)
+        nearby = [t for t, v in term_variants.items() if not v.isdisjoint(word_variants)]
+        expected = difflib.get_close_matches(word, nearby, n=1, cutoff=0.75)
+        assert index.match(word) == (expected[0] if expected else None)
+
+def test_two_typos_still_match():
+    index = FuzzyIndex()
+    index.add("volunteer", "volunteer")
+    assert index.match("vlounter") == "volunteer"
+
+def test_alias_typo_returns_canonical():
+    index = FuzzyIndex()
+    index.add("volunteer", "volunteer")
+    index.add("sora explore", "sora")
+    assert index.match("sora explor") == "sora"
+    assert index.match("volunter") == "volunteer"
+    assert index.match("zzz") is None
+
+def test_cache_serves_repeats_and_resets_on_change():
+    index = FuzzyIndex()
+    index.add("help", "help")
+    assert index.match("halp") == "help"
+    hits = index.hits
+    assert index.match("halp") == "help"
+    assert index.hits == hits + 1
+    index.remove("help")
+    assert index.match("halp") is None
+
+@pytest.mark.asyncio
+async def test_dispatch_uses_fuzzy_index():
+    clear_plugins()
+    try:
+        @plugin(["greet", "hello"], canonical="greet", required_role="everyone")
+        def _greet(args, ctx, state_machine):
+            return "hi"
+
+        parsed = ParsedMessage(sender=None, body="helo", timestamp=None, group_id=None, reply_to=None,
+                               message_timestamp=None, command="helo", args="")
+        ctx = SimpleNamespace(author=SimpleNamespace(id=1, roles=[]))
+        assert await dispatch_message(parsed, ctx, None) == "hi"
+        disable_plugin("greet")
+        assert await dispatch_message(parsed, ctx, None) == "Plugin 'greet' is currently disabled."
+    finally:
+        clear_plugins()
+
+# End of tests/plugins/test_fuzzy_index.py
@@ -0,0 +1,62 @@
+"""
+tests/plugins/test_perf_command.py - Tests for the perf admin command.
+Verifies it lists slow commands from the latency histogram, recent slow messages, and captured profiles,
+and that it switches the event-loop monitor.
+"""
+
+import asyncio
+
+import pytest
+
+from core import loop_monitor, metrics, tracing
+from core.tracing import SlowCommandTracker
+from plugins.commands.perf import PerfCommand
+
+@pytest.fixture
+def tracker(monkeypatch):
+    fresh = SlowCommandTracker(threshold=0.01, log_size=10, profile_runs=1, profile_lines=10)
+    monkeypatch.setattr(tracing, "tracker", fresh)
+    return fresh
+
+def _perf(args: str) -> str:
+    return asyncio.run(PerfCommand().run_command(args, None, None))
+
+def test_perf_top_lists_commands_by_latency(tracker):
+    metrics.COMMAND_LATENCY.labels(command="perfslow", outcome="ok").observe(2.0)
+    metrics.COMMAND_LATENCY.labels(command="perffast", outcome="ok").observe(0.001)
+    response = _perf("top")
+    assert response.index("perfslow") < response.index("perffast")
+
+def test_perf_slow_and_profile(tracker):
+    assert "No messages slower" in _perf("slow")
+    with tracing.trace("user:1"):
+        tracing.set_command("perfslow")
+        asyncio.run(asyncio.sleep(0.02))
+    assert "perfslow" in _perf("slow")
+    assert "No profile captured" in _perf("profile perfslow")
+    with tracing.profiled("perfslow"):
+        sum(range(1000))
+    assert "Profile of 'perfslow'" in _perf("profile perfslow")
+    assert "cleared" in _perf("reset")
+    assert not tracker.slow and not tracker.profiles
+
+def test_perf_arm_profiles_next_run(tracker):
+    assert "will be profiled" in _perf("arm somecmd")
+    assert tracker.begin_profile("somecmd") is not None
+
+def test_perf_monitor_toggle(monkeypatch):
+    monitor = loop_monitor.LoopMonitor(interval=0.01, threshold=0.05)
+    monkeypatch.setattr(loop_monitor, "_monitor", monitor)
+
+    async def scenario():
+        on = await PerfCommand().run_command("monitor on", None, None)
+        status = await PerfCommand().run_command("monitor", None, None)
+        off = await PerfCommand().run_command("monitor off", None, None)
+        return on, status, off
+
+    on, status, off = asyncio.run(scenario())
+    assert "Loop monitor on" in on
+    assert "is on" in status
+    assert off == "Loop monitor off."
+    assert not monitor.enabled
+    assert "No event-loop blocks" in _perf("monitor blocks")